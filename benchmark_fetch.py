@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+获取性能基准测试脚本
+在本地Involve Asia模拟服务器上对比同步/异步客户端和各获取模式的吞吐量
+
+示例:
+  python benchmark_fetch.py
+  python benchmark_fetch.py --modes sync,async-sharded --latency-ms 200 --max-concurrent 8
+  python benchmark_fetch.py --latency-distribution lognormal --rate-limit-probability 0.05 --output benchmark.json
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.fetch_benchmark import BENCHMARK_MODES, run_benchmark, print_benchmark_report, save_benchmark_report
+from modules.mock_involve_server import add_mock_arguments, settings_from_args
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Involve Asia 获取性能基准测试 (本地模拟服务器)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"可用模式: {', '.join(BENCHMARK_MODES)}"
+    )
+    parser.add_argument('--modes', default=','.join(BENCHMARK_MODES), help='要运行的模式，逗号分隔')
+    parser.add_argument('--start-date', default='2025-06-01', help='开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end-date', default='2025-06-07', help='结束日期 (YYYY-MM-DD)')
+    parser.add_argument('--max-concurrent-requests', type=int, help='客户端最大并发请求数 (MAX_CONCURRENT_REQUESTS)')
+    parser.add_argument('--request-timeout', type=int, help='客户端读取超时秒数 (REQUEST_TIMEOUT)')
+    parser.add_argument('--rate-limit', type=float, help='全局令牌桶每秒请求数 (GLOBAL_RATE_LIMIT_PER_SECOND)，0表示不限速')
+    parser.add_argument('--no-page-size-probe', action='store_true',
+                        help='关闭页面大小探测，固定使用DEFAULT_PAGE_LIMIT')
+    parser.add_argument('--output', help='保存JSON结果的路径')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in BENCHMARK_MODES]
+    if unknown:
+        parser.error(f"未知模式: {', '.join(unknown)}")
+
+    config_overrides = {'REQUEST_DELAY': 0}
+    if args.max_concurrent_requests:
+        config_overrides['MAX_CONCURRENT_REQUESTS'] = args.max_concurrent_requests
+    if args.request_timeout:
+        config_overrides['REQUEST_TIMEOUT'] = args.request_timeout
+    if args.rate_limit is not None:
+        config_overrides['GLOBAL_RATE_LIMIT_ENABLED'] = args.rate_limit > 0
+        config_overrides['GLOBAL_RATE_LIMIT_PER_SECOND'] = args.rate_limit or None
+        config_overrides['GLOBAL_RATE_LIMIT_BURST'] = args.rate_limit or None
+
+    if args.no_page_size_probe:
+        config_overrides['PAGE_SIZE_PROBE_ENABLED'] = False
+
+    results = run_benchmark(modes, args.start_date, args.end_date,
+                            mock_settings=settings_from_args(args), config_overrides=config_overrides)
+    print_benchmark_report(results)
+    if args.output:
+        save_benchmark_report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,17 @@ from datetime import datetime, timedelta
 # =============================================================================
 INVOLVE_ASIA_API_SECRET = "boiTXnRgB2B3N7rCictjjti1ufNIzKksSURJHwqtC50="
 INVOLVE_ASIA_API_KEY = "general"
-INVOLVE_ASIA_BASE_URL = "https://api.involve.asia/api"
+INVOLVE_ASIA_BASE_URL = os.getenv('INVOLVE_ASIA_BASE_URL', "https://api.involve.asia/api")  # 可指向本地模拟服务器
 INVOLVE_ASIA_AUTH_URL = f"{INVOLVE_ASIA_BASE_URL}/authenticate"
 INVOLVE_ASIA_CONVERSIONS_URL = f"{INVOLVE_ASIA_BASE_URL}/conversions/range"
 
+# 认证Token缓存 - 按API Key/Secret哈希跨运行、跨账户复用token，临近过期时重新认证，请求遇到401时刷新
+TOKEN_CACHE_ENABLED = True
+TOKEN_CACHE_BACKEND = os.getenv('TOKEN_CACHE_BACKEND', "file")  # file / memory，也可通过 set_token_store 注入自定义存储
+TOKEN_CACHE_PATH = os.path.join("cache", "token_cache.json")
+TOKEN_CACHE_TTL_SECONDS = 3600  # 认证响应未给出有效期时token的缓存时长
+TOKEN_CACHE_REFRESH_MARGIN = 300  # 距过期不足N秒时视为过期，重新认证
+
 # =============================================================================
 # 业务配置
 # =============================================================================
@@ -41,6 +48,7 @@ PREFERRED_CURRENCY = "USD"
 
 # API请求配置 - 优化为ByteC长时间任务
 REQUEST_TIMEOUT = 30  # 增加到30秒，提升大数据量请求的稳定性
+REQUEST_CONNECT_TIMEOUT = 10  # 同步客户端建立连接的超时时间(秒)，REQUEST_TIMEOUT 为读取超时
 MAX_RETRY_ATTEMPTS = 5  # 增加重试次数，提升容错性
 REQUEST_DELAY = 0.5  # 减少请求间隔到0.5秒，提升获取速度
 RATE_LIMIT_DELAY = 30  # 遇到429错误时的等待时间(秒)
@@ -51,10 +59,22 @@ MAX_SKIPPED_PAGES = 10  # 最大跳过页面数，超过此数停止获取
 CONNECTIVITY_CHECK_HOST = '8.8.8.8'  # 网络连通性检查主机
 CONNECTIVITY_CHECK_PORT = 53  # 网络连通性检查端口
 CONNECTIVITY_CHECK_TIMEOUT = 5  # 网络连通性检查超时(秒)
-THREAD_TIMEOUT_BUFFER = 5  # 线程超时缓冲时间(秒)
+
+# 后台资源采样 - 固定间隔采集CPU/内存/网络/磁盘写入环形缓冲区，运行结束时输出时间序列
+RESOURCE_SAMPLE_INTERVAL = 5  # 采样间隔(秒)
+RESOURCE_SAMPLE_BUFFER_SIZE = 720  # 环形缓冲区容量（5秒间隔约1小时）
+RESOURCE_CONNECTIVITY_EVERY = 6  # 每N次采样检查一次网络连通性
 
 # 分页配置
-DEFAULT_PAGE_LIMIT = 100
+DEFAULT_PAGE_LIMIT = 100  # 默认页面大小，也是页面大小探测和超时减半的下限
+
+# 页面大小探测 - 按账户探测API接受的最大limit并缓存，大页面频繁超时时自动减半
+PAGE_SIZE_PROBE_ENABLED = True
+PAGE_SIZE_CANDIDATES = [1000, 500, 250]  # 探测时从大到小尝试的页面大小
+PAGE_SIZE_CACHE_PATH = os.path.join("cache", "page_size_cache.json")
+PAGE_SIZE_CACHE_TTL_DAYS = 7  # 缓存有效期，过期后重新探测
+PAGE_SIZE_TIMEOUT_THRESHOLD = 3  # 当前页面大小累计超时N次后减半
+
 MAX_RECORDS_LIMIT = None  # 最大记录数限制，None表示不限制，例如设置100表示最多获取100条记录
 
 # Partner过滤配置
@@ -102,23 +122,53 @@ PARTNER_SOURCES_MAPPING = {
     }
 }
 
+# Source到Partner匹配结果的LRU缓存容量（匹配器在映射对象被替换时自动重新编译）
+PARTNER_MATCH_CACHE_SIZE = 4096
+
 # =============================================================================
 # 文件配置
 # =============================================================================
 # 输出目录
 OUTPUT_DIR = "output"
 TEMP_DIR = "temp"
+DIAGNOSTICS_DIR = os.path.join(TEMP_DIR, "diagnostics")  # 资源时间序列等诊断文件（不写入输出目录）
 
 # 文件名模板
 PARTNER_REPORT_TEMPLATE = "{partner}_ConversionReport_{start_date}_to_{end_date}.xlsx"
 JSON_FILE_TEMPLATE = "conversions_{date}_{timestamp}.json"
 
+# 中间数据格式 - --save-json 保存的转换数据：parquet（压缩列式存储，需要pyarrow，读取时按栏位投影）或 json（缩进JSON导出）
+CONVERSION_SAVE_FORMAT = os.getenv('CONVERSION_SAVE_FORMAT', "parquet")  # 未安装pyarrow时自动使用json
+CONVERSION_PARQUET_COMPRESSION = "zstd"
+
 # Excel配置
 EXCEL_SHEET_NAME = "Conversion Report"
+EXCEL_WRITE_CHUNK_ROWS = 50000  # 流式写入Excel时每次整列转换的行数（决定写入时的内存上限）
+
+# 报告汇总清单 - 生成报表时在同目录写入 <报表文件名>.summary.json（各Partner、Source、Offer的合计），邮件直接读取，清单缺失时才解析Excel
+REPORT_MANIFEST_ENABLED = True
+REPORT_MANIFEST_SUFFIX = ".summary.json"
 
 # 数据处理配置
 MOCKUP_MULTIPLIER = 0.9  # sale_amount调整倍数（默认90%）
 REMOVE_COLUMNS = ["payout", "base_payout", "bonus_payout"]  # 要移除的栏位
+CONVERSION_NUMERIC_FIELDS = ["sale_amount", "payout", "base_payout", "bonus_payout"]  # 构建共享数据时统一转为数值的金额字段（无法解析的值记为0）
+
+# 列类型策略 - 构建共享数据时压缩列类型，降低大数据量时各阶段的内存占用（导出的报表内容不变）
+DTYPE_POLICY_ENABLED = True
+DTYPE_CATEGORY_COLUMNS = ["offer_name", "aff_sub1", "api_source", "api_platform", "currency", "conversion_status", "status"]  # 始终转为category的字符串栏位
+DTYPE_CATEGORY_MAX_UNIQUE_RATIO = 0.5  # 其他字符串栏位的唯一值不超过行数的该比例时也转为category
+DTYPE_COMPACT_STRING_COLUMNS = ["conversion_id", "order_id", "adv_sub1", "datetime_conversion", "datetime_conversion_updated"]  # ID类栏位，安装pyarrow时使用Arrow字符串
+DTYPE_DOWNCAST_INTEGERS = True  # 整数栏位按取值范围降级（如int64 → int16）
+MEMORY_REPORT_ENABLED = True  # 输出各处理阶段的数据内存和进程RSS
+
+# 并行导出配置 - 各Partner的Excel工作簿在进程池中并行生成（openpyxl为纯Python，串行导出只能使用一个CPU核）
+PARALLEL_EXPORT_ENABLED = True
+PARALLEL_EXPORT_MIN_PARTNERS = 2  # 少于N个Partner时串行导出
+PARALLEL_EXPORT_MAX_WORKERS = None  # 最大工作进程数，None表示按可用CPU核数（含容器CPU配额）
+PARALLEL_EXPORT_WORKER_BASE_MB = 150  # 每个工作进程的基础内存估计(MB)
+PARALLEL_EXPORT_MEMORY_FACTOR = 8  # 生成工作簿的内存约为该Partner数据内存的N倍
+PARALLEL_EXPORT_MEMORY_FRACTION = 0.7  # 工作进程合计最多使用当前可用内存的比例
 
 # =============================================================================
 # ByteC 报表配置
@@ -288,18 +338,14 @@ def get_pattern_for_partner(partner_name):
     return partner_config.get('pattern', '')
 
 def match_source_to_partner(source_name):
-    """将Source映射到对应的Partner"""
-    import re
-    for partner, config in PARTNER_SOURCES_MAPPING.items():
-        # 先检查sources列表
-        if source_name in config.get('sources', []):
-            return partner
-        # 再检查正则表达式模式
-        pattern = config.get('pattern', '')
-        if pattern and re.match(pattern, source_name):
-            return partner
-    # 如果没有匹配到，返回原始source_name作为partner
-    return source_name
+    """
+    将Source映射到对应的Partner
+    按 PARTNER_SOURCES_MAPPING 顺序，先匹配sources列表再匹配正则；没有匹配到时返回原始source_name。
+    使用预编译的匹配器（字面值哈希表 + 合并正则 + LRU缓存），整列映射请使用
+    modules.partner_matcher.get_partner_matcher().match_series
+    """
+    from modules.partner_matcher import get_partner_matcher
+    return get_partner_matcher().match(source_name)
 
 def get_partner_email_config(partner_name):
     """获取Partner的邮件配置"""
@@ -582,6 +628,46 @@ HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
 HTTP_MAX_CONNECTIONS = 20
 HTTP_KEEPALIVE_EXPIRY = 30
 
+# 多账户并发获取配置 - 所有API账户在同一事件循环中共享连接池和并发预算
+CONCURRENT_MULTI_ACCOUNT_FETCH = True
+
+# 日期分片获取 - 较长的日期范围按N天切分，各分片首页并行获取后，所有页面进入同一个工作队列
+DATE_SHARDING_ENABLED = True
+DATE_SHARD_DAYS = 1  # 每个分片的天数
+DATE_SHARDING_MIN_DAYS = 3  # 日期范围达到该天数才分片
+
+# AIMD自适应并发控制 - 请求健康时逐步加性增加并发数，遇到429或超时时减半
+# 初始并发数为 MAX_CONCURRENT_REQUESTS；禁用时固定使用 MAX_CONCURRENT_REQUESTS
+ADAPTIVE_CONCURRENCY_ENABLED = True
+AIMD_MIN_CONCURRENT_REQUESTS = 1
+AIMD_MAX_CONCURRENT_REQUESTS = 20  # 不超过 HTTP_MAX_CONNECTIONS
+AIMD_INCREASE_STEP = 1  # 每完成约"当前并发数"个健康请求，并发数增加的步长
+AIMD_DECREASE_FACTOR = 0.5  # 遇到429/超时时的并发数乘数
+AIMD_LATENCY_THRESHOLD = 10.0  # 秒，延迟超过该值的成功请求不再增加并发
+AIMD_THROUGHPUT_WINDOW = 10.0  # 秒，吞吐量统计的滑动窗口
+
+# 全局令牌桶限速 - 进程内所有Involve Asia客户端按API主机共享，控制多账户/多任务合并后的请求速率
+# 启用后替代客户端各自的 REQUEST_DELAY 页间等待
+GLOBAL_RATE_LIMIT_ENABLED = True
+GLOBAL_RATE_LIMIT_PER_SECOND = 10  # 每个API主机每秒最多请求数
+GLOBAL_RATE_LIMIT_BURST = 10  # 允许的突发请求数
+GLOBAL_RATE_LIMIT_CROSS_PROCESS = False  # 通过文件锁在多个进程之间共享令牌桶（需要fcntl）
+RATE_LIMIT_STATE_DIR = os.path.join(TEMP_DIR, "rate_limit")  # 跨进程令牌桶状态文件目录
+
+# 请求对冲 - 页面请求耗时超过已观测延迟的p95时发送相同的对冲请求，先返回者胜出
+HEDGED_REQUESTS_ENABLED = False
+HEDGE_LATENCY_PERCENTILE = 95  # 触发对冲的延迟百分位
+HEDGE_MIN_SAMPLES = 20  # 至少观测到N个成功请求后才开始对冲
+HEDGE_BUDGET_PERCENT = 5  # 对冲请求数不超过主请求数的百分比
+HEDGE_MIN_DELAY = 1.0  # 对冲触发时间下限(秒)
+HEDGE_LATENCY_WINDOW = 200  # 计算p95使用的最近成功请求数
+
+# 页面处理流水线 - 每页完成后立即由消费者规范化并写入，与其他在途请求重叠
+PAGE_PIPELINE_USE_THREAD = True  # 在工作线程中执行页面处理，事件循环继续处理网络I/O
+PAGE_PIPELINE_MAX_PENDING = 50  # 等待处理的页面数上限（背压）
+PAGE_NUMERIC_FIELDS = ["sale_amount", "payout", "base_payout", "bonus_payout"]  # 获取时转为数值的金额字段
+PAGE_PARTNER_TAG_FIELD = None  # 设置字段名（如"partner"）时按aff_sub1为每条记录标记Partner，会作为新栏位出现在报表中
+
 # 异步批次处理配置 - 针对超时优化
 ASYNC_BATCH_SIZE = 15  # 每批最多处理的页面数，提高吞吐量
 
@@ -597,6 +683,10 @@ def get_async_config():
     """获取异步配置"""
     return {
         'max_concurrent_requests': MAX_CONCURRENT_REQUESTS,
+        'adaptive_concurrency': ADAPTIVE_CONCURRENCY_ENABLED,
+        'aimd_min_concurrent_requests': AIMD_MIN_CONCURRENT_REQUESTS,
+        'aimd_max_concurrent_requests': AIMD_MAX_CONCURRENT_REQUESTS,
+        'global_rate_limit_per_second': GLOBAL_RATE_LIMIT_PER_SECOND if GLOBAL_RATE_LIMIT_ENABLED else None,
         'http_max_keepalive_connections': HTTP_MAX_KEEPALIVE_CONNECTIONS,
         'http_max_connections': HTTP_MAX_CONNECTIONS,
         'http_keepalive_expiry': HTTP_KEEPALIVE_EXPIRY,
@@ -604,6 +694,70 @@ def get_async_config():
         'enable_performance_monitoring': ENABLE_ASYNC_PERFORMANCE_MONITORING
     }
 
+# 流式获取配置 - 每页数据追加写入磁盘上的NDJSON spool文件，避免长时间范围回溯时内存溢出
+STREAM_FETCH_ENABLED = False
+SPOOL_DIR = os.path.join(TEMP_DIR, "spool")  # spool文件目录
+SPOOL_CHUNK_SIZE = 50000  # 从spool分块加载时每块的记录数
+
+def should_stream_fetch():
+    """判断是否应该使用流式获取（spool落盘）模式"""
+    env_value = os.getenv('STREAM_FETCH')
+    if env_value is not None:
+        return env_value.lower() in ('true', '1', 'yes')
+    return STREAM_FETCH_ENABLED
+
+# 可续传获取检查点 - 流式获取时每完成一页写入检查点，--resume 只获取缺失的页面并追加到原spool
+CHECKPOINT_DIR = os.path.join(TEMP_DIR, "checkpoints")
+RESUME_FETCH = False
+
+# 增量Conversion存储 - 按账户+日期缓存已获取的数据，重跑时只请求缺失或未关闭的日期
+CONVERSION_STORE_ENABLED = False
+CONVERSION_STORE_PATH = os.path.join("cache", "conversion_store.db")
+CONVERSION_STORE_OPEN_DAYS = 2  # 获取时距今不足N天的日期视为未关闭（数据仍可能变动），下次运行重新获取
+CONVERSION_STORE_FETCH_CONCURRENCY = 4  # 同时请求的日期数（各日期的页面请求仍受全局并发控制和限速约束）
+
+# Conversion记录字段投影 - 每页数据到达时投影为只含下列字段的紧凑记录，降低大范围回溯的内存占用
+# 注意：开启后导出的Excel只包含投影字段（及 api_source / api_platform）
+CONVERSION_PROJECTION_ENABLED = False
+CONVERSION_PROJECTION_FIELDS = [
+    "conversion_id", "datetime_conversion", "datetime_conversion_updated", "conversion_status",
+    "offer_id", "offer_name", "order_id", "currency", "sale_amount", "payout", "base_payout", "bonus_payout",
+    "aff_sub1", "aff_sub2", "aff_sub3", "aff_sub4", "adv_sub1"
+]
+# 低基数字段：相同的字符串值在记录间共享同一个对象
+CONVERSION_PROJECTION_SHARED_FIELDS = [
+    "conversion_status", "offer_name", "currency", "aff_sub1", "aff_sub2", "aff_sub3", "aff_sub4"
+]
+CONVERSION_PROJECTION_KEEP_RAW = False  # 在紧凑记录中保留原始JSON（record.raw），会抵消大部分内存收益
+
+def should_project_conversion_records():
+    """判断是否应该对获取的conversion记录做字段投影"""
+    env_value = os.getenv('PROJECT_CONVERSION_RECORDS')
+    if env_value is not None:
+        return env_value.lower() in ('true', '1', 'yes')
+    return CONVERSION_PROJECTION_ENABLED
+
+def should_use_parallel_export():
+    """判断是否应该并行生成Partner工作簿"""
+    env_value = os.getenv('PARALLEL_EXPORT')
+    if env_value is not None:
+        return env_value.lower() in ('true', '1', 'yes')
+    return PARALLEL_EXPORT_ENABLED
+
+def should_optimize_dtypes():
+    """判断是否应该压缩共享转换数据的列类型"""
+    env_value = os.getenv('OPTIMIZE_DTYPES')
+    if env_value is not None:
+        return env_value.lower() in ('true', '1', 'yes')
+    return DTYPE_POLICY_ENABLED
+
+def should_use_conversion_store():
+    """判断是否应该使用增量conversion存储"""
+    env_value = os.getenv('USE_CONVERSION_STORE')
+    if env_value is not None:
+        return env_value.lower() in ('true', '1', 'yes')
+    return CONVERSION_STORE_ENABLED
+
 def should_use_async_api():
     """判断是否应该使用异步API"""
     # 默认启用异步API，除非明确禁用
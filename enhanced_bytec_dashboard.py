@@ -23,7 +23,7 @@ from concurrent.futures import ThreadPoolExecutor
 import socket
 import time
 import google.generativeai as genai
-import re
+from modules.partner_matcher import PartnerMatcher
 
 # PandasAI 相关导入
 try:
@@ -296,26 +296,12 @@ PUB_COMMISSION_RATE_MAPPING = {
 # 默认发布商佣金率
 DEFAULT_PUB_COMMISSION_RATE = 1.0  # 1%
 
+# 預編譯的 Partner 匹配器（跳過匹配所有數據的 ByteC 配置，空 Source 返回 Unknown）
+PARTNER_MATCHER = PartnerMatcher(PARTNER_SOURCES_MAPPING, skip_partners=("ByteC",), empty_result="Unknown")
+
 def match_source_to_partner(source_name):
-    """將 Source 映射到對應的 Partner"""
-    if not source_name:
-        return "Unknown"
-    
-    for partner, config in PARTNER_SOURCES_MAPPING.items():
-        if partner == "ByteC":  # 跳過 ByteC 配置
-            continue
-            
-        # 先檢查 sources 列表
-        if source_name in config.get('sources', []):
-            return partner
-        
-        # 再檢查正則表達式模式
-        pattern = config.get('pattern', '')
-        if pattern and re.match(pattern, source_name):
-            return partner
-    
-    # 如果沒有匹配到，返回原始 source_name 作為 partner
-    return source_name
+    """將 Source 映射到對應的 Partner（沒有匹配到時返回原始 source_name）"""
+    return PARTNER_MATCHER.match(source_name)
 
 def get_adv_commission_rate(platform_name, avg_commission_rate=None):
     """
@@ -632,7 +618,7 @@ class PostbackDataManager:
             
             # 添加 Partner 欄位（從 aff_sub 解析）
             if not df.empty:
-                df['partner_name'] = df['aff_sub'].apply(match_source_to_partner)
+                df['partner_name'] = PARTNER_MATCHER.match_series(df['aff_sub'])
                 
                 # 修復日期格式問題
                 if 'date' in df.columns:
@@ -16,12 +16,19 @@ from modules.feishu_uploader import FeishuUploader
 from modules.email_sender import EmailSender
 from modules.scheduler import ReportScheduler
 from modules.bytec_report_generator import ByteCReportGenerator
+from modules.conversion_spool import ConversionSpool, SpoolReader
+from modules.conversion_archive import save_conversions
+from modules.conversion_store import ConversionStore, account_key
+from modules.conversion_frame import ConversionFrame
+from modules.fetch_checkpoint import open_checkpointed_spool
+from modules.resource_sampler import dump_resource_timeseries
+from modules.excel_writer import write_dataframe_workbook, CURRENCY_FORMAT
 from utils.logger import print_step, log_error
 import config
 
 # 异步API支持
 try:
-    from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+    from modules.involve_asia_api_async import AsyncInvolveAsiaAPI, fetch_multiple_accounts
     ASYNC_API_AVAILABLE = True
 except ImportError:
     ASYNC_API_AVAILABLE = False
@@ -72,9 +79,17 @@ class WeeklyReporter:
         print_step("多API模式", f"开始从 {len(api_list)} 个API获取数据")
         
         all_conversions = []
+        spooled_conversions = []  # 流式模式下各API的spool读取器
         api_errors = []
         api_success_count = 0
         total_records = 0
+        stream = config.should_stream_fetch()
+        store = self._open_conversion_store(max_records)
+        
+        # 异步模式下，所有账户在同一事件循环中并发获取（共享连接池和并发预算）
+        prefetched_results = None
+        if self.use_async and getattr(config, 'CONCURRENT_MULTI_ACCOUNT_FETCH', False):
+            prefetched_results = self._fetch_accounts_concurrently(api_list, start_date, end_date, max_records, stream, store)
         
         for i, api_config in enumerate(api_list, 1):
             api_name = api_config['name']
@@ -92,57 +107,105 @@ class WeeklyReporter:
             sys.stdout.flush()
             
             try:
-                # 创建临时API客户端（根据主客户端类型选择）
-                if self.use_async:
-                    temp_client = AsyncInvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
-                else:
-                    temp_client = InvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
-                
-                # 临时设置记录限制
-                original_limit = config.MAX_RECORDS_LIMIT
-                if max_records is not None:
-                    config.MAX_RECORDS_LIMIT = max_records
-                
-                # 认证
-                print_step(f"API-{api_name}", f"开始认证...")
-                sys.stdout.flush()
-                
-                # 异步认证需要使用asyncio
-                if self.use_async:
-                    import asyncio
-                    
-                    async def authenticate_and_get_data():
-                        if not await temp_client.authenticate():
-                            return None
-                        return await temp_client.get_conversions_async(start_date, end_date, api_name=api_name)
-                    
-                    api_data = asyncio.run(authenticate_and_get_data())
-                    
+                if prefetched_results is not None:
+                    # 数据已在并发阶段获取（记录限制已在并发阶段应用）
+                    api_data = prefetched_results.get(api_name)
+                    if isinstance(api_data, Exception):
+                        raise api_data
                     if api_data is None:
                         error_msg = f"API认证失败: {api_name}"
                         api_errors.append(error_msg)
                         print_step(f"API-{api_name}", f"❌ {error_msg}")
                         continue
                 else:
-                    # 同步认证
-                    if not temp_client.authenticate():
-                        error_msg = f"API认证失败: {api_name}"
-                        api_errors.append(error_msg)
-                        print_step(f"API-{api_name}", f"❌ {error_msg}")
-                        continue
+                    # 创建临时API客户端（根据主客户端类型选择）
+                    if self.use_async:
+                        temp_client = AsyncInvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
+                    else:
+                        temp_client = InvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
                     
-                    print_step(f"API-{api_name}", f"认证成功，开始获取数据...")
-                    sys.stdout.flush()
+                    # 临时设置记录限制
+                    original_limit = config.MAX_RECORDS_LIMIT
+                    if max_records is not None:
+                        config.MAX_RECORDS_LIMIT = max_records
                     
-                    # 获取数据
-                    print_step(f"API-{api_name}", f"调用get_conversions方法...")
-                    sys.stdout.flush()
-                    api_data = temp_client.get_conversions(start_date, end_date, api_name=api_name)
-                    print_step(f"API-{api_name}", f"get_conversions方法执行完成")
+                    # 认证
+                    print_step(f"API-{api_name}", f"开始认证...")
                     sys.stdout.flush()
-                
-                # 恢复原始限制
-                config.MAX_RECORDS_LIMIT = original_limit
+                    
+                    # 异步认证需要使用asyncio
+                    if self.use_async:
+                        import asyncio
+                        
+                        async def fetch_range(spool=None, checkpoint=None):
+                            if store is None:
+                                return await temp_client.get_conversions_async(start_date, end_date, api_name=api_name,
+                                                                               spool=spool, checkpoint=checkpoint)
+                            return await store.fetch_range_async(
+                                account_key(api_secret), start_date, end_date,
+                                lambda day: temp_client.get_conversions_async(day, day, api_name=f"{api_name} {day}", allow_empty=True),
+                                spool=spool, label=f"{api_name} "
+                            )
+                        
+                        async def authenticate_and_get_data():
+                            if not await temp_client.authenticate():
+                                return None
+                            if not stream:
+                                return await fetch_range()
+                            if store is not None:
+                                with ConversionSpool(label=api_name) as spool:
+                                    return await fetch_range(spool)
+                            # 流式模式下每页写入检查点，可使用 --resume 续传
+                            spool, checkpoint = open_checkpointed_spool(api_name, start_date, end_date, resume=config.RESUME_FETCH)
+                            with spool:
+                                return await fetch_range(spool, checkpoint)
+                        
+                        api_data = asyncio.run(authenticate_and_get_data())
+                        
+                        if api_data is None:
+                            error_msg = f"API认证失败: {api_name}"
+                            api_errors.append(error_msg)
+                            print_step(f"API-{api_name}", f"❌ {error_msg}")
+                            continue
+                    else:
+                        # 同步认证
+                        if not temp_client.authenticate():
+                            error_msg = f"API认证失败: {api_name}"
+                            api_errors.append(error_msg)
+                            print_step(f"API-{api_name}", f"❌ {error_msg}")
+                            continue
+                        
+                        print_step(f"API-{api_name}", f"认证成功，开始获取数据...")
+                        sys.stdout.flush()
+                        
+                        # 获取数据
+                        print_step(f"API-{api_name}", f"调用get_conversions方法...")
+                        sys.stdout.flush()
+                        def fetch_range(spool=None, checkpoint=None):
+                            if store is None:
+                                return temp_client.get_conversions(start_date, end_date, api_name=api_name,
+                                                                   spool=spool, checkpoint=checkpoint)
+                            return store.fetch_range(
+                                account_key(api_secret), start_date, end_date,
+                                lambda day: temp_client.get_conversions(day, day, api_name=f"{api_name} {day}", allow_empty=True),
+                                spool=spool, label=f"{api_name} "
+                            )
+                        
+                        if stream and store is not None:
+                            with ConversionSpool(label=api_name) as spool:
+                                api_data = fetch_range(spool)
+                        elif stream:
+                            # 流式模式下每页写入检查点，可使用 --resume 续传
+                            spool, checkpoint = open_checkpointed_spool(api_name, start_date, end_date, resume=config.RESUME_FETCH)
+                            with spool:
+                                api_data = fetch_range(spool, checkpoint)
+                        else:
+                            api_data = fetch_range()
+                        print_step(f"API-{api_name}", f"get_conversions方法执行完成")
+                        sys.stdout.flush()
+                    
+                    # 恢复原始限制
+                    config.MAX_RECORDS_LIMIT = original_limit
                 
                 if not api_data or 'data' not in api_data:
                     error_msg = f"数据获取失败: {api_name}"
@@ -161,7 +224,7 @@ class WeeklyReporter:
                     # 其他可能结构
                     conversions = api_data.get('data', [])
                 
-                record_count = len(conversions) if isinstance(conversions, list) else 0
+                record_count = len(conversions) if isinstance(conversions, (list, SpoolReader)) else 0
                 
                 # 检查是否没有数据 - 这是正常情况，不应该算作错误
                 if record_count == 0:
@@ -176,14 +239,24 @@ class WeeklyReporter:
                 # 为每条记录添加API来源标记（只有在需要ByteC报表时才添加）
                 should_add_api_fields = self._should_add_api_source_fields()
                 if should_add_api_fields:
-                    for conversion in conversions:
-                        conversion['api_source'] = api_name
-                        conversion['api_platform'] = config.get_platform_from_api_secret(api_secret)
+                    if isinstance(conversions, SpoolReader):
+                        # spool记录在读取时附加标记，不回写文件
+                        conversions = conversions.with_fields(
+                            api_source=api_name,
+                            api_platform=config.get_platform_from_api_secret(api_secret)
+                        )
+                    else:
+                        for conversion in conversions:
+                            conversion['api_source'] = api_name
+                            conversion['api_platform'] = config.get_platform_from_api_secret(api_secret)
                     print_step(f"API-{api_name}", f"为ByteC报表添加API来源标记: {api_name}")
                 else:
                     print_step(f"API-{api_name}", f"非ByteC报表模式，跳过API来源标记")
                 
-                all_conversions.extend(conversions)
+                if isinstance(conversions, SpoolReader):
+                    spooled_conversions.append((api_name, conversions))
+                else:
+                    all_conversions.extend(conversions)
                 total_records += record_count
                 api_success_count += 1
                 
@@ -198,6 +271,9 @@ class WeeklyReporter:
                 print_step(f"API-{api_name}", f"❌ {error_msg}")
                 continue
         
+        if store is not None:
+            store.close()
+        
         # 检查是否有任何API成功获取了数据
         if api_success_count == 0:
             # 所有API都失败了，这是真正的错误
@@ -225,9 +301,17 @@ class WeeklyReporter:
             print_step("多API错误", f"❌ 所有API都没有返回数据")
             raise Exception("所有API都没有返回数据，请检查日期范围和数据源")
         
+        # 流式模式：合并各API的spool为一个惰性读取器
+        if spooled_conversions:
+            all_conversions = SpoolReader.merge([reader for _, reader in spooled_conversions])
+        
         # 构造API统计信息
         should_add_api_fields = self._should_add_api_source_fields()
-        if should_add_api_fields:
+        if should_add_api_fields and spooled_conversions:
+            # 流式模式：每个spool对应一个API，直接使用其记录数
+            spooled_counts = {name: len(reader) for name, reader in spooled_conversions}
+            api_breakdown = {api['name']: spooled_counts.get(api['name'], 0) for api in api_list}
+        elif should_add_api_fields:
             # 纯ByteC模式：基于api_source字段进行统计
             api_breakdown = {api['name']: len([c for c in all_conversions if c.get('api_source') == api['name']]) 
                            for api in api_list}
@@ -270,6 +354,53 @@ class WeeklyReporter:
         
         return merged_data
     
+    def _fetch_accounts_concurrently(self, api_list, start_date, end_date, max_records=None, stream=False, store=None):
+        """
+        在同一个事件循环中并发获取所有API账户的数据
+        
+        Args:
+            api_list: API配置列表 [{'name': 'IAByteC', 'secret': '...', 'key': '...'}, ...]
+            start_date: 开始日期
+            end_date: 结束日期
+            max_records: 最大记录数限制
+            stream: 是否将数据流式写入spool文件
+            store: 增量conversion存储，提供时只请求缺失或未关闭的日期
+            
+        Returns:
+            dict: {api_name: 获取结果}，失败时为None或异常对象
+        """
+        print_step("多API并发", f"所有 {len(api_list)} 个API共享连接池和并发预算，同时开始获取")
+        
+        # 临时设置记录限制
+        original_limit = config.MAX_RECORDS_LIMIT
+        if max_records is not None:
+            config.MAX_RECORDS_LIMIT = max_records
+        
+        fetch_start = time.time()
+        try:
+            return fetch_multiple_accounts(api_list, start_date, end_date, stream=stream, store=store,
+                                           resume=config.RESUME_FETCH)
+        finally:
+            # 恢复原始限制
+            config.MAX_RECORDS_LIMIT = original_limit
+            print_step("多API并发", f"并发获取阶段完成，耗时 {time.time() - fetch_start:.2f} 秒")
+    
+    def _open_conversion_store(self, max_records=None):
+        """
+        按配置打开增量conversion存储
+        设置了记录数限制时不使用，避免把不完整的日期写入缓存
+        
+        Returns:
+            ConversionStore or None
+        """
+        if not config.should_use_conversion_store():
+            return None
+        if max_records is not None or config.MAX_RECORDS_LIMIT is not None:
+            print_step("增量存储", "已设置记录数限制，本次不使用增量conversion存储")
+            return None
+        print_step("增量存储", f"使用增量conversion存储: {config.CONVERSION_STORE_PATH}")
+        return ConversionStore()
+    
     def _is_bytec_processing(self):
         """
         判断当前是否在处理ByteC Partner
@@ -428,16 +559,53 @@ class WeeklyReporter:
                 
             else:
                 # 标准单API模式
-                # 步骤1: API认证
-                if not self.api_client.authenticate():
+                # 步骤1: API认证（优先使用缓存的token；异步客户端的认证是协程，需要运行后取结果）
+                if self.use_async:
+                    import asyncio
+                    authenticated = asyncio.run(self.api_client.authenticate())
+                else:
+                    authenticated = self.api_client.authenticate()
+                if not authenticated:
                     result['error'] = "API认证失败"
                     return result
                 
-                # 步骤2: 获取数据
+                # 步骤2: 获取数据（流式模式下逐页写入spool文件）
                 if start_date and end_date:
-                    conversion_data = self.api_client.get_conversions(start_date, end_date)
+                    actual_start_date, actual_end_date = start_date, end_date
                 else:
-                    conversion_data = self.api_client.get_conversions_default_range()
+                    actual_start_date, actual_end_date = config.get_default_date_range()
+                
+                store = self._open_conversion_store(max_records)
+                spool, checkpoint = None, None
+                if config.should_stream_fetch() and store is None:
+                    # 流式模式下每页写入检查点，可使用 --resume 续传
+                    account_label = f"account_{account_key(self.api_client.api_secret)[:8]}"
+                    spool, checkpoint = open_checkpointed_spool(account_label, actual_start_date, actual_end_date,
+                                                                resume=config.RESUME_FETCH)
+                elif config.should_stream_fetch():
+                    spool = ConversionSpool()
+                try:
+                    if store is not None and self.use_async:
+                        # 增量模式：只请求缺失或未关闭的日期（并发获取），其余日期从本地缓存合并
+                        conversion_data = asyncio.run(store.fetch_range_async(
+                            account_key(self.api_client.api_secret), actual_start_date, actual_end_date,
+                            lambda day: self.api_client.get_conversions_async(day, day, allow_empty=True),
+                            spool=spool
+                        ))
+                    elif store is not None:
+                        conversion_data = store.fetch_range(
+                            account_key(self.api_client.api_secret), actual_start_date, actual_end_date,
+                            lambda day: self.api_client.get_conversions(day, day, allow_empty=True),
+                            spool=spool
+                        )
+                    else:
+                        conversion_data = self.api_client.get_conversions(actual_start_date, actual_end_date,
+                                                                          spool=spool, checkpoint=checkpoint)
+                finally:
+                    if spool is not None:
+                        spool.close()
+                    if store is not None:
+                        store.close()
             
             if not conversion_data:
                 result['error'] = "数据获取失败"
@@ -447,21 +615,19 @@ class WeeklyReporter:
             if save_json:
                 if use_multi_api_mode:
                     # 多API模式：使用自定义保存方法
-                    import json
                     import os
                     from datetime import datetime
                     
-                    # 生成文件名
+                    # 生成文件名（扩展名按保存格式确定）
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                     json_filename = f"conversions_{timestamp}.json"
                     json_filepath = os.path.join(config.OUTPUT_DIR, json_filename)
                     
-                    # 保存多API格式的数据
-                    with open(json_filepath, 'w', encoding='utf-8') as f:
-                        json.dump(conversion_data, f, indent=2, ensure_ascii=False)
+                    # 保存多API格式的数据（默认为压缩的Parquet中间文件，JSON格式时spool记录逐条流式写出）
+                    json_filepath = save_conversions(conversion_data, json_filepath)
                     
                     result['json_file'] = json_filepath
-                    print_step("JSON保存", f"✅ 已保存多API格式JSON: {json_filepath}")
+                    print_step("JSON保存", f"✅ 已保存多API格式数据: {json_filepath}")
                 else:
                     # 标准单API模式：使用原有方法
                     json_file = self.api_client.save_to_json(conversion_data)
@@ -504,9 +670,12 @@ class WeeklyReporter:
                 # 标准数据处理与清洗
                 print_step("数据处理", "开始执行数据清洗与Pub分类导出")
                 
+                # 本次运行只构建一次规范化数据，数据处理、ByteC报表和主Excel共用
+                conversion_frame = ConversionFrame.build(conversion_data)
+                
                 # 传递完整的日期范围信息
                 processor_result = self.data_processor.process_data(
-                    conversion_data, 
+                    conversion_frame, 
                     start_date=actual_start_date, 
                     end_date=actual_end_date
                 )
@@ -517,7 +686,7 @@ class WeeklyReporter:
                 if should_process_bytec:
                     print_step("ByteC额外报表", "在标准处理基础上生成 ByteC 公司专用汇总报表")
                     bytec_file = self.bytec_generator.generate_bytec_report(
-                        conversion_data, 
+                        conversion_frame, 
                         actual_start_date, 
                         actual_end_date
                     )
@@ -546,6 +715,10 @@ class WeeklyReporter:
                 cleaned_data = self.data_processor.processed_data
                 excel_file = self._generate_main_excel_from_cleaned_data(cleaned_data, output_filename)
                 result['excel_file'] = excel_file
+                
+                # 各阶段的内存占用（类型策略前后对比）
+                conversion_frame.memory_report.record("主Excel生成", cleaned_data)
+                conversion_frame.memory_report.log_summary()
             
             # 步骤6: 飞书上传（可选）
             if upload_to_feishu:
@@ -655,79 +828,20 @@ class WeeklyReporter:
         Returns:
             str: 生成的Excel文件路径
         """
-        from openpyxl import Workbook
-        from openpyxl.utils.dataframe import dataframe_to_rows
         import os
         
         # 生成完整路径
         output_path = os.path.join(config.OUTPUT_DIR, output_filename)
         
-        # 创建工作簿和工作表
-        wb = Workbook()
-        ws = wb.active
-        ws.title = config.EXCEL_SHEET_NAME
-        
-        # 写入数据（包含标题行），清理特殊字符
-        for r in dataframe_to_rows(cleaned_data, index=False, header=True):
-            # 清理行中的特殊字符
-            cleaned_row = self._clean_row_data(r)
-            ws.append(cleaned_row)
-        
-        # 查找sale_amount列的索引并设置货币格式
+        # 流式写入数据（包含标题行），sale_amount列使用美元货币格式
+        write_dataframe_workbook(cleaned_data, output_path, config.EXCEL_SHEET_NAME,
+                                 column_formats={'sale_amount': CURRENCY_FORMAT})
         if 'sale_amount' in cleaned_data.columns:
-            sale_amount_col = cleaned_data.columns.get_loc('sale_amount') + 1  # Excel列索引从1开始
-            
-            # 应用货币格式到sale_amount列（跳过标题行）
-            for row in range(2, len(cleaned_data) + 2):  # 从第2行开始（第1行是标题）
-                cell = ws.cell(row=row, column=sale_amount_col)
-                cell.number_format = '"$"#,##0.00'
-            
             print_step("货币格式", f"已为主Excel文件的sale_amount栏位设置美元货币格式")
-        
-        # 保存文件
-        wb.save(output_path)
         print_step("主Excel完成", f"成功生成清洗后的主Excel文件: {output_path}")
         
         return output_path
     
-    def _clean_row_data(self, row):
-        """
-        清理行数据中的特殊字符，确保Excel兼容性
-        
-        Args:
-            row: 数据行（列表或元组）
-            
-        Returns:
-            list: 清理后的数据行
-        """
-        import re
-        
-        cleaned_row = []
-        for cell in row:
-            if cell is None:
-                cleaned_row.append(None)
-            elif isinstance(cell, (int, float)):
-                # 数字类型直接保留
-                cleaned_row.append(cell)
-            else:
-                # 字符串类型需要清理
-                cell_str = str(cell)
-                
-                # 移除可能导致Excel问题的控制字符和特殊Unicode字符
-                # 保留基本的ASCII字符、常见Unicode字符
-                cleaned_str = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', cell_str)
-                
-                # 移除可能有问题的Unicode字符（保留基本字母、数字、常见符号）
-                # 这个正则表达式比较宽松，保留大部分字符但移除控制字符
-                cleaned_str = re.sub(r'[^\x20-\x7E\u00A0-\u024F\u1E00-\u1EFF\u2000-\u206F\u20A0-\u20CF\u2100-\u214F]', '_', cleaned_str)
-                
-                # 移除开头的特殊字符（如不可见字符）
-                cleaned_str = cleaned_str.strip()
-                
-                cleaned_row.append(cleaned_str)
-        
-        return cleaned_row
-    
     def _prepare_partner_summary_for_email(self, result):
         """准备Partner汇总数据用于邮件发送"""
         partner_summary_for_email = {}
@@ -956,7 +1070,7 @@ class WeeklyReporter:
         只运行数据处理
         
         Args:
-            data_input: 数据源（Excel文件、JSON文件或其他支持格式）
+            data_input: 数据源（Excel文件、JSON文件、Parquet中间文件或其他支持格式）
             output_dir: 输出目录
         
         Returns:
@@ -1065,8 +1179,9 @@ def create_parser():
   # 只转换现有JSON文件
   python main.py --convert-only conversions.json
 
-  # 只处理现有数据文件（Excel/JSON）
+  # 只处理现有数据文件（Excel/JSON/Parquet）
   python main.py --process-only data.xlsx
+  python main.py --process-only output/conversions_20250101_120000.parquet
 
   # 保存中间JSON文件并上传到飞书
   python main.py --save-json --upload-feishu
@@ -1092,6 +1207,15 @@ def create_parser():
   # 设置异步并发数
   python main.py --async --concurrent 10
 
+  # 流式获取模式（长时间范围回溯时降低内存占用）
+  python main.py --stream --start-date 2025-06-01 --end-date 2025-06-30
+
+  # 从检查点续传上次中断或有跳过页面的流式获取
+  python main.py --resume --start-date 2025-06-01 --end-date 2025-06-30
+
+  # 增量获取模式（已获取且已关闭的日期从本地缓存读取）
+  python main.py --incremental --start-date 2025-06-01 --end-date 2025-06-30
+
   # 执行性能测试
   python main.py --performance-test
 
@@ -1132,14 +1256,20 @@ def create_parser():
                        help='异步模式下的最大并发请求数（默认为配置文件中的值）')
     parser.add_argument('--performance-test', action='store_true',
                        help='执行同步vs异步性能测试')
+    parser.add_argument('--stream', action='store_true',
+                       help='流式获取模式：每页数据直接写入磁盘spool文件，降低长时间范围回溯的内存占用')
+    parser.add_argument('--resume', action='store_true',
+                       help='从检查点续传：只获取上次流式获取中缺失或跳过的页面，并追加到原spool文件（自动启用流式获取）')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量获取模式：已关闭的日期从本地conversion存储(cache/)读取，只请求缺失或未关闭的日期')
     
     # 模式选择
     parser.add_argument('--api-only', action='store_true',
                        help='只执行API数据获取')
     parser.add_argument('--convert-only', type=str, metavar='JSON_FILE',
-                       help='只执行JSON到Excel转换，指定JSON文件路径')
+                       help='只执行JSON到Excel转换，指定JSON或Parquet中间文件路径')
     parser.add_argument('--process-only', type=str, metavar='DATA_FILE',
-                       help='只执行数据处理，指定Excel或JSON文件路径')
+                       help='只执行数据处理，指定Excel、JSON或Parquet中间文件路径')
     parser.add_argument('--upload-only', action='store_true',
                        help='只执行飞书上传，上传output目录下所有Excel文件')
     
@@ -1148,6 +1278,8 @@ def create_parser():
                        help='保存中间JSON文件 (默认启用)')
     parser.add_argument('--no-save-json', action='store_false', dest='save_json',
                        help='禁用保存中间JSON文件')
+    parser.add_argument('--save-format', type=str, choices=['parquet', 'json'],
+                       help='中间文件格式：parquet（压缩列式存储，默认，需要pyarrow）或 json（缩进JSON导出）')
     parser.add_argument('--upload-feishu', action='store_true', default=True,
                        help='上传所有Excel文件到飞书Sheet (默认启用)')
     parser.add_argument('--no-upload-feishu', action='store_false', dest='upload_feishu',
@@ -1189,6 +1321,10 @@ def main():
     print("=" * 60)
     sys.stdout.flush()  # 强制刷新输出
     
+    # 运行结束时（包括 sys.exit）输出后台资源采样的时间序列
+    import atexit
+    atexit.register(dump_resource_timeseries)
+    
     # 解析命令行参数
     parser = create_parser()
     args = parser.parse_args()
@@ -1260,6 +1396,27 @@ def main():
             print("❌ 并发数必须大于0")
             sys.exit(1)
     
+    # 处理流式获取参数
+    if getattr(args, 'stream', False):
+        config.STREAM_FETCH_ENABLED = True
+        print("💾 启用流式获取模式，数据将逐页写入spool文件")
+    
+    if getattr(args, 'resume', False):
+        if args.limit is not None:
+            print("❌ --resume 不能与 --limit 同时使用（有记录数限制时从第1页按顺序获取，无法按检查点续传）")
+            sys.exit(1)
+        config.STREAM_FETCH_ENABLED = True
+        config.RESUME_FETCH = True
+        print("♻️ 启用检查点续传模式，只获取缺失的页面")
+    
+    if getattr(args, 'save_format', None):
+        config.CONVERSION_SAVE_FORMAT = args.save_format
+        print(f"💾 中间文件格式: {args.save_format}")
+    
+    if getattr(args, 'incremental', False):
+        config.CONVERSION_STORE_ENABLED = True
+        print("🗄️ 启用增量获取模式，只请求缺失或未关闭的日期")
+    
     # 处理性能测试参数
     if hasattr(args, 'performance_test') and args.performance_test:
         print("🏁 执行性能测试模式")
@@ -6,13 +6,29 @@ ByteC 报表生成器
 """
 
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
 from utils.logger import print_step
+from modules.conversion_spool import SpoolReader, records_to_dataframe
+from modules.conversion_frame import ConversionFrame, coerce_numeric_fields
+from modules.excel_sanitizer import sanitize_row
+from modules.excel_writer import StreamingWorkbook, CURRENCY_FORMAT, PERCENT_FORMAT
+from modules.partner_matcher import PartnerMatcher
+from modules.report_manifest import build_bytec_manifest, write_manifest
 import config
 
+# ByteC汇总实际用到的原始字段（从spool分块加载时只读取这些列）
+BYTEC_SOURCE_COLUMNS = [
+    'conversion_id', 'offer_name', 'sale_amount', 'payout', 'base_payout', 'bonus_payout',
+    'aff_sub1', 'api_source', 'api_platform'
+]
+
+# 报表中使用美元格式和百分比格式的栏位
+CURRENCY_COLUMNS = ['Sale Amount', 'Estimated Earning', 'Adv Commission', 'Pub Commission', 'ByteC Commission']
+PERCENTAGE_COLUMNS = ['Avg. Commission Rate', 'Adv Commission Rate', 'Pub Commission Rate', 'ByteC ROI']
+
 class ByteCReportGenerator:
     """ByteC 报表生成器类"""
     
@@ -31,7 +47,7 @@ class ByteCReportGenerator:
         生成 ByteC 格式的报表
         
         Args:
-            raw_data: 原始转换数据（DataFrame 或 JSON 数据）
+            raw_data: 原始转换数据（共享的 ConversionFrame、DataFrame 或 JSON 数据）
             start_date: 开始日期
             end_date: 结束日期
             output_dir: 输出目录
@@ -46,6 +62,8 @@ class ByteCReportGenerator:
         
         # 步骤1: 数据预处理
         df = self._prepare_data(raw_data)
+        if isinstance(raw_data, ConversionFrame):
+            raw_data.memory_report.record("ByteC汇总视图", df)
         
         # 步骤2: 按 offer_name 分组汇总
         summary_data = self._create_offer_summary(df)
@@ -61,7 +79,10 @@ class ByteCReportGenerator:
         print_step("数据预处理", "正在处理原始数据...")
         
         # 如果是 JSON 格式，提取 data 部分
-        if isinstance(raw_data, dict):
+        if isinstance(raw_data, ConversionFrame):
+            # 本次运行共享的规范化数据：只取汇总所需字段的视图，不再重新构建
+            df = raw_data.view(BYTEC_SOURCE_COLUMNS)
+        elif isinstance(raw_data, dict):
             # 检查是否为多API合并数据
             if 'data' in raw_data and 'conversions' in raw_data['data']:
                 # 多API模式的数据结构
@@ -80,7 +101,10 @@ class ByteCReportGenerator:
                 conversion_records = raw_data['data']
             else:
                 conversion_records = [raw_data]
-            df = pd.DataFrame(conversion_records)
+            # spool读取器只加载汇总所需的字段
+            df = records_to_dataframe(conversion_records, columns=BYTEC_SOURCE_COLUMNS)
+        elif isinstance(raw_data, SpoolReader):
+            df = records_to_dataframe(raw_data, columns=BYTEC_SOURCE_COLUMNS)
         elif isinstance(raw_data, list):
             df = pd.DataFrame(raw_data)
         elif isinstance(raw_data, pd.DataFrame):
@@ -94,21 +118,18 @@ class ByteCReportGenerator:
         if missing_fields:
             print_step("数据检查警告", f"缺少必需字段: {missing_fields}")
         
-        # 数据类型转换
-        if 'sale_amount' in df.columns:
-            df['sale_amount'] = pd.to_numeric(df['sale_amount'], errors='coerce').fillna(0)
-        
-        # 处理 payout 相关字段
-        payout_fields = ['payout', 'base_payout', 'bonus_payout']
-        for field in payout_fields:
-            if field in df.columns:
-                df[field] = pd.to_numeric(df[field], errors='coerce').fillna(0)
+        # 数据类型转换（sale_amount 和 payout 相关字段，共享数据构建时已转换）
+        if not isinstance(raw_data, ConversionFrame):
+            df = coerce_numeric_fields(df)
         
         print_step("数据预处理完成", f"处理了 {len(df)} 条记录，包含 {len(df.columns)} 个字段")
         return df
     
     def _create_offer_summary(self, df):
-        """按 offer_name + source 组合创建汇总数据"""
+        """
+        按 offer_name + source 组合创建汇总数据
+        一次分组得到各组合的键、转换数和平台，佣金率从预编译的费率表合并，佣金和ROI按整列计算
+        """
         print_step("数据汇总", "正在按 offer_name + source 组合进行数据汇总...")
         
         if 'offer_name' not in df.columns:
@@ -119,82 +140,91 @@ class ByteCReportGenerator:
             print_step("汇总警告", "aff_sub1 字段不存在，无法进行source分组")
             return pd.DataFrame()
         
-        # 按 offer_name + aff_sub1 组合分组汇总
-        summary_list = []
+        # 按 offer_name + aff_sub1 组合分组（与逐组遍历相同的排序和缺失值处理，category列只保留出现的组合）
+        grouped = df.groupby(['offer_name', 'aff_sub1'], sort=True, observed=True)
+        group_sizes = grouped.size()
+        if len(group_sizes) == 0:
+            print_step("汇总完成", "生成了 0 个 Offer + Source 组合的汇总数据")
+            return pd.DataFrame()
         
-        for (offer_name, source), group in df.groupby(['offer_name', 'aff_sub1']):
-            # 计算汇总数据
-            sales_amount = group['sale_amount'].sum() if 'sale_amount' in group.columns else 0
-            
-            # 计算 Estimated Earning (payout 总和)
-            estimated_earning = 0
-            if 'payout' in group.columns:
-                estimated_earning = group['payout'].sum()
-            
-            # 转换数量（conversion_id 的数量）
-            conversions = len(group) if 'conversion_id' in group.columns else 0
-            
-            # 获取该组合的 Partner（source已经在分组中确定）
-            # 对于ByteC报告，显示实际的原始partner而不是总是显示"ByteC"
-            actual_partner = self._get_actual_partner_for_source(source)
-            
-            # 获取该组合的平台名称（多API模式下从记录中获取）
-            platform_name = self._get_platform_for_group(group)
-            
-            # 计算平均佣金率 (Avg. Commission Rate)
-            avg_commission_rate = 0.0
-            if sales_amount > 0:
-                avg_commission_rate = (estimated_earning / sales_amount) * 100
-            
-            # 获取广告主佣金率 (Adv Commission Rate)
-            adv_commission_rate = config.get_adv_commission_rate(platform_name, avg_commission_rate)
-            
-            # 计算广告主佣金 (Adv Commission)
-            adv_commission = sales_amount * (adv_commission_rate / 100.0)
-            
-            # 获取发布商佣金率 (Pub Commission Rate)
-            pub_commission_rate = config.get_pub_commission_rate(actual_partner, offer_name)
-            
-            # 计算发布商佣金 (Pub Commission)
-            pub_commission = sales_amount * (pub_commission_rate / 100.0)
-            
-            # 计算ByteC佣金 (ByteC Commission)
-            bytec_commission = sales_amount * ((adv_commission_rate - pub_commission_rate) / 100.0)
-            
-            # 计算ByteC ROI - 新公式: 1 + (Adv Commission - Pub Commission) / Pub Commission
-            bytec_roi = 0.0
-            if pub_commission > 0:
-                bytec_roi = (1 + (adv_commission - pub_commission) / pub_commission) * 100
-            else:
-                # 如果发布商佣金为0，ROI设为0（避免除零错误）
-                bytec_roi = 0.0
-            
-            summary_list.append({
-                'Offer Name': offer_name,
-                'Sale Amount': sales_amount,
-                'Estimated Earning': estimated_earning, 
-                'Partner': actual_partner,
-                'Platform': platform_name,
-                'Source': source,
-                'Conversions': conversions,
-                'Avg. Commission Rate': round(avg_commission_rate, 2),
-                'Adv Commission Rate': round(adv_commission_rate, 2),
-                'Adv Commission': round(adv_commission, 2),
-                'Pub Commission Rate': round(pub_commission_rate, 2),
-                'Pub Commission': round(pub_commission, 2),
-                'ByteC Commission': round(bytec_commission, 2),
-                'ByteC ROI': round(bytec_roi, 2)
-            })
-        
-        summary_df = pd.DataFrame(summary_list)
+        # 各组的行按原顺序排在一起，first_rows 为每组第一行的位置
+        codes = grouped.ngroup().to_numpy(dtype=float, na_value=-1).astype(np.int64)
+        order = np.argsort(codes, kind='stable')
+        order = order[codes[order] >= 0]
+        bounds = np.searchsorted(codes[order], np.arange(len(group_sizes) + 1))
+        first_rows = order[bounds[:-1]]
+        
+        offer_names = group_sizes.index.get_level_values(0)
+        sources = group_sizes.index.get_level_values(1)
+        
+        # 销售额和 Estimated Earning (payout 总和)
+        sales_amount = self._group_sums(df, 'sale_amount', order, bounds)
+        estimated_earning = self._group_sums(df, 'payout', order, bounds)
+        
+        # 转换数量（conversion_id 的数量）
+        conversions = group_sizes.to_numpy() if 'conversion_id' in df.columns else np.zeros(len(group_sizes), dtype=np.int64)
+        
+        # Partner 和平台按唯一Source/平台查找，对于ByteC报告显示实际的原始partner而不是总是显示"ByteC"
+        actual_partners = self._partner_matcher().match_series(pd.Series(sources, dtype=object)).to_numpy()
+        platforms = self._get_platforms_for_groups(df, first_rows, actual_partners)
+        
+        # 计算平均佣金率 (Avg. Commission Rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_commission_rate = np.where(sales_amount > 0, (estimated_earning / sales_amount) * 100, 0.0)
+        
+        # 广告主佣金率 (Adv Commission Rate)：dynamic 平台使用平均佣金率，未配置的平台为0%
+        adv_rates = self._adv_rate_table(platforms)
+        adv_commission_rate = np.where(adv_rates['dynamic'], avg_commission_rate, adv_rates['rate'])
+        adv_commission = sales_amount * (adv_commission_rate / 100.0)
+        
+        # 发布商佣金率 (Pub Commission Rate)：按 (Partner, Offer Name) 合并费率表，未配置的组合使用默认值
+        keys = pd.DataFrame({'partner': pd.Series(actual_partners, dtype=object),
+                             'offer_name': pd.Series(offer_names, dtype=object)})
+        pub_commission_rate = keys.merge(self._pub_rate_table(), how='left', on=['partner', 'offer_name'])['rate'] \
+            .fillna(float(config.DEFAULT_PUB_COMMISSION_RATE)).to_numpy(dtype=float)
+        pub_commission = sales_amount * (pub_commission_rate / 100.0)
+        
+        # 计算ByteC佣金 (ByteC Commission)
+        bytec_commission = sales_amount * ((adv_commission_rate - pub_commission_rate) / 100.0)
+        
+        # 计算ByteC ROI - 新公式: 1 + (Adv Commission - Pub Commission) / Pub Commission
+        # 如果发布商佣金为0，ROI设为0（避免除零错误）
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bytec_roi = np.where(pub_commission > 0, (1 + (adv_commission - pub_commission) / pub_commission) * 100, 0.0)
+        
+        summary_df = pd.DataFrame({
+            'Offer Name': list(offer_names),
+            'Sale Amount': sales_amount,
+            'Estimated Earning': estimated_earning,
+            'Partner': list(actual_partners),
+            'Platform': list(platforms),
+            'Source': list(sources),
+            'Conversions': conversions,
+            'Avg. Commission Rate': np.round(avg_commission_rate, 2),
+            'Adv Commission Rate': np.round(adv_commission_rate, 2),
+            'Adv Commission': np.round(adv_commission, 2),
+            'Pub Commission Rate': np.round(pub_commission_rate, 2),
+            'Pub Commission': np.round(pub_commission, 2),
+            'ByteC Commission': np.round(bytec_commission, 2),
+            'ByteC ROI': np.round(bytec_roi, 2)
+        })
         
         # 按 Offer Name 升序排列
-        if len(summary_df) > 0:
-            summary_df = summary_df.sort_values('Offer Name', ascending=True)
+        summary_df = summary_df.sort_values('Offer Name', ascending=True)
         
         print_step("汇总完成", f"生成了 {len(summary_df)} 个 Offer + Source 组合的汇总数据")
         return summary_df
     
+    def _group_sums(self, df, column, order, bounds):
+        """
+        各组的列合计；字段不存在时为0
+        按组切片后用 numpy 求和（与逐组 Series.sum 的结果逐位一致，groupby 的求和算法末位可能不同）
+        """
+        if column not in df.columns:
+            return np.zeros(len(bounds) - 1, dtype=np.int64)
+        values = df[column].to_numpy(dtype=float)[order]
+        return np.array([values[start:end].sum() for start, end in zip(bounds[:-1], bounds[1:])], dtype=float)
+    
     def _generate_excel_report(self, summary_data, start_date, end_date, output_dir, raw_data=None):
         """生成 Excel 报表文件"""
         print_step("Excel生成", "正在生成 ByteC Excel 报表...")
@@ -209,11 +239,8 @@ class ByteCReportGenerator:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
-        # 创建工作簿
-        wb = Workbook()
-        
-        # 删除默认工作表
-        wb.remove(wb.active)
+        # 创建流式工作簿（只写模式没有默认工作表）
+        workbook = StreamingWorkbook()
         
         # 创建以日期范围命名的工作表
         if start_date == end_date:
@@ -226,27 +253,31 @@ class ByteCReportGenerator:
         
         # 确保 Sheet 名称符合 Excel 规范
         sheet_name = self._clean_sheet_name(sheet_name)
-        ws = wb.create_sheet(title=sheet_name)
         
         # 写入数据
         if len(summary_data) > 0:
-            # 写入标题行和数据
-            for r in dataframe_to_rows(summary_data, index=False, header=True):
-                cleaned_row = self._clean_row_data(r)
-                ws.append(cleaned_row)
+            # 货币和百分比格式按列设置
+            sheet = workbook.add_sheet(sheet_name, summary_data.columns, self._get_column_formats(summary_data))
+            
+            # 写入标题行和数据（百分比栏位转换为小数形式）
+            sheet.write_dataframe(self._to_excel_percentages(summary_data), replace_unsupported=False)
             
             # 添加汇总行
-            self._add_total_row(ws, summary_data)
+            self._add_total_row(sheet, summary_data)
             
-            # 设置货币格式
-            self._apply_currency_formatting(ws, summary_data)
+            # ByteC ROI为负数时标红
+            self._add_roi_conditional_formatting(sheet, summary_data)
         else:
             # 如果没有数据，写入标题行
             headers = ['Offer Name', 'Sale Amount', 'Estimated Earning', 'Partner', 'Platform', 'Source', 'Conversions', 'Avg. Commission Rate', 'Adv Commission Rate', 'Adv Commission', 'Pub Commission Rate', 'Pub Commission', 'ByteC Commission', 'ByteC ROI']
-            ws.append(headers)
+            workbook.add_sheet(sheet_name).append(headers)
         
         # 保存文件
-        wb.save(output_path)
+        workbook.save(output_path)
+        
+        # 汇总清单：邮件直接使用公司、Partner+Source、Offer三个维度的合计，不再重新读取报表
+        if config.REPORT_MANIFEST_ENABLED:
+            write_manifest(output_path, build_bytec_manifest(summary_data, sheet_name))
         
         # 输出统计信息
         total_sales = summary_data['Sale Amount'].sum() if len(summary_data) > 0 else 0
@@ -261,51 +292,61 @@ class ByteCReportGenerator:
         
         return output_path
     
+    def _partner_matcher(self):
+        """忽略ByteC配置的Partner匹配器（映射对象被替换时重新编译）"""
+        mapping = config.PARTNER_SOURCES_MAPPING
+        if getattr(self, '_matcher_mapping', None) is not mapping:
+            self._matcher = PartnerMatcher(mapping, skip_partners=("ByteC",))
+            self._matcher_mapping = mapping
+        return self._matcher
+    
     def _get_actual_partner_for_source(self, source):
-        """获取source对应的实际partner，忽略ByteC的配置"""
-        import re
-        
-        # 遍历所有partner配置，但跳过ByteC
-        for partner, partner_config in config.PARTNER_SOURCES_MAPPING.items():
-            if partner == "ByteC":  # 跳过ByteC配置
-                continue
-                
-            # 先检查sources列表
-            if source in partner_config.get('sources', []):
-                return partner
-            
-            # 再检查正则表达式模式
-            pattern = partner_config.get('pattern', '')
-            if pattern and re.match(pattern, source):
-                return partner
+        """获取source对应的实际partner，忽略ByteC的配置（没有匹配到具体的partner时返回source本身）"""
+        return self._partner_matcher().match(source)
+    
+    def _get_platforms_for_groups(self, df, first_rows, actual_partners):
+        """获取各组数据的平台名称"""
+        # 在纯ByteC模式下，从每组第一条记录的api_source字段获取
+        if 'api_source' in df.columns:
+            return df['api_source'].to_numpy(dtype=object)[first_rows]
+        
+        # 多Partner模式或没有api_source字段时，根据source对应的实际partner推断平台
+        codes, partners = pd.factorize(actual_partners, use_na_sentinel=False)
+        platforms = []
+        for partner in partners:
+            partner_apis = config.get_partner_api_platforms(partner)
+            # 使用第一个API平台作为默认值，最后的后备方案：使用初始化时的platform_name或默认值
+            platforms.append(partner_apis[0] if partner_apis else (self.platform_name or "LisaidByteC"))
+        return np.array(platforms, dtype=object)[codes]
+    
+    def _adv_rate_table(self, platforms):
+        """
+        按平台编译广告主佣金率表
         
-        # 如果没有匹配到具体的partner，返回source本身作为partner
-        return source
+        Returns:
+            dict: dynamic - 是否使用平均佣金率的布尔数组，rate - 固定佣金率数组
+        """
+        codes, uniques = pd.factorize(platforms, use_na_sentinel=False)
+        dynamic = np.zeros(len(uniques), dtype=bool)
+        rate = np.zeros(len(uniques), dtype=float)
+        for position, platform in enumerate(uniques):
+            rate_config = config.ADV_COMMISSION_RATE_MAPPING.get(platform)
+            if rate_config == "dynamic":
+                dynamic[position] = True
+            elif rate_config is not None:
+                rate[position] = float(rate_config)
+        return {'dynamic': dynamic[codes], 'rate': rate[codes]}
     
-    def _get_platform_for_group(self, group):
-        """获取该组数据的平台名称"""
-        # 在纯ByteC模式下，尝试从记录中获取api_source字段
-        if 'api_source' in group.columns and not group['api_source'].empty:
-            # 获取该组的api_source（应该都是相同的）
-            api_source = group['api_source'].iloc[0]
-            return api_source
-        
-        # 多Partner模式或没有api_source字段时，需要推断平台
-        # 根据source(aff_sub1)来推断应该使用哪个API平台
-        if not group.empty and 'aff_sub1' in group.columns:
-            source = group['aff_sub1'].iloc[0]
-            # 获取该source对应的实际partner
-            actual_partner = self._get_actual_partner_for_source(source)
-            # 获取该partner对应的API平台列表
-            partner_apis = config.get_partner_api_platforms(actual_partner)
-            if partner_apis:
-                # 使用第一个API平台作为默认值
-                return partner_apis[0]
-        
-        # 最后的后备方案：使用初始化时的platform_name或默认值
-        return self.platform_name or "LisaidByteC"
+    def _pub_rate_table(self):
+        """发布商佣金率表 (partner, offer_name, rate)，由 PUB_COMMISSION_RATE_MAPPING 编译"""
+        mapping = config.PUB_COMMISSION_RATE_MAPPING
+        return pd.DataFrame({
+            'partner': pd.Series([partner for partner, _ in mapping], dtype=object),
+            'offer_name': pd.Series([offer_name for _, offer_name in mapping], dtype=object),
+            'rate': pd.Series([float(rate) for rate in mapping.values()], dtype=float)
+        })
     
-    def _add_total_row(self, worksheet, summary_data):
+    def _add_total_row(self, sheet, summary_data):
         """添加汇总行到工作表底部"""
         if len(summary_data) == 0:
             return
@@ -333,7 +374,7 @@ class ByteCReportGenerator:
             total_bytec_roi = 0.0
         
         # 添加空行作为分隔
-        worksheet.append([])
+        sheet.append([])
         
         # 添加汇总行
         total_row = [
@@ -353,8 +394,13 @@ class ByteCReportGenerator:
             round(total_bytec_roi, 2)  # ByteC ROI
         ]
         
-        cleaned_total_row = self._clean_row_data(total_row)
-        worksheet.append(cleaned_total_row)
+        cleaned_total_row = sanitize_row(total_row, replace_unsupported=False)
+        
+        # 百分比栏位转换为小数形式（与数据行一致）
+        for position, column_name in enumerate(summary_data.columns[:len(cleaned_total_row)]):
+            if column_name in PERCENTAGE_COLUMNS and isinstance(cleaned_total_row[position], (int, float)):
+                cleaned_total_row[position] = cleaned_total_row[position] / 100.0
+        sheet.append(cleaned_total_row)
         
         print_step("汇总行", f"已添加汇总行 - 总销售: ${total_sales:,.2f}, 总收入: ${total_earning:,.2f}, 总转换: {total_conversions}")
         print_step("佣金汇总", f"广告主佣金: ${total_adv_commission:,.2f}, 发布商佣金: ${total_pub_commission:,.2f}, ByteC佣金: ${total_bytec_commission:,.2f}, ByteC ROI: {total_bytec_roi:.2f}%")
@@ -380,8 +426,12 @@ class ByteCReportGenerator:
         ]
         
         # 添加API来源信息（多API模式）
-        if raw_data and isinstance(raw_data, dict) and 'data' in raw_data:
+        data_section = None
+        if isinstance(raw_data, ConversionFrame):
+            data_section = raw_data.metadata
+        elif raw_data and isinstance(raw_data, dict) and 'data' in raw_data:
             data_section = raw_data['data']
+        if isinstance(data_section, dict):
             if 'merge_info' in data_section:
                 merge_info = data_section['merge_info']
                 summary_lines.extend([
@@ -447,74 +497,43 @@ class ByteCReportGenerator:
         
         return "\n".join(summary_lines)
     
-    def _apply_currency_formatting(self, worksheet, data):
-        """为货币字段和百分比字段应用格式"""
-        if len(data) == 0:
+    def _get_column_formats(self, data):
+        """货币字段和百分比字段的列格式"""
+        column_formats = {}
+        for column_name in data.columns:
+            if column_name in CURRENCY_COLUMNS:
+                column_formats[column_name] = CURRENCY_FORMAT
+            elif column_name in PERCENTAGE_COLUMNS:
+                column_formats[column_name] = PERCENT_FORMAT
+        
+        currency_count = sum(1 for number_format in column_formats.values() if number_format == CURRENCY_FORMAT)
+        print_step("格式设置", f"已为 {currency_count} 个货币栏位设置美元格式，{len(column_formats) - currency_count} 个栏位设置百分比格式")
+        return column_formats
+    
+    def _to_excel_percentages(self, data):
+        """百分比栏位的数值除以100转换为小数形式 (Excel的百分比格式要求)"""
+        percentage_columns = [column for column in data.columns if column in PERCENTAGE_COLUMNS]
+        if not percentage_columns:
+            return data
+        data = data.copy()
+        for column in percentage_columns:
+            data[column] = data[column] / 100.0
+        return data
+    
+    def _add_roi_conditional_formatting(self, sheet, data):
+        """添加条件格式 - ByteC ROI为负数时标红"""
+        if 'ByteC ROI' not in data.columns:
             return
         
-        # 查找各列的索引
         columns = list(data.columns)
+        roi_col_index = columns.index('ByteC ROI') + 1  # Excel列索引从1开始
+        roi_col_letter = get_column_letter(roi_col_index)  # 转换为Excel列字母
         
-        # 货币格式栏位
-        currency_columns = []
-        # 百分比格式栏位  
-        percentage_columns = []
+        # 应用条件格式到数据范围（不包括标题行）
+        data_range = f'{roi_col_letter}2:{roi_col_letter}{len(data) + 1}'
+        sheet.add_conditional_format(data_range, 'lessThan', '0', fill_color='FFCCCC', font_color='CC0000')
         
-        for i, column_name in enumerate(columns):
-            excel_col_index = i + 1  # Excel 列索引从1开始
-            
-            if column_name in ['Sale Amount', 'Estimated Earning', 'Adv Commission', 'Pub Commission', 'ByteC Commission']:
-                currency_columns.append(excel_col_index)
-            elif column_name in ['Avg. Commission Rate', 'Adv Commission Rate', 'Pub Commission Rate', 'ByteC ROI']:
-                percentage_columns.append(excel_col_index)
-        
-        # 计算总行数（包括数据行、空行和汇总行）
-        total_rows = len(data) + 3
-        
-        # 应用货币格式 ($0.00)
-        for col_index in currency_columns:
-            for row in range(2, total_rows + 1):  # 从第2行开始，跳过标题行
-                cell = worksheet.cell(row=row, column=col_index)
-                if cell.value is not None and str(cell.value).replace('.', '').replace('-', '').isdigit():
-                    try:
-                        cell.number_format = '"$"#,##0.00'
-                    except:
-                        pass
-        
-        # 应用百分比格式 (0.00%)
-        for col_index in percentage_columns:
-            for row in range(2, total_rows + 1):  # 从第2行开始，跳过标题行
-                cell = worksheet.cell(row=row, column=col_index)
-                if cell.value is not None and str(cell.value).replace('.', '').replace('-', '').isdigit():
-                    try:
-                        cell.number_format = '0.00%'
-                        # 将百分比值转换为小数形式 (Excel要求)
-                        # 所有百分比值都需要除以100转换为小数
-                        if isinstance(cell.value, (int, float)):
-                            cell.value = cell.value / 100.0
-                    except:
-                        pass
-        
-        print_step("格式设置", f"已为 {len(currency_columns)} 个货币栏位设置美元格式，{len(percentage_columns)} 个栏位设置百分比格式")
-        
-        # 添加条件格式 - ByteC ROI为负数时标红
-        if 'ByteC ROI' in columns:
-            roi_col_index = columns.index('ByteC ROI') + 1  # Excel列索引从1开始
-            roi_col_letter = chr(ord('A') + roi_col_index - 1)  # 转换为Excel列字母
-            
-            # 为ByteC ROI列添加条件格式（负数标红）
-            from openpyxl.styles import PatternFill, Font
-            from openpyxl.formatting.rule import CellIsRule
-            
-            red_fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-            red_font = Font(color='CC0000')
-            
-            # 应用条件格式到数据范围（不包括标题行）
-            data_range = f'{roi_col_letter}2:{roi_col_letter}{len(data) + 1}'
-            rule = CellIsRule(operator='lessThan', formula=['0'], fill=red_fill, font=red_font)
-            worksheet.conditional_formatting.add(data_range, rule)
-            
-            print(f"      ✓ ByteC ROI负数标红格式已应用到范围: {data_range}")
+        print(f"      ✓ ByteC ROI负数标红格式已应用到范围: {data_range}")
     
     def _clean_sheet_name(self, name):
         """清理 Sheet 名称，确保符合 Excel 规范"""
@@ -532,22 +551,3 @@ class ByteCReportGenerator:
             clean_name = "ByteC_Report"
         
         return clean_name
-    
-    def _clean_row_data(self, row):
-        """清理行数据，确保 Excel 兼容性"""
-        import re
-        
-        cleaned_row = []
-        for cell in row:
-            if cell is None:
-                cleaned_row.append(None)
-            elif isinstance(cell, (int, float)):
-                cleaned_row.append(cell)
-            else:
-                # 清理字符串中的特殊字符
-                cell_str = str(cell)
-                cleaned_str = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', cell_str)
-                cleaned_str = cleaned_str.strip()
-                cleaned_row.append(cleaned_str)
-        
-        return cleaned_row 
\ No newline at end of file
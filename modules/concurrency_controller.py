@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+AIMD自适应并发控制模块
+请求延迟和状态健康时加性增加并发数，遇到429或超时时乘性减半，
+使异步客户端贴近API的真实承载上限运行，而不是猜测一个固定并发数
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from utils.logger import print_step
+import config
+
+
+class AIMDConcurrencyController:
+    """
+    AIMD（加性增、乘性减）并发控制器，替代固定大小的 asyncio.Semaphore
+
+    等待者使用在当前事件循环中创建的Future，控制器本身不绑定事件循环，
+    因此学到的并发上限可以在多次 asyncio.run 之间保留
+    """
+
+    def __init__(self, initial_limit=None, min_limit=None, max_limit=None, increase_step=None,
+                 decrease_factor=None, latency_threshold=None, throughput_window=None, adaptive=True):
+        initial_limit = initial_limit or getattr(config, 'MAX_CONCURRENT_REQUESTS', 5)
+        if adaptive:
+            self.min_limit = min_limit or getattr(config, 'AIMD_MIN_CONCURRENT_REQUESTS', 1)
+            self.max_limit = max(max_limit or getattr(config, 'AIMD_MAX_CONCURRENT_REQUESTS', 20), initial_limit)
+        else:
+            # 固定并发：与原来的 Semaphore(MAX_CONCURRENT_REQUESTS) 行为一致
+            self.min_limit = self.max_limit = initial_limit
+
+        self.adaptive = adaptive
+        self.increase_step = increase_step or getattr(config, 'AIMD_INCREASE_STEP', 1)
+        self.decrease_factor = decrease_factor or getattr(config, 'AIMD_DECREASE_FACTOR', 0.5)
+        self.latency_threshold = latency_threshold or getattr(config, 'AIMD_LATENCY_THRESHOLD', 10.0)
+        self.throughput_window = throughput_window or getattr(config, 'AIMD_THROUGHPUT_WINDOW', 10.0)
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = None
+        self._completions = deque()
+
+        # 统计信息
+        self.successes = 0
+        self.overloads = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = self.current_limit
+
+    @property
+    def current_limit(self):
+        """当前允许的最大并发请求数"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """当前正在进行的请求数"""
+        return self._in_flight
+
+    @property
+    def throughput(self):
+        """滑动窗口内观测到的吞吐量（成功请求数/秒）"""
+        now = time.monotonic()
+        self._trim_completions(now)
+        if not self._completions:
+            return 0.0
+        return len(self._completions) / max(now - self._completions[0], 1.0)
+
+    @asynccontextmanager
+    async def slot(self):
+        """获取一个并发槽位，退出时释放"""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self._in_flight < self.current_limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已被分配槽位但任务取消：归还槽位
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self._in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def record_success(self, latency):
+        """
+        记录一次成功请求
+        延迟健康时加性增加：每完成约 current_limit 个请求，并发数增加 increase_step
+
+        Args:
+            latency: 请求耗时（秒）
+        """
+        self.successes += 1
+        now = time.monotonic()
+        self._completions.append(now)
+        self._trim_completions(now)
+
+        if not self.adaptive or latency > self.latency_threshold or self._limit >= self.max_limit:
+            return
+
+        previous_limit = self.current_limit
+        self._limit = min(self.max_limit, self._limit + self.increase_step / self._limit)
+        if self.current_limit > previous_limit:
+            self.increases += 1
+            self.peak_limit = max(self.peak_limit, self.current_limit)
+            self._wake_waiters()
+
+    def record_overload(self, reason="429", started_at=None):
+        """
+        记录一次过载信号（429或超时），乘性减小并发数
+        在上次减半之前就已发出的请求不再触发减半，避免同一波失败把并发数压到最低
+
+        Args:
+            reason: 过载原因，用于日志
+            started_at: 该请求发出时的 time.monotonic()
+        """
+        self.overloads += 1
+        if not self.adaptive:
+            return
+
+        now = time.monotonic()
+        if self._last_decrease is not None and (started_at if started_at is not None else now) <= self._last_decrease:
+            return
+
+        previous_limit = self.current_limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self._last_decrease = now
+        self.decreases += 1
+        print_step("自适应并发", f"检测到{reason}，并发数 {previous_limit} -> {self.current_limit}")
+
+    def get_stats(self):
+        """获取控制器统计信息"""
+        return {
+            'adaptive': self.adaptive,
+            'current_limit': self.current_limit,
+            'peak_limit': self.peak_limit,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'throughput_per_second': round(self.throughput, 2),
+            'successes': self.successes,
+            'overloads': self.overloads,
+            'increases': self.increases,
+            'decreases': self.decreases
+        }
+
+    def _trim_completions(self, now):
+        while self._completions and now - self._completions[0] > self.throughput_window:
+            self._completions.popleft()
+
+
+def create_concurrency_controller(initial_limit=None):
+    """根据配置创建并发控制器（禁用自适应时固定为 MAX_CONCURRENT_REQUESTS）"""
+    return AIMDConcurrencyController(
+        initial_limit=initial_limit,
+        adaptive=getattr(config, 'ADAPTIVE_CONCURRENCY_ENABLED', True)
+    )
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+转换数据中间文件模块
+保存的转换数据默认写为压缩的Parquet文件（需要pyarrow）：记录按列存储，API结果中的其他信息写入文件元数据；
+--process-only / --convert-only 读取时使用内存映射并只加载需要的栏位，不再整体解析缩进的JSON文档。
+未安装pyarrow或 CONVERSION_SAVE_FORMAT 为 json 时仍保存为JSON（作为导出格式保留）
+"""
+
+import json
+import os
+import pandas as pd
+from pandas.api.types import infer_dtype
+from utils.logger import print_step
+from modules.conversion_spool import dump_json, records_to_dataframe
+from modules.record_projection import json_default
+import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Parquet文件元数据中保存API结果信息的键
+_METADATA_KEY = b'weeklyreporter.conversions'
+
+# 可以直接存为Arrow列的object栏位类型，其余（字符串与数字混合、嵌套对象等）按JSON文本存储，读取时还原
+_ARROW_SAFE_TYPES = ('string', 'integer', 'floating', 'mixed-integer-float', 'boolean', 'empty')
+
+
+def is_conversion_archive(path):
+    """判断是否为Parquet中间文件路径"""
+    return isinstance(path, str) and path.lower().endswith('.parquet')
+
+
+def resolve_save_format(save_format=None):
+    """
+    确定保存格式
+
+    Args:
+        save_format: parquet / json，默认 config.CONVERSION_SAVE_FORMAT
+
+    Returns:
+        str: 实际使用的格式（未安装pyarrow时为json）
+    """
+    save_format = (save_format or config.CONVERSION_SAVE_FORMAT).lower()
+    if save_format == 'parquet' and not PARQUET_AVAILABLE:
+        print_step("中间文件格式", "⚠️ 未安装pyarrow，转换数据保存为JSON")
+        return 'json'
+    return save_format
+
+
+def save_conversions(data, filepath, save_format=None):
+    """
+    保存API返回的转换数据
+
+    Args:
+        data: API结果字典（记录在 data.data 或 data.conversions，可以是列表或spool读取器）
+        filepath: 输出路径，扩展名按实际格式替换为 .parquet / .json
+        save_format: parquet / json，默认 config.CONVERSION_SAVE_FORMAT
+
+    Returns:
+        str: 实际保存的文件路径
+    """
+    save_format = resolve_save_format(save_format)
+    records_key = _records_key(data)
+    if save_format == 'parquet' and records_key is None:
+        print_step("中间文件格式", "⚠️ 数据中没有转换记录列表，保存为JSON")
+        save_format = 'json'
+
+    filepath = os.path.splitext(filepath)[0] + ('.parquet' if save_format == 'parquet' else '.json')
+    temp_path = filepath + '.tmp'
+    if save_format == 'parquet':
+        _write_parquet(data, records_key, temp_path)
+    else:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            dump_json(data, f)
+    os.replace(temp_path, filepath)
+    return filepath
+
+
+def load_conversion_archive(path, columns=None):
+    """
+    读取Parquet中间文件
+
+    Args:
+        path: Parquet文件路径
+        columns: 只读取的栏位（不存在的栏位跳过），默认全部栏位
+
+    Returns:
+        tuple: (记录DataFrame, 不含记录的API结果字典)
+    """
+    if not PARQUET_AVAILABLE:
+        raise ImportError("读取Parquet中间文件需要安装pyarrow")
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    info = json.loads((parquet_file.schema_arrow.metadata or {}).get(_METADATA_KEY, b'{}'))
+    if columns is not None:
+        columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+    df = parquet_file.read(columns=columns).to_pandas()
+
+    for column in info.get('json_columns', []):
+        if column in df.columns:
+            df[column] = pd.Series([json.loads(value) if isinstance(value, str) else None for value in df[column]],
+                                   index=df.index, dtype=object)
+
+    print_step("中间文件加载", f"从Parquet加载 {len(df):,} 条记录，{len(df.columns)} 个字段: {path}")
+    return df, info.get('result', {})
+
+
+def _records_key(data):
+    """记录列表所在的键（data.data 或 data.conversions），没有时返回None"""
+    data_section = data.get('data') if isinstance(data, dict) else None
+    if isinstance(data_section, dict):
+        for key in ('data', 'conversions'):
+            if key in data_section:
+                return key
+    return None
+
+
+def _write_parquet(data, records_key, filepath):
+    """记录写为Parquet表，其余信息写入文件元数据"""
+    df = records_to_dataframe(data['data'][records_key])
+
+    arrays, json_columns = [], []
+    for column in df.columns:
+        series = df[column]
+        array = None
+        if series.dtype != object or infer_dtype(series, skipna=True) in _ARROW_SAFE_TYPES:
+            try:
+                array = pa.Array.from_pandas(series)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                array = None
+        if array is None:
+            json_columns.append(column)
+            array = pa.array([None if _is_missing(value) else json.dumps(value, ensure_ascii=False, default=json_default)
+                              for value in series], type=pa.string())
+        arrays.append(array)
+
+    result = {key: value for key, value in data.items() if key != 'data'}
+    result['data'] = {key: value for key, value in data['data'].items() if key != records_key}
+    info = {'records_key': records_key, 'json_columns': json_columns, 'result': result}
+
+    table = pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+    table = table.replace_schema_metadata({_METADATA_KEY: json.dumps(info, ensure_ascii=False, default=json_default)})
+    pq.write_table(table, filepath, compression=config.CONVERSION_PARQUET_COMPRESSION)
+
+
+def _is_missing(value):
+    """None和NaN视为缺失值"""
+    return value is None or (isinstance(value, float) and value != value)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+规范化转换数据模块
+每次运行只把转换记录构建为一个DataFrame：金额字段一次性转为数值，按类型策略压缩列类型，
+Source列表和Source到Partner的映射按需计算后缓存；DataProcessor、ByteC报表和主Excel都从同一个对象取只读视图，
+不再各自重复构建和整表复制，各阶段的内存占用记录在同一个 MemoryReport 中
+"""
+
+import json
+import pandas as pd
+from modules.conversion_spool import SpoolReader, records_to_dataframe
+from modules.conversion_archive import is_conversion_archive, load_conversion_archive
+from modules.partner_matcher import get_partner_matcher
+from modules.dtype_policy import optimize_dtypes, frame_memory_bytes, MemoryReport
+import config
+
+
+def coerce_numeric_fields(df, fields=None):
+    """
+    金额字段转为数值，无法解析的值和缺失值记为0（原DataFrame不变）
+
+    Args:
+        df: 转换数据
+        fields: 需要转换的字段，默认 config.CONVERSION_NUMERIC_FIELDS，不存在的字段跳过
+
+    Returns:
+        pd.DataFrame: 转换后的DataFrame（没有需要转换的字段时为原DataFrame）
+    """
+    fields = [field for field in (fields if fields is not None else config.CONVERSION_NUMERIC_FIELDS)
+              if field in df.columns]
+    if not fields:
+        return df
+    df = df.copy(deep=False)
+    for field in fields:
+        df[field] = pd.to_numeric(df[field], errors='coerce').fillna(0)
+    return df
+
+
+class ConversionFrame:
+    """
+    一次运行内共享的规范化转换数据
+
+    data 为只读的共享DataFrame，需要增删或修改栏位的调用方使用 view() 取得浅拷贝后再修改
+    """
+
+    def __init__(self, data, metadata=None, memory_report=None):
+        """
+        Args:
+            data: 已规范化的DataFrame
+            metadata: API结果中除记录以外的信息（如多API模式的 merge_info、api_sources）
+            memory_report: 本次运行的各阶段内存记录，默认新建
+        """
+        self.data = data
+        self.metadata = metadata or {}
+        self.memory_report = memory_report or MemoryReport()
+        self._sources = None
+        self._partner_maps = {}
+
+    @classmethod
+    def build(cls, data_source, columns=None):
+        """
+        从数据源构建规范化转换数据
+
+        Args:
+            data_source: DataFrame、Excel/JSON/Parquet/spool文件路径、SpoolReader 或API返回的字典
+            columns: 从spool或Parquet加载时只读取的字段，默认全部字段
+
+        Returns:
+            ConversionFrame
+        """
+        if isinstance(data_source, ConversionFrame):
+            return data_source
+
+        metadata = {}
+        if isinstance(data_source, pd.DataFrame):
+            data = data_source
+        elif isinstance(data_source, str) and data_source.endswith('.xlsx'):
+            data = pd.read_excel(data_source)
+        elif isinstance(data_source, str) and data_source.endswith('.json'):
+            # 处理JSON格式数据
+            with open(data_source, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+            records, metadata = _extract_records(json_data)
+            data = pd.DataFrame(records)
+        elif is_conversion_archive(data_source):
+            # Parquet中间文件：内存映射读取，只加载需要的栏位
+            data, result = load_conversion_archive(data_source, columns=columns)
+            metadata = result.get('data', {})
+        elif isinstance(data_source, str) and data_source.endswith('.ndjson'):
+            # 流式获取模式生成的spool文件，分块加载
+            data = SpoolReader(data_source).to_dataframe(columns=columns)
+        elif isinstance(data_source, SpoolReader):
+            data = records_to_dataframe(data_source, columns=columns)
+        elif isinstance(data_source, dict):
+            # 直接处理字典格式的JSON数据（记录可能是内存列表或spool读取器）
+            records, metadata = _extract_records(data_source)
+            data = records_to_dataframe(records, columns=columns)
+        else:
+            raise ValueError(f"不支持的数据源格式: {type(data_source)}")
+
+        data = coerce_numeric_fields(data)
+        memory_report = MemoryReport()
+        baseline_bytes = frame_memory_bytes(data) if config.MEMORY_REPORT_ENABLED else None
+        data = optimize_dtypes(data)
+        memory_report.record("构建共享数据", data, baseline_bytes)
+        return cls(data, metadata, memory_report)
+
+    def __len__(self):
+        return len(self.data)
+
+    def view(self, columns=None):
+        """
+        共享数据的浅拷贝，修改栏位不会影响共享数据
+
+        Args:
+            columns: 只保留的栏位（不存在的栏位跳过），默认全部栏位
+        """
+        if columns is None:
+            return self.data.copy(deep=False)
+        return self.data[[column for column in columns if column in self.data.columns]].copy(deep=False)
+
+    @property
+    def sources(self):
+        """所有非空的Source（aff_sub1），按首次出现顺序"""
+        if self._sources is None:
+            if 'aff_sub1' in self.data.columns:
+                self._sources = list(pd.unique(self.data['aff_sub1'].dropna()))
+            else:
+                self._sources = []
+        return self._sources
+
+    def partner_map(self, matcher=None):
+        """
+        各Source对应的Partner {Source: Partner}
+
+        Args:
+            matcher: PartnerMatcher，默认使用 config.PARTNER_SOURCES_MAPPING 编译的共享匹配器；
+                     同一个匹配器只计算一次
+        """
+        matcher = matcher or get_partner_matcher()
+        cached = self._partner_maps.get(id(matcher))
+        if cached is None or cached[0] is not matcher:
+            partners = matcher.match_series(pd.Series(self.sources, dtype=object)).tolist()
+            cached = (matcher, dict(zip(self.sources, partners)))
+            self._partner_maps[id(matcher)] = cached
+        return cached[1]
+
+
+def _extract_records(json_data):
+    """从API结果中取出转换记录和其余信息"""
+    data_section = json_data.get('data')
+    if isinstance(data_section, dict):
+        for key in ('data', 'conversions'):  # 单API格式 / 多API合并格式
+            if key in data_section:
+                metadata = {name: value for name, value in data_section.items() if name not in ('data', 'conversions')}
+                return data_section[key], metadata
+    raise ValueError("JSON数据格式不正确")
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Conversion 数据落盘模块
+将API分页获取的conversion记录逐页追加写入磁盘上的NDJSON spool文件，
+并提供惰性读取器，供 DataProcessor / ByteCReportGenerator 分块加载，
+使峰值内存不随记录总数增长
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils.logger import print_step
+from modules.record_projection import json_default
+import config
+
+
+class ConversionSpool:
+    """NDJSON spool 写入器：每获取一页就追加写入磁盘"""
+
+    def __init__(self, path=None, label=None):
+        if path is None:
+            spool_dir = getattr(config, 'SPOOL_DIR', config.TEMP_DIR)
+            os.makedirs(spool_dir, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            prefix = f"conversions_{label}_" if label else "conversions_"
+            path = os.path.join(spool_dir, f"{prefix}{timestamp}_{uuid.uuid4().hex[:8]}.ndjson")
+
+        self.path = path
+        # 追加模式打开：续传时在已有spool后继续写入
+        self.record_count = _count_lines(path) if os.path.exists(path) else 0
+        self.pages_written = 0
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append_page(self, records):
+        """
+        追加一页记录到spool文件
+
+        Args:
+            records: 该页的conversion记录列表
+
+        Returns:
+            int: 本次写入的记录数
+        """
+        if self._file is None:
+            raise ValueError(f"spool文件已关闭: {self.path}")
+
+        lines = [json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=json_default)
+                 for record in records]
+        if lines:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+
+        self.record_count += len(lines)
+        self.pages_written += 1
+        return len(lines)
+
+    def close(self):
+        """关闭spool文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reader(self):
+        """返回该spool的惰性读取器"""
+        if self._file is not None:
+            self._file.flush()
+        return SpoolReader(self.path, self.record_count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SpoolReader:
+    """
+    spool 文件的惰性读取器
+    支持逐条迭代、按块生成DataFrame，以及多个spool的合并读取
+    """
+
+    def __init__(self, path=None, record_count=None, extra_fields=None, segments=None):
+        if segments is None:
+            segments = [{
+                'path': path,
+                'count': record_count,
+                'extra_fields': dict(extra_fields or {})
+            }]
+        self.segments = segments
+
+    @classmethod
+    def merge(cls, readers):
+        """合并多个读取器（例如多API账户各自的spool）"""
+        return cls(segments=[dict(segment) for reader in readers for segment in reader.segments])
+
+    def with_fields(self, **fields):
+        """返回在读取时为每条记录附加额外字段的新读取器（如 api_source 标记）"""
+        segments = []
+        for segment in self.segments:
+            segment = dict(segment)
+            segment['extra_fields'] = {**segment['extra_fields'], **fields}
+            segments.append(segment)
+        return SpoolReader(segments=segments)
+
+    @property
+    def paths(self):
+        """所有spool文件路径"""
+        return [segment['path'] for segment in self.segments]
+
+    def __len__(self):
+        total = 0
+        for segment in self.segments:
+            if segment['count'] is None:
+                segment['count'] = _count_lines(segment['path'])
+            total += segment['count']
+        return total
+
+    def __iter__(self):
+        for segment in self.segments:
+            extra_fields = segment['extra_fields']
+            with open(segment['path'], 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if extra_fields:
+                        record.update(extra_fields)
+                    yield record
+
+    def iter_chunks(self, chunksize=None, columns=None):
+        """
+        按块生成DataFrame
+
+        Args:
+            chunksize: 每块记录数，默认使用 config.SPOOL_CHUNK_SIZE
+            columns: 只保留的字段列表（列投影），None表示保留全部字段
+
+        Yields:
+            pd.DataFrame: 每块数据
+        """
+        chunksize = chunksize or getattr(config, 'SPOOL_CHUNK_SIZE', 50000)
+        batch = []
+        for record in self:
+            batch.append(record)
+            if len(batch) >= chunksize:
+                yield _batch_to_frame(batch, columns)
+                batch = []
+        if batch:
+            yield _batch_to_frame(batch, columns)
+
+    def to_dataframe(self, columns=None, chunksize=None):
+        """
+        分块读取spool并构建一个DataFrame
+        按总记录数预分配各列数组，每块读入后写入对应行即释放，峰值内存约为结果加一个块
+        （先保留全部块再pd.concat需要约2倍）；只需逐块处理时请直接使用 iter_chunks
+        """
+        total = len(self)
+        arrays = {}
+        offset = 0
+        for chunk in self.iter_chunks(chunksize=chunksize, columns=columns):
+            if offset == 0 and len(chunk) == total:
+                return chunk  # 只有一个块，无需复制
+            end = offset + len(chunk)
+            for column in chunk.columns:
+                values = chunk[column].to_numpy()
+                array = arrays.get(column)
+                if array is None:
+                    # 之前的块没有该字段：前面的行为缺失值
+                    array = np.empty(total, dtype=_nullable_dtype(values.dtype) if offset else values.dtype)
+                    if offset:
+                        array[:offset] = np.nan
+                elif array.dtype != values.dtype:
+                    array = array.astype(_common_dtype(array.dtype, values.dtype), copy=False)
+                array[offset:end] = values
+                arrays[column] = array
+            for column in [column for column in arrays if column not in chunk.columns]:
+                # 该块没有此字段：对应的行为缺失值
+                array = arrays[column].astype(_nullable_dtype(arrays[column].dtype), copy=False)
+                array[offset:end] = np.nan
+                arrays[column] = array
+            offset = end
+        if offset == 0:
+            return pd.DataFrame()
+        return pd.DataFrame({column: array[:offset] for column, array in arrays.items()}, copy=False)
+
+    def __repr__(self):
+        return f"SpoolReader(paths={self.paths})"
+
+
+def is_spooled(records):
+    """判断记录集合是否为spool读取器"""
+    return isinstance(records, SpoolReader)
+
+
+def records_to_dataframe(records, columns=None):
+    """将记录列表或spool读取器转换为DataFrame"""
+    if isinstance(records, SpoolReader):
+        print_step("Spool加载", f"从spool分块加载 {len(records):,} 条记录: {records.paths}")
+        return records.to_dataframe(columns=columns)
+    return pd.DataFrame(records)
+
+
+def dump_json(data, fp, indent=2):
+    """
+    将API结果写入JSON文件，结果中的spool读取器会被逐条流式写出，
+    不会一次性载入内存
+    """
+    if not _contains_spool(data):
+        json.dump(data, fp, indent=indent, ensure_ascii=False, default=json_default)
+        return
+    _write_json_value(data, fp, indent, 0)
+
+
+def _contains_spool(value):
+    if isinstance(value, SpoolReader):
+        return True
+    if isinstance(value, dict):
+        return any(_contains_spool(v) for v in value.values())
+    return False
+
+
+def _write_json_value(value, fp, indent, level):
+    """流式写出JSON（只对包含spool的字典做特殊处理）"""
+    pad = ' ' * (indent * (level + 1))
+    closing_pad = ' ' * (indent * level)
+
+    if isinstance(value, SpoolReader):
+        fp.write('[')
+        first = True
+        for record in value:
+            fp.write('\n' + pad if first else ',\n' + pad)
+            fp.write(json.dumps(record, ensure_ascii=False))
+            first = False
+        fp.write(']' if first else '\n' + closing_pad + ']')
+    elif isinstance(value, dict) and _contains_spool(value):
+        fp.write('{')
+        first = True
+        for key, item in value.items():
+            fp.write('\n' + pad if first else ',\n' + pad)
+            fp.write(json.dumps(str(key), ensure_ascii=False) + ': ')
+            _write_json_value(item, fp, indent, level + 1)
+            first = False
+        fp.write('}' if first else '\n' + closing_pad + '}')
+    else:
+        text = json.dumps(value, indent=indent, ensure_ascii=False, default=json_default)
+        fp.write(text.replace('\n', '\n' + closing_pad))
+
+
+def _batch_to_frame(batch, columns):
+    df = pd.DataFrame(batch)
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    return df
+
+
+def _nullable_dtype(dtype):
+    """能表示缺失值(NaN)的dtype：整数转为float64，布尔和字符串等转为object"""
+    if dtype.kind == 'f':
+        return dtype
+    if dtype.kind in 'iu':
+        return np.dtype('float64')
+    return np.dtype(object)
+
+
+def _common_dtype(left, right):
+    """不同块中同一字段dtype不一致时的共同dtype：数值类型取公共类型，其余为object"""
+    if left.kind in 'biuf' and right.kind in 'biuf':
+        return np.result_type(left, right)
+    return np.dtype(object)
+
+
+def _count_lines(path):
+    count = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                count += 1
+    return count
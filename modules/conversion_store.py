@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+增量Conversion存储模块
+按 API账户 + 转换日期 将已获取的conversion数据缓存到本地SQLite（cache/目录），
+并为每一天记录水位（closed / open），重跑时只向API请求仍未关闭或缺失的日期
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from utils.logger import print_step
+from modules.record_projection import json_default
+import config
+
+DAY_STATUS_CLOSED = "closed"
+DAY_STATUS_OPEN = "open"
+
+
+def account_key(api_secret, currency=None):
+    """
+    生成账户存储键（不在缓存中保存明文secret）
+
+    Args:
+        api_secret: API Secret
+        currency: 货币类型，不同货币的数据分开存储
+    """
+    currency = currency or config.PREFERRED_CURRENCY
+    digest = hashlib.sha256(str(api_secret).encode('utf-8')).hexdigest()[:16]
+    return f"{digest}:{currency}"
+
+
+def iter_days(start_date, end_date):
+    """生成 start_date..end_date（含）的所有日期字符串"""
+    current = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    while current <= end:
+        yield current.strftime("%Y-%m-%d")
+        current += timedelta(days=1)
+
+
+class ConversionStore:
+    """基于SQLite的增量conversion存储"""
+
+    def __init__(self, db_path=None, open_days=None):
+        self.db_path = db_path or config.CONVERSION_STORE_PATH
+        self.open_days = open_days if open_days is not None else config.CONVERSION_STORE_OPEN_DAYS
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversions (
+                account TEXT NOT NULL,
+                day TEXT NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_conversions_account_day ON conversions (account, day);
+            CREATE TABLE IF NOT EXISTS day_watermarks (
+                account TEXT NOT NULL,
+                day TEXT NOT NULL,
+                status TEXT NOT NULL,
+                record_count INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (account, day)
+            );
+        """)
+        self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def day_status_for(self, day, fetched_at=None):
+        """根据获取时间判断某天的数据是否已关闭（距获取时已超过open_days天）"""
+        fetched_date = (fetched_at or datetime.now()).date()
+        day_date = datetime.strptime(day, "%Y-%m-%d").date()
+        return DAY_STATUS_CLOSED if (fetched_date - day_date).days >= self.open_days else DAY_STATUS_OPEN
+
+    def get_watermarks(self, account, start_date, end_date):
+        """获取日期范围内各天的水位信息 {day: {'status', 'record_count', 'fetched_at'}}"""
+        rows = self._conn.execute(
+            "SELECT day, status, record_count, fetched_at FROM day_watermarks "
+            "WHERE account = ? AND day BETWEEN ? AND ?",
+            (account, start_date, end_date)
+        ).fetchall()
+        return {
+            day: {'status': status, 'record_count': record_count, 'fetched_at': fetched_at}
+            for day, status, record_count, fetched_at in rows
+        }
+
+    def get_days_to_fetch(self, account, start_date, end_date):
+        """获取需要向API请求的日期（缺失或仍为open的日期）"""
+        watermarks = self.get_watermarks(account, start_date, end_date)
+        return [
+            day for day in iter_days(start_date, end_date)
+            if watermarks.get(day, {}).get('status') != DAY_STATUS_CLOSED
+        ]
+
+    def save_day(self, account, day, records, complete=True, fetched_at=None):
+        """
+        保存某一天的完整数据（覆盖该天已有数据）并更新水位
+
+        Args:
+            account: 账户存储键
+            day: 日期 (YYYY-MM-DD)
+            records: 该天的conversion记录列表
+            complete: 数据是否完整（有跳过页面时为False，该天保持open）
+            fetched_at: 获取时间，默认为当前时间
+        """
+        fetched_at = fetched_at or datetime.now()
+        status = self.day_status_for(day, fetched_at) if complete else DAY_STATUS_OPEN
+
+        with self._conn:
+            self._conn.execute("DELETE FROM conversions WHERE account = ? AND day = ?", (account, day))
+            self._conn.executemany(
+                "INSERT INTO conversions (account, day, record) VALUES (?, ?, ?)",
+                ((account, day, json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=json_default)) for record in records)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO day_watermarks (account, day, status, record_count, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (account, day, status, len(records), fetched_at.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        return status
+
+    def iter_day_records(self, account, day):
+        """逐条读取某一天的缓存记录"""
+        cursor = self._conn.execute(
+            "SELECT record FROM conversions WHERE account = ? AND day = ? ORDER BY rowid",
+            (account, day)
+        )
+        for (record,) in cursor:
+            yield json.loads(record)
+
+    def load_day(self, account, day):
+        """读取某一天的缓存记录列表"""
+        return list(self.iter_day_records(account, day))
+
+    def fetch_range(self, account, start_date, end_date, fetch_day, spool=None, label=""):
+        """
+        增量获取日期范围内的数据：只对缺失或open的日期调用fetch_day（最多同时请求
+        CONVERSION_STORE_FETCH_CONCURRENCY 天），其余从缓存读取
+
+        Args:
+            account: 账户存储键
+            start_date: 开始日期
+            end_date: 结束日期
+            fetch_day: 可调用对象 fetch_day(day) -> API结果字典，获取失败时为None
+                       （当天没有数据时应返回记录为空的结果，如 get_conversions(..., allow_empty=True)）
+            spool: 可选的ConversionSpool，提供时合并结果逐天写入spool
+            label: 日志标签
+
+        Returns:
+            dict: 与API客户端相同结构的结果，没有任何数据时返回None
+        """
+        days = self._plan_days(account, start_date, end_date, label)
+        if len(days) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(days), self._fetch_concurrency())) as executor:
+                fetched_results = dict(zip(days, executor.map(fetch_day, days)))
+        else:
+            fetched_results = {day: fetch_day(day) for day in days}
+        return self._merge_days(account, start_date, end_date, fetched_results, spool, label)
+
+    async def fetch_range_async(self, account, start_date, end_date, fetch_day_async, spool=None, label=""):
+        """fetch_range 的异步版本，fetch_day_async(day) 为协程函数，各日期并发获取"""
+        days = self._plan_days(account, start_date, end_date, label)
+        semaphore = asyncio.Semaphore(self._fetch_concurrency())
+
+        async def fetch(day):
+            async with semaphore:
+                return await fetch_day_async(day)
+
+        results = await asyncio.gather(*(fetch(day) for day in days))
+        return self._merge_days(account, start_date, end_date, dict(zip(days, results)), spool, label)
+
+    def _fetch_concurrency(self):
+        return max(1, getattr(config, 'CONVERSION_STORE_FETCH_CONCURRENCY', 1))
+
+    def _plan_days(self, account, start_date, end_date, label):
+        """需要请求的日期（按日期顺序）"""
+        days_to_fetch = self.get_days_to_fetch(account, start_date, end_date)
+        self._print_plan(account, start_date, end_date, days_to_fetch, label)
+        return days_to_fetch
+
+    def _print_plan(self, account, start_date, end_date, days_to_fetch, label):
+        total_days = len(list(iter_days(start_date, end_date)))
+        print_step("增量获取", f"{label}{start_date} 到 {end_date} 共 {total_days} 天，"
+                              f"缓存命中 {total_days - len(days_to_fetch)} 天，需请求API {len(days_to_fetch)} 天: {sorted(days_to_fetch)}")
+
+    def _merge_days(self, account, start_date, end_date, fetched_results, spool, label):
+        """保存新获取的日期，并按日期顺序合并缓存与新数据"""
+        all_conversions = []
+        records_collected = 0
+        skipped_pages = []
+        cached_days = []
+
+        for day in iter_days(start_date, end_date):
+            if day in fetched_results and fetched_results[day] is None:
+                # 获取失败：不更新水位（下次运行重新请求），本次使用该天已缓存的记录（没有缓存时为空）
+                records = self.load_day(account, day)
+                cached_days.append(day)
+                print_step("增量获取", f"{label}{day} 获取失败，使用已缓存的 {len(records)} 条记录")
+            elif day in fetched_results:
+                result = fetched_results[day]
+                day_data = result['data']
+                records = day_data['data'] if isinstance(day_data, dict) else day_data
+                records = list(records)
+                day_skipped = day_data.get('skipped_pages', []) if isinstance(day_data, dict) else []
+                skipped_pages.extend(f"{day}#{page}" for page in day_skipped)
+                # 当天没有数据的成功获取同样写入水位，已关闭的空日期不再重复请求
+                status = self.save_day(account, day, records, complete=not day_skipped)
+                print_step("增量缓存", f"{label}{day}: 已缓存 {len(records)} 条记录 (状态: {status})")
+            else:
+                records = self.load_day(account, day)
+                cached_days.append(day)
+
+            if spool is not None:
+                spool.append_page(records)
+            else:
+                all_conversions.extend(records)
+            records_collected += len(records)
+
+        if not records_collected:
+            print_step("增量获取", f"{label}缓存和API都没有数据")
+            return None
+
+        return {
+            "status": "success",
+            "message": "Success",
+            "data": {
+                "page": 1,
+                "limit": config.DEFAULT_PAGE_LIMIT,
+                "count": records_collected,
+                "skipped_pages": skipped_pages,
+                "current_page_count": records_collected,
+                "data": spool.reader() if spool is not None else all_conversions,
+                "incremental": {
+                    "cached_days": cached_days,
+                    "fetched_days": sorted(day for day, result in fetched_results.items() if result is not None)
+                }
+            }
+        }
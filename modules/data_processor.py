@@ -8,15 +8,18 @@ import pandas as pd
 import os
 from datetime import datetime
 from utils.logger import print_step
+from modules.conversion_frame import ConversionFrame, coerce_numeric_fields
+from modules.excel_writer import StreamingWorkbook, CURRENCY_FORMAT, unique_sheet_title
+from modules.parallel_export import export_workbooks
+from modules.report_manifest import build_partner_manifest, write_manifest
 import config
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import NamedStyle
 
 class DataProcessor:
     """数据处理器类"""
     
     def __init__(self):
+        self.conversions = None
         self.original_data = None
         self.processed_data = None
         self.total_sale_amount = 0
@@ -28,7 +31,7 @@ class DataProcessor:
         完整的数据处理流程
         
         Args:
-            data_source: 数据源（DataFrame、Excel文件路径或JSON数据）
+            data_source: 数据源（ConversionFrame、DataFrame、Excel文件路径或JSON数据）
             output_dir: 输出目录，默认使用config.OUTPUT_DIR
             report_date: 报告日期，用于文件名，默认使用当前日期（向后兼容）
             start_date: 开始日期，用于文件名生成
@@ -61,6 +64,7 @@ class DataProcessor:
         
         # 步骤4: 调整金额（Mockup）
         self._apply_mockup_adjustment()
+        self.conversions.memory_report.record("数据清洗与金额调整", self.processed_data)
         
         # 步骤5: 按Pub分类导出
         pub_files = self._export_by_pub(output_dir)
@@ -72,46 +76,16 @@ class DataProcessor:
         return result
     
     def _load_data(self, data_source):
-        """加载数据源"""
+        """加载数据源（已构建的共享数据直接使用，不再复制）"""
         print_step("数据加载", "正在加载原始数据...")
         
-        if isinstance(data_source, pd.DataFrame):
-            self.original_data = data_source.copy()
-        elif isinstance(data_source, str) and data_source.endswith('.xlsx'):
-            self.original_data = pd.read_excel(data_source)
-        elif isinstance(data_source, str) and data_source.endswith('.json'):
-            # 处理JSON格式数据
-            import json
-            with open(data_source, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-            
-            if 'data' in json_data and 'data' in json_data['data']:
-                conversion_records = json_data['data']['data']
-                self.original_data = pd.DataFrame(conversion_records)
-            elif 'data' in json_data and 'conversions' in json_data['data']:
-                # 支持多API合并格式
-                conversion_records = json_data['data']['conversions']
-                self.original_data = pd.DataFrame(conversion_records)
-            else:
-                raise ValueError("JSON数据格式不正确")
-        elif isinstance(data_source, dict):
-            # 直接处理字典格式的JSON数据
-            if 'data' in data_source and 'data' in data_source['data']:
-                conversion_records = data_source['data']['data']
-                self.original_data = pd.DataFrame(conversion_records)
-            elif 'data' in data_source and 'conversions' in data_source['data']:
-                # 支持多API合并格式
-                conversion_records = data_source['data']['conversions']
-                self.original_data = pd.DataFrame(conversion_records)
-            else:
-                raise ValueError("JSON数据格式不正确")
-        else:
-            raise ValueError(f"不支持的数据源格式: {type(data_source)}")
+        self.conversions = ConversionFrame.build(data_source)
+        self.original_data = self.conversions.data
         
         print_step("数据加载完成", f"成功加载 {len(self.original_data)} 条记录，{len(self.original_data.columns)} 个字段")
         
-        # 复制到处理数据
-        self.processed_data = self.original_data.copy()
+        # 处理数据为共享数据的浅拷贝，后续栏位修改不影响共享数据
+        self.processed_data = self.conversions.view()
     
     def _clean_data(self):
         """数据清洗 - 移除不需要的栏位"""
@@ -138,11 +112,9 @@ class DataProcessor:
             print_step("金额处理警告", "sale_amount栏位不存在，跳过金额处理")
             return
         
-        # 转换为数值类型并处理异常值
-        self.processed_data['sale_amount'] = pd.to_numeric(
-            self.processed_data['sale_amount'], 
-            errors='coerce'
-        ).fillna(0)
+        # 构建共享数据时已转为数值类型（异常值记为0），直接设置的数据仍需转换
+        if not pd.api.types.is_numeric_dtype(self.processed_data['sale_amount']):
+            self.processed_data = coerce_numeric_fields(self.processed_data, ['sale_amount'])
         
         # 格式化为两位小数
         self.processed_data['sale_amount'] = self.processed_data['sale_amount'].round(2)
@@ -185,14 +157,20 @@ class DataProcessor:
             print_step("分类导出警告", "aff_sub1 (Source) 栏位不存在，跳过分类导出")
             return []
         
-        # 获取所有唯一的Source值（aff_sub1）
-        unique_sources = self.processed_data['aff_sub1'].dropna().unique()
-        print_step("Source统计", f"发现 {len(unique_sources)} 个不同的Source: {list(unique_sources)}")
+        # 一次分组得到每个Source的数据（按首次出现顺序），后续各Partner/Source不再逐个扫描全表
+        source_frames, source_totals = self._partition_by_source()
+        unique_sources = list(source_frames)
+        if self.conversions is not None:
+            self.conversions.memory_report.record("Source分组", source_frames)
+        print_step("Source统计", f"发现 {len(unique_sources)} 个不同的Source: {unique_sources}")
         
         # 按Partner分组Sources
+        # Source到Partner的映射由共享数据计算一次（直接设置处理数据时按当前数据计算）
+        conversions = self.conversions if self.conversions is not None else ConversionFrame(self.processed_data)
+        partner_map = conversions.partner_map()
         partner_sources_map = {}
         for source in unique_sources:
-            partner = config.match_source_to_partner(source)
+            partner = partner_map[source]
             if partner not in partner_sources_map:
                 partner_sources_map[partner] = []
             partner_sources_map[partner].append(source)
@@ -218,45 +196,67 @@ class DataProcessor:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
+        # 生成各Partner工作簿（多个Partner时在进程池中并行生成）
+        jobs = []
         for partner, sources_list in partner_sources_map.items():
             # 检查是否在目标Partner列表中
             if not config.is_partner_enabled(partner):
                 print_step("Partner跳过", f"跳过Partner '{partner}' (不在处理范围内)")
                 continue
-                
-            try:
-                # 生成Partner文件名
-                filename = config.get_partner_filename(partner, start_date, end_date)
-                filepath = os.path.join(output_dir, filename)
-                
-                # 创建Excel工作簿，包含多个Sources作为Sheets
-                self._create_partner_excel_with_sources(partner, sources_list, filepath)
-                
-                # 统计Partner总信息
-                partner_data = self.processed_data[self.processed_data['aff_sub1'].isin(sources_list)]
-                partner_total = partner_data['sale_amount'].sum() if 'sale_amount' in partner_data.columns else 0
-                
-                self.pub_summary[partner] = {
-                    'records': len(partner_data),
-                    'total_amount': partner_total,
-                    'amount_formatted': f"${partner_total:,.2f}",
-                    'filename': filename,
-                    'sources': sources_list,
-                    'sources_count': len(sources_list)
-                }
-                
-                partner_files.append(filepath)
-                
-                print_step("Partner导出", f"Partner '{partner}': {len(sources_list)} 个Sources, {len(partner_data)} 条记录，总金额 ${partner_total:,.2f} → {filename}")
-                
-            except Exception as e:
-                print_step("Partner导出错误", f"❌ Partner '{partner}' 导出失败: {str(e)}")
+            filename = config.get_partner_filename(partner, start_date, end_date)
+            jobs.append((partner, sources_list, os.path.join(output_dir, filename)))
+        
+        export_errors = export_workbooks(jobs, source_frames, _write_partner_workbook)
+        
+        # 按Partner映射顺序汇总结果，与串行导出的输出一致
+        for partner, sources_list, filepath in jobs:
+            error = export_errors.get(partner)
+            if error is not None:
+                print_step("Partner导出错误", f"❌ Partner '{partner}' 导出失败: {str(error)}")
                 continue
+            
+            filename = os.path.basename(filepath)
+            
+            # 统计Partner总信息（由各Source的分组结果汇总）
+            partner_records = sum(len(source_frames[source]) for source in sources_list)
+            partner_total = sum(source_totals[source] for source in sources_list) if source_totals is not None else 0
+            
+            self.pub_summary[partner] = {
+                'records': partner_records,
+                'total_amount': partner_total,
+                'amount_formatted': f"${partner_total:,.2f}",
+                'filename': filename,
+                'sources': sources_list,
+                'sources_count': len(sources_list)
+            }
+            
+            partner_files.append(filepath)
+            
+            # 汇总清单：邮件直接使用各Source/Offer的合计，不再重新读取工作簿
+            if config.REPORT_MANIFEST_ENABLED:
+                write_manifest(filepath, build_partner_manifest(partner, source_frames, source_totals,
+                                                                self._partner_sheet_titles(sources_list, source_frames)))
+            
+            print_step("Partner导出", f"Partner '{partner}': {len(sources_list)} 个Sources, {partner_records} 条记录，总金额 ${partner_total:,.2f} → {filename}")
         
         print_step("分类导出完成", f"成功生成 {len(partner_files)} 个Partner分类文件")
         return partner_files
     
-    def _create_partner_excel_with_sources(self, partner, sources_list, filepath):
+    def _partition_by_source(self):
+        """
+        按aff_sub1一次分组
+        
+        Returns:
+            tuple: ({Source: 该Source的数据}, {Source: sale_amount合计}，没有sale_amount栏位时为None)
+        """
+        grouped = self.processed_data.groupby('aff_sub1', sort=False, dropna=True, observed=True)
+        source_frames = {source: frame for source, frame in grouped}
+        source_totals = None
+        if 'sale_amount' in self.processed_data.columns:
+            source_totals = grouped['sale_amount'].sum().to_dict()
+        return source_frames, source_totals
+    
+    def _create_partner_excel_with_sources(self, partner, sources_list, filepath, source_frames=None):
         """
         创建Partner Excel文件，包含多个Sources作为不同的Sheets
         
@@ -264,56 +264,58 @@ class DataProcessor:
             partner: Partner名称
             sources_list: 该Partner下的Sources列表
             filepath: 输出文件路径
+            source_frames: _partition_by_source 得到的 {Source: 数据}，未提供时重新分组
         """
-        from openpyxl import Workbook
-        from openpyxl.utils.dataframe import dataframe_to_rows
+        # 创建流式工作簿（只写模式没有默认工作表）
+        workbook = StreamingWorkbook()
         
-        # 创建工作簿
-        wb = Workbook()
-        # 删除默认的工作表
-        wb.remove(wb.active)
+        if source_frames is None:
+            source_frames, _ = self._partition_by_source()
         
         # 为每个Source创建一个Sheet
+        sheet_titles = self._partner_sheet_titles(sources_list, source_frames)
         for source in sources_list:
-            # 过滤该Source的数据
-            source_data = self.processed_data[self.processed_data['aff_sub1'] == source].copy()
-            
-            if len(source_data) == 0:
+            if source not in sheet_titles:
                 print_step("Sheet创建", f"⚠️ Source '{source}' 没有数据，跳过创建Sheet")
                 continue
             
-            # 创建工作表，使用Source名称作为Sheet名（清理特殊字符并限制长度）
-            safe_sheet_name = self._clean_sheet_name(str(source))
-            ws = wb.create_sheet(title=safe_sheet_name)
+            # 该Source的数据（分组结果，不再逐个扫描全表）
+            source_data = source_frames[source]
             
-            # 写入数据（包含标题行），清理特殊字符
-            for r in dataframe_to_rows(source_data, index=False, header=True):
-                # 清理行中的特殊字符
-                cleaned_row = self._clean_row_data(r)
-                ws.append(cleaned_row)
+            # 写入数据（包含标题行），sale_amount列使用美元货币格式
+            sheet = workbook.add_dataframe_sheet(sheet_titles[source], source_data, column_formats={'sale_amount': CURRENCY_FORMAT})
             
-            # 查找sale_amount列的索引并应用货币格式
-            if 'sale_amount' in source_data.columns:
-                sale_amount_col = source_data.columns.get_loc('sale_amount') + 1  # Excel列索引从1开始
-                
-                # 应用货币格式到sale_amount列（跳过标题行）
-                for row in range(2, len(source_data) + 2):  # 从第2行开始（第1行是标题）
-                    cell = ws.cell(row=row, column=sale_amount_col)
-                    cell.number_format = '"$"#,##0.00'
-            
-            print_step("Sheet创建", f"✅ 已创建Sheet '{safe_sheet_name}' ({len(source_data)} 条记录)")
+            print_step("Sheet创建", f"✅ 已创建Sheet '{sheet.title}' ({len(source_data)} 条记录)")
         
         # 检查是否有任何Sheet被创建
-        if len(wb.worksheets) == 0:
+        if workbook.sheet_count == 0:
             # 如果没有Sheet，创建一个空的Sheet
-            ws = wb.create_sheet(title="No_Data")
-            ws.append(["Partner", "Message"])
-            ws.append([partner, "No data available"])
+            sheet = workbook.add_sheet("No_Data")
+            sheet.append(["Partner", "Message"])
+            sheet.append([partner, "No data available"])
             print_step("Sheet创建", f"⚠️ Partner '{partner}' 没有任何数据，创建空Sheet")
         
         # 保存文件
-        wb.save(filepath)
-        print_step("Excel保存", f"✅ Partner Excel文件已保存: {filepath} (包含 {len(wb.worksheets)} 个Sheets)")
+        workbook.save(filepath)
+        print_step("Excel保存", f"✅ Partner Excel文件已保存: {filepath} (包含 {workbook.sheet_count} 个Sheets)")
+    
+    def _partner_sheet_titles(self, sources_list, source_frames):
+        """
+        Partner工作簿中各Source的工作表名称
+        
+        使用Source名称（清理特殊字符并限制长度），清理后重名的Source（如 Shopee/Promo 与 Shopee_Promo）
+        与 StreamingWorkbook.add_sheet 一样依次追加序号；没有数据的Source不创建工作表
+        
+        Returns:
+            dict: {Source: 工作表名称}，按工作表顺序
+        """
+        sheet_titles = {}
+        for source in sources_list:
+            source_data = source_frames.get(source)
+            if source_data is None or len(source_data) == 0:
+                continue
+            sheet_titles[source] = unique_sheet_title(self._clean_sheet_name(str(source)), sheet_titles.values())
+        return sheet_titles
     
     def _clean_sheet_name(self, name):
         """
@@ -369,44 +371,6 @@ class DataProcessor:
         
         return clean_name
     
-    def _clean_row_data(self, row):
-        """
-        清理行数据中的特殊字符，确保Excel兼容性
-        
-        Args:
-            row: 数据行（列表或元组）
-            
-        Returns:
-            list: 清理后的数据行
-        """
-        import re
-        
-        cleaned_row = []
-        for cell in row:
-            if cell is None:
-                cleaned_row.append(None)
-            elif isinstance(cell, (int, float)):
-                # 数字类型直接保留
-                cleaned_row.append(cell)
-            else:
-                # 字符串类型需要清理
-                cell_str = str(cell)
-                
-                # 移除可能导致Excel问题的控制字符和特殊Unicode字符
-                # 保留基本的ASCII字符、常见Unicode字符
-                cleaned_str = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', cell_str)
-                
-                # 移除可能有问题的Unicode字符（保留基本字母、数字、常见符号）
-                # 这个正则表达式比较宽松，保留大部分字符但移除控制字符
-                cleaned_str = re.sub(r'[^\x20-\x7E\u00A0-\u024F\u1E00-\u1EFF\u2000-\u206F\u20A0-\u20CF\u2100-\u214F]', '_', cleaned_str)
-                
-                # 移除开头的特殊字符（如不可见字符）
-                cleaned_str = cleaned_str.strip()
-                
-                cleaned_row.append(cleaned_str)
-        
-        return cleaned_row
-    
     def _generate_summary(self, pub_files, output_dir):
         """生成处理结果摘要"""
         print_step("生成摘要", "正在生成数据处理结果摘要...")
@@ -452,6 +416,10 @@ class DataProcessor:
                 print(f"   - {pub}: {info['records']} 条记录, ${info['total_amount']:,.2f}, 文件: {info['filename']}")
 
 # 便捷函数
+def _write_partner_workbook(partner, sources_list, filepath, source_frames):
+    """生成单个Partner的工作簿（可在并行导出的工作进程中调用）"""
+    DataProcessor()._create_partner_excel_with_sources(partner, sources_list, filepath, source_frames)
+
 def process_conversion_data(data_source, output_dir=None):
     """
     便捷的数据处理函数
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+转换数据类型策略模块
+构建共享转换数据时统一压缩列类型：低基数字符串列转为category（各Partner/Source切片只复制整数编码），
+整数列按取值范围降级，ID类字符串列在安装了pyarrow时使用紧凑的Arrow字符串；
+MemoryReport 记录各处理阶段的DataFrame内存占用，便于对比策略前后的内存
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_integer_dtype, is_numeric_dtype
+import psutil
+from utils.logger import print_step
+import config
+
+try:
+    import pyarrow  # noqa: F401
+    _COMPACT_STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    _COMPACT_STRING_DTYPE = None
+
+
+def frame_memory_bytes(data):
+    """DataFrame（或 {名称: DataFrame} 字典中所有DataFrame）的内存占用（字节，包含字符串对象）"""
+    if isinstance(data, dict):
+        return sum(frame_memory_bytes(frame) for frame in data.values())
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+def optimize_dtypes(df):
+    """
+    按 config 中的类型策略压缩列类型（原DataFrame不变，取值和缺失值不变）
+
+    Args:
+        df: 已完成金额数值转换的转换数据
+
+    Returns:
+        pd.DataFrame: 压缩后的DataFrame（没有可压缩的列时为原DataFrame）
+    """
+    if not config.should_optimize_dtypes() or len(df) == 0:
+        return df
+
+    category_columns = set(getattr(config, 'DTYPE_CATEGORY_COLUMNS', []))
+    compact_columns = set(getattr(config, 'DTYPE_COMPACT_STRING_COLUMNS', []))
+    max_ratio = getattr(config, 'DTYPE_CATEGORY_MAX_UNIQUE_RATIO', 0.5)
+
+    converted = {}
+    for column in df.columns:
+        series = df[column]
+        if is_bool_dtype(series.dtype) or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if is_integer_dtype(series.dtype):
+            # 可空整数等扩展类型不降级
+            if getattr(config, 'DTYPE_DOWNCAST_INTEGERS', True) and isinstance(series.dtype, np.dtype):
+                downcast = pd.to_numeric(series, downcast='integer')
+                if downcast.dtype != series.dtype:
+                    converted[column] = downcast
+            continue
+        if is_numeric_dtype(series.dtype):
+            # 金额等浮点列保持float64：报表合计需要与原始数据逐位一致
+            continue
+        if infer_dtype(series, skipna=True) != 'string':
+            continue  # 混合类型、日期等列不转换
+
+        if column in compact_columns:
+            if _COMPACT_STRING_DTYPE is not None and series.dtype != _COMPACT_STRING_DTYPE:
+                converted[column] = series.astype(_COMPACT_STRING_DTYPE)
+            continue
+        if column in category_columns or series.nunique(dropna=True) <= max_ratio * len(series):
+            converted[column] = series.astype('category')
+
+    if not converted:
+        return df
+    df = df.copy(deep=False)
+    for column, series in converted.items():
+        df[column] = series
+    return df
+
+
+class MemoryReport:
+    """各处理阶段的内存占用记录（同一次运行的各阶段共用）"""
+
+    def __init__(self):
+        self.stages = []
+
+    def record(self, stage, data, baseline_bytes=None):
+        """
+        记录一个阶段的数据内存和进程RSS
+
+        Args:
+            stage: 阶段名称
+            data: 该阶段持有的DataFrame或 {名称: DataFrame}
+            baseline_bytes: 同一数据在类型策略前的内存（有值时输出压缩前后对比）
+        """
+        if not getattr(config, 'MEMORY_REPORT_ENABLED', True):
+            return None
+        entry = {
+            'stage': stage,
+            'data_mb': frame_memory_bytes(data) / 1024 / 1024,
+            'baseline_mb': baseline_bytes / 1024 / 1024 if baseline_bytes is not None else None,
+            'rss_mb': psutil.Process().memory_info().rss / 1024 / 1024
+        }
+        self.stages.append(entry)
+
+        if entry['baseline_mb'] is not None:
+            saved = entry['baseline_mb'] - entry['data_mb']
+            print_step("内存报告", f"{stage}: {entry['baseline_mb']:.1f}MB → {entry['data_mb']:.1f}MB "
+                                  f"(节省 {saved:.1f}MB)，进程RSS {entry['rss_mb']:.1f}MB")
+        else:
+            print_step("内存报告", f"{stage}: 数据 {entry['data_mb']:.1f}MB，进程RSS {entry['rss_mb']:.1f}MB")
+        return entry
+
+    def log_summary(self):
+        """输出所有阶段的内存汇总"""
+        if not self.stages:
+            return
+        peak = max(self.stages, key=lambda entry: entry['rss_mb'])
+        print_step("内存报告汇总", f"共 {len(self.stages)} 个阶段，进程RSS峰值 {peak['rss_mb']:.1f}MB（{peak['stage']}）")
+        for entry in self.stages:
+            baseline = f"（策略前 {entry['baseline_mb']:.1f}MB）" if entry['baseline_mb'] is not None else ""
+            print_step("内存报告汇总", f"  • {entry['stage']}: 数据 {entry['data_mb']:.1f}MB{baseline}，RSS {entry['rss_mb']:.1f}MB")
@@ -14,6 +14,7 @@ from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
 from utils.logger import print_step
+from modules.report_manifest import load_manifest
 import config
 import pandas as pd
 
@@ -249,12 +250,19 @@ class EmailSender:
         
         file_path = partner_data.get('file_path')
         
-        # 从Excel文件中计算真实的销售总额
-        real_total_amount = self._calculate_sales_amount_from_excel(file_path)
-        
-        # 计算Sources统计信息
-        sources_statistics = self._calculate_sources_statistics_from_excel(file_path)
-        print_step("Sources统计", f"✅ 计算完成，获得 {len(sources_statistics)} 个Sources统计")
+        # 优先使用生成报表时写入的汇总清单，没有清单时从Excel文件中计算
+        manifest = load_manifest(file_path)
+        if manifest is not None:
+            real_total_amount = f"${manifest['total_amount']:,.2f}"
+            sources_statistics = self._sources_statistics_from_manifest(manifest)
+            print_step("Sources统计", f"✅ 从汇总清单读取 {len(sources_statistics)} 个Sources统计，总销售额: {real_total_amount}")
+        else:
+            # 从Excel文件中计算真实的销售总额
+            real_total_amount = self._calculate_sales_amount_from_excel(file_path)
+            
+            # 计算Sources统计信息
+            sources_statistics = self._calculate_sources_statistics_from_excel(file_path)
+            print_step("Sources统计", f"✅ 计算完成，获得 {len(sources_statistics)} 个Sources统计")
         
         return {
             'partner_name': partner_name,
@@ -270,6 +278,17 @@ class EmailSender:
             'sources_statistics': sources_statistics
         }
     
+    def _sources_statistics_from_manifest(self, manifest):
+        """从汇总清单得到各Sources（工作表）的统计信息，格式与 _calculate_sources_statistics_from_excel 相同"""
+        return [
+            {
+                'source_name': str(sheet['sheet_name']),
+                'records': int(sheet['records']),
+                'sales_amount': f"${sheet['sales_amount']:,.2f}"
+            }
+            for sheet in manifest.get('sheets', [])
+        ]
+    
     def _calculate_sales_amount_from_excel(self, file_path):
         """从Excel文件中计算Sale Amount总额（包含所有sheets）"""
         try:
@@ -352,17 +371,14 @@ class EmailSender:
             sources_stats = []
             
             for sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                
                 # 跳过Summary工作表，因为它不包含实际的转化数据
                 if sheet_name.lower() == 'summary':
                     continue
                 
-                # 跳过第一行标题，计算记录数
-                row_count = ws.max_row - 1 if ws.max_row > 1 else 0
-                
-                # 读取该sheet的数据来计算销售金额
+                # 读取该sheet的数据来计算记录数和销售金额
+                # （只写模式生成的工作表没有dimension信息，只读模式下 ws.max_row 为None，按读取的行数计算）
                 df = pd.read_excel(file_path, sheet_name=sheet_name)
+                row_count = len(df)
                 
                 # 支持多种可能的销售金额列名
                 sales_amount_col = None
@@ -830,9 +846,12 @@ class EmailSender:
             # 如果模板加载失败，使用备用的简单HTML
             return self._generate_fallback_email_body(partner_name, email_data, feishu_info)
         
-        # 从Excel文件计算ByteC三个维度的数据
+        # ByteC三个维度的数据：优先使用汇总清单，没有清单时从Excel文件计算
         file_path = email_data.get('file_path')
-        if not file_path or not os.path.exists(file_path):
+        manifest = load_manifest(file_path)
+        if manifest is not None and manifest.get('report_type') == 'bytec':
+            bytec_data = self._bytec_data_from_manifest(manifest)
+        elif not file_path or not os.path.exists(file_path):
             print_step("ByteC邮件", f"⚠️ 文件不存在: {file_path}")
             # 使用默认值
             bytec_data = self._get_default_bytec_data()
@@ -891,6 +910,54 @@ class EmailSender:
         
         return body
 
+    def _bytec_data_from_manifest(self, manifest):
+        """从汇总清单得到ByteC三个维度的数据，格式与 _calculate_bytec_summary_from_excel 相同"""
+        company = manifest['company']
+        adv_commission_total = company['total_adv_commission']
+        pub_commission_total = company['total_pub_commission']
+        total_earning = company['total_earning']
+        
+        # ByteC Commission = Adv Commission - Pub Commission，ByteC ROI = ByteC Commission / Estimated Earning * 100%
+        bytec_commission_total = adv_commission_total - pub_commission_total
+        bytec_roi = 0.0
+        roi_class = "amount"
+        if total_earning > 0:
+            bytec_roi = (bytec_commission_total / total_earning) * 100
+            if bytec_roi < 0:
+                roi_class = "negative-roi"
+        
+        print_step("ByteC数据计算", f"✅ 从汇总清单读取: {len(manifest['partner_sources'])} 个Partner+Source组合，{len(manifest['offers'])} 个Offer")
+        return {
+            'company': {
+                'total_conversion': int(company['total_conversion']),
+                'total_sales': f"${company['total_sales']:,.2f}",
+                'total_earning': f"${total_earning:,.2f}",
+                'total_adv_commission': f"${adv_commission_total:,.2f}",
+                'total_pub_commission': f"${pub_commission_total:,.2f}",
+                'total_bytec_commission': f"${bytec_commission_total:,.2f}",
+                'bytec_roi': f"{bytec_roi:.2f}%",
+                'roi_class': roi_class
+            },
+            'partner_source': [
+                {
+                    'partner_source': f"{item['partner']}+{item['source']}",
+                    'conversion': int(item['conversions']),
+                    'sales_amount': f"${item['sales_amount']:,.2f}",
+                    'estimated_earning': f"${item['estimated_earning']:,.2f}"
+                }
+                for item in manifest['partner_sources']
+            ],
+            'offer': [
+                {
+                    'offer_name': item['offer_name'],
+                    'conversion': int(item['conversions']),
+                    'sales_amount': f"${item['sales_amount']:,.2f}",
+                    'estimated_earning': f"${item['estimated_earning']:,.2f}"
+                }
+                for item in manifest['offers']
+            ]
+        }
+
     def _calculate_bytec_summary_from_excel(self, file_path):
         """从Excel文件计算ByteC三个维度的汇总数据"""
         try:
@@ -907,8 +974,10 @@ class EmailSender:
             if not all_data:
                 return self._get_default_bytec_data()
             
-            # 合并所有数据
-            combined_df = pd.concat(all_data, ignore_index=True)
+            # 合并所有数据，去掉报表底部的空行和TOTAL汇总行（否则公司级合计会重复计算）
+            combined_df = pd.concat(all_data, ignore_index=True).dropna(how='all')
+            if 'Offer Name' in combined_df.columns:
+                combined_df = combined_df[combined_df['Offer Name'] != 'TOTAL']
             
             # 计算Company Level Summary
             company_summary = self._calculate_company_level_summary(combined_df)
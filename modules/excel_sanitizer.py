@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Excel字符清理模块
+所有报表写入前统一清理DataFrame中的字符串列：正则预编译，按整列 Series.str.replace 处理，
+已经是可打印ASCII的列直接跳过；结果与逐行逐单元格清理完全一致
+"""
+
+import re
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_numeric_dtype
+
+# 可能导致Excel问题的控制字符，以及XML中不允许出现的代理项和 U+FFFE/U+FFFF（不替换时也必须移除，否则工作表XML损坏）
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F\uD800-\uDFFF\uFFFE\uFFFF]')
+
+# 保留基本的ASCII字符、常见Unicode字符（拉丁扩展、标点、货币、字母符号），其余替换为下划线
+_UNSUPPORTED_CHARS = re.compile(r'[^\x20-\x7E\u00A0-\u024F\u1E00-\u1EFF\u2000-\u206F\u20A0-\u20CF\u2100-\u214F]')
+
+# 可打印ASCII以外的字符（整列都不含时无需清理）
+_NON_PRINTABLE_ASCII = re.compile(r'[^\x20-\x7E]')
+
+
+def sanitize_value(value, replace_unsupported=True):
+    """
+    清理单个单元格
+
+    Args:
+        value: 单元格值，None和数字原样返回，pd.NA/NaT返回None（空单元格），其余转为字符串后清理
+        replace_unsupported: 是否把不常见的Unicode字符替换为下划线（否则只移除控制字符）
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if value is pd.NA or value is pd.NaT:
+        return None
+    cleaned = _CONTROL_CHARS.sub('', str(value))
+    if replace_unsupported:
+        cleaned = _UNSUPPORTED_CHARS.sub('_', cleaned)
+    return cleaned.strip()
+
+
+def sanitize_row(row, replace_unsupported=True):
+    """清理单行数据（如单独追加的汇总行）"""
+    return [sanitize_value(cell, replace_unsupported) for cell in row]
+
+
+def sanitize_dataframe(df, replace_unsupported=True):
+    """
+    写入Excel前清理整个DataFrame（包括列名），原DataFrame不变
+
+    Args:
+        df: 待写入的DataFrame
+        replace_unsupported: 同 sanitize_value
+
+    Returns:
+        pd.DataFrame: 清理后的DataFrame，数字列与缺失值不变
+    """
+    columns = {}
+    changed = False
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        cleaned = _sanitize_column(series, replace_unsupported)
+        columns[position] = cleaned
+        changed = changed or cleaned is not series
+
+    headers = sanitize_row(df.columns, replace_unsupported)
+    if not changed and headers == list(df.columns):
+        return df
+
+    result = pd.concat(columns, axis=1) if columns else df.copy()
+    result.columns = headers
+    return result
+
+
+def _sanitize_column(series, replace_unsupported):
+    """清理一列，无需清理时返回原Series"""
+    if is_numeric_dtype(series.dtype) or is_bool_dtype(series.dtype):
+        return series
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if is_numeric_dtype(categories.dtype):
+            return series
+        cleaned = _sanitize_column(pd.Series(categories, dtype=object), replace_unsupported)
+        if cleaned is not None and cleaned.is_unique and cleaned.notna().all():
+            return series.cat.rename_categories(list(cleaned))
+        # 清理后类别重复，按普通列处理
+        series = series.astype(object)
+
+    if series.dtype != object and not isinstance(series.dtype, pd.StringDtype):
+        # 日期等其他类型：与逐单元格清理一致，先转为字符串（NaT等缺失值为None）
+        series = series.astype(object).map(lambda value: None if value is pd.NaT or value is pd.NA else str(value))
+
+    if series.dtype == object and infer_dtype(series, skipna=True) not in ('string', 'empty'):
+        # 字符串与数字混合的列：数字和None保留，其余转为字符串后只清理字符串部分
+        values = [value if value is None or isinstance(value, (int, float)) else
+                  None if value is pd.NA or value is pd.NaT else str(value)
+                  for value in series]
+        series = pd.Series(values, index=series.index, name=series.name, dtype=object)
+        mask = series.map(lambda value: isinstance(value, str))
+        if not mask.any():
+            return series
+        result = series.copy()
+        result[mask] = _sanitize_strings(series[mask], replace_unsupported)
+        return result
+
+    return _sanitize_strings(series, replace_unsupported)
+
+
+def _sanitize_strings(series, replace_unsupported):
+    """整列清理纯字符串Series（缺失值不变）"""
+    values = series.dropna()
+    if len(values) == 0:
+        return series
+    if _NON_PRINTABLE_ASCII.search("".join(values)) is None:
+        # 已经是可打印ASCII，只需检查首尾空格
+        if not (values.str.startswith(' ').any() or values.str.endswith(' ').any()):
+            return series
+        return series.str.strip()
+
+    cleaned = series.str.replace(_CONTROL_CHARS, '', regex=True)
+    if replace_unsupported:
+        cleaned = cleaned.str.replace(_UNSUPPORTED_CHARS, '_', regex=True)
+    return cleaned.str.strip()
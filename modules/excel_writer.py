@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Excel输出引擎
+基于openpyxl只写模式（Workbook(write_only=True)）流式写入xlsx：行数据按块（EXCEL_WRITE_CHUNK_ROWS行）
+整列转换为Python值后逐行追加，openpyxl随即写入工作表的临时文件，不保留单元格对象图；
+数字格式按列设置一次，带格式的列共用同一个样式，缺失值（None/NaN/pd.NA/NaT）写为空单元格
+"""
+
+import os
+import shutil
+from copy import copy
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from modules.excel_sanitizer import sanitize_dataframe
+import config
+
+# 常用数字格式
+CURRENCY_FORMAT = '"$"#,##0.00'
+PERCENT_FORMAT = '0.00%'
+
+
+def unique_sheet_title(title, existing_titles):
+    """
+    不与已有工作表重名的名称（不区分大小写，与openpyxl的 avoid_duplicate_name 相同，重名时依次追加1、2...）
+
+    Args:
+        title: 期望的工作表名称
+        existing_titles: 已有的工作表名称
+
+    Returns:
+        str: 可用的名称（追加序号后仍不超过Excel的31个字符）
+    """
+    existing = {name.lower() for name in existing_titles}
+    if title.lower() not in existing:
+        return title
+    index = 1
+    while True:
+        suffix = str(index)
+        candidate = title[:31 - len(suffix)] + suffix
+        if candidate.lower() not in existing:
+            return candidate
+        index += 1
+
+
+def _is_missing(value):
+    """单元格值是否为缺失值（写为空单元格）"""
+    if value is None:
+        return True
+    if isinstance(value, (float, np.floating)):
+        return not np.isfinite(value)
+    return value is pd.NA or value is pd.NaT
+
+
+def _column_values(series):
+    """
+    整列转换为Python值列表，缺失值和非有限浮点数为None（空单元格）
+
+    Returns:
+        list: 与行对应的单元格值
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biu':
+        return series.tolist()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+        numbers = series.to_numpy()
+        values = numbers.astype(object)
+        values[~np.isfinite(numbers)] = None
+        return values.tolist()
+    values = series.to_numpy(dtype=object)
+    return [None if _is_missing(value) else value for value in values]
+
+
+class SheetWriter:
+    """流式工作表（openpyxl只写工作表），带格式的列使用同一个样式"""
+
+    def __init__(self, workbook, title, columns, column_formats=None):
+        """
+        Args:
+            workbook: 所属的 StreamingWorkbook
+            title: 工作表名称
+            columns: 列名列表（用于按列名定位格式）
+            column_formats: {列名: 数字格式}
+        """
+        self.title = title
+        self.rows_written = 0
+        self.max_column = 0
+        self._worksheet = workbook._workbook.create_sheet(title)
+        self._styles = {}
+        for position, column in enumerate(columns):
+            number_format = (column_formats or {}).get(column)
+            if number_format:
+                template = WriteOnlyCell(self._worksheet)
+                template.number_format = number_format
+                self._styles[position] = template._style
+
+    def _styled_cell(self, value, style):
+        cell = WriteOnlyCell(self._worksheet, value)
+        cell._style = copy(style)
+        return cell
+
+    def _append_values(self, values, styled=True):
+        """写入一行已转换的值（None为空单元格）"""
+        if styled and self._styles:
+            values = list(values)
+            for position, style in self._styles.items():
+                if position < len(values) and values[position] is not None:
+                    values[position] = self._styled_cell(values[position], style)
+        self._worksheet.append(values)
+        self.rows_written += 1
+        self.max_column = max(self.max_column, len(values))
+
+    def append(self, row, styled=True):
+        """
+        写入一行
+
+        Args:
+            row: 单元格值序列，None和缺失值为空单元格
+            styled: 是否应用列格式（标题行不应用）
+        """
+        self._append_values([None if _is_missing(value) else value for value in row], styled)
+
+    def append_rows(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def write_dataframe(self, df, header=True, replace_unsupported=True):
+        """
+        写入DataFrame（写入前整表清理一次特殊字符，按块整列转换后逐行追加）
+
+        Args:
+            df: 数据
+            header: 是否写入标题行（标题行不应用数字格式）
+            replace_unsupported: 同 sanitize_dataframe
+        """
+        clean = sanitize_dataframe(df, replace_unsupported)
+        if header:
+            self.append(list(clean.columns), styled=False)
+
+        chunk_rows = max(1, getattr(config, 'EXCEL_WRITE_CHUNK_ROWS', 50000))
+        for start in range(0, len(clean), chunk_rows):
+            chunk = clean.iloc[start:start + chunk_rows]
+            columns = [_column_values(chunk.iloc[:, position]) for position in range(chunk.shape[1])]
+            for values in zip(*columns) if columns else ([] for _ in range(len(chunk))):
+                self._append_values(values)
+        self.max_column = max(self.max_column, clean.shape[1])
+
+    def add_conditional_format(self, cell_range, operator, formula, fill_color=None, font_color=None):
+        """
+        添加单元格值条件格式（如负数标红）
+
+        Args:
+            cell_range: 单元格范围，如 'N2:N20'
+            operator: lessThan / greaterThan / equal 等
+            formula: 比较值，如 '0'
+            fill_color / font_color: RGB颜色，如 'FFCCCC'
+        """
+        fill = PatternFill(start_color=f"FF{fill_color}", end_color=f"FF{fill_color}", fill_type='solid') if fill_color else None
+        font = Font(color=f"FF{font_color}") if font_color else None
+        self._worksheet.conditional_formatting.add(
+            cell_range, CellIsRule(operator=operator, formula=[str(formula)], fill=fill, font=font))
+
+
+class StreamingWorkbook:
+    """流式Excel工作簿（openpyxl只写模式，保存时按创建顺序写出各工作表）"""
+
+    def __init__(self):
+        self.sheets = []
+        self._workbook = Workbook(write_only=True)
+
+    def add_sheet(self, title, columns=(), column_formats=None):
+        """创建工作表，返回 SheetWriter（名称与已有工作表重复时按 unique_sheet_title 改名，见 sheet.title）"""
+        title = unique_sheet_title(title, [sheet.title for sheet in self.sheets])
+        sheet = SheetWriter(self, title, list(columns), column_formats)
+        self.sheets.append(sheet)
+        return sheet
+
+    def add_dataframe_sheet(self, title, df, column_formats=None, replace_unsupported=True):
+        """创建工作表并写入DataFrame（含标题行）"""
+        sheet = self.add_sheet(title, df.columns, column_formats)
+        sheet.write_dataframe(df, replace_unsupported=replace_unsupported)
+        return sheet
+
+    @property
+    def sheet_count(self):
+        return len(self.sheets)
+
+    def save(self, filepath):
+        """保存xlsx文件（先写临时文件再替换，失败时不留下不完整的文件）"""
+        if not self.sheets:
+            self.add_sheet("Sheet")
+
+        tmp_path = f"{filepath}.tmp"
+        try:
+            self._workbook.save(tmp_path)
+            shutil.move(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def write_dataframe_workbook(df, filepath, sheet_name, column_formats=None, replace_unsupported=True):
+    """把单个DataFrame写成只有一个工作表的Excel文件"""
+    workbook = StreamingWorkbook()
+    workbook.add_dataframe_sheet(sheet_name, df, column_formats, replace_unsupported)
+    workbook.save(filepath)
+    return filepath
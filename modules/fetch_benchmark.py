@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+获取性能基准测试模块
+在本地Involve Asia模拟服务器上运行同步客户端、异步客户端及各获取模式，
+报告 pages/sec、页面延迟 p50/p95/p99、重试次数和峰值RSS，
+用于离线调优并发参数而不消耗生产账户的API配额
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import psutil
+from utils.logger import print_step
+import config
+from modules.involve_asia_api import InvolveAsiaAPI
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from modules.conversion_spool import ConversionSpool
+from modules.mock_involve_server import MockServerProcess
+from modules.rate_limiter import get_rate_limiter, reset_rate_limiters
+from modules.page_size_probe import reset_page_size_cache
+from modules.token_cache import reset_token_cache
+
+
+def _fetch_sync(start_date, end_date):
+    with InvolveAsiaAPI() as api:
+        if not api.authenticate():
+            return None
+        return api.get_conversions(start_date, end_date)
+
+
+def _fetch_async(start_date, end_date):
+    api = AsyncInvolveAsiaAPI()
+
+    async def fetch():
+        if not await api.authenticate():
+            return None
+        return await api.get_conversions_async(start_date, end_date)
+
+    return asyncio.run(fetch())
+
+
+def _fetch_async_stream(start_date, end_date):
+    api = AsyncInvolveAsiaAPI()
+
+    async def fetch():
+        if not await api.authenticate():
+            return None
+        with tempfile.TemporaryDirectory() as spool_dir:
+            with ConversionSpool(path=os.path.join(spool_dir, "benchmark.ndjson")) as spool:
+                result = await api.get_conversions_async(start_date, end_date, spool=spool)
+                if result:
+                    # 在spool删除前统计记录数
+                    result['data']['data'] = [None] * len(result['data']['data'])
+                return result
+
+    return asyncio.run(fetch())
+
+
+# 基准测试模式: 名称 -> (说明, 获取函数, 临时覆盖的配置)
+BENCHMARK_MODES = {
+    'sync': ("同步客户端 (requests.Session)", _fetch_sync, {}),
+    'async-fixed': ("异步客户端，固定并发，不分片", _fetch_async,
+                    {'ADAPTIVE_CONCURRENCY_ENABLED': False, 'DATE_SHARDING_ENABLED': False}),
+    'async-adaptive': ("异步客户端，AIMD自适应并发，不分片", _fetch_async,
+                       {'ADAPTIVE_CONCURRENCY_ENABLED': True, 'DATE_SHARDING_ENABLED': False}),
+    'async-sharded': ("异步客户端，AIMD自适应并发，按日期分片", _fetch_async,
+                      {'ADAPTIVE_CONCURRENCY_ENABLED': True, 'DATE_SHARDING_ENABLED': True}),
+    'async-stream': ("异步客户端，分片 + spool落盘", _fetch_async_stream,
+                     {'ADAPTIVE_CONCURRENCY_ENABLED': True, 'DATE_SHARDING_ENABLED': True}),
+    'async-hedged': ("异步客户端，分片 + p95请求对冲", _fetch_async,
+                     {'ADAPTIVE_CONCURRENCY_ENABLED': True, 'DATE_SHARDING_ENABLED': True,
+                      'HEDGED_REQUESTS_ENABLED': True}),
+}
+
+
+class PeakRSSSampler:
+    """后台线程定期采样当前进程RSS，记录峰值"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = self.process.memory_info().rss
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            self._stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop_event.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+
+class _PageLatencyRecorder:
+    """临时包装两个客户端的单页请求方法，记录每页耗时（包含重试）"""
+
+    def __init__(self):
+        self.latencies = []
+        self._originals = {}
+
+    def __enter__(self):
+        recorder = self
+        sync_original = InvolveAsiaAPI._handle_page_request
+        async_original = AsyncInvolveAsiaAPI._make_single_request
+        self._originals = {'sync': sync_original, 'async': async_original}
+
+        def timed_sync(api, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return sync_original(api, *args, **kwargs)
+            finally:
+                recorder.latencies.append(time.perf_counter() - start)
+
+        async def timed_async(api, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await async_original(api, *args, **kwargs)
+            finally:
+                recorder.latencies.append(time.perf_counter() - start)
+
+        InvolveAsiaAPI._handle_page_request = timed_sync
+        AsyncInvolveAsiaAPI._make_single_request = timed_async
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        InvolveAsiaAPI._handle_page_request = self._originals['sync']
+        AsyncInvolveAsiaAPI._make_single_request = self._originals['async']
+
+
+def percentile(values, pct):
+    """线性插值百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_benchmark(modes=None, start_date="2025-06-01", end_date="2025-06-07", mock_settings=None,
+                  config_overrides=None):
+    """
+    在模拟服务器上运行基准测试
+
+    Args:
+        modes: 要运行的模式列表，默认运行全部 BENCHMARK_MODES
+        start_date: 开始日期
+        end_date: 结束日期
+        mock_settings: 模拟服务器设置（见 DEFAULT_MOCK_SETTINGS）
+        config_overrides: 所有模式共用的配置覆盖（如 MAX_CONCURRENT_REQUESTS、REQUEST_TIMEOUT）
+
+    Returns:
+        list: 每个模式的结果字典
+    """
+    modes = modes or list(BENCHMARK_MODES)
+    results = []
+
+    with MockServerProcess(settings=mock_settings) as server, tempfile.TemporaryDirectory() as cache_dir:
+        print_step("基准测试", f"模拟服务器已启动: {server.base_url}")
+        base_overrides = {
+            'INVOLVE_ASIA_AUTH_URL': f"{server.base_url}/authenticate",
+            'INVOLVE_ASIA_CONVERSIONS_URL': f"{server.base_url}/conversions/range",
+            'RESOURCE_MONITOR_ENABLED': False,
+            'MAX_RECORDS_LIMIT': None,
+            'TOKEN_CACHE_BACKEND': "memory",  # 模拟服务器的token不写入本地缓存文件
+            **(config_overrides or {})
+        }
+
+        for mode in modes:
+            description, fetch, mode_overrides = BENCHMARK_MODES[mode]
+            overrides = {**base_overrides, **mode_overrides}
+            saved = {key: getattr(config, key, None) for key in overrides}
+            for key, value in overrides.items():
+                setattr(config, key, value)
+
+            # 每个模式使用独立的页面大小缓存，都从探测开始
+            saved.setdefault('PAGE_SIZE_CACHE_PATH', config.PAGE_SIZE_CACHE_PATH)
+            config.PAGE_SIZE_CACHE_PATH = os.path.join(cache_dir, f"page_size_{mode}.json")
+
+            print_step("基准测试", f"运行模式 {mode}: {description}")
+            server.reset_stats()
+            reset_rate_limiters()
+            reset_page_size_cache()
+            reset_token_cache()
+            try:
+                with PeakRSSSampler() as sampler, _PageLatencyRecorder() as recorder:
+                    started = time.perf_counter()
+                    data = fetch(start_date, end_date)
+                    elapsed = time.perf_counter() - started
+            finally:
+                for key, value in saved.items():
+                    setattr(config, key, value)
+
+            server_stats = server.get_stats()
+            rate_stats = get_rate_limiter(base_overrides['INVOLVE_ASIA_CONVERSIONS_URL']).get_stats()
+            records = len(data['data']['data']) if data else 0
+            hedge_stats = data['data'].get('hedge_stats', {}) if data else {}
+            page_size = data['data'].get('limit') if data else None
+            pages = server_stats['pages_served']
+            results.append({
+                'mode': mode,
+                'description': description,
+                'elapsed_seconds': round(elapsed, 3),
+                'records': records,
+                'pages': pages,
+                'pages_per_second': round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+                'latency_p50_ms': round(percentile(recorder.latencies, 50) * 1000, 1),
+                'latency_p95_ms': round(percentile(recorder.latencies, 95) * 1000, 1),
+                'latency_p99_ms': round(percentile(recorder.latencies, 99) * 1000, 1),
+                'requests': server_stats['conversion_requests'],
+                'retries': max(0, server_stats['conversion_requests'] - pages),
+                'rate_limited': server_stats['rate_limited'],
+                'timeouts_injected': server_stats['timeouts_injected'],
+                'peak_server_in_flight': server_stats['peak_in_flight'],
+                'rate_limit_throttled': rate_stats['throttled'],
+                'rate_limit_wait_seconds': rate_stats['total_wait_seconds'],
+                'hedges_issued': hedge_stats.get('hedges_issued', 0),
+                'hedges_won': hedge_stats.get('hedges_won', 0),
+                'page_size': page_size,
+                'peak_rss_mb': round(sampler.peak_rss / 1024 / 1024, 1)
+            })
+
+    return results
+
+
+def print_benchmark_report(results):
+    """打印基准测试结果表格"""
+    print(f"\n{'='*110}")
+    print("📊 获取性能基准测试结果 (本地模拟服务器)")
+    print(f"{'='*110}")
+    header = f"{'模式':<16}{'耗时(s)':>9}{'记录数':>9}{'页数':>7}{'pages/s':>9}{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}{'重试':>6}{'429':>6}{'峰值并发':>9}{'峰值RSS(MB)':>12}"
+    print(header)
+    print('-' * 110)
+    for result in results:
+        print(f"{result['mode']:<16}{result['elapsed_seconds']:>9.2f}{result['records']:>9}{result['pages']:>7}"
+              f"{result['pages_per_second']:>9.2f}{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}"
+              f"{result['latency_p99_ms']:>9.1f}{result['retries']:>6}{result['rate_limited']:>6}"
+              f"{result['peak_server_in_flight']:>9}{result['peak_rss_mb']:>12.1f}")
+    print(f"{'='*110}\n")
+
+
+def save_benchmark_report(results, path):
+    """保存基准测试结果为JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print_step("基准测试", f"结果已保存到: {path}")
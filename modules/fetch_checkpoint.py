@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+可续传获取检查点模块
+流式获取时每完成（或跳过）一页就写入检查点文件，记录各日期分片的总数、
+已完成页面、跳过页面以及spool路径（token由token缓存管理，不写入检查点）；使用 --resume 重跑时只获取缺失的页面，
+并追加写入原来的spool文件
+"""
+
+import json
+import os
+from datetime import datetime
+from utils.logger import print_step
+from modules.conversion_spool import ConversionSpool
+import config
+
+
+def shard_key(start_date, end_date):
+    """日期分片在检查点中的键"""
+    return f"{start_date}~{end_date}"
+
+
+class FetchCheckpoint:
+    """单个API账户 + 日期范围 + 货币的获取检查点"""
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+
+    @staticmethod
+    def path_for(api_name, start_date, end_date, currency=None):
+        """检查点文件路径（同一账户、日期范围和货币的重跑使用同一个文件）"""
+        currency = currency or config.PREFERRED_CURRENCY
+        checkpoint_dir = getattr(config, 'CHECKPOINT_DIR', os.path.join(config.TEMP_DIR, "checkpoints"))
+        return os.path.join(checkpoint_dir, f"checkpoint_{api_name or 'default'}_{start_date}_{end_date}_{currency}.json")
+
+    @classmethod
+    def open(cls, api_name, start_date, end_date, currency=None, resume=False):
+        """
+        打开检查点：resume时加载已有检查点（且其spool文件仍存在），否则新建
+
+        Returns:
+            FetchCheckpoint
+        """
+        currency = currency or config.PREFERRED_CURRENCY
+        path = cls.path_for(api_name, start_date, end_date, currency)
+
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('spool_path') and os.path.exists(state['spool_path']):
+                checkpoint = cls(path, state)
+                print_step("检查点续传", f"{api_name or ''} 从检查点续传: 已完成 {checkpoint.pages_done_count} 页，"
+                                      f"缺失/跳过 {len(checkpoint.missing_pages())} 页 ({path})")
+                return checkpoint
+            print_step("检查点续传", f"检查点的spool文件不存在，重新获取: {path}")
+        elif resume:
+            print_step("检查点续传", f"没有找到检查点，重新获取: {path}")
+
+        return cls(path, {
+            'api_name': api_name,
+            'start_date': start_date,
+            'end_date': end_date,
+            'currency': currency,
+            'spool_path': None,
+            'shards': {},
+            'completed': False,
+            'updated_at': None
+        })
+
+    @property
+    def spool_path(self):
+        return self.state.get('spool_path')
+
+    @property
+    def shard_ranges(self):
+        """检查点中记录的日期分片 [(start, end), ...]"""
+        return [tuple(key.split('~')) for key in self.state['shards']]
+
+    @property
+    def pages_done_count(self):
+        return sum(len(shard['done']) for shard in self.state['shards'].values())
+
+    @property
+    def total_count(self):
+        return sum(shard.get('count') or 0 for shard in self.state['shards'].values())
+
+    def bind(self, spool_path=None, shards=None):
+        """
+        记录spool路径和日期分片（已有分片信息保留）
+        检查点已记录分片时，本次的分片计划必须与之相同，否则新分片会重新获取已写入spool的记录
+
+        Raises:
+            ValueError: 分片计划与检查点中记录的不一致
+        """
+        recorded = self.shard_ranges
+        requested = [tuple(shard) for shard in shards or []]
+        if recorded and requested and sorted(requested) != sorted(recorded):
+            raise ValueError(f"检查点的日期分片 {recorded} 与本次获取的分片 {requested} 不一致，"
+                             f"请使用与上次相同的获取模式（同步/异步）和分片设置续传，或不使用 --resume 重新获取: {self.path}")
+        if spool_path:
+            self.state['spool_path'] = spool_path
+        for start_date, end_date in shards or []:
+            self._shard(start_date, end_date)
+        self.save()
+
+    def shard_total_pages(self, start_date, end_date):
+        """分片总页数，第一页尚未成功获取时返回None"""
+        return self._shard(start_date, end_date).get('total_pages')
+
+    def shard_page_limit(self, start_date, end_date):
+        """分片第一页确认的页面大小（续传时后续页面必须使用同一limit）"""
+        return self._shard(start_date, end_date).get('page_limit') or config.DEFAULT_PAGE_LIMIT
+
+    def set_shard_total(self, start_date, end_date, count, total_pages, page_limit=None):
+        shard = self._shard(start_date, end_date)
+        shard['count'] = count
+        shard['total_pages'] = total_pages
+        if page_limit:
+            shard['page_limit'] = page_limit
+
+    def is_done(self, start_date, end_date, page):
+        return page in self._shard(start_date, end_date)['done']
+
+    def mark_done(self, start_date, end_date, page):
+        """标记页面已完成（数据已写入spool后调用）并保存检查点"""
+        shard = self._shard(start_date, end_date)
+        if page not in shard['done']:
+            shard['done'].append(page)
+        if page in shard['skipped']:
+            shard['skipped'].remove(page)
+        self.save()
+
+    def mark_skipped(self, start_date, end_date, page):
+        """标记页面重试后仍失败并保存检查点"""
+        shard = self._shard(start_date, end_date)
+        if page not in shard['skipped']:
+            shard['skipped'].append(page)
+        self.save()
+
+    def missing_pages(self):
+        """
+        获取缺失的页面 [(shard_start, shard_end, page), ...]
+        第一页未成功的分片返回第1页（总页数需要第一页确定）
+        """
+        missing = []
+        for key, shard in self.state['shards'].items():
+            start_date, end_date = key.split('~')
+            total_pages = shard.get('total_pages')
+            if total_pages is None:
+                missing.append((start_date, end_date, 1))
+                continue
+            done = set(shard['done'])
+            missing.extend((start_date, end_date, page) for page in range(1, total_pages + 1) if page not in done)
+        return missing
+
+    def finish(self):
+        """获取结束：没有缺失页面时标记为完成"""
+        self.state['completed'] = not self.missing_pages()
+        self.save()
+        if self.state['completed']:
+            print_step("检查点", f"获取完成，检查点已标记完成: {self.path}")
+        else:
+            print_step("检查点", f"仍有 {len(self.missing_pages())} 页缺失，可使用 --resume 续传: {self.path}")
+
+    def save(self):
+        """原子写入检查点文件"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.state['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _shard(self, start_date, end_date):
+        return self.state['shards'].setdefault(shard_key(start_date, end_date), {
+            'count': None,
+            'total_pages': None,
+            'done': [],
+            'skipped': []
+        })
+
+
+def open_checkpointed_spool(api_name, start_date, end_date, currency=None, resume=False):
+    """
+    打开检查点及其spool：续传时追加写入检查点记录的spool，否则新建spool。
+    有记录数限制（MAX_RECORDS_LIMIT）时按顺序从第1页获取，不能按检查点续传，重新获取以免spool中的记录重复
+
+    Returns:
+        tuple: (ConversionSpool, FetchCheckpoint)
+    """
+    if resume and config.MAX_RECORDS_LIMIT is not None:
+        print_step("检查点续传", f"⚠️ {api_name or ''} 设置了记录数限制，不使用检查点续传，重新获取")
+        resume = False
+    checkpoint = FetchCheckpoint.open(api_name, start_date, end_date, currency, resume=resume)
+    spool = ConversionSpool(path=checkpoint.spool_path, label=api_name)
+    checkpoint.bind(spool_path=spool.path)
+    return spool, checkpoint
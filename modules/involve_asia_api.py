@@ -6,15 +6,20 @@ Involve Asia API 模块
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import psutil
-import threading
 import os
 import sys
-import socket
 from datetime import datetime
 from utils.logger import print_step
+from modules.conversion_archive import save_conversions
+from modules.rate_limiter import get_rate_limiter, print_rate_limit_stats
+from modules.resource_sampler import get_resource_sampler, check_connectivity, is_data_output_file
+from modules.record_projection import get_record_projector
+from modules.page_size_probe import PageSizeTuner
+from modules.token_cache import get_token_cache, token_key, token_preview
 import config
 
 class ResourceMonitor:
@@ -23,6 +28,9 @@ class ResourceMonitor:
     def __init__(self):
         self.start_time = time.time()
         self.initial_memory = self.get_memory_usage()
+        # 启动进程级后台资源采样器
+        if getattr(config, 'RESOURCE_MONITOR_ENABLED', True):
+            get_resource_sampler()
         
     def get_memory_usage(self):
         """获取内存使用情况"""
@@ -78,7 +86,7 @@ class ResourceMonitor:
             return {'error': str(e)}
     
     def get_json_files_info(self, output_dir=None):
-        """获取JSON文件大小信息"""
+        """获取转换数据文件（JSON/Parquet）大小信息"""
         if output_dir is None:
             output_dir = config.OUTPUT_DIR
         
@@ -88,7 +96,7 @@ class ResourceMonitor:
         try:
             if os.path.exists(output_dir):
                 for file in os.listdir(output_dir):
-                    if file.endswith('.json'):
+                    if is_data_output_file(file):
                         file_path = os.path.join(output_dir, file)
                         file_size = os.path.getsize(file_path) / 1024 / 1024  # MB
                         json_files.append({
@@ -116,15 +124,17 @@ class ResourceMonitor:
     
     def check_connectivity(self, host='8.8.8.8', port=53, timeout=5):
         """检查网络连接"""
-        try:
-            socket.setdefaulttimeout(timeout)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-            return True
-        except socket.error:
-            return False
+        return check_connectivity(host, port, timeout)
     
     def print_resource_status(self, prefix="", show_details=True):
-        """打印完整的资源使用状态"""
+        """打印最新的后台资源样本（只读取采样器缓冲区，不在请求路径上执行探测）"""
+        if not getattr(config, 'RESOURCE_MONITOR_ENABLED', True):
+            return
+        
+        sampler = get_resource_sampler()
+        sampler.record_event(prefix)
+        sample = sampler.latest()
+        
         print(f"\n{'='*60}")
         print(f"🔍 {prefix} 系统资源监控报告")
         print(f"{'='*60}")
@@ -133,46 +143,39 @@ class ResourceMonitor:
         runtime = self.get_runtime_info()
         print(f"⏱️  运行时间: {runtime['runtime_formatted']}")
         
-        # 内存使用
-        memory = self.get_memory_usage()
-        if 'error' not in memory:
-            print(f"💾 内存使用: {memory['rss']:.1f}MB (RSS), {memory['vms']:.1f}MB (VMS), {memory['percent']:.1f}%")
-        else:
-            print(f"💾 内存使用: 获取失败 - {memory['error']}")
+        if sample is None:
+            print("📡 后台采样器尚未完成首次采样")
+            print(f"{'='*60}\n")
+            return
         
-        # CPU使用
-        cpu = self.get_cpu_usage()
-        if 'error' not in cpu:
-            print(f"⚡ CPU使用: 进程 {cpu['process_cpu']:.1f}%, 系统 {cpu['system_cpu']:.1f}% (共{cpu['cpu_count']}核)")
-        else:
-            print(f"⚡ CPU使用: 获取失败 - {cpu['error']}")
+        sample_age = time.time() - sample['timestamp']
+        print(f"📡 最新样本: {sample_age:.1f} 秒前 (采样间隔 {sampler.interval} 秒)")
         
-        # 网络信息
-        network = self.get_network_info()
-        if 'error' not in network:
-            print(f"🌐 网络连接: {network['established_connections']}/{network['total_connections']} (已建立/总数)")
-            connectivity = self.check_connectivity()
-            print(f"🌐 网络连通性: {'✅ 正常' if connectivity else '❌ 异常'}")
+        # 内存使用
+        if 'error' not in sample:
+            print(f"💾 内存使用: {sample['rss_mb']:.1f}MB (RSS), {sample['vms_mb']:.1f}MB (VMS), {sample['memory_percent']:.1f}%")
+            print(f"⚡ CPU使用: 进程 {sample['process_cpu']:.1f}%, 系统 {sample['system_cpu']:.1f}% (共{sample['cpu_count']}核)")
         else:
-            print(f"🌐 网络信息: 获取失败 - {network['error']}")
+            print(f"💾 内存/CPU: 获取失败 - {sample['error']}")
         
-        # 磁盘使用
-        disk = self.get_disk_usage()
-        if 'error' not in disk:
-            print(f"💿 磁盘使用: {disk['used']:.1f}GB/{disk['total']:.1f}GB ({disk['percent']:.1f}%)")
+        # 网络信息
+        if 'network_error' not in sample:
+            print(f"🌐 网络连接: {sample['established_connections']}/{sample['total_connections']} (已建立/总数)")
+            if sample['connectivity'] is not None:
+                print(f"🌐 网络连通性: {'✅ 正常' if sample['connectivity'] else '❌ 异常'}")
         else:
-            print(f"💿 磁盘使用: 获取失败 - {disk['error']}")
+            print(f"🌐 网络信息: 获取失败 - {sample['network_error']}")
         
-        # JSON文件信息
-        json_info = self.get_json_files_info()
-        if 'error' not in json_info:
-            print(f"📄 JSON文件: {json_info['count']} 个文件, 总大小 {json_info['total_size_mb']:.1f}MB")
-            if show_details and json_info['files']:
+        # 磁盘使用和JSON文件信息
+        if 'disk_error' not in sample:
+            print(f"💿 磁盘使用: {sample['disk_used_gb']:.1f}GB/{sample['disk_total_gb']:.1f}GB ({sample['disk_percent']:.1f}%)")
+            print(f"📄 JSON/Parquet文件: {sample['json_files']} 个文件, 总大小 {sample['json_files_mb']:.1f}MB")
+            if show_details and sample['json_files_latest']:
                 print("   详细信息:")
-                for file in json_info['files'][-3:]:  # 显示最新的3个文件
+                for file in sample['json_files_latest']:  # 显示最新的3个文件
                     print(f"     - {file['name']}: {file['size_mb']:.1f}MB")
         else:
-            print(f"📄 JSON文件: 获取失败 - {json_info['error']}")
+            print(f"💿 磁盘信息: 获取失败 - {sample['disk_error']}")
         
         print(f"{'='*60}\n")
 
@@ -188,8 +191,10 @@ class InvolveAsiaAPI:
         self.auth_url = config.INVOLVE_ASIA_AUTH_URL
         self.conversions_url = config.INVOLVE_ASIA_CONVERSIONS_URL
         
-        # 认证token
+        # 认证token（跨运行缓存，401时刷新）
         self.token = None
+        self.token_cache = get_token_cache()
+        self.token_key = token_key(self.api_key, self.api_secret, self.auth_url)
         
         # 资源监控器
         self.resource_monitor = ResourceMonitor()
@@ -197,13 +202,61 @@ class InvolveAsiaAPI:
         # 跳过的页面记录
         self.skipped_pages = []
         
-        # 请求超时设置
+        # 请求超时设置 - (连接超时, 读取超时)
         self.request_timeout = getattr(config, 'REQUEST_TIMEOUT', 30)
+        self.connect_timeout = getattr(config, 'REQUEST_CONNECT_TIMEOUT', 10)
+        self.timeout = (self.connect_timeout, self.request_timeout)
         self.max_retries = getattr(config, 'MAX_RETRY_ATTEMPTS', 5)
         self.request_delay = getattr(config, 'REQUEST_DELAY', 0.5)
+        
+        # 全局令牌桶限速器 - 与同一进程内的其他客户端按API主机共享
+        self.rate_limiter = get_rate_limiter(self.conversions_url)
+        
+        # 记录字段投影器 - 每页到达时投影为紧凑记录（未启用时原样保留）
+        self.projector = get_record_projector()
+        
+        # 页面大小 - 按账户探测并缓存API接受的最大limit，超时过多时减半
+        self.page_size = PageSizeTuner(self.api_secret, self.conversions_url)
+        
+        # 持久化会话 - keep-alive连接池，所有页面和重试复用同一组连接
+        self.session = self._create_session()
+    
+    def _create_session(self):
+        """创建带连接池的requests会话（重试由 _handle_page_request 自行处理）"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=getattr(config, 'HTTP_MAX_KEEPALIVE_CONNECTIONS', 10),
+            pool_maxsize=getattr(config, 'HTTP_MAX_CONNECTIONS', 20),
+            max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def close(self):
+        """关闭会话，释放连接池"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
     
-    def authenticate(self):
-        """执行API认证"""
+    def authenticate(self, force=False):
+        """
+        执行API认证：优先使用缓存中未过期的token
+        
+        Args:
+            force: 忽略缓存，重新请求token
+        """
+        if not force:
+            cached_token = self.token_cache.get(self.token_key)
+            if cached_token:
+                self.token = cached_token
+                print_step("认证成功", f"使用缓存Token: {token_preview(cached_token)}")
+                return True
+        
         print_step("认证步骤", "正在执行API认证...")
         
         headers = {"Accept": "application/json"}
@@ -213,11 +266,12 @@ class InvolveAsiaAPI:
         }
         
         try:
-            response = requests.post(
+            self.rate_limiter.acquire()
+            response = self.session.post(
                 self.auth_url, 
                 headers=headers, 
                 data=data, 
-                timeout=self.request_timeout
+                timeout=self.timeout
             )
             response.raise_for_status()
             
@@ -225,8 +279,8 @@ class InvolveAsiaAPI:
             
             if "data" in result and "token" in result["data"]:
                 self.token = result["data"]["token"]
-                token_preview = self.token[:8] + "..." if len(self.token) > 8 else self.token
-                print_step("认证成功", f"获得Token: {token_preview}")
+                self.token_cache.put(self.token_key, self.token, result["data"].get("expires_in"))
+                print_step("认证成功", f"获得Token: {token_preview(self.token)}")
                 return True
             else:
                 print_step("认证失败", f"响应结构不符合预期: {result}")
@@ -239,47 +293,26 @@ class InvolveAsiaAPI:
             print_step("认证失败", f"JSON解析错误: {str(e)}")
             return False
     
-    def _make_request_with_timeout(self, url, headers, data, timeout):
-        """使用超时机制发送请求"""
-        class RequestResult:
-            def __init__(self):
-                self.response = None
-                self.exception = None
-                self.completed = False
-        
-        result = RequestResult()
-        
-        def make_request():
-            try:
-                result.response = requests.post(url, headers=headers, data=data, timeout=timeout)
-                result.completed = True
-            except Exception as e:
-                result.exception = e
-                result.completed = True
-        
-        thread = threading.Thread(target=make_request)
-        thread.daemon = True
-        thread.start()
-        
-        # 等待请求完成或超时
-        thread.join(timeout + 5)  # 额外5秒缓冲
-        
-        if not result.completed:
-            print_step("请求超时", f"请求超时 ({timeout}s)，可能遇到网络问题")
-            # 显示资源状态
-            self.resource_monitor.print_resource_status("请求超时时")
-            raise requests.exceptions.Timeout(f"Request timed out after {timeout}s")
-        
-        if result.exception:
-            raise result.exception
-        
-        return result.response
+    def _refresh_token(self, headers):
+        """token被拒绝（401）：作废缓存并重新认证，更新请求头，返回是否成功"""
+        print_step("Token刷新", "Token已失效(401)，重新认证...")
+        self.token_cache.invalidate(self.token_key, self.token)
+        if not self.authenticate(force=True):
+            return False
+        headers["Authorization"] = f"Bearer {self.token}"
+        return True
     
-    def _handle_page_request(self, page, headers, data, api_label=""):
-        """处理单页请求，包含重试和跳过机制"""
+    def _handle_page_request(self, page, headers, data, api_label="", probe=False):
+        """
+        处理单页请求，包含重试和跳过机制
+        
+        Args:
+            probe: 页面大小探测请求，被拒绝（4xx/无data）或超时时立即返回失败，不重试
+        """
         max_retries = 5  # 用户要求的最大重试次数
         retry_count = 0
         page_success = False
+        token_refreshed = False
         
         while retry_count <= max_retries and not page_success:
             try:
@@ -288,12 +321,13 @@ class InvolveAsiaAPI:
                     print(f"   �� 第 {retry_count} 次重试，等待 {wait_time} 秒...")
                     time.sleep(wait_time)
                 
-                # 使用增强的请求方法
-                response = self._make_request_with_timeout(
+                # 通过持久化会话发送请求（连接/读取超时由requests直接控制）
+                self.rate_limiter.acquire()
+                response = self.session.post(
                     self.conversions_url, 
-                    headers, 
-                    data, 
-                    self.request_timeout
+                    headers=headers, 
+                    data=data, 
+                    timeout=self.timeout
                 )
                 
                 # 处理429错误(频率限制)
@@ -303,10 +337,21 @@ class InvolveAsiaAPI:
                     time.sleep(config.RATE_LIMIT_DELAY)
                     continue
                 
+                # token失效：每个页面最多刷新一次，刷新后立即重试（不计入重试次数）
+                if response.status_code == 401 and not token_refreshed:
+                    token_refreshed = True
+                    if self._refresh_token(headers):
+                        continue
+                
+                if probe and 400 <= response.status_code < 500:
+                    return None, False
+                
                 response.raise_for_status()
                 result = response.json()
                 
                 if "data" not in result:
+                    if probe:
+                        return None, False
                     print_step("数据获取失败", f"响应中没有data字段: {result}")
                     retry_count += 1
                     continue
@@ -317,6 +362,9 @@ class InvolveAsiaAPI:
                 
             except requests.exceptions.Timeout as e:
                 retry_count += 1
+                self.page_size.record_timeout(int(data["limit"]))
+                if probe:
+                    return None, False
                 print_step("请求超时", f"第{page}页请求超时（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
                     # 显示资源状态
@@ -346,8 +394,19 @@ class InvolveAsiaAPI:
         # 重试次数用完，返回失败
         return None, False
     
-    def get_conversions(self, start_date, end_date, currency=None, api_name=None):
-        """获取指定日期范围的所有conversion数据 - 增强版"""
+    def get_conversions(self, start_date, end_date, currency=None, api_name=None, spool=None, checkpoint=None,
+                        allow_empty=False):
+        """
+        获取指定日期范围的所有conversion数据 - 增强版
+        
+        Args:
+            spool: 可选的ConversionSpool，提供时每页数据直接追加写入磁盘，
+                   结果中的data为惰性SpoolReader而不是内存列表
+            checkpoint: 可选的FetchCheckpoint（需同时提供spool），每页完成后写入检查点，
+                        续传时跳过检查点中已完成的页面
+            allow_empty: 获取成功（没有跳过页面）但没有记录时返回空结果而不是None，
+                         供增量存储区分"获取失败"和"当天没有数据"
+        """
         if not self.token:
             print_step("数据获取失败", "没有有效的认证token")
             return None
@@ -365,6 +424,8 @@ class InvolveAsiaAPI:
         }
         
         all_conversions = []
+        # 续传时spool中已有的记录计入总数
+        records_collected = spool.record_count if spool is not None else 0
         page = 1
         total_count = 0
         total_pages = 0
@@ -372,29 +433,63 @@ class InvolveAsiaAPI:
         skipped_pages = []
         data_complete = False
         
+        # 页面大小由第一页确认，之后所有页面使用同一limit（续传时沿用检查点记录的limit）
+        page_limit = None
+        
+        if checkpoint is not None:
+            try:
+                checkpoint.bind(spool_path=spool.path, shards=[(start_date, end_date)])
+            except ValueError as e:
+                print_step("检查点续传失败", f"{api_label}{e}")
+                return None
+            total_pages = checkpoint.shard_total_pages(start_date, end_date) or 0
+            total_count = checkpoint.total_count
+            if total_pages:
+                page_limit = checkpoint.shard_page_limit(start_date, end_date)
+        
         while not data_complete:
+            # 续传：跳过检查点中已完成的页面
+            if checkpoint is not None and checkpoint.is_done(start_date, end_date, page):
+                if total_pages and page >= total_pages:
+                    break
+                page += 1
+                continue
+            
             page_label = f"{api_label}🔄 正在获取第 {page} 页数据..." if api_name else f"\n🔄 正在获取第 {page} 页数据..."
             print(page_label)
             
+            # 账户页面大小尚未探测时从最大候选值开始，被拒绝则减小后重新请求
+            probing = page_limit is None and self.page_size.probing
+            request_limit = page_limit or self.page_size.limit
             data = {
                 "page": str(page),
-                "limit": str(config.DEFAULT_PAGE_LIMIT),
+                "limit": str(request_limit),
                 "start_date": start_date,
                 "end_date": end_date,
                 "filters[preferred_currency]": currency
             }
             
             # 使用增强的请求处理方法
-            result, success = self._handle_page_request(page, headers, data, api_label)
+            result, success = self._handle_page_request(page, headers, data, api_label, probe=probing)
+            
+            if probing and not success:
+                self.page_size.reject(request_limit)
+                continue
             
             if success and result:
                 data_obj = result["data"]
                 
                 # 获取分页信息
                 if isinstance(data_obj, dict):
-                    page_data = data_obj.get("data", [])
+                    if page_limit is None:
+                        page_limit = self.page_size.confirm(request_limit, data_obj.get("limit"),
+                                                            rows=len(data_obj.get("data") or []),
+                                                            count=data_obj.get("count"))
+                        if page_limit is None:
+                            continue  # 页面大小被静默截断，按更小的页面大小重新请求第一页
+                    page_data = self.projector.project_page(data_obj.get("data", []))
                     current_page = data_obj.get("page", page)
-                    limit = data_obj.get("limit", config.DEFAULT_PAGE_LIMIT)
+                    limit = page_limit
                     total_count = data_obj.get("count", 0)
                     next_page = data_obj.get("nextPage")
                     
@@ -403,17 +498,29 @@ class InvolveAsiaAPI:
                         total_pages = (total_count + limit - 1) // limit
                     
                     pages_fetched += 1
-                    api_current_total = len(all_conversions) + len(page_data)
+                    api_current_total = records_collected + len(page_data)
                     
                     print(f"   {api_label}📊 第 {current_page} 页: 获取到 {len(page_data)} 条记录")
                     print(f"   {api_label}📈 进度: {current_page}/{total_pages} 页 ({api_current_total}/{total_count} 条)")
                     
-                    # 添加到总数据中
-                    all_conversions.extend(page_data)
-                    
                     # 检查是否超过记录数限制
-                    if config.MAX_RECORDS_LIMIT is not None and len(all_conversions) >= config.MAX_RECORDS_LIMIT:
-                        all_conversions = all_conversions[:config.MAX_RECORDS_LIMIT]
+                    limit_reached = False
+                    if config.MAX_RECORDS_LIMIT is not None and api_current_total >= config.MAX_RECORDS_LIMIT:
+                        page_data = page_data[:config.MAX_RECORDS_LIMIT - records_collected]
+                        limit_reached = True
+                    
+                    # 添加到总数据中（流式模式下直接写入spool）
+                    if spool is not None:
+                        spool.append_page(page_data)
+                    else:
+                        all_conversions.extend(page_data)
+                    records_collected += len(page_data)
+                    
+                    if checkpoint is not None:
+                        checkpoint.set_shard_total(start_date, end_date, total_count, total_pages, page_limit)
+                        checkpoint.mark_done(start_date, end_date, current_page)
+                    
+                    if limit_reached:
                         print(f"   {api_label}⏹️ 已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
                         data_complete = True
                         break
@@ -436,22 +543,31 @@ class InvolveAsiaAPI:
                     
                 else:
                     # 旧格式兼容
-                    page_data = result["data"] if isinstance(result["data"], list) else []
-                    all_conversions.extend(page_data)
+                    page_data = self.projector.project_page(result["data"] if isinstance(result["data"], list) else [])
+                    if spool is not None:
+                        spool.append_page(page_data)
+                    else:
+                        all_conversions.extend(page_data)
+                    records_collected += len(page_data)
                     pages_fetched += 1
+                    if checkpoint is not None:
+                        checkpoint.mark_done(start_date, end_date, page)
                     
-                    if len(page_data) < config.DEFAULT_PAGE_LIMIT:
+                    if len(page_data) < request_limit:
                         data_complete = True
                         break
                     page += 1
                 
-                # 添加延迟避免请求过快
-                time.sleep(self.request_delay)
+                # 添加延迟避免请求过快（启用全局限速时由令牌桶控制速率）
+                if not self.rate_limiter.enabled:
+                    time.sleep(self.request_delay)
                 
             else:
                 # 页面获取失败，记录跳过的页面
                 skipped_pages.append(page)
                 self.skipped_pages.append(page)
+                if checkpoint is not None:
+                    checkpoint.mark_skipped(start_date, end_date, page)
                 
                 print_step("页面跳过", f"❌ 第{page}页重试{self.max_retries}次后仍失败，跳过该页面继续获取下一页")
                 
@@ -469,24 +585,32 @@ class InvolveAsiaAPI:
         # 显示最终资源状态
         self.resource_monitor.print_resource_status(f"{api_label}数据获取完成")
         
-        if all_conversions:
+        if checkpoint is not None:
+            checkpoint.finish()
+        
+        print_rate_limit_stats(api_label)
+        
+        if records_collected or (allow_empty and pages_fetched and not skipped_pages):
             # 构造完整结果
             result = {
                 "status": "success",
                 "message": "Success",
                 "data": {
                     "page": 1,
-                    "limit": config.DEFAULT_PAGE_LIMIT,
+                    "limit": page_limit or self.page_size.limit,
                     "count": total_count,
                     "total_pages": total_pages,
                     "pages_fetched": pages_fetched,
                     "skipped_pages": skipped_pages,
-                    "current_page_count": len(all_conversions),
-                    "data": all_conversions
+                    "current_page_count": records_collected,
+                    "data": spool.reader() if spool is not None else all_conversions,
+                    "page_size_stats": self.page_size.get_stats()
                 }
             }
+            if spool is not None:
+                result["data"]["spool_path"] = spool.path
             
-            success_msg = f"{api_label}成功获取数据: {len(all_conversions)} 条转换记录，共 {pages_fetched} 页"
+            success_msg = f"{api_label}成功获取数据: {records_collected} 条转换记录，共 {pages_fetched} 页"
             if skipped_pages:
                 success_msg += f"，跳过 {len(skipped_pages)} 页: {skipped_pages}"
             
@@ -496,13 +620,13 @@ class InvolveAsiaAPI:
             print_step("数据获取失败", f"{api_label}没有获取到任何数据")
             return None
     
-    def get_conversions_default_range(self, currency=None):
+    def get_conversions_default_range(self, currency=None, spool=None):
         """使用默认日期范围获取数据"""
         start_date, end_date = config.get_default_date_range()
-        return self.get_conversions(start_date, end_date, currency)
+        return self.get_conversions(start_date, end_date, currency, spool=spool)
     
     def save_to_json(self, data, filename=None):
-        """保存数据到JSON文件"""
+        """保存转换数据到中间文件（Parquet或JSON，见 config.CONVERSION_SAVE_FORMAT）"""
         if not data:
             print_step("保存失败", "没有数据可保存")
             return None
@@ -516,8 +640,8 @@ class InvolveAsiaAPI:
         filepath = os.path.join(config.OUTPUT_DIR, filename)
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # 默认保存为压缩的Parquet中间文件（未安装pyarrow时为JSON）
+            filepath = save_conversions(data, filepath)
             
             print_step("JSON保存成功", f"数据已保存到: {filepath}")
             return filepath
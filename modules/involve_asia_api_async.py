@@ -11,6 +11,7 @@ import json
 import time
 import os
 import sys
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple, Any
 from utils.logger import print_step
@@ -18,11 +19,28 @@ import config
 
 # 重用现有的ResourceMonitor类
 from modules.involve_asia_api import ResourceMonitor
+from modules.conversion_spool import ConversionSpool
+from modules.conversion_archive import save_conversions
+from modules.conversion_store import ConversionStore, account_key
+from modules.concurrency_controller import AIMDConcurrencyController, create_concurrency_controller
+from modules.shard_planner import plan_date_shards, ConversionDeduplicator
+from modules.fetch_checkpoint import FetchCheckpoint, open_checkpointed_spool
+from modules.rate_limiter import get_rate_limiter, print_rate_limit_stats
+from modules.record_projection import get_record_projector
+from modules.page_pipeline import PagePipeline, PageNormalizer
+from modules.request_hedging import HedgePolicy, create_hedge_policy, run_hedged
+from modules.page_size_probe import PageSizeTuner
+from modules.token_cache import get_token_cache, token_key, token_preview
+
+def _noop():
+    """有序流水线中占位失败页面的序号"""
 
 class AsyncInvolveAsiaAPI:
     """Involve Asia API异步客户端"""
     
-    def __init__(self, api_secret=None, api_key=None):
+    def __init__(self, api_secret=None, api_key=None, client: Optional[httpx.AsyncClient] = None,
+                 concurrency: Optional[AIMDConcurrencyController] = None,
+                 hedging: Optional[HedgePolicy] = None):
         # 使用配置文件中的值或传入的值
         self.api_secret = api_secret or config.INVOLVE_ASIA_API_SECRET
         self.api_key = api_key or config.INVOLVE_ASIA_API_KEY
@@ -31,8 +49,11 @@ class AsyncInvolveAsiaAPI:
         self.auth_url = config.INVOLVE_ASIA_AUTH_URL
         self.conversions_url = config.INVOLVE_ASIA_CONVERSIONS_URL
         
-        # 认证token
+        # 认证token（跨运行缓存，401时刷新；并发页面同时遇到401时只刷新一次）
         self.token = None
+        self.token_cache = get_token_cache()
+        self.token_key = token_key(self.api_key, self.api_secret, self.auth_url)
+        self._refresh_lock = asyncio.Lock()
         
         # 资源监控器
         self.resource_monitor = ResourceMonitor()
@@ -45,9 +66,27 @@ class AsyncInvolveAsiaAPI:
         self.max_retries = getattr(config, 'MAX_RETRY_ATTEMPTS', 3)  # 减少重试次数，加快失败恢复
         self.request_delay = getattr(config, 'REQUEST_DELAY', 0.2)  # 减少请求间隔，提高速度
         
-        # 并发配置
+        # 并发配置 - AIMD自适应并发控制器（多账户模式下共享同一个并发预算）
         self.max_concurrent_requests = getattr(config, 'MAX_CONCURRENT_REQUESTS', 5)
-        self.semaphore = None
+        self.concurrency = concurrency or create_concurrency_controller(self.max_concurrent_requests)
+        
+        # 请求对冲策略 - 页面耗时超过p95时发送对冲请求（多账户模式下共享预算）
+        self.hedging = hedging or create_hedge_policy()
+        
+        # 全局令牌桶限速器 - 与同一进程内的其他客户端（包括其他账户和同步客户端）按API主机共享
+        self.rate_limiter = get_rate_limiter(self.conversions_url)
+        
+        # 页面大小 - 按账户探测并缓存API接受的最大limit，超时过多时减半
+        self.page_size = PageSizeTuner(self.api_secret, self.conversions_url)
+        
+        # 记录字段投影器 - 每页到达时投影为紧凑记录（未启用时原样保留）
+        self.projector = get_record_projector()
+        
+        # 页面规范化 - 金额数值化和可选的Partner标记，在页面流水线的消费者中执行
+        self.normalizer = PageNormalizer()
+        
+        # 多账户模式下共享的HTTP客户端（为None时每次请求自行创建）
+        self._shared_client = client
         
         # HTTP客户端配置
         self.client_config = {
@@ -60,8 +99,29 @@ class AsyncInvolveAsiaAPI:
             'follow_redirects': True
         }
     
-    async def authenticate(self) -> bool:
-        """执行API认证"""
+    @asynccontextmanager
+    async def _client_session(self):
+        """获取HTTP客户端：优先使用共享连接池，否则创建临时客户端"""
+        if self._shared_client is not None:
+            yield self._shared_client
+        else:
+            async with httpx.AsyncClient(**self.client_config) as client:
+                yield client
+    
+    async def authenticate(self, force: bool = False) -> bool:
+        """
+        执行API认证：优先使用缓存中未过期的token
+        
+        Args:
+            force: 忽略缓存，重新请求token
+        """
+        if not force:
+            cached_token = self.token_cache.get(self.token_key)
+            if cached_token:
+                self.token = cached_token
+                print_step("认证成功", f"使用缓存Token: {token_preview(cached_token)}")
+                return True
+        
         print_step("异步认证", "正在执行API认证...")
         
         headers = {"Accept": "application/json"}
@@ -71,7 +131,8 @@ class AsyncInvolveAsiaAPI:
         }
         
         try:
-            async with httpx.AsyncClient(**self.client_config) as client:
+            async with self._client_session() as client:
+                await self.rate_limiter.acquire_async()
                 response = await client.post(
                     self.auth_url,
                     headers=headers,
@@ -83,8 +144,8 @@ class AsyncInvolveAsiaAPI:
                 
                 if "data" in result and "token" in result["data"]:
                     self.token = result["data"]["token"]
-                    token_preview = self.token[:8] + "..." if len(self.token) > 8 else self.token
-                    print_step("认证成功", f"获得Token: {token_preview}")
+                    self.token_cache.put(self.token_key, self.token, result["data"].get("expires_in"))
+                    print_step("认证成功", f"获得Token: {token_preview(self.token)}")
                     return True
                 else:
                     print_step("认证失败", f"响应结构不符合预期: {result}")
@@ -100,10 +161,27 @@ class AsyncInvolveAsiaAPI:
             print_step("认证失败", f"未知错误: {str(e)}")
             return False
     
+    async def _refresh_token(self, stale_token: Optional[str]) -> bool:
+        """token被拒绝（401）：作废缓存并重新认证；其他页面已经刷新过时直接使用新token"""
+        async with self._refresh_lock:
+            if self.token != stale_token:
+                return True
+            print_step("Token刷新", "Token已失效(401)，重新认证...")
+            self.token_cache.invalidate(self.token_key, stale_token)
+            return await self.authenticate(force=True)
+    
     async def _make_single_request(self, client: httpx.AsyncClient, page: int, 
                                  start_date: str, end_date: str, currency: str,
-                                 api_label: str = "") -> Tuple[Optional[Dict], bool, int]:
-        """发送单个页面请求"""
+                                 api_label: str = "", limit: Optional[int] = None,
+                                 probe: bool = False) -> Tuple[Optional[Dict], bool, int]:
+        """
+        发送单个页面请求
+        
+        Args:
+            limit: 页面大小，默认为当前账户的页面大小
+            probe: 页面大小探测请求，被拒绝（4xx/无data）或超时时立即返回失败，不重试
+        """
+        limit = limit or self.page_size.limit
         headers = {
             "Accept": "application/json",
             "Authorization": f"Bearer {self.token}"
@@ -111,7 +189,7 @@ class AsyncInvolveAsiaAPI:
         
         data = {
             "page": str(page),
-            "limit": str(config.DEFAULT_PAGE_LIMIT),
+            "limit": str(limit),
             "start_date": start_date,
             "end_date": end_date,
             "filters[preferred_currency]": currency
@@ -119,42 +197,75 @@ class AsyncInvolveAsiaAPI:
         
         max_retries = self.max_retries
         retry_count = 0
+        rate_limit_wait = None
+        token_refreshed = False
         
         while retry_count <= max_retries:
             try:
-                if retry_count > 0:
+                if rate_limit_wait is not None:
+                    # 频率限制：在并发槽位之外等待，不占用并发预算
+                    print(f"   ⚠️  第{page}页遇到频率限制，等待{rate_limit_wait:.1f}秒后重试...")
+                    await asyncio.sleep(rate_limit_wait)
+                    rate_limit_wait = None
+                elif retry_count > 0:
                     wait_time = min(60, 10 * retry_count)
                     print(f"   🔄 第{page}页第{retry_count}次重试，等待{wait_time}秒...")
                     await asyncio.sleep(wait_time)
                 
-                # 使用信号量控制并发数量
-                async with self.semaphore:
-                    response = await client.post(
-                        self.conversions_url,
-                        headers=headers,
-                        data=data
+                # 先在并发槽位之外等待全局令牌，再使用自适应并发控制器控制并发数量
+                request_start = None
+                await self.rate_limiter.acquire_async()
+                async with self.concurrency.slot():
+                    request_start = time.monotonic()
+                    # 耗时超过p95时发送对冲请求，先返回者胜出（未启用或样本不足时只发送一次）
+                    response = await run_hedged(
+                        self.hedging,
+                        lambda: client.post(self.conversions_url, headers=headers, data=data),
+                        before_hedge=self.rate_limiter.acquire_async,
+                        is_success=lambda response: response.status_code < 400,  # 429/5xx响应不作为胜出结果
+                        hedge_slot=self.concurrency.slot  # 对冲请求同样占用并发槽位
                     )
                     
                     # 处理429错误(频率限制)
                     if response.status_code == 429:
                         retry_count += 1
-                        print(f"   ⚠️  第{page}页遇到频率限制，等待{config.RATE_LIMIT_DELAY}秒后重试...")
-                        await asyncio.sleep(config.RATE_LIMIT_DELAY)
+                        self.concurrency.record_overload("429频率限制", request_start)
+                        rate_limit_wait = self._get_rate_limit_wait(response, retry_count)
                         continue
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    if "data" not in result:
-                        print_step("数据获取失败", f"第{page}页响应中没有data字段: {result}")
-                        retry_count += 1
+                
+                # token失效：每个页面最多刷新一次，在并发槽位之外刷新后立即重试（不计入重试次数）
+                if response.status_code == 401 and not token_refreshed:
+                    token_refreshed = True
+                    stale_token = headers["Authorization"][len("Bearer "):]
+                    if await self._refresh_token(stale_token):
+                        headers["Authorization"] = f"Bearer {self.token}"
                         continue
-                    
-                    # 请求成功
-                    return result, True, page
-                    
+                
+                if probe and 400 <= response.status_code < 500:
+                    return None, False, page
+                
+                response.raise_for_status()
+                result = response.json()
+                
+                if "data" not in result:
+                    if probe:
+                        return None, False, page
+                    print_step("数据获取失败", f"第{page}页响应中没有data字段: {result}")
+                    retry_count += 1
+                    continue
+                
+                # 请求成功
+                latency = time.monotonic() - request_start
+                self.concurrency.record_success(latency)
+                self.hedging.record_latency(latency)
+                return result, True, page
+                
             except httpx.TimeoutException as e:
                 retry_count += 1
+                self.concurrency.record_overload("请求超时", request_start)
+                self.page_size.record_timeout(limit)
+                if probe:
+                    return None, False, page
                 print_step("请求超时", f"第{page}页请求超时（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
                     self.resource_monitor.print_resource_status(f"第{page}页超时重试{retry_count}")
@@ -184,23 +295,85 @@ class AsyncInvolveAsiaAPI:
         # 重试次数用完，返回失败
         return None, False, page
     
+    async def _fetch_first_page(self, client: httpx.AsyncClient, start_date: str, end_date: str,
+                                currency: str, api_label: str = "") -> Tuple[Optional[Dict], bool, int]:
+        """
+        获取日期范围的第一页并确定后续页面使用的limit
+        账户页面大小尚未探测时从最大候选值开始，被拒绝或被静默截断则逐级减小后重新请求
+        
+        Returns:
+            (结果, 是否成功, 后续页面使用的limit)
+        """
+        while True:
+            limit = self.page_size.limit
+            probing = self.page_size.probing
+            result, success, _ = await self._make_single_request(
+                client, 1, start_date, end_date, currency, api_label, limit=limit, probe=probing
+            )
+            if success:
+                data_obj = result["data"]
+                if not isinstance(data_obj, dict):
+                    return result, True, self.page_size.confirm(limit)
+                accepted = self.page_size.confirm(limit, data_obj.get("limit"),
+                                                  rows=len(data_obj.get("data") or []), count=data_obj.get("count"))
+                if accepted is not None:
+                    return result, True, accepted
+                continue  # 页面大小被静默截断，按更小的页面大小重新请求第一页
+            if not probing:
+                return None, False, limit
+            self.page_size.reject(limit)
+    
+    def _get_rate_limit_wait(self, response: httpx.Response, retry_count: int) -> float:
+        """
+        计算429后的等待时间：优先使用Retry-After响应头，
+        否则自适应模式下指数退避（上限RATE_LIMIT_DELAY），固定模式下等待RATE_LIMIT_DELAY
+        """
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), float(config.RATE_LIMIT_DELAY))
+            except ValueError:
+                pass
+        if self.concurrency.adaptive:
+            return min(float(config.RATE_LIMIT_DELAY), 2.0 ** (retry_count - 1))
+        return float(config.RATE_LIMIT_DELAY)
+    
     async def _fetch_pages_concurrently(self, pages: List[int], start_date: str, 
-                                      end_date: str, currency: str, api_label: str = "") -> List[Tuple]:
-        """并发获取多个页面"""
-        print_step("并发请求", f"{api_label}开始并发获取 {len(pages)} 页数据...")
+                                      end_date: str, currency: str, api_label: str = "",
+                                      pipeline: Optional[PagePipeline] = None,
+                                      on_page=None, seq_offset: int = 0,
+                                      limit: Optional[int] = None,
+                                      skipped_pages: Optional[List] = None) -> List[Tuple]:
+        """
+        并发获取多个页面
         
-        # 创建信号量控制并发数量
-        self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        Args:
+            limit: 页面大小（与第一页确认的limit一致）
+            pipeline: 可选的页面流水线，提供时每页完成后立即提交 on_page(result, page) 处理，
+                      按 seq_offset + 页面在pages中的位置保持顺序，返回值中不再保留页面数据
+            on_page: 配合pipeline使用的页面处理函数
+            skipped_pages: 可选的列表，失败的页码追加到其中（本次获取的跳过页面，与实例累计的分开）
+        """
+        print_step("并发请求", f"{api_label}开始并发获取 {len(pages)} 页数据...")
         
-        async with httpx.AsyncClient(**self.client_config) as client:
-            # 创建所有页面的请求任务
-            tasks = [
-                self._make_single_request(client, page, start_date, end_date, currency, api_label)
-                for page in pages
-            ]
+        async with self._client_session() as client:
+            async def fetch(index, page):
+                try:
+                    result = await self._make_single_request(client, page, start_date, end_date, currency, api_label,
+                                                             limit=limit)
+                except Exception as e:
+                    result = e
+                if pipeline is not None:
+                    # 页面完成后立即交给流水线处理，与其他在途请求重叠
+                    if not isinstance(result, Exception) and result[1]:
+                        await pipeline.submit(on_page, result[0], page, seq=seq_offset + index)
+                        result = (None, True, page)
+                    else:
+                        await pipeline.submit(_noop, seq=seq_offset + index)
+                return result
             
             # 并发执行所有请求
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            results = await asyncio.gather(*(fetch(index, page) for index, page in enumerate(pages)))
             
             # 处理结果
             successful_results = []
@@ -217,14 +390,29 @@ class AsyncInvolveAsiaAPI:
             
             if failed_pages:
                 self.skipped_pages.extend(failed_pages)
+                if skipped_pages is not None:
+                    skipped_pages.extend(failed_pages)
                 print_step("页面跳过", f"跳过失败页面: {failed_pages}")
             
             print_step("并发完成", f"{api_label}并发请求完成，成功: {len(successful_results)}, 失败: {len(failed_pages)}")
             return successful_results
     
     async def get_conversions_async(self, start_date: str, end_date: str, 
-                                  currency: Optional[str] = None, api_name: Optional[str] = None) -> Optional[Dict]:
-        """异步获取指定日期范围的所有conversion数据"""
+                                  currency: Optional[str] = None, api_name: Optional[str] = None,
+                                  spool: Optional[ConversionSpool] = None,
+                                  checkpoint: Optional[FetchCheckpoint] = None,
+                                  allow_empty: bool = False) -> Optional[Dict]:
+        """
+        异步获取指定日期范围的所有conversion数据
+        
+        Args:
+            spool: 可选的ConversionSpool，提供时每页数据直接追加写入磁盘，
+                   结果中的data为惰性SpoolReader而不是内存列表
+            checkpoint: 可选的FetchCheckpoint（需同时提供spool），每页完成后写入检查点，
+                        续传时只获取检查点中缺失的页面
+            allow_empty: 获取成功（没有跳过页面）但没有记录时返回空结果而不是None，
+                         供增量存储区分"获取失败"和"当天没有数据"
+        """
         if not self.token:
             print_step("数据获取失败", "没有有效的认证token")
             return None
@@ -236,38 +424,69 @@ class AsyncInvolveAsiaAPI:
         # 显示初始资源状态
         self.resource_monitor.print_resource_status(f"{api_label}异步数据获取开始")
         
+        # 较长的日期范围按日期分片获取（有记录数限制时保持按顺序分页获取）
+        # 使用检查点时统一走分片工作队列（未分片时为单个分片），续传沿用检查点中的分片
+        if config.MAX_RECORDS_LIMIT is None:
+            sharding_enabled = getattr(config, 'DATE_SHARDING_ENABLED', False)
+            shards = plan_date_shards(start_date, end_date) if sharding_enabled else [(start_date, end_date)]
+            if checkpoint is not None and spool is not None:
+                return await self._get_conversions_sharded(checkpoint.shard_ranges or shards, currency,
+                                                           api_label, spool, checkpoint, allow_empty)
+            if len(shards) > 1:
+                return await self._get_conversions_sharded(shards, currency, api_label, spool,
+                                                           allow_empty=allow_empty)
+        
         all_conversions = []
+        records_collected = 0
         total_count = 0
         total_pages = 0
         pages_fetched = 0
+        # 本次获取跳过的页面（同一客户端可能被多个日期并发调用，实例上的列表是累计的）
+        skipped_pages = []
+        
+        def collect(page_data):
+            """收集一页数据（流式模式下直接写入spool），返回是否已达到记录数限制"""
+            nonlocal records_collected
+            limit_reached = False
+            page_data = self.normalizer.normalize_page(self.projector.project_page(page_data))
+            if config.MAX_RECORDS_LIMIT is not None and records_collected + len(page_data) >= config.MAX_RECORDS_LIMIT:
+                page_data = page_data[:config.MAX_RECORDS_LIMIT - records_collected]
+                limit_reached = True
+            if spool is not None:
+                spool.append_page(page_data)
+            else:
+                all_conversions.extend(page_data)
+            records_collected += len(page_data)
+            return limit_reached
         
         # 步骤1: 获取第一页以确定总页数
         print_step("获取元数据", f"{api_label}获取第一页以确定总页数...")
         
-        first_page_results = await self._fetch_pages_concurrently(
-            [1], start_date, end_date, currency, api_label
-        )
+        async with self._client_session() as client:
+            first_result, first_success, limit = await self._fetch_first_page(
+                client, start_date, end_date, currency, api_label
+            )
         
-        if not first_page_results:
+        if not first_success:
+            self.skipped_pages.append(1)
+            skipped_pages.append(1)
             print_step("数据获取失败", f"{api_label}无法获取第一页数据")
             return None
         
-        first_result, _, _ = first_page_results[0]
         data_obj = first_result["data"]
         
         if isinstance(data_obj, dict):
             first_page_data = data_obj.get("data", [])
-            limit = data_obj.get("limit", config.DEFAULT_PAGE_LIMIT)
             total_count = data_obj.get("count", 0)
             
             # 计算总页数
             if total_count > 0:
                 total_pages = (total_count + limit - 1) // limit
             
-            all_conversions.extend(first_page_data)
+            collect(first_page_data)
             pages_fetched = 1
             
-            print_step("元数据获取", f"{api_label}总记录数: {total_count}, 总页数: {total_pages}")
+            print_step("元数据获取", f"{api_label}总记录数: {total_count}, 总页数: {total_pages}, 页面大小: {limit}")
             
             # 检查记录数限制
             if config.MAX_RECORDS_LIMIT is not None and total_count > config.MAX_RECORDS_LIMIT:
@@ -277,7 +496,7 @@ class AsyncInvolveAsiaAPI:
         else:
             # 旧格式兼容处理
             first_page_data = first_result["data"] if isinstance(first_result["data"], list) else []
-            all_conversions.extend(first_page_data)
+            collect(first_page_data)
             pages_fetched = 1
             total_pages = 10  # 默认假设有更多页面
         
@@ -294,68 +513,80 @@ class AsyncInvolveAsiaAPI:
                 print_step("并发策略", f"{api_label}将并发获取剩余 {len(remaining_pages)} 页数据")
                 
                 # 分批并发处理，避免一次性发送太多请求
-                batch_size = min(self.max_concurrent_requests * 2, 10)  # 每批最多10页
+                batch_size = max(min(self.max_concurrent_requests * 2, 10), self.concurrency.max_limit)  # 每批至少10页，自适应时覆盖并发上限
+                limit_reached = False
                 
-                for i in range(0, len(remaining_pages), batch_size):
-                    batch_pages = remaining_pages[i:i + batch_size]
-                    print_step("批次处理", f"{api_label}处理第 {i//batch_size + 1} 批，页面: {batch_pages}")
-                    
-                    batch_results = await self._fetch_pages_concurrently(
-                        batch_pages, start_date, end_date, currency, api_label
-                    )
-                    
-                    # 处理批次结果
-                    for result, success, page in batch_results:
-                        if success and result:
-                            data_obj = result["data"]
-                            
-                            if isinstance(data_obj, dict):
-                                page_data = data_obj.get("data", [])
-                                all_conversions.extend(page_data)
-                                pages_fetched += 1
-                                
-                                print(f"   {api_label}📊 第 {page} 页: 获取到 {len(page_data)} 条记录")
-                            else:
-                                # 旧格式兼容
-                                page_data = result["data"] if isinstance(result["data"], list) else []
-                                all_conversions.extend(page_data)
-                                pages_fetched += 1
-                    
-                    # 检查记录数限制
-                    if config.MAX_RECORDS_LIMIT is not None and len(all_conversions) >= config.MAX_RECORDS_LIMIT:
-                        all_conversions = all_conversions[:config.MAX_RECORDS_LIMIT]
-                        print_step("记录限制", f"{api_label}已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
-                        break
-                    
-                    # 批次间添加短暂延迟
-                    if i + batch_size < len(remaining_pages):
-                        await asyncio.sleep(self.request_delay)
+                def handle_page(result, page):
+                    """流水线消费者中按页码顺序处理一页（规范化、投影、写入spool或内存）"""
+                    nonlocal pages_fetched, limit_reached
+                    if limit_reached:
+                        return
+                    data_obj = result["data"]
+                    if isinstance(data_obj, dict):
+                        page_data = data_obj.get("data", [])
+                        limit_reached = collect(page_data)
+                        pages_fetched += 1
+                        print(f"   {api_label}📊 第 {page} 页: 获取到 {len(page_data)} 条记录")
+                    else:
+                        # 旧格式兼容
+                        page_data = result["data"] if isinstance(result["data"], list) else []
+                        limit_reached = collect(page_data)
+                        pages_fetched += 1
+                
+                # 每页完成后立即进入流水线处理，下一批请求与上一批的页面处理重叠
+                async with PagePipeline(ordered=True, label=api_label) as pipeline:
+                    for i in range(0, len(remaining_pages), batch_size):
+                        batch_pages = remaining_pages[i:i + batch_size]
+                        print_step("批次处理", f"{api_label}处理第 {i//batch_size + 1} 批，页面: {batch_pages}")
+                        
+                        await self._fetch_pages_concurrently(
+                            batch_pages, start_date, end_date, currency, api_label,
+                            pipeline=pipeline, on_page=handle_page, seq_offset=i, limit=limit,
+                            skipped_pages=skipped_pages
+                        )
+                        
+                        # 检查记录数限制（流水线处理可能滞后一批）
+                        if limit_reached:
+                            print_step("记录限制", f"{api_label}已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
+                            break
+                        
+                        # 批次间添加短暂延迟（启用全局限速时由令牌桶控制速率）
+                        if i + batch_size < len(remaining_pages) and not self.rate_limiter.enabled:
+                            await asyncio.sleep(self.request_delay)
         
         # 显示最终资源状态
         self.resource_monitor.print_resource_status(f"{api_label}异步数据获取完成")
         
-        if all_conversions:
+        if records_collected or (allow_empty and pages_fetched and not skipped_pages):
             # 构造完整结果
             result = {
                 "status": "success",
                 "message": "Success",
                 "data": {
                     "page": 1,
-                    "limit": config.DEFAULT_PAGE_LIMIT,
-                    "count": total_count or len(all_conversions),
+                    "limit": limit,
+                    "count": total_count or records_collected,
                     "total_pages": total_pages,
                     "pages_fetched": pages_fetched,
-                    "skipped_pages": self.skipped_pages,
-                    "current_page_count": len(all_conversions),
-                    "data": all_conversions,
+                    "skipped_pages": skipped_pages,
+                    "current_page_count": records_collected,
+                    "data": spool.reader() if spool is not None else all_conversions,
                     "async_mode": True,
-                    "concurrent_requests": self.max_concurrent_requests
+                    "concurrent_requests": self.max_concurrent_requests,
+                    "concurrency_stats": self.concurrency.get_stats(),
+                    "rate_limit_stats": self.rate_limiter.get_stats(),
+                    "hedge_stats": self.hedging.get_stats(),
+                    "page_size_stats": self.page_size.get_stats()
                 }
             }
+            if spool is not None:
+                result["data"]["spool_path"] = spool.path
             
-            success_msg = f"{api_label}异步获取成功: {len(all_conversions)} 条转换记录，共 {pages_fetched} 页"
-            if self.skipped_pages:
-                success_msg += f"，跳过 {len(self.skipped_pages)} 页: {self.skipped_pages}"
+            stats = self.concurrency.get_stats()
+            success_msg = (f"{api_label}异步获取成功: {records_collected} 条转换记录，共 {pages_fetched} 页，"
+                           f"当前并发 {stats['current_limit']} (峰值 {stats['peak_limit']})，吞吐 {stats['throughput_per_second']} 请求/秒")
+            if skipped_pages:
+                success_msg += f"，跳过 {len(skipped_pages)} 页: {skipped_pages}"
             
             print_step("异步获取成功", success_msg)
             return result
@@ -363,22 +594,207 @@ class AsyncInvolveAsiaAPI:
             print_step("数据获取失败", f"{api_label}没有获取到任何数据")
             return None
     
+    async def _get_conversions_sharded(self, shards: List[Tuple[str, str]], currency: str,
+                                       api_label: str = "", spool: Optional[ConversionSpool] = None,
+                                       checkpoint: Optional[FetchCheckpoint] = None,
+                                       allow_empty: bool = False) -> Optional[Dict]:
+        """
+        按日期分片获取数据：并行获取所有分片的第一页以确定各分片页数，
+        再把所有分片的剩余页面放入同一个工作队列，结果按conversion_id去重
+        提供检查点时每页完成后写入检查点，检查点中已完成的页面不再请求
+        """
+        print_step("分片获取", f"{api_label}日期范围切分为 {len(shards)} 个分片: {shards[0][0]} ~ {shards[-1][1]}")
+        
+        deduplicator = ConversionDeduplicator()
+        all_conversions = []
+        # 续传时spool中已有的记录计入总数，并参与去重
+        records_collected = spool.record_count if spool is not None else 0
+        total_count = 0
+        total_pages = 0
+        pages_fetched = 0
+        skipped_pages = []  # 本次获取跳过的页面
+        
+        if checkpoint is not None:
+            try:
+                checkpoint.bind(spool_path=spool.path, shards=shards)
+            except ValueError as e:
+                print_step("检查点续传失败", f"{api_label}{e}")
+                return None
+            if records_collected:
+                deduplicator.seed(spool.reader())
+        
+        def collect(result, shard_start, shard_end, page):
+            """收集一页数据（去重后写入spool或内存），写入后更新检查点"""
+            nonlocal records_collected, pages_fetched
+            data_obj = result["data"]
+            page_data = data_obj.get("data", []) if isinstance(data_obj, dict) else (data_obj if isinstance(data_obj, list) else [])
+            page_data = self.normalizer.normalize_page(self.projector.project_page(deduplicator.filter(page_data)))
+            if spool is not None:
+                spool.append_page(page_data)
+            else:
+                all_conversions.extend(page_data)
+            records_collected += len(page_data)
+            pages_fetched += 1
+            if checkpoint is not None:
+                checkpoint.mark_done(shard_start, shard_end, page)
+        
+        def skip(shard_start, shard_end, page):
+            label = f"{shard_start}~{shard_end}#{page}"
+            self.skipped_pages.append(label)
+            skipped_pages.append(label)
+            if checkpoint is not None:
+                checkpoint.mark_skipped(shard_start, shard_end, page)
+        
+        def collect_first_page(result, shard_start, shard_end, shard_count, shard_pages, limit):
+            if checkpoint is not None:
+                checkpoint.set_shard_total(shard_start, shard_end, shard_count, shard_pages, limit)
+            collect(result, shard_start, shard_end, 1)
+        
+        # 页面处理（去重、规范化、写入spool和检查点）全部在流水线消费者中串行执行，与网络请求重叠
+        async with self._client_session() as client, PagePipeline(label=api_label) as pipeline:
+            work_queue = asyncio.Queue()
+            
+            # 检查点中已知页数的分片直接排入缺失页面（沿用检查点记录的limit），其余分片需要先获取第一页
+            first_page_shards = []
+            for shard_start, shard_end in shards:
+                known_pages = checkpoint.shard_total_pages(shard_start, shard_end) if checkpoint is not None else None
+                if known_pages is None:
+                    first_page_shards.append((shard_start, shard_end))
+                    continue
+                total_pages += known_pages
+                shard_limit = checkpoint.shard_page_limit(shard_start, shard_end)
+                for page in range(1, known_pages + 1):
+                    if not checkpoint.is_done(shard_start, shard_end, page):
+                        work_queue.put_nowait((shard_start, shard_end, page, shard_limit))
+            if checkpoint is not None:
+                total_count = checkpoint.total_count
+            
+            # 步骤1: 并行获取每个分片的第一页（页面大小尚未探测时先用第一个分片探测，其余分片复用结果）
+            first_results = []
+            if first_page_shards and self.page_size.probing:
+                shard_start, shard_end = first_page_shards[0]
+                first_results.append(await self._fetch_first_page(client, shard_start, shard_end, currency, api_label))
+            first_results += await asyncio.gather(
+                *(self._fetch_first_page(client, shard_start, shard_end, currency, api_label)
+                  for shard_start, shard_end in first_page_shards[len(first_results):]),
+                return_exceptions=True
+            )
+            
+            for (shard_start, shard_end), first_result in zip(first_page_shards, first_results):
+                if isinstance(first_result, Exception) or not first_result[1]:
+                    await pipeline.submit(skip, shard_start, shard_end, 1)
+                    print_step("分片失败", f"{api_label}分片 {shard_start}~{shard_end} 第一页获取失败，跳过该分片")
+                    continue
+                
+                result, _, limit = first_result
+                data_obj = result["data"]
+                shard_pages = 1
+                shard_count = 0
+                if isinstance(data_obj, dict):
+                    shard_count = data_obj.get("count", 0)
+                    total_count += shard_count
+                    if shard_count > 0:
+                        shard_pages = min((shard_count + limit - 1) // limit, 1000)  # 每个分片最多1000页
+                
+                await pipeline.submit(collect_first_page, result, shard_start, shard_end, shard_count, shard_pages, limit)
+                total_pages += shard_pages
+                for page in range(2, shard_pages + 1):
+                    work_queue.put_nowait((shard_start, shard_end, page, limit))
+            
+            print_step("分片元数据", f"{api_label}总记录数: {total_count}, 总页数: {total_pages}, 待获取页面: {work_queue.qsize()}")
+            
+            # 步骤2: 所有分片的剩余页面通过同一个工作队列获取，并发由自适应控制器限制
+            async def worker():
+                while True:
+                    try:
+                        shard_start, shard_end, page, limit = work_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        result, success, _ = await self._make_single_request(
+                            client, page, shard_start, shard_end, currency, api_label, limit=limit
+                        )
+                    except Exception as e:
+                        print_step("页面异常", f"{api_label}分片 {shard_start}~{shard_end} 第{page}页发生异常: {str(e)}")
+                        success = False
+                    if success:
+                        await pipeline.submit(collect, result, shard_start, shard_end, page)
+                        print(f"   {api_label}📊 分片 {shard_start}~{shard_end} 第 {page} 页完成")
+                    else:
+                        await pipeline.submit(skip, shard_start, shard_end, page)
+            
+            worker_count = min(self.concurrency.max_limit, work_queue.qsize())
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+        
+        # 显示最终资源状态
+        self.resource_monitor.print_resource_status(f"{api_label}异步数据获取完成")
+        
+        if checkpoint is not None:
+            checkpoint.finish()
+        
+        if deduplicator.duplicates:
+            print_step("分片去重", f"{api_label}分片边界去除重复记录 {deduplicator.duplicates} 条")
+        
+        if not records_collected and not (allow_empty and pages_fetched and not skipped_pages):
+            print_step("数据获取失败", f"{api_label}没有获取到任何数据")
+            return None
+        
+        result = {
+            "status": "success",
+            "message": "Success",
+            "data": {
+                "page": 1,
+                "limit": self.page_size.limit,
+                "count": records_collected,
+                "total_count": total_count,
+                "total_pages": total_pages,
+                "pages_fetched": pages_fetched,
+                "skipped_pages": skipped_pages,
+                "current_page_count": records_collected,
+                "data": spool.reader() if spool is not None else all_conversions,
+                "async_mode": True,
+                "shards": len(shards),
+                "duplicates_removed": deduplicator.duplicates,
+                "concurrent_requests": self.max_concurrent_requests,
+                "concurrency_stats": self.concurrency.get_stats(),
+                "rate_limit_stats": self.rate_limiter.get_stats(),
+                "hedge_stats": self.hedging.get_stats(),
+                "page_size_stats": self.page_size.get_stats()
+            }
+        }
+        if spool is not None:
+            result["data"]["spool_path"] = spool.path
+        
+        stats = self.concurrency.get_stats()
+        success_msg = (f"{api_label}分片获取成功: {records_collected} 条转换记录，{len(shards)} 个分片共 {pages_fetched} 页，"
+                       f"当前并发 {stats['current_limit']} (峰值 {stats['peak_limit']})，吞吐 {stats['throughput_per_second']} 请求/秒")
+        if skipped_pages:
+            success_msg += f"，跳过 {len(skipped_pages)} 页: {skipped_pages}"
+        print_step("异步获取成功", success_msg)
+        return result
+    
     def get_conversions(self, start_date: str, end_date: str, 
-                       currency: Optional[str] = None, api_name: Optional[str] = None) -> Optional[Dict]:
+                       currency: Optional[str] = None, api_name: Optional[str] = None,
+                       spool: Optional[ConversionSpool] = None,
+                       checkpoint: Optional[FetchCheckpoint] = None,
+                       allow_empty: bool = False) -> Optional[Dict]:
         """同步包装器，运行异步获取函数"""
-        return asyncio.run(self.get_conversions_async(start_date, end_date, currency, api_name))
+        return asyncio.run(self.get_conversions_async(start_date, end_date, currency, api_name, spool, checkpoint,
+                                                      allow_empty))
     
-    async def get_conversions_default_range_async(self, currency: Optional[str] = None) -> Optional[Dict]:
+    async def get_conversions_default_range_async(self, currency: Optional[str] = None,
+                                                  spool: Optional[ConversionSpool] = None) -> Optional[Dict]:
         """使用默认日期范围异步获取数据"""
         start_date, end_date = config.get_default_date_range()
-        return await self.get_conversions_async(start_date, end_date, currency)
+        return await self.get_conversions_async(start_date, end_date, currency, spool=spool)
     
-    def get_conversions_default_range(self, currency: Optional[str] = None) -> Optional[Dict]:
+    def get_conversions_default_range(self, currency: Optional[str] = None,
+                                      spool: Optional[ConversionSpool] = None) -> Optional[Dict]:
         """使用默认日期范围获取数据的同步包装器"""
-        return asyncio.run(self.get_conversions_default_range_async(currency))
+        return asyncio.run(self.get_conversions_default_range_async(currency, spool))
     
     def save_to_json(self, data: Dict, filename: Optional[str] = None) -> Optional[str]:
-        """保存数据到JSON文件"""
+        """保存转换数据到中间文件（Parquet或JSON，见 config.CONVERSION_SAVE_FORMAT）"""
         if not data:
             print_step("保存失败", "没有数据可保存")
             return None
@@ -392,8 +808,8 @@ class AsyncInvolveAsiaAPI:
         filepath = os.path.join(config.OUTPUT_DIR, filename)
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # 默认保存为压缩的Parquet中间文件（未安装pyarrow时为JSON）
+            filepath = save_conversions(data, filepath)
             
             print_step("JSON保存成功", f"数据已保存到: {filepath}")
             return filepath
@@ -420,7 +836,22 @@ class AsyncInvolveAsiaAPI:
         print(f"⏱️  总运行时间: {runtime['runtime_formatted']}")
         
         # 异步配置信息
-        print(f"🚀 异步配置: 最大并发请求数 {self.max_concurrent_requests}")
+        stats = self.concurrency.get_stats()
+        mode = "自适应AIMD" if stats['adaptive'] else "固定"
+        print(f"🚀 异步配置: {mode}并发，当前并发数 {stats['current_limit']} (峰值 {stats['peak_limit']}, 范围 {stats['min_limit']}-{stats['max_limit']})")
+        print(f"📈 吞吐量: {stats['throughput_per_second']} 请求/秒，过载信号 {stats['overloads']} 次，减半 {stats['decreases']} 次")
+        hedge_stats = self.hedging.get_stats()
+        if hedge_stats['enabled']:
+            print(f"🪃 请求对冲: 发送 {hedge_stats['hedges_issued']} 次，胜出 {hedge_stats['hedges_won']} 次，"
+                  f"预算不足跳过 {hedge_stats['hedges_skipped_budget']} 次 (预算 {hedge_stats['budget_percent']}%)")
+        page_size_stats = self.page_size.get_stats()
+        if page_size_stats['enabled']:
+            print(f"📏 页面大小: {page_size_stats['page_size']}，探测被拒 {page_size_stats['probe_rejections']} 次，"
+                  f"超时减半 {page_size_stats['shrinks']} 次")
+        rate_stats = self.rate_limiter.get_stats()
+        if rate_stats['rate']:
+            print(f"🚦 全局限速: {rate_stats['rate']:g} 请求/秒，被限速 {rate_stats['throttled']}/{rate_stats['requests']} 次，"
+                  f"累计等待 {rate_stats['total_wait_seconds']:.1f} 秒")
         
         # 跳过页面信息
         if self.skipped_pages:
@@ -461,6 +892,95 @@ def get_conversions_async(start_date: str, end_date: str,
     
     return asyncio.run(fetch_data())
 
+async def fetch_multiple_accounts_async(api_configs: List[Dict[str, str]], start_date: str, end_date: str,
+                                       currency: Optional[str] = None, stream: bool = False,
+                                       store: Optional[ConversionStore] = None, resume: bool = False) -> Dict[str, Any]:
+    """
+    在同一个事件循环中并发获取多个API账户的数据
+    所有账户共享一个httpx连接池和一个AIMD自适应并发预算（初始为MAX_CONCURRENT_REQUESTS）
+    
+    Args:
+        api_configs: API配置列表 [{'name': 'IAByteC', 'secret': '...', 'key': '...'}, ...]
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        currency: 货币类型，默认使用配置文件中的值
+        stream: 是否将每个账户的数据流式写入各自的spool文件
+        store: 增量conversion存储，提供时每个账户只请求缺失或未关闭的日期
+        resume: 流式模式下从各账户的检查点续传，只获取缺失的页面
+    
+    Returns:
+        dict: {api_name: 获取结果}，认证或获取失败时为None，发生异常时为异常对象
+    """
+    print_step("多账户并发", f"在同一事件循环中并发获取 {len(api_configs)} 个API账户的数据")
+    
+    async_config = config.get_async_config()
+    client_config = {
+        'timeout': httpx.Timeout(getattr(config, 'REQUEST_TIMEOUT', 45)),
+        'limits': httpx.Limits(
+            max_keepalive_connections=async_config['http_max_keepalive_connections'],
+            max_connections=async_config['http_max_connections'],
+            keepalive_expiry=async_config['http_keepalive_expiry']
+        ),
+        'follow_redirects': True
+    }
+    concurrency = create_concurrency_controller(async_config['max_concurrent_requests'])
+    hedging = create_hedge_policy()
+    
+    async with httpx.AsyncClient(**client_config) as client:
+        async def fetch_account(api_config):
+            api_name = api_config['name']
+            api = AsyncInvolveAsiaAPI(
+                api_secret=api_config['secret'],
+                api_key=api_config['key'],
+                client=client,
+                concurrency=concurrency,
+                hedging=hedging
+            )
+            if not await api.authenticate():
+                print_step(f"API-{api_name}", "❌ 认证失败")
+                return None
+            if not stream:
+                return await fetch_range(api, api_name, None)
+            if store is not None:
+                with ConversionSpool(label=api_name) as spool:
+                    return await fetch_range(api, api_name, spool)
+            # 流式模式下每页写入检查点，可使用 --resume 续传
+            spool, checkpoint = open_checkpointed_spool(api_name, start_date, end_date, currency, resume)
+            with spool:
+                return await api.get_conversions_async(start_date, end_date, currency, api_name=api_name,
+                                                       spool=spool, checkpoint=checkpoint)
+        
+        async def fetch_range(api, api_name, spool):
+            if store is None:
+                return await api.get_conversions_async(start_date, end_date, currency, api_name=api_name, spool=spool)
+            return await store.fetch_range_async(
+                account_key(api.api_secret, currency), start_date, end_date,
+                lambda day: api.get_conversions_async(day, day, currency, api_name=f"{api_name} {day}", allow_empty=True),
+                spool=spool, label=f"{api_name} "
+            )
+        
+        results = await asyncio.gather(
+            *(fetch_account(api_config) for api_config in api_configs),
+            return_exceptions=True
+        )
+    
+    stats = concurrency.get_stats()
+    print_step("多账户并发", f"共享并发预算: 当前 {stats['current_limit']} (峰值 {stats['peak_limit']})，"
+                          f"吞吐 {stats['throughput_per_second']} 请求/秒，过载信号 {stats['overloads']} 次")
+    hedge_stats = hedging.get_stats()
+    if hedge_stats['enabled']:
+        print_step("请求对冲", f"对冲请求 {hedge_stats['hedges_issued']} 次，胜出 {hedge_stats['hedges_won']} 次，"
+                              f"触发阈值 {hedge_stats['hedge_delay_seconds']} 秒")
+    print_rate_limit_stats()
+    
+    return {api_config['name']: result for api_config, result in zip(api_configs, results)}
+
+def fetch_multiple_accounts(api_configs: List[Dict[str, str]], start_date: str, end_date: str,
+                            currency: Optional[str] = None, stream: bool = False,
+                            store: Optional[ConversionStore] = None, resume: bool = False) -> Dict[str, Any]:
+    """fetch_multiple_accounts_async 的同步包装器"""
+    return asyncio.run(fetch_multiple_accounts_async(api_configs, start_date, end_date, currency, stream, store, resume))
+
 # 性能测试函数
 def compare_sync_vs_async_performance(start_date: str, end_date: str, 
                                     test_pages: int = 5) -> Dict[str, Any]:
@@ -537,5 +1057,7 @@ def compare_sync_vs_async_performance(start_date: str, end_date: str,
 __all__ = [
     'AsyncInvolveAsiaAPI',
     'get_conversions_async', 
+    'fetch_multiple_accounts_async',
+    'fetch_multiple_accounts',
     'compare_sync_vs_async_performance'
 ] 
\ No newline at end of file
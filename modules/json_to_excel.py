@@ -8,9 +8,9 @@ import json
 import pandas as pd
 import os
 from utils.logger import print_step
+from modules.excel_writer import write_dataframe_workbook
+from modules.conversion_archive import is_conversion_archive, load_conversion_archive
 import config
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 
 class JSONToExcelConverter:
     """JSON到Excel转换器"""
@@ -23,7 +23,7 @@ class JSONToExcelConverter:
         将JSON数据转换为Excel文件
         
         Args:
-            json_data: JSON数据（可以是字符串、字典或文件路径）
+            json_data: JSON数据（可以是字符串、字典、JSON文件路径或Parquet中间文件路径）
             output_filename: 输出文件名，如果为None则自动生成
         
         Returns:
@@ -31,14 +31,19 @@ class JSONToExcelConverter:
         """
         print_step("开始转换", "正在将JSON数据转换为Excel格式...")
         
-        # 处理输入数据
-        data = self._process_input(json_data)
-        
-        # 验证数据结构
-        conversion_records = self._validate_and_extract(data)
-        
-        # 转换为DataFrame
-        df = self._create_dataframe(conversion_records)
+        if is_conversion_archive(json_data):
+            # Parquet中间文件：按列读取，不需要解析整个JSON文档
+            df, data = load_conversion_archive(json_data)
+            print_step("DataFrame创建", f"DataFrame包含 {len(df)} 行，{len(df.columns)} 列")
+        else:
+            # 处理输入数据
+            data = self._process_input(json_data)
+            
+            # 验证数据结构
+            conversion_records = self._validate_and_extract(data)
+            
+            # 转换为DataFrame
+            df = self._create_dataframe(conversion_records)
         
         # 生成输出文件名
         output_path = self._generate_output_path(output_filename)
@@ -151,30 +156,19 @@ class JSONToExcelConverter:
             data: 要导出的DataFrame
             filepath: 输出文件路径
         """
-        # 创建工作簿和工作表
-        wb = Workbook()
-        ws = wb.active
-        ws.title = config.EXCEL_SHEET_NAME
-        
-        # 写入数据（包含标题行），清理特殊字符
-        for r in dataframe_to_rows(data, index=False, header=True):
-            # 清理行中的特殊字符
-            cleaned_row = self._clean_row_data(r)
-            ws.append(cleaned_row)
-        
-        # 为所有数字字段设置千分位格式
-        self._apply_number_formatting(ws, data)
-        
-        # 保存文件
-        wb.save(filepath)
+        # 流式写入数据（包含标题行），数字字段按列设置千分位格式
+        write_dataframe_workbook(data, filepath, config.EXCEL_SHEET_NAME,
+                                 column_formats=self._get_number_formats(data))
     
-    def _apply_number_formatting(self, worksheet, data):
+    def _get_number_formats(self, data):
         """
-        为Excel工作表中的所有数字字段应用千分位格式
+        获取Excel中各数字字段的千分位格式
         
         Args:
-            worksheet: Excel工作表对象
             data: DataFrame数据
+            
+        Returns:
+            dict: {列名: 数字格式}
         """
         format_count = 0
         
@@ -215,59 +209,18 @@ class JSONToExcelConverter:
             'discount_rate': '0.00%'
         }
         
-        # 遍历所有列，应用格式
+        # 遍历所有列，收集格式（写入时按列应用一次）
+        column_formats = {}
         for col_name in data.columns:
             if col_name in number_format_mapping:
-                col_index = data.columns.get_loc(col_name) + 1  # Excel列索引从1开始
                 number_format = number_format_mapping[col_name]
-                
-                # 应用格式到该列的所有数据行（跳过标题行）
-                for row in range(2, len(data) + 2):  # 从第2行开始（第1行是标题）
-                    cell = worksheet.cell(row=row, column=col_index)
-                    cell.number_format = number_format
+                column_formats[col_name] = number_format
                 
                 format_count += 1
                 print_step("数字格式", f"已为 {col_name} 字段设置千分位格式: {number_format}")
         
         print_step("格式化完成", f"✅ 成功为 {format_count} 个数字字段设置千分位格式")
-    
-    def _clean_row_data(self, row):
-        """
-        清理行数据中的特殊字符，确保Excel兼容性
-        
-        Args:
-            row: 数据行（列表或元组）
-            
-        Returns:
-            list: 清理后的数据行
-        """
-        import re
-        
-        cleaned_row = []
-        for cell in row:
-            if cell is None:
-                cleaned_row.append(None)
-            elif isinstance(cell, (int, float)):
-                # 数字类型直接保留
-                cleaned_row.append(cell)
-            else:
-                # 字符串类型需要清理
-                cell_str = str(cell)
-                
-                # 移除可能导致Excel问题的控制字符和特殊Unicode字符
-                # 保留基本的ASCII字符、常见Unicode字符
-                cleaned_str = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', cell_str)
-                
-                # 移除可能有问题的Unicode字符（保留基本字母、数字、常见符号）
-                # 这个正则表达式比较宽松，保留大部分字符但移除控制字符
-                cleaned_str = re.sub(r'[^\x20-\x7E\u00A0-\u024F\u1E00-\u1EFF\u2000-\u206F\u20A0-\u20CF\u2100-\u214F]', '_', cleaned_str)
-                
-                # 移除开头的特殊字符（如不可见字符）
-                cleaned_str = cleaned_str.strip()
-                
-                cleaned_row.append(cleaned_str)
-        
-        return cleaned_row
+        return column_formats
     
     def _print_conversion_summary(self, df, original_data, output_path):
         """打印转换结果摘要"""
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Involve Asia 本地模拟服务器
+在本地模拟 /authenticate 和 /conversions/range，返回合成的conversion数据，
+支持可配置的记录数、延迟分布、429注入和超时注入，用于离线测试和性能基准测试
+
+独立运行:
+    python -m modules.mock_involve_server --port 8765 --records-per-day 5000 --latency-ms 200
+    INVOLVE_ASIA_BASE_URL=http://127.0.0.1:8765/api python main.py --api-only
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+from urllib.request import urlopen, Request
+
+# 默认模拟参数
+DEFAULT_MOCK_SETTINGS = {
+    'records_per_day': 1000,        # 每天的conversion记录数
+    'latency_ms': 100,              # 平均响应延迟(毫秒)
+    'latency_distribution': 'fixed',  # fixed / uniform / lognormal
+    'latency_jitter_ms': 50,        # uniform为±抖动，lognormal为标准差
+    'max_concurrent': 0,            # 同时处理的请求超过该值时返回429，0表示不限制
+    'rate_limit_probability': 0.0,  # 随机返回429的概率
+    'retry_after': None,            # 429响应的Retry-After头(秒)
+    'timeout_probability': 0.0,     # 随机挂起请求的概率（模拟超时）
+    'timeout_seconds': 60,          # 挂起请求的时长(秒)
+    'max_page_limit': 0,            # 接受的最大分页limit，0表示不限制
+    'page_limit_policy': 'reject',  # limit超过上限时: reject返回422 / clamp截断并回显实际limit / silent截断但回显请求的limit
+    'latency_per_record_ms': 0.0,   # 每条记录额外增加的延迟(毫秒)，模拟大页面更慢
+    'token_ttl_seconds': 0,         # 大于0时只接受本服务器签发且未过期的token，否则返回401
+    'seed': 42                      # 随机种子
+}
+
+OFFER_NAMES = [
+    "Shopee TH - CPS", "Shopee MY - CPS", "Shopee PH - CPS",
+    "Shopee ID (Media Buyers) - CPS", "Shopee VN - CPS", "TikTok Shop ID - CPS"
+]
+AFF_SUB1_VALUES = ["OEM2", "OEM3", "OPPO", "VIVO", "RAMPUP", "RPID001", "MKK", "TestPartner"]
+
+
+def synthetic_conversion(day, index):
+    """根据日期和序号生成确定性的合成conversion记录"""
+    rng = random.Random(f"{day}-{index}")
+    sale_amount = round(rng.uniform(1, 500), 2)
+    payout = round(sale_amount * rng.uniform(0.01, 0.05), 2)
+    return {
+        'conversion_id': int(day.replace('-', '')) * 1000000 + index,
+        'datetime_conversion': f"{day} {index % 24:02d}:{index % 60:02d}:00",
+        'offer_id': 1000 + index % len(OFFER_NAMES),
+        'offer_name': OFFER_NAMES[index % len(OFFER_NAMES)],
+        'sale_amount': f"{sale_amount:.2f}",
+        'payout': f"{payout:.2f}",
+        'base_payout': f"{payout:.2f}",
+        'bonus_payout': "0.00",
+        'currency': "USD",
+        'conversion_status': rng.choice(["approved", "pending"]),
+        'aff_sub1': AFF_SUB1_VALUES[index % len(AFF_SUB1_VALUES)],
+        'aff_sub2': f"sub2-{index % 7}",
+        'adv_sub1': f"order-{day}-{index}"
+    }
+
+
+class MockInvolveAsiaServer(ThreadingHTTPServer):
+    """模拟Involve Asia API的HTTP服务器（在后台线程中运行）"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, settings=None):
+        self.settings = {**DEFAULT_MOCK_SETTINGS, **(settings or {})}
+        self._rng = random.Random(self.settings['seed'])
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = {}
+        self._thread = None
+        self.reset_stats()
+        super().__init__((host, port), _MockRequestHandler)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                'auth_requests': 0,
+                'conversion_requests': 0,
+                'pages_served': 0,
+                'rate_limited': 0,
+                'unauthorized': 0,
+                'timeouts_injected': 0,
+                'peak_in_flight': 0
+            }
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def sample_latency(self):
+        """按配置的延迟分布采样一次延迟(秒)"""
+        settings = self.settings
+        mean = settings['latency_ms'] / 1000.0
+        jitter = settings['latency_jitter_ms'] / 1000.0
+        with self._lock:
+            if settings['latency_distribution'] == 'uniform':
+                latency = self._rng.uniform(mean - jitter, mean + jitter)
+            elif settings['latency_distribution'] == 'lognormal' and mean > 0:
+                sigma = math.sqrt(math.log(1 + (jitter / mean) ** 2))
+                latency = self._rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            else:
+                latency = mean
+        return max(0.0, latency)
+
+    def enter_request(self):
+        """记录请求开始，返回是否超过并发上限"""
+        with self._lock:
+            self._in_flight += 1
+            self.stats['conversion_requests'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+            max_concurrent = self.settings['max_concurrent']
+            return bool(max_concurrent) and self._in_flight > max_concurrent
+
+    def exit_request(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def issue_token(self, key):
+        """签发token并记录签发时间"""
+        with self._lock:
+            token = f"mock-token-{key}-{len(self._tokens) + 1}"
+            self._tokens[token] = time.monotonic()
+        return token
+
+    def token_valid(self, token):
+        """未开启token校验时接受任意token"""
+        ttl = self.settings['token_ttl_seconds']
+        if not ttl:
+            return True
+        with self._lock:
+            issued_at = self._tokens.get(token)
+        return issued_at is not None and time.monotonic() - issued_at <= ttl
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def build_page(self, start_date, end_date, page, limit):
+        """生成指定日期范围和页码的数据"""
+        records_per_day = self.settings['records_per_day']
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        days = max(0, (end - start).days + 1)
+        total = days * records_per_day
+
+        first = (page - 1) * limit
+        records = []
+        for position in range(first, min(first + limit, total)):
+            day = (start + timedelta(days=position // records_per_day)).strftime("%Y-%m-%d")
+            records.append(synthetic_conversion(day, position % records_per_day))
+
+        last_page = max(1, (total + limit - 1) // limit)
+        return {
+            'status': 'success',
+            'message': 'Success',
+            'data': {
+                'page': page,
+                'limit': limit,
+                'count': total,
+                'nextPage': page + 1 if page < last_page else None,
+                'data': records
+            }
+        }
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/__stats'):
+            self._send_json(200, self.server.get_stats())
+        else:
+            self._send_json(404, {'message': 'Not Found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        path = self.path.rstrip('/')
+
+        if path.endswith('/__reset'):
+            self.server.reset_stats()
+            self._send_json(200, {'status': 'success'})
+        elif path.endswith('/authenticate'):
+            self.server.count('auth_requests')
+            data = {'token': self.server.issue_token(form.get('key', 'general'))}
+            if self.server.settings['token_ttl_seconds']:
+                data['expires_in'] = self.server.settings['token_ttl_seconds']
+            self._send_json(200, {'status': 'success', 'data': data})
+        elif path.endswith('/conversions/range'):
+            self._handle_conversions(form)
+        else:
+            self._send_json(404, {'message': 'Not Found'})
+
+    def _handle_conversions(self, form):
+        server = self.server
+        settings = server.settings
+        over_limit = server.enter_request()
+        try:
+            authorization = self.headers.get('Authorization', '')
+            if not authorization.startswith('Bearer ') or not server.token_valid(authorization[len('Bearer '):]):
+                server.count('unauthorized')
+                self._send_json(401, {'message': 'Unauthorized'})
+                return
+
+            if over_limit or server._random() < settings['rate_limit_probability']:
+                server.count('rate_limited')
+                headers = {'Retry-After': str(settings['retry_after'])} if settings['retry_after'] is not None else {}
+                self._send_json(429, {'message': 'Too Many Requests'}, headers)
+                return
+
+            if server._random() < settings['timeout_probability']:
+                server.count('timeouts_injected')
+                time.sleep(settings['timeout_seconds'])
+                self._send_json(504, {'message': 'Gateway Timeout'})
+                return
+
+            page = int(form.get('page', 1))
+            limit = requested_limit = int(form.get('limit', 100))
+            max_limit = settings['max_page_limit']
+            if max_limit and limit > max_limit:
+                if settings['page_limit_policy'] == 'reject':
+                    self._send_json(422, {'status': 'error', 'message': f'limit must not exceed {max_limit}'})
+                    return
+                limit = max_limit
+
+            time.sleep(server.sample_latency() + limit * settings['latency_per_record_ms'] / 1000.0)
+            body = server.build_page(form['start_date'], form['end_date'], page, limit)
+            if settings['page_limit_policy'] == 'silent':
+                body['data']['limit'] = requested_limit
+            server.count('pages_served')
+            self._send_json(200, body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时断开
+            pass
+        finally:
+            server.exit_request()
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve_in_process(settings, host, port_queue, stop_event):
+    server = MockInvolveAsiaServer(host=host, port=0, settings=settings).start()
+    port_queue.put(server.server_address[1])
+    stop_event.wait()
+    server.stop()
+
+
+class MockServerProcess:
+    """
+    在独立子进程中运行模拟服务器，避免服务器的CPU和内存计入被测客户端
+    统计信息通过 GET /__stats 获取
+    """
+
+    def __init__(self, settings=None, host='127.0.0.1'):
+        self.settings = settings
+        self.host = host
+        self.base_url = None
+        self._process = None
+        self._stop_event = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        port_queue = context.Queue()
+        self._stop_event = context.Event()
+        self._process = context.Process(
+            target=_serve_in_process,
+            args=(self.settings, self.host, port_queue, self._stop_event),
+            daemon=True
+        )
+        self._process.start()
+        port = port_queue.get(timeout=30)
+        self.base_url = f"http://{self.host}:{port}/api"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._stop_event.set()
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+    def get_stats(self):
+        with urlopen(f"{self.base_url}/__stats", timeout=10) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def reset_stats(self):
+        request = Request(f"{self.base_url}/__reset", data=b"", method='POST')
+        with urlopen(request, timeout=10) as response:
+            response.read()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def add_mock_arguments(parser):
+    """向命令行解析器添加模拟服务器参数"""
+    parser.add_argument('--records-per-day', type=int, default=DEFAULT_MOCK_SETTINGS['records_per_day'],
+                        help='每天的合成conversion记录数')
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_MOCK_SETTINGS['latency_ms'],
+                        help='平均响应延迟(毫秒)')
+    parser.add_argument('--latency-distribution', choices=['fixed', 'uniform', 'lognormal'],
+                        default=DEFAULT_MOCK_SETTINGS['latency_distribution'], help='延迟分布')
+    parser.add_argument('--latency-jitter-ms', type=float, default=DEFAULT_MOCK_SETTINGS['latency_jitter_ms'],
+                        help='延迟抖动(uniform为±抖动，lognormal为标准差)')
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MOCK_SETTINGS['max_concurrent'],
+                        help='超过该并发数时返回429，0表示不限制')
+    parser.add_argument('--rate-limit-probability', type=float, default=DEFAULT_MOCK_SETTINGS['rate_limit_probability'],
+                        help='随机返回429的概率')
+    parser.add_argument('--retry-after', type=float, default=DEFAULT_MOCK_SETTINGS['retry_after'],
+                        help='429响应的Retry-After(秒)')
+    parser.add_argument('--timeout-probability', type=float, default=DEFAULT_MOCK_SETTINGS['timeout_probability'],
+                        help='随机挂起请求的概率')
+    parser.add_argument('--timeout-seconds', type=float, default=DEFAULT_MOCK_SETTINGS['timeout_seconds'],
+                        help='挂起请求的时长(秒)')
+    parser.add_argument('--max-page-limit', type=int, default=DEFAULT_MOCK_SETTINGS['max_page_limit'],
+                        help='接受的最大分页limit，0表示不限制')
+    parser.add_argument('--page-limit-policy', choices=['reject', 'clamp', 'silent'],
+                        default=DEFAULT_MOCK_SETTINGS['page_limit_policy'],
+                        help='limit超过上限时返回422(reject)、截断(clamp)或截断但回显请求的limit(silent)')
+    parser.add_argument('--latency-per-record-ms', type=float, default=DEFAULT_MOCK_SETTINGS['latency_per_record_ms'],
+                        help='每条记录额外增加的延迟(毫秒)')
+    parser.add_argument('--token-ttl-seconds', type=float, default=DEFAULT_MOCK_SETTINGS['token_ttl_seconds'],
+                        help='token有效期(秒)，大于0时过期或未知的token返回401')
+    parser.add_argument('--seed', type=int, default=DEFAULT_MOCK_SETTINGS['seed'], help='随机种子')
+
+
+def settings_from_args(args):
+    """从命令行参数构造模拟设置"""
+    return {key: getattr(args, key) for key in DEFAULT_MOCK_SETTINGS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Involve Asia 本地模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockInvolveAsiaServer(host=args.host, port=args.port, settings=settings_from_args(args))
+    print(f"🧪 Involve Asia 模拟服务器已启动: {server.base_url}")
+    print(f"   设置 INVOLVE_ASIA_BASE_URL={server.base_url} 即可让WeeklyReporter使用模拟服务器")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
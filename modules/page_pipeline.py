@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+页面处理流水线模块
+异步获取时每完成一页就交给单个消费者处理（金额数值化、Source到Partner标记、投影、写入spool/检查点），
+网络请求和页面处理相互重叠，而不是先等全部页面下载完再集中处理；
+消费者默认在工作线程中执行处理函数，事件循环可以继续处理其他在途请求
+"""
+
+import asyncio
+import time
+from utils.logger import print_step
+import config
+
+_STOP = object()
+
+
+class PageNormalizer:
+    """单页记录规范化：金额字段转为数值，可选按aff_sub1标记Partner"""
+
+    def __init__(self, numeric_fields=None, partner_field=None):
+        """
+        Args:
+            numeric_fields: 需要转为数值的字段，默认 config.PAGE_NUMERIC_FIELDS
+            partner_field: 写入Partner标记的字段名，为None时不标记（默认 config.PAGE_PARTNER_TAG_FIELD）
+        """
+        self.numeric_fields = numeric_fields if numeric_fields is not None else getattr(config, 'PAGE_NUMERIC_FIELDS', [])
+        self.partner_field = partner_field if partner_field is not None else getattr(config, 'PAGE_PARTNER_TAG_FIELD', None)
+        self._partner_cache = {}
+
+    def normalize_page(self, records):
+        """
+        原地规范化一页记录
+
+        Returns:
+            list: 同一个记录列表
+        """
+        numeric_fields = self.numeric_fields
+        partner_field = self.partner_field
+        for record in records:
+            for field in numeric_fields:
+                value = record.get(field)
+                if isinstance(value, str):
+                    try:
+                        record[field] = float(value.replace(',', ''))
+                    except ValueError:
+                        pass  # 无法解析的值保持原样，下游 to_numeric 统一处理
+            if partner_field:
+                record[partner_field] = self.match_partner(record.get('aff_sub1'))
+        return records
+
+    def match_partner(self, source):
+        """Source到Partner的匹配结果按Source缓存"""
+        partner = self._partner_cache.get(source)
+        if partner is None:
+            partner = config.match_source_to_partner(source) if source else None
+            self._partner_cache[source] = partner
+        return partner
+
+
+class PagePipeline:
+    """
+    单消费者页面流水线
+    生产者（各页面请求）完成后调用 submit(处理函数, *参数) 提交页面，消费者按到达顺序（或按序号顺序）执行；
+    处理函数只在消费者中串行执行，因此可以安全地更新计数、spool和检查点
+    """
+
+    def __init__(self, ordered=False, use_thread=None, max_pending=None, label=""):
+        """
+        Args:
+            ordered: 为True时按 submit 的 seq 从0开始依次处理（乱序到达的页面先缓存），
+                     失败的页面也需要提交（如提交跳过处理函数）以免阻塞后续序号
+            use_thread: 是否在工作线程中执行处理函数，默认 config.PAGE_PIPELINE_USE_THREAD
+            max_pending: 队列中最多等待处理的页面数（背压），默认 config.PAGE_PIPELINE_MAX_PENDING
+            label: 日志标签
+        """
+        self.ordered = ordered
+        self.use_thread = getattr(config, 'PAGE_PIPELINE_USE_THREAD', True) if use_thread is None else use_thread
+        self.label = label
+        self._queue = asyncio.Queue(maxsize=max_pending or getattr(config, 'PAGE_PIPELINE_MAX_PENDING', 50))
+        self._consumer = None
+        self._pending = {}
+        self._next_seq = 0
+        self._error = None
+        self.pages_processed = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+
+    async def __aenter__(self):
+        self.started_at = time.monotonic()
+        self._consumer = asyncio.ensure_future(self._consume())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except (asyncio.CancelledError, Exception):
+                pass
+            return False
+        await self.close()
+        return False
+
+    async def submit(self, func, *args, seq=None):
+        """提交一页的处理函数和参数（队列满时等待，形成背压）"""
+        if self._error is not None:
+            # 处理函数已出错，立即抛出
+            raise self._error
+        await self._queue.put((seq, (func, args)))
+
+    async def close(self):
+        """等待所有已提交页面处理完毕；处理函数的异常在这里抛出"""
+        await self._queue.put(_STOP)
+        await self._consumer
+        if self._error is not None:
+            raise self._error
+        elapsed = time.monotonic() - self.started_at
+        if self.pages_processed:
+            print_step("页面流水线", f"{self.label}处理 {self.pages_processed} 页，处理耗时 {self.busy_seconds:.2f} 秒 "
+                                    f"(与网络请求重叠，获取总耗时 {elapsed:.2f} 秒)")
+
+    async def _consume(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            if self._error is not None:
+                continue  # 出错后继续取出并丢弃剩余页面，避免生产者在队列满时阻塞
+            try:
+                await self._process(*item)
+            except Exception as e:
+                self._error = e
+
+        if self._error is None:
+            # 有序模式下未提交的序号（如请求异常）之后的页面按序号处理
+            try:
+                for seq in sorted(self._pending):
+                    await self._run(self._pending.pop(seq))
+            except Exception as e:
+                self._error = e
+
+    async def _process(self, seq, payload):
+        if not self.ordered:
+            await self._run(payload)
+            return
+        self._pending[seq] = payload
+        while self._next_seq in self._pending:
+            await self._run(self._pending.pop(self._next_seq))
+            self._next_seq += 1
+
+    async def _run(self, payload):
+        func, args = payload
+        started = time.monotonic()
+        if self.use_thread:
+            await asyncio.to_thread(func, *args)
+        else:
+            func(*args)
+        self.busy_seconds += time.monotonic() - started
+        self.pages_processed += 1
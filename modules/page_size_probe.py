@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+页面大小探测模块
+按账户探测API接受的最大分页limit（从最大候选值开始，被拒绝时逐级减小），
+结果连同探测时间缓存到磁盘，后续运行直接复用；大页面频繁超时时自动减半并写回缓存，
+以更少的请求数获取同样的数据，减少触发429的机会
+"""
+
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from utils.logger import print_step
+from modules.conversion_store import account_key
+import config
+
+
+class PageSizeCache:
+    """按账户持久化的页面大小缓存（JSON文件，条目超过有效期后重新探测）"""
+
+    def __init__(self, path=None, ttl_days=None):
+        self.path = path or getattr(config, 'PAGE_SIZE_CACHE_PATH', os.path.join("cache", "page_size_cache.json"))
+        self.ttl_seconds = (ttl_days if ttl_days is not None else getattr(config, 'PAGE_SIZE_CACHE_TTL_DAYS', 7)) * 86400
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def get(self, key):
+        """获取未过期的缓存条目，没有时返回None"""
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or time.time() - entry.get('probed_at', 0) > self.ttl_seconds:
+            return None
+        return entry
+
+    def set(self, key, page_size, probed_at=None):
+        """写入账户的页面大小（同时清理过期条目）"""
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            previous = entries.get(key, {})
+            entries[key] = {
+                'page_size': page_size,
+                'probed_at': probed_at or previous.get('probed_at') or now,
+                'updated_at': now
+            }
+            for stale_key in [k for k, entry in entries.items() if now - entry.get('probed_at', 0) > self.ttl_seconds]:
+                del entries[stale_key]
+            self._save(entries)
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self, entries):
+        """原子写入缓存文件，写入失败不影响获取"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print_step("页面大小缓存", f"写入缓存失败: {str(e)}")
+
+
+class PageSizeTuner:
+    """
+    单个账户的页面大小：未缓存时从最大候选值开始探测，确认后写入缓存
+
+    分页偏移量由limit决定，同一日期范围（或分片）的所有页面必须使用第一页确认的limit，
+    因此超时后减小的页面大小从下一个分片/下一次运行开始生效
+    """
+
+    def __init__(self, api_secret, api_url=None, cache=None, candidates=None, min_size=None,
+                 timeout_threshold=None, enabled=None):
+        self.enabled = getattr(config, 'PAGE_SIZE_PROBE_ENABLED', False) if enabled is None else enabled
+        self.min_size = min_size or config.DEFAULT_PAGE_LIMIT
+        self.candidates = sorted({size for size in (candidates or getattr(config, 'PAGE_SIZE_CANDIDATES', []))
+                                  if size >= self.min_size} | {self.min_size}, reverse=True)
+        self.timeout_threshold = timeout_threshold or getattr(config, 'PAGE_SIZE_TIMEOUT_THRESHOLD', 3)
+        host = urlparse(api_url or config.INVOLVE_ASIA_CONVERSIONS_URL).netloc
+        self.key = f"{host}|{account_key(api_secret).split(':', 1)[0]}"
+        self.cache = cache or get_page_size_cache()
+        self._lock = threading.Lock()
+        self._timeouts = 0
+
+        # 统计信息
+        self.probe_rejections = 0
+        self.shrinks = 0
+
+        entry = self.cache.get(self.key) if self.enabled else None
+        if not self.enabled:
+            self.page_size = config.DEFAULT_PAGE_LIMIT
+            self.probing = False
+        elif entry is not None:
+            self.page_size = max(self.min_size, int(entry['page_size']))
+            self.probing = False
+        else:
+            self.page_size = self.candidates[0]
+            self.probing = True
+
+    @property
+    def limit(self):
+        """下一个日期范围/分片使用的页面大小"""
+        return self.page_size
+
+    def confirm(self, requested, reported=None, rows=None, count=None):
+        """
+        第一页获取成功：API回显的limit小于请求值时说明被截断，以回显值为准；
+        第一页实际返回的记录数少于 min(limit, count) 时说明API静默截断了页面大小（未回显或回显请求值），
+        该页面大小不被接受也不缓存，改用下一个更小的候选值重新请求第一页
+
+        Args:
+            requested: 请求时使用的limit
+            reported: 响应中的limit
+            rows: 第一页实际返回的记录数
+            count: 响应中的总记录数
+
+        Returns:
+            int: 该日期范围后续页面使用的limit；页面大小被静默截断时返回None，调用方按 limit 重新请求第一页
+        """
+        try:
+            accepted = min(requested, int(reported)) if reported else requested
+        except (TypeError, ValueError):
+            accepted = requested
+        try:
+            truncated = rows is not None and bool(count) and rows < min(accepted, int(count))
+        except (TypeError, ValueError):
+            truncated = False
+        with self._lock:
+            if truncated and self.enabled and requested > self.min_size:
+                if requested == self.page_size:
+                    # 已缓存的页面大小也可能失效：重新从更小的候选值开始探测
+                    self.probe_rejections += 1
+                    self.page_size = [size for size in self.candidates if size < requested][0]
+                    self.probing = True
+                    print_step("页面大小探测", f"页面大小 {requested} 只返回 {rows} 条记录（共 {count} 条），"
+                                            f"API静默截断，改为探测 {self.page_size}")
+                return None
+            if self.probing:
+                self.probing = False
+                self.page_size = accepted
+                print_step("页面大小探测", f"API接受的页面大小: {accepted} (请求 {requested})，已缓存")
+                self.cache.set(self.key, accepted, probed_at=time.time())
+            elif self.enabled and accepted < requested and accepted < self.page_size:
+                self.page_size = accepted
+                self.cache.set(self.key, accepted)
+        return accepted
+
+    def reject(self, requested):
+        """探测中的页面大小被拒绝（4xx、无data或超时），改用下一个更小的候选值"""
+        with self._lock:
+            if not self.probing or requested != self.page_size:
+                return
+            self.probe_rejections += 1
+            smaller = [size for size in self.candidates if size < requested]
+            if smaller:
+                self.page_size = smaller[0]
+                print_step("页面大小探测", f"页面大小 {requested} 未被接受，改为探测 {self.page_size}")
+            else:
+                # 最小值也失败时不再探测，按普通请求重试
+                self.probing = False
+
+    def record_timeout(self, requested):
+        """记录一次页面超时，当前页面大小累计超时达到阈值时减半"""
+        with self._lock:
+            if not self.enabled or self.probing or requested != self.page_size:
+                return
+            self._timeouts += 1
+            if self._timeouts < self.timeout_threshold or self.page_size <= self.min_size:
+                return
+            previous = self.page_size
+            self.page_size = max(self.min_size, previous // 2)
+            self._timeouts = 0
+            self.shrinks += 1
+            self.cache.set(self.key, self.page_size)
+        print_step("页面大小调整", f"页面大小 {previous} 累计超时 {self.timeout_threshold} 次，"
+                                f"后续分片/运行改为 {self.page_size}")
+
+    def get_stats(self):
+        """获取页面大小统计"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'page_size': self.page_size,
+                'probing': self.probing,
+                'probe_rejections': self.probe_rejections,
+                'shrinks': self.shrinks
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_size_cache():
+    """获取进程级共享的页面大小缓存（首次调用时按当前配置创建）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageSizeCache()
+        return _cache
+
+
+def reset_page_size_cache():
+    """丢弃已加载的缓存（配置修改后或测试时使用）"""
+    global _cache
+    with _cache_lock:
+        _cache = None
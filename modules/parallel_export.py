@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+并行导出模块
+openpyxl 为纯Python实现，生成工作簿时占满一个CPU核；多个Partner时把各Partner预先分组好的数据
+交给进程池中的工作进程并行写入，工作进程数按可用CPU（含容器CPU配额）和可用内存限制。
+Linux下使用fork启动工作进程，分组数据由子进程直接继承，不需要序列化传输
+"""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import psutil
+from utils.logger import print_step
+import config
+
+# fork 模式下由工作进程继承的分组数据 {Source: DataFrame}
+_inherited_frames = None
+
+
+def available_cpus():
+    """当前进程可用的CPU核数（考虑CPU亲和性和cgroup v2的CPU配额，如Cloud Run实例）"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max", 'r') as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def plan_export_workers(job_count, largest_job_bytes=0):
+    """
+    计算并行导出的工作进程数
+
+    Args:
+        job_count: 待生成的工作簿数量
+        largest_job_bytes: 最大的单个工作簿数据的内存占用（字节）
+
+    Returns:
+        int: 工作进程数，1表示串行导出
+    """
+    max_workers = getattr(config, 'PARALLEL_EXPORT_MAX_WORKERS', None) or available_cpus()
+    workers = min(job_count, max_workers, available_cpus())
+
+    # 每个工作进程的内存估计 = 基础内存 + 最大工作簿数据 × 放大倍数
+    base_bytes = getattr(config, 'PARALLEL_EXPORT_WORKER_BASE_MB', 150) * 1024 * 1024
+    per_worker = base_bytes + largest_job_bytes * getattr(config, 'PARALLEL_EXPORT_MEMORY_FACTOR', 8)
+    budget = psutil.virtual_memory().available * getattr(config, 'PARALLEL_EXPORT_MEMORY_FRACTION', 0.7)
+    workers = min(workers, int(budget // per_worker))
+    return max(1, workers)
+
+
+def export_workbooks(jobs, source_frames, writer):
+    """
+    生成各Partner的工作簿（能并行时使用进程池）
+
+    Args:
+        jobs: [(partner, sources_list, filepath)]，按输出顺序排列
+        source_frames: {Source: 该Source的数据}
+        writer: 模块级函数 writer(partner, sources_list, filepath, source_frames)，在工作进程中调用
+
+    Returns:
+        dict: {partner: None 表示成功，否则为异常}
+    """
+    if not jobs:
+        return {}
+
+    job_bytes = [
+        sum(int(source_frames[source].memory_usage(index=False, deep=True).sum())
+            for source in sources_list if source in source_frames)
+        for _, sources_list, _ in jobs
+    ]
+    workers = 1
+    if config.should_use_parallel_export() and len(jobs) >= getattr(config, 'PARALLEL_EXPORT_MIN_PARTNERS', 2):
+        workers = plan_export_workers(len(jobs), max(job_bytes))
+
+    if workers <= 1:
+        return _export_serial(jobs, source_frames, writer)
+
+    print_step("并行导出", f"使用 {workers} 个工作进程生成 {len(jobs)} 个Partner工作簿")
+    try:
+        return _export_parallel(jobs, source_frames, writer, workers)
+    except (BrokenProcessPool, OSError) as e:
+        print_step("并行导出", f"⚠️ 进程池不可用，改为串行导出: {str(e)}")
+        return _export_serial(jobs, source_frames, writer)
+
+
+def _export_serial(jobs, source_frames, writer):
+    results = {}
+    for partner, sources_list, filepath in jobs:
+        try:
+            writer(partner, sources_list, filepath, source_frames)
+            results[partner] = None
+        except Exception as e:
+            results[partner] = e
+    return results
+
+
+def _export_parallel(jobs, source_frames, writer, workers):
+    global _inherited_frames
+
+    use_fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if use_fork else 'spawn')
+    if use_fork:
+        _inherited_frames = source_frames
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {}
+            for partner, sources_list, filepath in jobs:
+                # spawn 模式下只传输该Partner自己的分组数据
+                frames = None if use_fork else {source: source_frames[source] for source in sources_list if source in source_frames}
+                futures[partner] = executor.submit(_run_job, writer, partner, sources_list, filepath, frames)
+
+            results = {}
+            for partner, future in futures.items():
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    raise error
+                results[partner] = error
+            return results
+    finally:
+        _inherited_frames = None
+
+
+def _run_job(writer, partner, sources_list, filepath, frames):
+    """工作进程入口"""
+    writer(partner, sources_list, filepath, frames if frames is not None else _inherited_frames)
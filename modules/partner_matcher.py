@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Partner匹配器模块
+把 Partner -> {sources, pattern} 映射预编译为：Source字面值哈希表 + 一个按Partner顺序排列的合并正则，
+单个Source的匹配结果带LRU缓存；match_series 对整列先去重再映射，百万行数据只需按唯一值匹配一次
+"""
+
+import re
+import threading
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import config
+
+_KEEP = object()
+
+
+def _is_empty(value):
+    """None、空字符串和NaN视为空Source"""
+    if value is None or value == "":
+        return True
+    return isinstance(value, float) and value != value
+
+
+class PartnerMatcher:
+    """
+    预编译的Source到Partner匹配器
+
+    优先级与逐个Partner检查相同：按映射顺序，第一个在sources列表中包含该Source
+    或pattern匹配该Source（re.match，从开头匹配）的Partner胜出；都不匹配时返回原Source
+    """
+
+    def __init__(self, mapping, skip_partners=(), empty_result=_KEEP, cache_size=None):
+        """
+        Args:
+            mapping: Partner映射，如 config.PARTNER_SOURCES_MAPPING
+            skip_partners: 不参与匹配的Partner（如汇总所有数据的ByteC）
+            empty_result: 空Source（None/空字符串/NaN）的返回值，默认原样返回
+            cache_size: LRU缓存的Source数量，默认 config.PARTNER_MATCH_CACHE_SIZE
+        """
+        self.partners = [partner for partner in mapping if partner not in set(skip_partners)]
+        self.empty_result = empty_result
+
+        # 字面值Source -> 最先声明它的Partner序号
+        self._literals = {}
+        patterns = []
+        for index, partner in enumerate(self.partners):
+            partner_config = mapping[partner]
+            for source in partner_config.get('sources', []):
+                self._literals.setdefault(source, index)
+            if partner_config.get('pattern'):
+                patterns.append((index, partner_config['pattern']))
+
+        # 合并正则：按Partner顺序排列的命名分组，re.match 从左到右尝试，第一个匹配的分组即优先级最高的Partner
+        self._combined = None
+        self._patterns = [(index, re.compile(pattern)) for index, pattern in patterns]
+        if patterns:
+            try:
+                self._combined = re.compile("|".join(f"(?P<_p{index}>{pattern})" for index, pattern in patterns))
+            except re.error:
+                # 个别pattern无法合并（如内联全局标志），逐个匹配
+                self._combined = None
+
+        self._cached_match = lru_cache(maxsize=cache_size or getattr(config, 'PARTNER_MATCH_CACHE_SIZE', 4096))(self._match)
+
+    def match(self, source):
+        """匹配单个Source，返回Partner名称（未匹配时返回原Source）"""
+        try:
+            return self._cached_match(source)
+        except TypeError:
+            # 不可哈希的值不进缓存
+            return self._match(source)
+
+    def match_series(self, series):
+        """
+        向量化匹配一列Source
+
+        Args:
+            series: pandas Series
+
+        Returns:
+            pd.Series: 与输入同索引的Partner列
+        """
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapped = np.empty(len(uniques) + 1, dtype=object)
+        for position, source in enumerate(uniques):
+            mapped[position] = self.match(source)
+        # 缺失值（factorize的-1）映射到最后一个位置
+        if self.empty_result is not _KEEP:
+            mapped[-1] = self.empty_result
+        else:
+            mapped[-1] = series.dtype.na_value if isinstance(series.dtype, pd.StringDtype) else np.nan
+        return pd.Series(mapped.take(codes), index=series.index, name=series.name, dtype=object)
+
+    def cache_info(self):
+        return self._cached_match.cache_info()
+
+    def _match(self, source):
+        if self.empty_result is _KEEP:
+            # 原样返回空值时，空字符串与逐个Partner检查相同，仍参与字面值和正则匹配（如ByteC的 .*）
+            if source is None or (isinstance(source, float) and source != source):
+                return source
+        elif _is_empty(source):
+            return self.empty_result
+
+        try:
+            best = self._literals.get(source)
+        except TypeError:
+            best = None
+        if isinstance(source, str):
+            pattern_index = self._match_pattern(source)
+            if pattern_index is not None and (best is None or pattern_index < best):
+                best = pattern_index
+        return self.partners[best] if best is not None else source
+
+    def _match_pattern(self, source):
+        if self._combined is not None:
+            match = self._combined.match(source)
+            return int(match.lastgroup[2:]) if match else None
+        for index, pattern in self._patterns:
+            if pattern.match(source):
+                return index
+        return None
+
+
+_matcher = None
+_matcher_mapping = None
+_matcher_lock = threading.Lock()
+
+
+def get_partner_matcher():
+    """获取 config.PARTNER_SOURCES_MAPPING 的匹配器（映射对象被替换时重新编译）"""
+    global _matcher, _matcher_mapping
+    mapping = config.PARTNER_SOURCES_MAPPING
+    matcher = _matcher
+    if matcher is not None and _matcher_mapping is mapping:
+        return matcher
+    with _matcher_lock:
+        if _matcher is None or _matcher_mapping is not mapping:
+            _matcher = PartnerMatcher(mapping)
+            _matcher_mapping = mapping
+        return _matcher
+
+
+def reset_partner_matcher():
+    """丢弃已编译的匹配器（原地修改映射后调用）"""
+    global _matcher, _matcher_mapping
+    with _matcher_lock:
+        _matcher = None
+        _matcher_mapping = None
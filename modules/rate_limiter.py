@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+全局令牌桶限速模块
+进程内所有Involve Asia客户端（同步、异步、多账户、多个partner任务）按API主机共享同一个令牌桶，
+控制合并后的请求速率，避免同时触发429后又同时等待；
+可选使用文件锁（fcntl）在多个进程之间共享令牌桶状态
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from utils.logger import print_step
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows等没有fcntl的平台只支持进程内限速
+    fcntl = None
+
+
+class TokenBucketRateLimiter:
+    """
+    令牌桶限速器（预约模式）
+    每次请求预约一个令牌：桶中有令牌时立即放行，否则令牌数变为负数，
+    按欠下的令牌数计算需要等待的时间，保证并发调用者按预约顺序依次放行
+    """
+
+    def __init__(self, key, rate=None, burst=None, state_path=None):
+        """
+        Args:
+            key: 限速键（API主机）
+            rate: 每秒令牌数，为None或0时不限速（仍统计请求数）
+            burst: 桶容量（允许的突发请求数），默认等于rate
+            state_path: 跨进程共享的状态文件路径，为None时只在进程内限速
+        """
+        self.key = key
+        self.rate = float(rate) if rate else None
+        self.burst = float(burst or rate or 1)
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+
+    @property
+    def enabled(self):
+        return self.rate is not None
+
+    def acquire(self):
+        """同步获取一个令牌（阻塞等待），返回等待的秒数"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """异步获取一个令牌，返回等待的秒数"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self):
+        """获取限速统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['total_wait_seconds'] = round(stats['total_wait_seconds'], 3)
+        stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+        stats.update({
+            'key': self.key,
+            'rate': self.rate,
+            'burst': self.burst,
+            'cross_process': self.state_path is not None
+        })
+        return stats
+
+    def _reserve(self):
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            if not self.enabled:
+                wait = 0.0
+            elif self.state_path:
+                wait = self._reserve_shared()
+            else:
+                now = time.monotonic()
+                self._tokens, wait = self._take(self._tokens, now - self._updated)
+                self._updated = now
+
+            self.stats['requests'] += 1
+            if wait > 0:
+                self.stats['throttled'] += 1
+                self.stats['total_wait_seconds'] += wait
+                self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], wait)
+        return wait
+
+    def _take(self, tokens, elapsed):
+        """补充elapsed秒的令牌后取走一个，返回(剩余令牌, 等待秒数)"""
+        tokens = min(self.burst, tokens + max(0.0, elapsed) * self.rate) - 1
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, wait
+
+    def _reserve_shared(self):
+        """在文件锁保护下读写共享状态（使用墙上时钟，各进程可比较）"""
+        with self._locked_state() as f:
+            try:
+                state = json.loads(f.read() or '{}')
+            except json.JSONDecodeError:
+                state = {}
+            now = time.time()
+            tokens, wait = self._take(state.get('tokens', self.burst), now - state.get('updated', now))
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps({'tokens': tokens, 'updated': now}))
+        return wait
+
+    @contextmanager
+    def _locked_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with open(self.state_path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                yield f
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limit_key(url):
+    """限速键：URL的主机（含端口）"""
+    return urlparse(url).netloc or url
+
+
+def get_rate_limiter(url):
+    """
+    获取URL所属主机的进程级共享限速器（首次调用时按当前配置创建）
+
+    Args:
+        url: API地址
+
+    Returns:
+        TokenBucketRateLimiter
+    """
+    key = rate_limit_key(url)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _create_rate_limiter(key)
+            _limiters[key] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats():
+    """获取所有限速器的统计 {主机: stats}"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.key: limiter.get_stats() for limiter in limiters}
+
+
+def reset_rate_limiters():
+    """清空已创建的限速器（配置修改后或测试时使用）"""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def print_rate_limit_stats(label=""):
+    """打印限速统计"""
+    for stats in get_rate_limiter_stats().values():
+        if not stats['rate']:
+            continue
+        print_step("全局限速", f"{label}{stats['key']}: {stats['requests']} 个请求，"
+                              f"被限速 {stats['throttled']} 次，累计等待 {stats['total_wait_seconds']:.1f} 秒 "
+                              f"(最长 {stats['max_wait_seconds']:.2f} 秒，{stats['rate']:g} 请求/秒)")
+
+
+def _create_rate_limiter(key):
+    if not getattr(config, 'GLOBAL_RATE_LIMIT_ENABLED', True):
+        return TokenBucketRateLimiter(key)
+
+    state_path = None
+    if getattr(config, 'GLOBAL_RATE_LIMIT_CROSS_PROCESS', False):
+        if fcntl is None:
+            print_step("全局限速", "当前平台不支持fcntl文件锁，跨进程限速降级为进程内限速")
+        else:
+            safe_key = key.replace(':', '_').replace('/', '_')
+            state_path = os.path.join(config.RATE_LIMIT_STATE_DIR, f"rate_limit_{safe_key}.json")
+
+    return TokenBucketRateLimiter(
+        key,
+        rate=config.GLOBAL_RATE_LIMIT_PER_SECOND,
+        burst=config.GLOBAL_RATE_LIMIT_BURST,
+        state_path=state_path
+    )
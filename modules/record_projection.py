@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Conversion记录字段投影模块
+每页数据到达时立即投影为只保留配置字段的紧凑记录（__slots__对象，字段值存放在列表中），
+丢弃下游不使用的字段和每条记录的dict开销，降低长时间回溯时的内存占用；
+紧凑记录实现映射接口（get/[]/keys/items/dict()），DataFrame、去重和JSON序列化可直接使用，
+原始JSON可按需保留
+"""
+
+from collections.abc import MutableMapping
+import config
+
+_MISSING = object()
+
+
+class CompactRecord(MutableMapping):
+    """
+    紧凑conversion记录基类
+    子类通过 compact_record_type 按字段列表生成；投影字段存放在定长列表中，
+    投影外新增的字段（如 api_source）存放在按需创建的额外dict中
+    """
+
+    __slots__ = ('_values', '_extra', '_raw')
+    _fields = ()
+    _index = {}
+
+    def __init__(self, record, keep_raw=False, shared_values=None):
+        values = [record.get(field, _MISSING) for field in self._fields]
+        if shared_values is not None:
+            # 低基数字段的相同字符串值在所有记录间共享同一个对象
+            for index, cache in shared_values:
+                value = values[index]
+                if isinstance(value, str):
+                    values[index] = cache.setdefault(value, value)
+        self._values = values
+        self._extra = None
+        self._raw = record if keep_raw else None
+
+    @property
+    def raw(self):
+        """原始JSON记录（未开启保留原始记录时为None）"""
+        return self._raw
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getitem__(self, key):
+        index = self._index.get(key)
+        if index is not None:
+            value = self._values[index]
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        index = self._index.get(key)
+        if index is not None:
+            self._values[index] = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        index = self._index.get(key)
+        if index is not None and self._values[index] is not _MISSING:
+            self._values[index] = _MISSING
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field, value in zip(self._fields, self._values):
+            if value is not _MISSING:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not _MISSING) + len(self._extra or ())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+_record_types = {}
+
+
+def compact_record_type(fields):
+    """按字段列表生成（并缓存）紧凑记录类型"""
+    fields = tuple(dict.fromkeys(fields))
+    record_type = _record_types.get(fields)
+    if record_type is None:
+        record_type = type('ConversionRecord', (CompactRecord,), {
+            '__slots__': (),
+            '_fields': fields,
+            '_index': {field: i for i, field in enumerate(fields)}
+        })
+        _record_types[fields] = record_type
+    return record_type
+
+
+def json_default(value):
+    """json.dumps 的 default 处理：紧凑记录序列化为普通dict"""
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RecordProjector:
+    """把每页API记录投影为紧凑记录"""
+
+    def __init__(self, fields=None, keep_raw=False, enabled=True, shared_fields=None):
+        self.enabled = enabled
+        self.keep_raw = keep_raw
+        self.record_type = compact_record_type(fields or config.CONVERSION_PROJECTION_FIELDS)
+        index = self.record_type._index
+        self.shared_values = [(index[field], {}) for field in shared_fields or () if field in index] or None
+
+    @property
+    def fields(self):
+        return self.record_type._fields
+
+    def project_page(self, records):
+        """
+        投影一页记录（未启用时原样返回）
+
+        Args:
+            records: API返回的一页conversion记录
+
+        Returns:
+            list: 紧凑记录列表
+        """
+        if not self.enabled:
+            return records
+        record_type = self.record_type
+        keep_raw = self.keep_raw
+        shared_values = self.shared_values
+        return [record_type(record, keep_raw, shared_values) if isinstance(record, dict) else record
+                for record in records]
+
+
+def get_record_projector():
+    """按当前配置创建记录投影器"""
+    return RecordProjector(
+        fields=getattr(config, 'CONVERSION_PROJECTION_FIELDS', None),
+        keep_raw=getattr(config, 'CONVERSION_PROJECTION_KEEP_RAW', False),
+        enabled=config.should_project_conversion_records(),
+        shared_fields=getattr(config, 'CONVERSION_PROJECTION_SHARED_FIELDS', None)
+    )
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+报告汇总清单模块
+生成报表时由内存中已有的分组和汇总结果得到各Partner、Source、Offer的合计，写入报表旁的
+<报表文件名>.summary.json；邮件直接读取清单，不再用openpyxl/pandas把刚生成的工作簿重新解析两三遍。
+清单记录报表文件的大小和修改时间，报表被替换或清单缺失时返回None，由调用方回退到读取Excel
+"""
+
+import json
+import os
+from utils.logger import print_step
+import config
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(report_path):
+    """报表对应的清单文件路径"""
+    return report_path + config.REPORT_MANIFEST_SUFFIX
+
+
+def is_report_manifest(filename):
+    """判断文件名是否为报表清单（统计JSON输出文件时跳过）"""
+    return filename.endswith(config.REPORT_MANIFEST_SUFFIX)
+
+
+def build_partner_manifest(partner, source_frames, source_totals, sheet_titles):
+    """
+    Partner工作簿的汇总清单
+
+    Args:
+        partner: Partner名称
+        source_frames: {Source: 该Source的数据}
+        source_totals: {Source: sale_amount合计}，没有sale_amount栏位时为None
+        sheet_titles: {Source: 工作表名称}，按工作表顺序，与写入工作簿时的名称相同（含重名时追加的序号）
+
+    Returns:
+        dict: 清单内容
+    """
+    sheets = []
+    offers = {}
+    for source, sheet_title in sheet_titles.items():
+        frame = source_frames[source]
+        sales_amount = float(source_totals.get(source, 0)) if source_totals is not None else 0.0
+        sheets.append({
+            'sheet_name': sheet_title,
+            'source': str(source),
+            'records': int(len(frame)),
+            'sales_amount': sales_amount
+        })
+
+        # 各Offer的转换数和销售额（按Source分组后的小表聚合，不再拼接整个Partner的数据）
+        if 'offer_name' in frame.columns:
+            grouped = frame.groupby('offer_name', sort=False, observed=True)
+            counts = grouped.size()
+            totals = grouped['sale_amount'].sum() if 'sale_amount' in frame.columns else None
+            for offer_name, count in counts.items():
+                entry = offers.setdefault(str(offer_name), [0, 0.0])
+                entry[0] += int(count)
+                entry[1] += float(totals[offer_name]) if totals is not None else 0.0
+
+    offer_list = [{'offer_name': name, 'conversions': count, 'sales_amount': amount}
+                  for name, (count, amount) in offers.items()]
+    offer_list.sort(key=lambda item: item['sales_amount'], reverse=True)
+
+    return {
+        'report_type': 'partner',
+        'partner': partner,
+        'records': sum(sheet['records'] for sheet in sheets),
+        'total_amount': sum(sheet['sales_amount'] for sheet in sheets),
+        'sheets': sheets,
+        'offers': offer_list
+    }
+
+
+def build_bytec_manifest(summary_data, sheet_name):
+    """
+    ByteC报表的汇总清单
+
+    Args:
+        summary_data: ByteCReportGenerator._create_offer_summary 的结果（不含TOTAL行）
+        sheet_name: 报表工作表名称
+
+    Returns:
+        dict: 清单内容（company 为公司级合计，partner_sources / offers 按 Estimated Earning 降序）
+    """
+    if len(summary_data) == 0:
+        return {
+            'report_type': 'bytec', 'partner': 'ByteC', 'records': 0, 'total_amount': 0.0,
+            'sheets': [{'sheet_name': sheet_name, 'records': 0, 'sales_amount': 0.0}],
+            'company': {'total_conversion': 0, 'total_sales': 0.0, 'total_earning': 0.0,
+                        'total_adv_commission': 0.0, 'total_pub_commission': 0.0},
+            'partner_sources': [],
+            'offers': []
+        }
+
+    total_sales = float(summary_data['Sale Amount'].sum())
+    company = {
+        'total_conversion': int(summary_data['Conversions'].sum()),
+        'total_sales': total_sales,
+        'total_earning': float(summary_data['Estimated Earning'].sum()),
+        'total_adv_commission': float(summary_data['Adv Commission'].sum()),
+        'total_pub_commission': float(summary_data['Pub Commission'].sum())
+    }
+
+    return {
+        'report_type': 'bytec',
+        'partner': 'ByteC',
+        'records': int(len(summary_data)),
+        'total_amount': total_sales,
+        'sheets': [{'sheet_name': sheet_name, 'records': int(len(summary_data)), 'sales_amount': total_sales}],
+        'company': company,
+        'partner_sources': [
+            {'partner': str(keys[0]), 'source': str(keys[1]), **values}
+            for keys, values in _earning_ranked(summary_data, ['Partner', 'Source'])
+        ],
+        'offers': [
+            {'offer_name': str(keys[0]), **values}
+            for keys, values in _earning_ranked(summary_data, ['Offer Name'])
+        ]
+    }
+
+
+def _earning_ranked(summary_data, keys):
+    """按keys分组合计转换数、销售额和预计收入，按预计收入降序"""
+    grouped = summary_data.groupby(keys)[['Conversions', 'Sale Amount', 'Estimated Earning']].sum().reset_index()
+    grouped = grouped.sort_values('Estimated Earning', ascending=False)
+    for row in grouped.itertuples(index=False):
+        values = dict(zip(grouped.columns, row))
+        yield [values[key] for key in keys], {
+            'conversions': int(values['Conversions']),
+            'sales_amount': float(values['Sale Amount']),
+            'estimated_earning': float(values['Estimated Earning'])
+        }
+
+
+def write_manifest(report_path, manifest):
+    """
+    在报表旁写入汇总清单（报表保存之后调用），写入失败不影响报表
+
+    Args:
+        report_path: 已保存的报表路径
+        manifest: build_partner_manifest / build_bytec_manifest 的结果
+
+    Returns:
+        str: 清单路径，写入失败时为None
+    """
+    path = manifest_path(report_path)
+    try:
+        stat = os.stat(report_path)
+        content = dict(manifest, version=MANIFEST_VERSION, report_file=os.path.basename(report_path),
+                       report_size=stat.st_size, report_mtime_ns=stat.st_mtime_ns)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return path
+    except (OSError, TypeError, ValueError) as e:
+        print_step("汇总清单", f"⚠️ 写入失败 {os.path.basename(path)}: {str(e)}")
+        return None
+
+
+def load_manifest(report_path):
+    """
+    读取报表的汇总清单
+
+    Args:
+        report_path: 报表路径
+
+    Returns:
+        dict: 清单内容；清单不存在、无法解析或报表已被替换（大小/修改时间不一致）时为None
+    """
+    if not report_path:
+        return None
+    path = manifest_path(report_path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        stat = os.stat(report_path)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or \
+            manifest.get('report_size') != stat.st_size or manifest.get('report_mtime_ns') != stat.st_mtime_ns:
+        print_step("汇总清单", f"⚠️ {os.path.basename(path)} 与报表不一致，改为读取Excel")
+        return None
+    return manifest
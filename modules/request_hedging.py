@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+请求对冲模块
+页面请求耗时超过已观测延迟的p95时，再发送一个相同的请求（同样占用并发槽位），两者中先成功返回者胜出，
+以少量额外请求（受预算比例限制）截断长尾页面对整体获取时间的影响
+"""
+
+import asyncio
+import math
+import threading
+from collections import deque
+import config
+
+
+class HedgePolicy:
+    """
+    对冲策略：记录成功请求的延迟，计算对冲触发时间，并限制对冲请求占总请求的比例
+
+    多账户并发获取时与AIMD控制器一样在所有客户端间共享
+    """
+
+    def __init__(self, enabled=None, percentile=None, min_samples=None, budget_percent=None,
+                 min_delay=None, window=None):
+        self.enabled = getattr(config, 'HEDGED_REQUESTS_ENABLED', False) if enabled is None else enabled
+        self.percentile = percentile or getattr(config, 'HEDGE_LATENCY_PERCENTILE', 95)
+        self.min_samples = min_samples or getattr(config, 'HEDGE_MIN_SAMPLES', 20)
+        self.budget_percent = budget_percent if budget_percent is not None else getattr(config, 'HEDGE_BUDGET_PERCENT', 5)
+        self.min_delay = min_delay if min_delay is not None else getattr(config, 'HEDGE_MIN_DELAY', 1.0)
+        self._latencies = deque(maxlen=window or getattr(config, 'HEDGE_LATENCY_WINDOW', 200))
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.requests = 0
+        self.hedges_issued = 0
+        self.hedges_won = 0
+        self.hedges_skipped_budget = 0
+
+    def record_latency(self, latency):
+        """记录一次成功请求的延迟（秒）"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self):
+        """
+        对冲触发时间（秒）：已观测延迟的p95，不低于 min_delay
+
+        Returns:
+            float: 触发时间；未启用或样本不足时返回None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * self.percentile / 100.0) - 1))
+        return max(ordered[index], self.min_delay)
+
+    def count_request(self):
+        """每个主请求调用一次，作为对冲预算的分母"""
+        with self._lock:
+            self.requests += 1
+
+    def try_acquire(self):
+        """对冲请求数不超过主请求数的 budget_percent% 时允许发送对冲请求"""
+        with self._lock:
+            if (self.hedges_issued + 1) * 100 > self.requests * self.budget_percent:
+                self.hedges_skipped_budget += 1
+                return False
+            self.hedges_issued += 1
+            return True
+
+    def record_win(self):
+        """对冲请求先于主请求返回"""
+        with self._lock:
+            self.hedges_won += 1
+
+    def get_stats(self):
+        """获取对冲统计"""
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'requests': self.requests,
+                'hedges_issued': self.hedges_issued,
+                'hedges_won': self.hedges_won,
+                'hedges_skipped_budget': self.hedges_skipped_budget,
+                'hedge_delay_seconds': round(delay, 3) if delay is not None else None,
+                'budget_percent': self.budget_percent
+            }
+
+
+async def run_hedged(policy, send, before_hedge=None, is_success=None, hedge_slot=None):
+    """
+    执行可对冲的请求
+
+    Args:
+        policy: HedgePolicy
+        send: 无参数的协程函数，每次调用发送一次请求
+        before_hedge: 可选的协程函数，发送对冲请求前调用（如获取限速令牌）
+        is_success: 可选的函数，判断结果是否可以作为胜出结果（如排除429/5xx响应），默认所有结果都可以
+        hedge_slot: 可选的异步上下文管理器工厂，对冲请求在其中发送（如并发控制器的 slot），
+            使对冲请求也计入并发数
+
+    Returns:
+        先成功返回的结果；都不成功时返回主请求的结果（主请求异常时返回对冲请求的结果），
+        两个请求都抛出异常时抛出主请求的异常
+    """
+    policy.count_request()
+    delay = policy.hedge_delay()
+    primary = asyncio.ensure_future(send())
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not policy.try_acquire():
+        return await primary
+
+    async def send_hedge():
+        if before_hedge is not None:
+            await before_hedge()
+        if hedge_slot is None:
+            return await send()
+        async with hedge_slot():
+            return await send()
+
+    hedge = asyncio.ensure_future(send_hedge())
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and (is_success is None or is_success(task.result())):
+                    if task is hedge:
+                        policy.record_win()
+                    return task.result()
+        # 两个请求都不成功：优先返回有响应的结果，由调用方按状态码处理
+        if primary.exception() is None or hedge.exception() is not None:
+            return primary.result()
+        return hedge.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def create_hedge_policy():
+    """根据配置创建对冲策略"""
+    return HedgePolicy()
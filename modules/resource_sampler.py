@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+后台资源采样模块
+后台线程按固定间隔采集CPU、内存、网络、磁盘和JSON输出文件信息写入环形缓冲区，
+请求路径上的重试/超时/跳过只读取最新样本并记录事件，不再同步执行psutil探测和连通性检查；
+运行结束时把缓冲区输出为时间序列JSON，便于将资源峰值与慢页面对应起来
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import psutil
+from utils.logger import print_step
+from modules.report_manifest import is_report_manifest
+from modules.conversion_archive import is_conversion_archive
+import config
+
+
+def check_connectivity(host=None, port=None, timeout=None):
+    """检查网络连通性（仅在后台采样线程中调用）"""
+    host = host or getattr(config, 'CONNECTIVITY_CHECK_HOST', '8.8.8.8')
+    port = port or getattr(config, 'CONNECTIVITY_CHECK_PORT', 53)
+    timeout = timeout or getattr(config, 'CONNECTIVITY_CHECK_TIMEOUT', 5)
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+# 资源时间序列文件名前缀
+TIMESERIES_PREFIX = "resource_timeseries_"
+
+
+def is_data_output_file(name):
+    """判断是否为转换数据输出文件（JSON或Parquet中间文件，不含报表清单和资源时间序列）"""
+    if name.startswith(TIMESERIES_PREFIX):
+        return False
+    return (name.endswith('.json') and not is_report_manifest(name)) or is_conversion_archive(name)
+
+
+def json_files_info(output_dir=None):
+    """统计输出目录中的转换数据文件（JSON/Parquet）数量和总大小"""
+    output_dir = output_dir or config.OUTPUT_DIR
+    files = []
+    if os.path.exists(output_dir):
+        for name in os.listdir(output_dir):
+            if is_data_output_file(name):
+                files.append({'name': name, 'size_mb': os.path.getsize(os.path.join(output_dir, name)) / 1024 / 1024})
+    return {
+        'count': len(files),
+        'total_size_mb': sum(f['size_mb'] for f in files),
+        'latest': files[-3:]
+    }
+
+
+class ResourceSampler:
+    """后台资源采样器：固定间隔采样写入环形缓冲区"""
+
+    def __init__(self, interval=None, buffer_size=None, connectivity_every=None):
+        """
+        Args:
+            interval: 采样间隔(秒)，默认 config.RESOURCE_SAMPLE_INTERVAL
+            buffer_size: 环形缓冲区容量，默认 config.RESOURCE_SAMPLE_BUFFER_SIZE
+            connectivity_every: 每N次采样检查一次网络连通性，默认 config.RESOURCE_CONNECTIVITY_EVERY
+        """
+        self.interval = interval or getattr(config, 'RESOURCE_SAMPLE_INTERVAL', 5)
+        self.connectivity_every = connectivity_every or getattr(config, 'RESOURCE_CONNECTIVITY_EVERY', 6)
+        buffer_size = buffer_size or getattr(config, 'RESOURCE_SAMPLE_BUFFER_SIZE', 720)
+        self.samples = deque(maxlen=buffer_size)
+        self.events = deque(maxlen=buffer_size)
+        self.process = psutil.Process(os.getpid())
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sample_count = 0
+        self._connectivity = None
+        self._last_net_io = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台采样线程（已启动时忽略）"""
+        if self.running:
+            return self
+        self._stop_event.clear()
+        # 初始化CPU计数基准，之后的 cpu_percent(interval=None) 返回两次采样之间的使用率
+        self.process.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, name="ResourceSampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def latest(self):
+        """获取最新样本，尚未采样时返回None"""
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def record_event(self, label):
+        """记录事件（如第N页超时重试），附带最新样本的时间戳便于对照"""
+        with self._lock:
+            self.events.append({
+                'timestamp': time.time(),
+                'elapsed_seconds': round(time.time() - self.start_time, 3),
+                'label': label
+            })
+
+    def take_sample(self):
+        """采集一次样本并写入缓冲区"""
+        sample = {
+            'timestamp': time.time(),
+            'elapsed_seconds': round(time.time() - self.start_time, 3)
+        }
+        try:
+            memory_info = self.process.memory_info()
+            sample.update({
+                'rss_mb': round(memory_info.rss / 1024 / 1024, 1),
+                'vms_mb': round(memory_info.vms / 1024 / 1024, 1),
+                'memory_percent': round(self.process.memory_percent(), 2),
+                'process_cpu': self.process.cpu_percent(interval=None),
+                'system_cpu': psutil.cpu_percent(interval=None),
+                'cpu_count': psutil.cpu_count()
+            })
+        except Exception as e:
+            sample['error'] = str(e)
+
+        try:
+            connections = self.process.net_connections(kind='inet') if hasattr(self.process, 'net_connections') \
+                else self.process.connections(kind='inet')
+            net_io = psutil.net_io_counters()
+            sample.update({
+                'total_connections': len(connections),
+                'established_connections': len([c for c in connections if c.status == 'ESTABLISHED']),
+                'bytes_sent': net_io.bytes_sent,
+                'bytes_recv': net_io.bytes_recv
+            })
+            if self._last_net_io is not None:
+                sample['recv_kb_per_second'] = round(
+                    (net_io.bytes_recv - self._last_net_io[1]) / 1024 / max(sample['timestamp'] - self._last_net_io[0], 1e-6), 1)
+            self._last_net_io = (sample['timestamp'], net_io.bytes_recv)
+        except Exception as e:
+            sample['network_error'] = str(e)
+
+        try:
+            disk_usage = psutil.disk_usage('/')
+            sample.update({
+                'disk_used_gb': round(disk_usage.used / 1024 / 1024 / 1024, 1),
+                'disk_total_gb': round(disk_usage.total / 1024 / 1024 / 1024, 1),
+                'disk_percent': round(disk_usage.used / disk_usage.total * 100, 1)
+            })
+            json_info = json_files_info()
+            sample['json_files'] = json_info['count']
+            sample['json_files_mb'] = round(json_info['total_size_mb'], 1)
+            sample['json_files_latest'] = json_info['latest']
+        except Exception as e:
+            sample['disk_error'] = str(e)
+
+        if self._sample_count % self.connectivity_every == 0:
+            self._connectivity = check_connectivity()
+        sample['connectivity'] = self._connectivity
+        self._sample_count += 1
+
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    def dump(self, path=None):
+        """
+        将缓冲区输出为时间序列JSON（默认写入诊断目录 config.DIAGNOSTICS_DIR）
+
+        Returns:
+            str: 输出文件路径，没有样本时返回None
+        """
+        with self._lock:
+            samples = list(self.samples)
+            events = list(self.events)
+        if not samples:
+            return None
+
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            diagnostics_dir = getattr(config, 'DIAGNOSTICS_DIR', os.path.join(config.TEMP_DIR, "diagnostics"))
+            path = os.path.join(diagnostics_dir, f"{TIMESERIES_PREFIX}{timestamp}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        payload = {
+            'interval_seconds': self.interval,
+            'started_at': datetime.fromtimestamp(self.start_time).strftime("%Y-%m-%d %H:%M:%S"),
+            'samples': [{k: v for k, v in sample.items() if k != 'json_files_latest'} for sample in samples],
+            'events': events
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print_step("资源时间序列", f"已输出 {len(samples)} 个资源样本和 {len(events)} 个事件: {path}")
+        return path
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.take_sample()
+            self._stop_event.wait(self.interval)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_resource_sampler():
+    """获取进程级共享的资源采样器（首次调用时启动后台线程）"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ResourceSampler()
+        if not _sampler.running:
+            _sampler.start()
+        return _sampler
+
+
+def dump_resource_timeseries(path=None):
+    """运行结束时输出资源时间序列（采样器未启动时不输出）"""
+    if _sampler is None:
+        return None
+    _sampler.stop()
+    return _sampler.dump(path)
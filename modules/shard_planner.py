@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+日期分片规划模块
+将较长的日期范围切分为按天或按N天的分片，供异步客户端并行获取各分片首页、
+再把所有分片的剩余页面放入同一个工作队列，并在分片边界按 conversion_id 去重
+"""
+
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+import config
+
+
+def plan_date_shards(start_date, end_date, shard_days=None, min_days=None):
+    """
+    规划日期分片
+
+    Args:
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        shard_days: 每个分片的天数，默认使用 config.DATE_SHARD_DAYS
+        min_days: 日期范围达到该天数才分片，默认使用 config.DATE_SHARDING_MIN_DAYS
+
+    Returns:
+        list: [(shard_start, shard_end), ...]，不需要分片时只包含原范围
+    """
+    shard_days = max(1, shard_days or getattr(config, 'DATE_SHARD_DAYS', 1))
+    min_days = min_days or getattr(config, 'DATE_SHARDING_MIN_DAYS', 3)
+
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    total_days = (end - start).days + 1
+
+    if total_days < min_days or total_days <= shard_days:
+        return [(start_date, end_date)]
+
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(shard_start + timedelta(days=shard_days - 1), end)
+        shards.append((shard_start.strftime("%Y-%m-%d"), shard_end.strftime("%Y-%m-%d")))
+        shard_start = shard_end + timedelta(days=1)
+    return shards
+
+
+class ConversionDeduplicator:
+    """按 conversion_id 去重（没有 conversion_id 的记录原样保留）"""
+
+    def __init__(self, key='conversion_id'):
+        self.key = key
+        self.seen = set()
+        self.duplicates = 0
+
+    def seed(self, records):
+        """用已有记录（如续传时spool中的记录）初始化已出现的conversion_id"""
+        for record in records:
+            conversion_id = record.get(self.key) if isinstance(record, Mapping) else None
+            if conversion_id is not None:
+                self.seen.add(conversion_id)
+
+    def filter(self, records):
+        """
+        过滤已出现过的记录
+
+        Args:
+            records: 一页conversion记录
+
+        Returns:
+            list: 首次出现的记录
+        """
+        unique_records = []
+        for record in records:
+            conversion_id = record.get(self.key) if isinstance(record, Mapping) else None
+            if conversion_id is not None:
+                if conversion_id in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(conversion_id)
+            unique_records.append(record)
+        return unique_records
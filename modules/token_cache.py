@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+认证Token缓存模块
+按 API主机 + Key + Secret 的哈希缓存认证token及其过期时间，同步和异步客户端共用，
+每次运行、每个账户不再重复请求 /authenticate；存储可插拔（默认本地JSON文件），
+token被服务器拒绝（401）时由客户端作废缓存并重新认证
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from utils.logger import print_step
+import config
+
+
+def token_key(api_key, api_secret, auth_url=None):
+    """token缓存键（不在缓存中保存明文secret）"""
+    host = urlparse(auth_url or config.INVOLVE_ASIA_AUTH_URL).netloc
+    digest = hashlib.sha256(f"{host}|{api_key}|{api_secret}".encode('utf-8')).hexdigest()[:24]
+    return f"{host}|{digest}"
+
+
+def token_preview(token):
+    """日志中显示的token前缀"""
+    return token[:8] + "..." if len(token) > 8 else token
+
+
+class MemoryTokenStore:
+    """进程内token存储（不落盘）"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = dict(entry)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class FileTokenStore:
+    """本地JSON文件token存储（文件权限600，原子写入，每次读取最新内容以便与其他进程共享）"""
+
+    def __init__(self, path=None):
+        self.path = path or getattr(config, 'TOKEN_CACHE_PATH', os.path.join("cache", "token_cache.json"))
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._load().get(key)
+
+    def set(self, key, entry):
+        with self._lock:
+            entries = self._load()
+            entries[key] = entry
+            now = time.time()
+            for stale_key in [k for k, value in entries.items() if value.get('expires_at', 0) < now]:
+                del entries[stale_key]
+            self._save(entries)
+
+    def delete(self, key):
+        with self._lock:
+            entries = self._load()
+            if entries.pop(key, None) is not None:
+                self._save(entries)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        """原子写入，写入失败只影响下次运行的缓存命中"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print_step("Token缓存", f"写入缓存失败: {str(e)}")
+
+
+class TokenCache:
+    """
+    带过期时间的token缓存
+    store 为任意实现 get(key) / set(key, entry) / delete(key) 的对象
+    """
+
+    def __init__(self, store=None, enabled=None, ttl_seconds=None, refresh_margin=None):
+        self.store = store if store is not None else MemoryTokenStore()
+        self.enabled = getattr(config, 'TOKEN_CACHE_ENABLED', True) if enabled is None else enabled
+        self.ttl_seconds = ttl_seconds or getattr(config, 'TOKEN_CACHE_TTL_SECONDS', 3600)
+        self.refresh_margin = refresh_margin if refresh_margin is not None else getattr(config, 'TOKEN_CACHE_REFRESH_MARGIN', 300)
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """获取未过期（且未进入刷新窗口）的token，没有时返回None"""
+        if not self.enabled:
+            return None
+        entry = self.store.get(key)
+        valid = entry is not None and entry.get('expires_at', 0) - self.refresh_margin > time.time()
+        with self._lock:
+            if valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry['token'] if valid else None
+
+    def put(self, key, token, expires_in=None):
+        """缓存认证得到的token，expires_in 为认证响应给出的有效期(秒)"""
+        if not self.enabled:
+            return
+        try:
+            lifetime = float(expires_in) if expires_in else self.ttl_seconds
+        except (TypeError, ValueError):
+            lifetime = self.ttl_seconds
+        now = time.time()
+        self.store.set(key, {'token': token, 'issued_at': now, 'expires_at': now + lifetime})
+
+    def invalidate(self, key, token=None):
+        """
+        作废缓存的token（服务器返回401时调用）
+
+        Args:
+            token: 被拒绝的token；缓存中已经是其他客户端刷新后的新token时保留
+        """
+        if not self.enabled:
+            return
+        entry = self.store.get(key)
+        if entry is None or (token is not None and entry.get('token') != token):
+            return
+        self.store.delete(key)
+        with self._lock:
+            self.invalidations += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _create_token_store():
+    backend = getattr(config, 'TOKEN_CACHE_BACKEND', "file")
+    if backend == "memory":
+        return MemoryTokenStore()
+    if backend != "file":
+        print_step("Token缓存", f"未知的存储类型 {backend}，使用本地文件存储")
+    return FileTokenStore()
+
+
+def get_token_cache():
+    """获取进程级共享的token缓存（首次调用时按当前配置创建存储）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TokenCache(_create_token_store())
+        return _cache
+
+
+def set_token_store(store):
+    """注入自定义token存储（如云端密钥存储），替换当前的进程级缓存"""
+    global _cache
+    with _cache_lock:
+        _cache = TokenCache(store)
+        return _cache
+
+
+def reset_token_cache():
+    """丢弃进程级缓存（配置修改后或测试时使用）"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -13,6 +13,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from modules.bytec_report_generator import ByteCReportGenerator
 from utils.logger import print_step
 import config
+import re
+import numpy as np
 import pandas as pd
 
 def create_test_conversion_data():
@@ -134,6 +136,73 @@ def test_bytec_report_generation():
         traceback.print_exc()
         return False
 
+def reference_offer_summary(generator, df):
+    """逐组计算的参考实现"""
+    def actual_partner_for(source):
+        for partner, partner_config in config.PARTNER_SOURCES_MAPPING.items():
+            if partner == "ByteC":
+                continue
+            if source in partner_config.get('sources', []):
+                return partner
+            pattern = partner_config.get('pattern', '')
+            if pattern and re.match(pattern, source):
+                return partner
+        return source
+
+    summary_list = []
+    for (offer_name, source), group in df.groupby(['offer_name', 'aff_sub1']):
+        sales_amount = group['sale_amount'].sum() if 'sale_amount' in group.columns else 0
+        estimated_earning = group['payout'].sum() if 'payout' in group.columns else 0
+        conversions = len(group) if 'conversion_id' in group.columns else 0
+        actual_partner = actual_partner_for(source)
+        if 'api_source' in group.columns:
+            platform_name = group['api_source'].iloc[0]
+        else:
+            partner_apis = config.get_partner_api_platforms(actual_partner)
+            platform_name = partner_apis[0] if partner_apis else (generator.platform_name or "LisaidByteC")
+        avg_commission_rate = (estimated_earning / sales_amount) * 100 if sales_amount > 0 else 0.0
+        adv_commission_rate = config.get_adv_commission_rate(platform_name, avg_commission_rate)
+        adv_commission = sales_amount * (adv_commission_rate / 100.0)
+        pub_commission_rate = config.get_pub_commission_rate(actual_partner, offer_name)
+        pub_commission = sales_amount * (pub_commission_rate / 100.0)
+        bytec_commission = sales_amount * ((adv_commission_rate - pub_commission_rate) / 100.0)
+        bytec_roi = (1 + (adv_commission - pub_commission) / pub_commission) * 100 if pub_commission > 0 else 0.0
+        summary_list.append({
+            'Offer Name': offer_name, 'Sale Amount': sales_amount, 'Estimated Earning': estimated_earning,
+            'Partner': actual_partner, 'Platform': platform_name, 'Source': source, 'Conversions': conversions,
+            'Avg. Commission Rate': round(avg_commission_rate, 2), 'Adv Commission Rate': round(adv_commission_rate, 2),
+            'Adv Commission': round(adv_commission, 2), 'Pub Commission Rate': round(pub_commission_rate, 2),
+            'Pub Commission': round(pub_commission, 2), 'ByteC Commission': round(bytec_commission, 2),
+            'ByteC ROI': round(bytec_roi, 2)
+        })
+    summary_df = pd.DataFrame(summary_list)
+    return summary_df.sort_values('Offer Name', ascending=True) if len(summary_df) > 0 else summary_df
+
+def test_offer_summary_matches_per_group():
+    """测试向量化汇总与逐组计算的结果逐位一致（含多平台、缺失Source、未配置费率和零销售额）"""
+    print_step("ByteC汇总测试", "测试向量化汇总与逐组计算一致")
+
+    rng = np.random.default_rng(7)
+    rows = 20000
+    offers = list({offer for _, offer in config.PUB_COMMISSION_RATE_MAPPING}) + ["Lazada SG - CPS", "Unknown Offer"]
+    sources = ["RPID455CXP", "RAMPUP", "OEM2", "OEM3", "VIVO1", "MKK", "TestPartner-A", "Other", "", None]
+    df = pd.DataFrame({
+        'conversion_id': np.arange(rows),
+        'offer_name': rng.choice(offers, rows),
+        'sale_amount': np.round(rng.random(rows) * 500, 2) * (rng.random(rows) > 0.05),
+        'payout': np.round(rng.random(rows) * 20, 2),
+        'aff_sub1': [sources[i] for i in rng.integers(0, len(sources), rows)],
+        'api_source': rng.choice(["IAByteC", "LisaidByteC", "OtherPlatform"], rows),
+    })
+    generator = ByteCReportGenerator()
+
+    for frame in (df, df.drop(columns=['api_source']), df.drop(columns=['payout', 'conversion_id'])):
+        expected = reference_offer_summary(generator, frame)
+        pd.testing.assert_frame_equal(generator._create_offer_summary(frame), expected, check_exact=True)
+
+    empty = df[df['aff_sub1'].isna()]
+    assert generator._create_offer_summary(empty).empty
+
 def test_main_integration():
     """测试与主程序的集成"""
     print_step("集成测试", "测试 main.py 中的 ByteC 集成")
@@ -159,6 +228,9 @@ if __name__ == "__main__":
     print("")
     print("=" * 50)
     
+    # 测试汇总计算
+    test_offer_summary_matches_per_group()
+    
     # 测试集成
     test_main_integration()
     
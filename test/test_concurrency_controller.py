@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+AIMD自适应并发控制器测试
+测试健康请求加性增加、429/超时减半以及并发槽位限制
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.concurrency_controller import AIMDConcurrencyController
+from utils.logger import print_step
+
+def test_additive_increase_and_multiplicative_decrease():
+    """测试加性增加与乘性减半"""
+    print_step("AIMD测试", "测试加性增加与乘性减半")
+
+    controller = AIMDConcurrencyController(initial_limit=4, min_limit=1, max_limit=6, latency_threshold=1.0)
+
+    # 约 current_limit 个健康请求后并发数 +1
+    for _ in range(5):
+        controller.record_success(0.1)
+    assert controller.current_limit == 5
+
+    # 慢请求不增加并发
+    for _ in range(20):
+        controller.record_success(5.0)
+    assert controller.current_limit == 5
+
+    # 不超过上限
+    for _ in range(100):
+        controller.record_success(0.1)
+    assert controller.current_limit == 6
+
+    # 429减半；减半前已发出的请求不再重复减半
+    started_at = time.monotonic()
+    controller.record_overload("429", started_at)
+    assert controller.current_limit == 3
+    controller.record_overload("429", started_at)
+    assert controller.current_limit == 3
+    controller.record_overload("超时", time.monotonic())
+    assert controller.current_limit == 1
+
+    stats = controller.get_stats()
+    assert stats['peak_limit'] == 6
+    assert stats['decreases'] == 2
+    assert stats['overloads'] == 3
+    assert stats['throughput_per_second'] > 0
+
+def test_fixed_mode_and_slot_limit():
+    """测试固定模式下槽位限制与原Semaphore一致，且可跨事件循环复用"""
+    print_step("AIMD测试", "测试固定并发模式的槽位限制")
+
+    controller = AIMDConcurrencyController(initial_limit=3, adaptive=False)
+    state = {'active': 0, 'peak': 0}
+
+    async def worker():
+        async with controller.slot():
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+        controller.record_success(0.01)
+
+    async def run_workers():
+        await asyncio.gather(*(worker() for _ in range(12)))
+
+    # 两次 asyncio.run 使用同一个控制器
+    asyncio.run(run_workers())
+    asyncio.run(run_workers())
+
+    assert state['peak'] == 3
+    assert controller.in_flight == 0
+    assert controller.current_limit == 3
+    controller.record_overload("429")
+    assert controller.current_limit == 3
+
+if __name__ == "__main__":
+    test_additive_increase_and_multiplicative_decrease()
+    test_fixed_mode_and_slot_limit()
+    print_step("测试完成", "AIMD自适应并发控制器测试全部通过")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+中间文件测试
+测试转换数据保存为Parquet后按原样读回（混合类型、缺失字段、嵌套对象），
+数据处理和JSON转换读取Parquet与读取JSON结果一致，未安装pyarrow时保存为JSON
+"""
+
+import sys
+import os
+import json
+import tempfile
+import zipfile
+import pandas as pd
+import pytest
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules import conversion_archive
+from modules.conversion_archive import save_conversions, load_conversion_archive, PARQUET_AVAILABLE
+from modules.conversion_frame import ConversionFrame
+from modules.data_processor import DataProcessor
+from modules.json_to_excel import JSONToExcelConverter
+from utils.logger import print_step
+
+def create_api_data(count=300):
+    """生成单API格式的测试数据"""
+    records = []
+    for i in range(count):
+        record = {
+            'conversion_id': 20250101000000 + i,
+            'offer_name': ["Shopee TH - CPS", "Lazada MY - CPS"][i % 2],
+            'sale_amount': f"{10 + i * 0.37:.2f}" if i % 5 else 12.5,  # 字符串与数字混合
+            'payout': f"{i * 0.05:.2f}",
+            'aff_sub1': ["OEM3", "RPID001", "MKK", None][i % 4],
+            'aff_sub2': f"sub2-{i % 7}",
+        }
+        if i % 7 == 0:
+            del record['aff_sub2']  # 缺失字段
+        if i % 11 == 0:
+            record['extra'] = {'tags': [i, "x"]}  # 嵌套对象
+        records.append(record)
+    return {'status': 'success', 'message': 'ok',
+            'data': {'count': count, 'page': 1, 'limit': count, 'data': records}}
+
+def _cells(path):
+    """xlsx文件中各部分的内容"""
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+def test_json_fallback():
+    """测试配置为json或未安装pyarrow时保存为JSON"""
+    print_step("中间文件测试", "测试JSON保存与回退")
+
+    api_data = create_api_data(20)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = save_conversions(api_data, os.path.join(tmp_dir, "conversions.json"), save_format='json')
+        assert path.endswith('.json')
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f) == api_data
+
+        original = conversion_archive.PARQUET_AVAILABLE
+        try:
+            conversion_archive.PARQUET_AVAILABLE = False
+            path = save_conversions(api_data, os.path.join(tmp_dir, "fallback.json"), save_format='parquet')
+            assert path.endswith('fallback.json') and os.path.exists(path)
+        finally:
+            conversion_archive.PARQUET_AVAILABLE = original
+
+def test_parquet_roundtrip_matches_json():
+    """测试Parquet读回的数据和处理结果与JSON一致"""
+    print_step("中间文件测试", "测试Parquet读写")
+
+    if not PARQUET_AVAILABLE:
+        pytest.skip("未安装pyarrow，无法测试Parquet读写")
+
+    api_data = create_api_data()
+    original_parallel = config.PARALLEL_EXPORT_ENABLED
+    original_output = config.OUTPUT_DIR
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            config.PARALLEL_EXPORT_ENABLED = False
+            config.OUTPUT_DIR = tmp_dir
+            json_path = save_conversions(api_data, os.path.join(tmp_dir, "conversions.json"), save_format='json')
+            parquet_path = save_conversions(api_data, os.path.join(tmp_dir, "conversions.json"), save_format='parquet')
+            assert parquet_path.endswith('.parquet')
+            assert os.path.getsize(parquet_path) < os.path.getsize(json_path)
+
+            df, result = load_conversion_archive(parquet_path)
+            expected = pd.DataFrame(api_data['data']['data'])
+            assert list(df.columns) == list(expected.columns)
+            for column in expected.columns:
+                actual = df[column].astype(object).where(df[column].notna(), None).tolist()
+                assert actual == expected[column].astype(object).where(expected[column].notna(), None).tolist(), column
+            assert result == {'status': 'success', 'message': 'ok', 'data': {'count': 300, 'page': 1, 'limit': 300}}
+
+            projected, _ = load_conversion_archive(parquet_path, columns=['aff_sub1', 'sale_amount', 'missing'])
+            assert list(projected.columns) == ['aff_sub1', 'sale_amount']
+            conversions = ConversionFrame.build(parquet_path, columns=['aff_sub1', 'sale_amount'])
+            assert conversions.metadata == {'count': 300, 'page': 1, 'limit': 300}
+            assert conversions.data['sale_amount'].tolist() == ConversionFrame.build(json_path).data['sale_amount'].tolist()
+
+            pub_files = {}
+            for name, path in (('json', json_path), ('parquet', parquet_path)):
+                summary = DataProcessor().process_data(path, output_dir=os.path.join(tmp_dir, name),
+                                                       start_date="2025-01-01", end_date="2025-01-01")
+                pub_files[name] = {os.path.basename(file): _cells(file) for file in summary['pub_files']}
+            assert pub_files['json'] == pub_files['parquet']
+
+            converter = JSONToExcelConverter()
+            assert _cells(converter.convert(json_path, "from_json.xlsx")) == \
+                _cells(converter.convert(parquet_path, "from_parquet.xlsx"))
+        finally:
+            config.PARALLEL_EXPORT_ENABLED = original_parallel
+            config.OUTPUT_DIR = original_output
+
+if __name__ == "__main__":
+    test_json_fallback()
+    if PARQUET_AVAILABLE:
+        test_parquet_roundtrip_matches_json()
+    else:
+        print_step("中间文件测试跳过", "未安装pyarrow")
+    print_step("测试完成", "中间文件测试全部通过")
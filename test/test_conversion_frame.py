@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+共享转换数据测试
+测试一次构建的规范化数据（数值转换、Source到Partner映射）被数据处理和ByteC报表共用时，
+结果与各自从原始数据构建一致，且共享数据不被修改
+"""
+
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.conversion_frame import ConversionFrame
+from modules.data_processor import DataProcessor
+from modules.bytec_report_generator import ByteCReportGenerator
+from utils.logger import print_step
+
+def create_api_data():
+    """生成多API合并格式的测试数据（金额为字符串，含无法解析的值和缺失值）"""
+    sources = ["OEM3", "RPID001", "OPPO", "MKK", None, "Other"]
+    records = [
+        {
+            'conversion_id': f"c{i}",
+            'offer_name': ["Shopee TH - CPS", "Lazada MY - CPS"][i % 2],
+            'sale_amount': ["10.555", "bad", None, 20][i % 4],
+            'payout': ["1.05", None, 2.5][i % 3],
+            'base_payout': 1.0,
+            'bonus_payout': "0.5",
+            'aff_sub1': sources[i % len(sources)],
+            'api_source': "LisaidByteC",
+        }
+        for i in range(48)
+    ]
+    return {'data': {'conversions': records, 'current_page_count': len(records),
+                     'merge_info': {'total_apis': 2, 'successful_apis': 2}}}
+
+def test_build_normalizes_once():
+    """测试构建时的数值转换、元信息和Partner映射"""
+    print_step("共享数据测试", "测试数值转换与Partner映射")
+
+    api_data = create_api_data()
+    conversions = ConversionFrame.build(api_data)
+    assert ConversionFrame.build(conversions) is conversions
+    assert len(conversions) == 48
+    assert conversions.metadata == {'current_page_count': 48, 'merge_info': {'total_apis': 2, 'successful_apis': 2}}
+
+    for field in config.CONVERSION_NUMERIC_FIELDS:
+        assert pd.api.types.is_numeric_dtype(conversions.data[field]), field
+    assert conversions.data['sale_amount'].tolist()[:4] == [10.555, 0.0, 0.0, 20.0]
+
+    assert conversions.sources == ["OEM3", "RPID001", "OPPO", "MKK", "Other"]
+    partner_map = conversions.partner_map()
+    assert partner_map == {source: config.match_source_to_partner(source) for source in conversions.sources}
+    assert conversions.partner_map() is partner_map
+
+    # 视图中修改栏位不影响共享数据
+    view = conversions.view(['sale_amount', 'missing'])
+    view['sale_amount'] = 0
+    assert list(view.columns) == ['sale_amount']
+    assert conversions.data['sale_amount'].iloc[0] == 10.555
+
+def test_shared_frame_matches_separate_builds():
+    """测试数据处理和ByteC报表共用一份数据时，结果与各自构建一致"""
+    print_step("共享数据测试", "测试共用数据的处理结果")
+
+    api_data = create_api_data()
+    conversions = ConversionFrame.build(api_data)
+    snapshot = conversions.data.copy()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shared = DataProcessor()
+        shared_result = shared.process_data(conversions, output_dir=os.path.join(tmp_dir, "shared"))
+        separate = DataProcessor()
+        separate_result = separate.process_data(api_data, output_dir=os.path.join(tmp_dir, "separate"))
+
+        pd.testing.assert_frame_equal(shared.processed_data, separate.processed_data)
+        assert shared_result['total_sale_amount'] == separate_result['total_sale_amount']
+        assert shared.pub_summary.keys() == separate.pub_summary.keys()
+        assert shared.original_data is conversions.data
+
+        generator = ByteCReportGenerator()
+        pd.testing.assert_frame_equal(
+            generator._create_offer_summary(generator._prepare_data(conversions)),
+            generator._create_offer_summary(generator._prepare_data(api_data))
+        )
+        report_path = generator.generate_bytec_report(conversions, "2025-01-01", "2025-01-07", output_dir=tmp_dir)
+        assert os.path.exists(report_path)
+        assert "多API模式" in generator._generate_report_summary(
+            generator._create_offer_summary(generator._prepare_data(conversions)), "2025-01-01", "2025-01-07", conversions)
+
+    # 各阶段都没有修改共享数据
+    pd.testing.assert_frame_equal(conversions.data, snapshot)
+
+if __name__ == "__main__":
+    test_build_normalizes_once()
+    test_shared_frame_matches_separate_builds()
+    print_step("测试完成", "共享转换数据测试全部通过")
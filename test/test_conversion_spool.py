@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Conversion spool 测试
+测试逐页落盘、惰性分块读取、预分配构建DataFrame、多API合并以及流式JSON保存
+"""
+
+import sys
+import os
+import json
+import tempfile
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.conversion_spool import ConversionSpool, SpoolReader, dump_json, records_to_dataframe
+from modules.data_processor import DataProcessor
+from modules.bytec_report_generator import ByteCReportGenerator
+from utils.logger import print_step
+
+def create_test_pages(pages=3, page_size=4, prefix="OEM3"):
+    """生成分页的测试转换数据"""
+    return [
+        [
+            {
+                'conversion_id': f"{page}-{i}",
+                'offer_name': 'Shopee TH - CPS',
+                'sale_amount': '10.50',
+                'payout': '1.05',
+                'aff_sub1': prefix,
+            }
+            for i in range(page_size)
+        ]
+        for page in range(pages)
+    ]
+
+def test_spool_roundtrip():
+    """测试逐页写入和分块读取"""
+    print_step("Spool测试", "测试逐页写入和分块读取")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "conversions.ndjson")
+        with ConversionSpool(path=path) as spool:
+            for page in create_test_pages():
+                spool.append_page(page)
+            reader = spool.reader()
+
+        assert len(reader) == 12
+        assert [record['conversion_id'] for record in reader][:2] == ['0-0', '0-1']
+
+        chunks = list(reader.iter_chunks(chunksize=5, columns=['conversion_id', 'sale_amount', 'missing']))
+        assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+        assert list(chunks[0].columns) == ['conversion_id', 'sale_amount']
+
+        # 续传：重新打开已有spool继续追加
+        with ConversionSpool(path=path) as spool:
+            assert spool.record_count == 12
+            spool.append_page(create_test_pages(pages=1)[0])
+        assert len(SpoolReader(path)) == 16
+
+def test_to_dataframe_matches_concat():
+    """测试预分配构建的DataFrame与拼接各块的结果一致（字段在部分块中缺失、类型不一致）"""
+    print_step("Spool测试", "测试预分配构建DataFrame")
+
+    records = [{'conversion_id': f"c{i}", 'payout': i, 'sale_amount': 1.5 * i, 'aff_sub1': "OEM3"} for i in range(5)]
+    records += [
+        {'conversion_id': "c5", 'payout': 2.5, 'aff_sub2': "late", 'is_new': True},
+        {'conversion_id': "c6", 'payout': 7, 'aff_sub1': "OEM2", 'is_new': False},
+        {'conversion_id': "c7", 'sale_amount': 3.0},
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "conversions.ndjson")
+        with ConversionSpool(path=path) as spool:
+            spool.append_page(records)
+            reader = spool.reader()
+
+        for chunksize in (1, 2, 3, 100):
+            df = reader.to_dataframe(chunksize=chunksize)
+            expected = pd.concat(list(reader.iter_chunks(chunksize=chunksize)), ignore_index=True)
+            pd.testing.assert_frame_equal(df, expected)
+
+        df = reader.to_dataframe(chunksize=3, columns=['conversion_id', 'payout', 'missing'])
+        assert list(df.columns) == ['conversion_id', 'payout'] and df['payout'].isna().sum() == 1
+
+def test_merge_with_fields_and_json_dump():
+    """测试多API spool合并、来源标记以及流式JSON保存"""
+    print_step("Spool测试", "测试多API合并与流式JSON保存")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        readers = []
+        for api_name in ['IAByteC', 'LisaidByteC']:
+            with ConversionSpool(path=os.path.join(tmp_dir, f"{api_name}.ndjson")) as spool:
+                for page in create_test_pages(pages=2, page_size=3):
+                    spool.append_page(page)
+                readers.append(spool.reader().with_fields(api_source=api_name))
+
+        merged = SpoolReader.merge(readers)
+        df = records_to_dataframe(merged)
+        assert len(df) == 12
+        assert df['api_source'].value_counts().to_dict() == {'IAByteC': 6, 'LisaidByteC': 6}
+
+        data = {'data': {'conversions': merged, 'current_page_count': len(merged)}, 'success': True}
+        json_path = os.path.join(tmp_dir, "conversions.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            dump_json(data, f)
+        with open(json_path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+
+        assert loaded['success'] is True
+        assert loaded['data']['current_page_count'] == 12
+        assert len(loaded['data']['conversions']) == 12
+        assert loaded['data']['conversions'][-1]['api_source'] == 'LisaidByteC'
+
+def test_processors_accept_spool():
+    """测试 DataProcessor 和 ByteC 报表生成器直接读取spool"""
+    print_step("Spool测试", "测试数据处理模块读取spool")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ConversionSpool(path=os.path.join(tmp_dir, "conversions.ndjson")) as spool:
+            for page in create_test_pages():
+                spool.append_page(page)
+            reader = spool.reader()
+
+        api_data = {'data': {'data': reader, 'current_page_count': len(reader)}}
+
+        processor = DataProcessor()
+        processor._load_data(api_data)
+        assert len(processor.original_data) == 12
+
+        df = ByteCReportGenerator()._prepare_data(api_data)
+        assert len(df) == 12
+        assert df['sale_amount'].sum() == 126.0
+
+if __name__ == "__main__":
+    test_spool_roundtrip()
+    test_to_dataframe_matches_concat()
+    test_merge_with_fields_and_json_dump()
+    test_processors_accept_spool()
+    print_step("测试完成", "Conversion spool 测试全部通过")
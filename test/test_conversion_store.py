@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+增量Conversion存储测试
+测试按日期水位判断需要请求的日期、缓存合并以及写入spool，
+获取失败时保留已缓存的记录、无数据日期写入水位、各日期并发获取，
+以及共享客户端时各日期只携带本次获取跳过的页面
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.conversion_store import ConversionStore, account_key
+from modules.conversion_spool import ConversionSpool
+from modules.mock_involve_server import MockInvolveAsiaServer
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from modules.token_cache import reset_token_cache
+from utils.logger import print_step
+
+def create_day_result(day, count=3, skipped_pages=None):
+    """生成某一天的API返回结果"""
+    return {
+        'status': 'success',
+        'data': {
+            'skipped_pages': skipped_pages or [],
+            'data': [
+                {'conversion_id': f"{day}-{i}", 'sale_amount': '10.00', 'aff_sub1': 'OEM3'}
+                for i in range(count)
+            ]
+        }
+    }
+
+def test_incremental_fetch_only_requests_open_days():
+    """测试第二次运行只请求缺失或未关闭的日期"""
+    print_step("增量存储测试", "测试重跑时只请求未关闭日期")
+
+    today = datetime.now().date()
+    start_date = (today - timedelta(days=6)).strftime("%Y-%m-%d")
+    end_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
+    account = account_key("test-secret", "USD")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ConversionStore(db_path=os.path.join(tmp_dir, "store.db"), open_days=2) as store:
+            requested = []
+
+            def fetch_day(day):
+                requested.append(day)
+                return create_day_result(day)
+
+            result = store.fetch_range(account, start_date, end_date, fetch_day)
+            assert len(requested) == 6
+            assert result['data']['count'] == 18
+
+            # 第二次运行：只有昨天（获取时距今不足2天）仍为open
+            requested.clear()
+            result = store.fetch_range(account, start_date, end_date, fetch_day)
+            assert requested == [end_date]
+            assert result['data']['count'] == 18
+            assert len(result['data']['incremental']['cached_days']) == 5
+            ids = [record['conversion_id'] for record in result['data']['data']]
+            assert ids[0] == f"{start_date}-0" and ids[-1] == f"{end_date}-2"
+
+            # 其他账户互不影响
+            assert len(store.get_days_to_fetch(account_key("other-secret", "USD"), start_date, end_date)) == 6
+
+def test_incomplete_day_stays_open_and_spool_output():
+    """测试有跳过页面的日期保持open，以及结果写入spool"""
+    print_step("增量存储测试", "测试不完整日期与spool输出")
+
+    account = account_key("test-secret")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ConversionStore(db_path=os.path.join(tmp_dir, "store.db"), open_days=2) as store:
+            results = {
+                '2025-06-01': create_day_result('2025-06-01', count=2),
+                '2025-06-02': create_day_result('2025-06-02', count=2, skipped_pages=[3]),
+                '2025-06-03': None,
+            }
+            with ConversionSpool(path=os.path.join(tmp_dir, "conversions.ndjson")) as spool:
+                result = store.fetch_range(account, '2025-06-01', '2025-06-03', results.get, spool=spool)
+
+            assert len(result['data']['data']) == 4
+            assert result['data']['skipped_pages'] == ['2025-06-02#3']
+
+            watermarks = store.get_watermarks(account, '2025-06-01', '2025-06-03')
+            assert watermarks['2025-06-01']['status'] == 'closed'
+            assert watermarks['2025-06-02']['status'] == 'open'
+            assert '2025-06-03' not in watermarks
+            assert store.get_days_to_fetch(account, '2025-06-01', '2025-06-03') == ['2025-06-02', '2025-06-03']
+
+def test_failed_refetch_keeps_cache_and_empty_days_close():
+    """测试open日期重新获取失败时使用缓存记录，成功获取但没有数据的日期写入水位"""
+    print_step("增量存储测试", "测试获取失败与无数据日期")
+
+    today = datetime.now().date()
+    yesterday = (today - timedelta(days=1)).strftime("%Y-%m-%d")
+    empty_day = (today - timedelta(days=5)).strftime("%Y-%m-%d")
+    account = account_key("test-secret")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ConversionStore(db_path=os.path.join(tmp_dir, "store.db"), open_days=2) as store:
+            store.save_day(account, yesterday, create_day_result(yesterday, count=2)['data']['data'])
+            assert store.get_days_to_fetch(account, yesterday, yesterday) == [yesterday]
+
+            # 重新获取open日期失败：本次结果使用已缓存的记录，水位不变
+            result = store.fetch_range(account, yesterday, yesterday, lambda day: None)
+            assert [record['conversion_id'] for record in result['data']['data']] == [f"{yesterday}-0", f"{yesterday}-1"]
+            assert result['data']['incremental'] == {'cached_days': [yesterday], 'fetched_days': []}
+            assert store.get_watermarks(account, yesterday, yesterday)[yesterday]['record_count'] == 2
+
+            # 成功获取但当天没有数据：写入水位，已关闭后不再请求
+            result = store.fetch_range(account, empty_day, empty_day, lambda day: create_day_result(day, count=0))
+            assert result is None
+            watermark = store.get_watermarks(account, empty_day, empty_day)[empty_day]
+            assert watermark['status'] == 'closed' and watermark['record_count'] == 0
+            assert store.get_days_to_fetch(account, empty_day, empty_day) == []
+
+def test_async_days_fetched_concurrently():
+    """测试异步增量获取时各日期并发请求（不超过配置的并发数），结果按日期顺序合并"""
+    print_step("增量存储测试", "测试日期并发获取")
+
+    account = account_key("test-secret")
+    in_flight = {'current': 0, 'peak': 0}
+
+    async def fetch_day_async(day):
+        in_flight['current'] += 1
+        in_flight['peak'] = max(in_flight['peak'], in_flight['current'])
+        await asyncio.sleep(0.01 if day.endswith('1') else 0.02)  # 后面的日期可能先完成
+        in_flight['current'] -= 1
+        return create_day_result(day, count=1)
+
+    original = config.CONVERSION_STORE_FETCH_CONCURRENCY
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            config.CONVERSION_STORE_FETCH_CONCURRENCY = 3
+            with ConversionStore(db_path=os.path.join(tmp_dir, "store.db"), open_days=2) as store:
+                result = asyncio.run(store.fetch_range_async(account, '2025-06-01', '2025-06-10', fetch_day_async))
+        finally:
+            config.CONVERSION_STORE_FETCH_CONCURRENCY = original
+
+    assert in_flight['peak'] == 3
+    ids = [record['conversion_id'] for record in result['data']['data']]
+    assert ids == [f"2025-06-{day:02d}-0" for day in range(1, 11)]
+
+def test_shared_client_skips_are_per_day():
+    """测试多个日期共享同一异步客户端时，其他日期跳过的页面不影响本日期的水位和空结果"""
+    print_step("增量存储测试", "测试共享客户端的跳过页面")
+
+    keys = ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL', 'REQUEST_DELAY', 'RESOURCE_MONITOR_ENABLED',
+            'DATE_SHARDING_ENABLED', 'PAGE_SIZE_PROBE_ENABLED', 'TOKEN_CACHE_BACKEND')
+    saved = {key: getattr(config, key) for key in keys}
+    account = account_key("secret")
+    with MockInvolveAsiaServer(settings={'records_per_day': 0, 'latency_ms': 1}) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+        config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+        config.REQUEST_DELAY = 0
+        config.RESOURCE_MONITOR_ENABLED = False
+        config.DATE_SHARDING_ENABLED = False
+        config.PAGE_SIZE_PROBE_ENABLED = False
+        config.TOKEN_CACHE_BACKEND = "memory"
+        reset_token_cache()
+        try:
+            api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+            api.skipped_pages.append("2025-05-31#3")  # 之前某个日期跳过的页面
+
+            async def fetch():
+                assert await api.authenticate()
+                with ConversionStore(db_path=os.path.join(tmp_dir, "store.db"), open_days=2) as store:
+                    result = await store.fetch_range_async(
+                        account, '2025-06-01', '2025-06-03',
+                        lambda day: api.get_conversions_async(day, day, allow_empty=True))
+                    return result, store.get_watermarks(account, '2025-06-01', '2025-06-03')
+
+            result, watermarks = asyncio.run(fetch())
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            reset_token_cache()
+
+    assert result is None
+    assert sorted(watermarks) == ['2025-06-01', '2025-06-02', '2025-06-03']
+    assert all(mark['status'] == 'closed' and mark['record_count'] == 0 for mark in watermarks.values())
+
+if __name__ == "__main__":
+    test_incremental_fetch_only_requests_open_days()
+    test_incomplete_day_stays_open_and_spool_output()
+    test_failed_refetch_keeps_cache_and_empty_days_close()
+    test_async_days_fetched_concurrently()
+    test_shared_client_skips_are_per_day()
+    print_step("测试完成", "增量Conversion存储测试全部通过")
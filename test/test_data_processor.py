@@ -138,6 +138,76 @@ def test_excel_file_processing():
         print_step("Excel测试异常", f"处理Excel文件时发生异常: {str(e)}")
         return None
 
+def test_export_partition_matches_masks():
+    """测试Partner分类导出的一次分组结果与逐个Source过滤一致"""
+    print_step("分组导出测试", "测试一次分组得到的Source数据和Partner汇总")
+    
+    import tempfile
+    test_data = create_test_data()
+    test_data.loc[len(test_data)] = [None, 99.0, 1.0, 1.0, 0.0, 'Campaign D', '2025-01-17 16:00:00', 'Data7']
+    processor = DataProcessor()
+    processor.processed_data = test_data
+    processor.start_date = processor.end_date = "2025-01-17"
+    
+    source_frames, source_totals = processor._partition_by_source()
+    assert list(source_frames) == list(test_data['aff_sub1'].dropna().unique())
+    for source, frame in source_frames.items():
+        expected = test_data[test_data['aff_sub1'] == source]
+        pd.testing.assert_frame_equal(frame, expected)
+        assert source_totals[source] == expected['sale_amount'].sum()
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        pub_files = processor._export_by_pub(output_dir)
+        assert len(pub_files) == len(processor.pub_summary)
+    for partner, summary in processor.pub_summary.items():
+        partner_data = test_data[test_data['aff_sub1'].isin(summary['sources'])]
+        assert summary['records'] == len(partner_data)
+        assert summary['amount_formatted'] == f"${partner_data['sale_amount'].sum():,.2f}"
+
+def test_parallel_export_matches_serial():
+    """测试并行生成Partner工作簿与串行导出的文件名、文件内容和pub_summary一致"""
+    print_step("并行导出测试", "测试进程池导出与串行导出结果一致")
+    
+    import tempfile
+    from openpyxl import load_workbook
+    from modules import parallel_export
+    
+    sources = ['RPID001', 'OEM2', 'MKK1', 'Other', 'OEM3', 'RAMPUP']
+    test_data = pd.DataFrame({
+        'aff_sub1': [sources[i % len(sources)] for i in range(600)],
+        'sale_amount': [round(i * 1.37, 2) for i in range(600)],
+        'offer_name': [f"Offer {i % 7}" for i in range(600)],
+    })
+    
+    def export(parallel):
+        processor = DataProcessor()
+        processor.processed_data = test_data
+        processor.start_date, processor.end_date = "2025-01-17", "2025-01-18"
+        config.PARALLEL_EXPORT_ENABLED = parallel
+        with tempfile.TemporaryDirectory() as output_dir:
+            pub_files = processor._export_by_pub(output_dir)
+            contents = {}
+            for path in pub_files:
+                wb = load_workbook(path)
+                contents[os.path.basename(path)] = {ws.title: list(ws.values) for ws in wb.worksheets}
+        return [os.path.basename(path) for path in pub_files], contents, processor.pub_summary
+    
+    saved = (config.PARALLEL_EXPORT_ENABLED, config.PARALLEL_EXPORT_MAX_WORKERS, parallel_export.available_cpus)
+    try:
+        config.PARALLEL_EXPORT_MAX_WORKERS = 3
+        parallel_export.available_cpus = lambda: 4  # 单核测试环境下也走进程池
+        assert parallel_export.plan_export_workers(5) == 3
+        assert parallel_export.plan_export_workers(5, largest_job_bytes=1 << 50) == 1  # 内存不足时串行
+        serial = export(False)
+        parallel = export(True)
+    finally:
+        config.PARALLEL_EXPORT_ENABLED, config.PARALLEL_EXPORT_MAX_WORKERS, parallel_export.available_cpus = saved
+    
+    assert parallel[0] == serial[0] and len(serial[0]) == 4
+    assert parallel[1] == serial[1]
+    assert parallel[2] == serial[2]
+    assert list(parallel[2]) == list(serial[2])
+
 def main():
     """主测试函数"""
     print_step("独立测试开始", "开始执行数据处理模块的独立测试")
@@ -148,6 +218,8 @@ def main():
         '2': ('API数据处理', test_data_processor_with_api_data),
         '3': ('独立功能测试', test_individual_functions),
         '4': ('Excel文件处理', test_excel_file_processing),
+        '5': ('分组导出测试', test_export_partition_matches_masks),
+        '6': ('并行导出测试', test_parallel_export_matches_serial),
         'a': ('全部测试', None)
     }
     
@@ -155,7 +227,7 @@ def main():
     for key, (description, _) in tests.items():
         print(f"   {key}) {description}")
     
-    choice = input(f"\n请选择测试选项 (1-4, a, 或按Enter默认测试1): ").strip().lower()
+    choice = input(f"\n请选择测试选项 (1-6, a, 或按Enter默认测试1): ").strip().lower()
     
     if not choice:
         choice = '1'
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+列类型策略测试
+测试低基数字符串列转为category、整数降级后取值不变，内存报告记录各阶段，
+以及压缩前后数据处理、ByteC汇总和Excel输出完全一致
+"""
+
+import sys
+import os
+import tempfile
+import zipfile
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.conversion_frame import ConversionFrame
+from modules.dtype_policy import optimize_dtypes, frame_memory_bytes, MemoryReport
+from modules.data_processor import DataProcessor
+from modules.bytec_report_generator import ByteCReportGenerator
+from modules.excel_writer import write_dataframe_workbook
+from utils.logger import print_step
+
+def create_test_frame(rows=4000):
+    """生成包含低基数、高基数、混合类型和整数列的测试数据"""
+    sources = ["OEM3", "RPID001", "OPPO", None, "MKK", "A&B <x>"]
+    return pd.DataFrame({
+        'conversion_id': [f"c{i}" for i in range(rows)],
+        'offer_id': [1000 + i % 6 for i in range(rows)],
+        'offer_name': [["Shopee TH - CPS", "Lazada MY - CPS", "Zalora - CPS"][i % 3] for i in range(rows)],
+        'sale_amount': [round(1 + (i * 7.31) % 500, 2) for i in range(rows)],
+        'payout': [round((i * 0.37) % 20, 2) for i in range(rows)],
+        'aff_sub1': [sources[i % len(sources)] for i in range(rows)],
+        'aff_sub2': [f"sub2-{i % 7}" for i in range(rows)],
+        'adv_sub1': [f"order-{i}" for i in range(rows)],
+        'mixed': [i if i % 2 else f"v{i % 3}" for i in range(rows)],
+        'api_source': ["LisaidByteC" if i % 3 else "IAByteC" for i in range(rows)],
+    })
+
+def test_optimize_dtypes_preserves_values():
+    """测试类型压缩后取值不变、内存减少，关闭策略时不转换"""
+    print_step("类型策略测试", "测试类型压缩")
+
+    df = create_test_frame()
+    optimized = optimize_dtypes(df)
+    assert optimized is not df and list(optimized.columns) == list(df.columns)
+
+    for column in ['offer_name', 'aff_sub1', 'aff_sub2', 'api_source']:
+        assert isinstance(optimized[column].dtype, pd.CategoricalDtype), column
+    assert optimized['offer_id'].dtype == 'int16'
+    assert optimized['sale_amount'].dtype == 'float64'
+    assert not isinstance(optimized['adv_sub1'].dtype, pd.CategoricalDtype)  # 高基数列
+    assert optimized['mixed'].dtype == object  # 混合类型列不转换
+    for column in df.columns:
+        assert optimized[column].astype(object).where(optimized[column].notna(), None).tolist() == \
+            df[column].astype(object).where(df[column].notna(), None).tolist(), column
+    assert frame_memory_bytes(optimized) < frame_memory_bytes(df)
+
+    original = config.DTYPE_POLICY_ENABLED
+    try:
+        config.DTYPE_POLICY_ENABLED = False
+        assert optimize_dtypes(df) is df
+    finally:
+        config.DTYPE_POLICY_ENABLED = original
+
+    report = MemoryReport()
+    entry = report.record("测试", optimized, frame_memory_bytes(df))
+    assert entry['baseline_mb'] > entry['data_mb'] and entry['rss_mb'] > 0
+    entry = report.record("测试分组", {'a': optimized, 'b': optimized})
+    assert entry['data_mb'] == 2 * frame_memory_bytes(optimized) / 1024 / 1024 and entry['baseline_mb'] is None
+    report.log_summary()
+
+def test_outputs_match_without_policy():
+    """测试压缩前后数据处理、ByteC汇总和Excel输出一致"""
+    print_step("类型策略测试", "测试压缩前后输出一致")
+
+    df = create_test_frame()
+    original = config.DTYPE_POLICY_ENABLED
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            for enabled in (False, True):
+                config.DTYPE_POLICY_ENABLED = enabled
+                conversions = ConversionFrame.build(df)
+                assert isinstance(conversions.data['aff_sub1'].dtype, pd.CategoricalDtype) == enabled
+                assert [stage['stage'] for stage in conversions.memory_report.stages] == ["构建共享数据"]
+
+                output_dir = os.path.join(tmp_dir, str(enabled))
+                processor = DataProcessor()
+                summary = processor.process_data(conversions, output_dir=output_dir,
+                                                 start_date="2025-01-01", end_date="2025-01-07")
+                generator = ByteCReportGenerator()
+                offer_summary = generator._create_offer_summary(generator._prepare_data(conversions))
+                main_path = os.path.join(output_dir, "main.xlsx")
+                write_dataframe_workbook(processor.processed_data, main_path, config.EXCEL_SHEET_NAME)
+
+                files = {}
+                for path in summary['pub_files'] + [main_path]:
+                    with zipfile.ZipFile(path) as archive:
+                        # docProps/core.xml 记录创建时间，不参与比较
+                        files[os.path.basename(path)] = {name: archive.read(name) for name in archive.namelist()
+                                                         if name != 'docProps/core.xml'}
+                results[enabled] = (summary['pub_summary'], offer_summary, files)
+                assert len(conversions.memory_report.stages) == 3
+        finally:
+            config.DTYPE_POLICY_ENABLED = original
+
+    assert results[True][0] == results[False][0]
+    pd.testing.assert_frame_equal(results[True][1], results[False][1])
+    assert results[True][2] == results[False][2]
+
+if __name__ == "__main__":
+    test_optimize_dtypes_preserves_values()
+    test_outputs_match_without_policy()
+    print_step("测试完成", "列类型策略测试全部通过")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Excel字符清理测试
+测试整表向量化清理与逐行逐单元格清理的写入结果一致（控制字符、不常见Unicode、首尾空白、
+缺失值、数字与字符串混合列、分类列、日期列和列名），以及干净的DataFrame原样返回
+"""
+
+import sys
+import os
+import re
+import numpy as np
+import pandas as pd
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.excel_sanitizer import sanitize_dataframe, sanitize_row
+from utils.logger import print_step
+
+def reference_clean_row(row, replace_unsupported=True):
+    """逐单元格清理的参考实现"""
+    cleaned_row = []
+    for cell in row:
+        if cell is None or isinstance(cell, (int, float)):
+            cleaned_row.append(cell)
+            continue
+        if cell is pd.NaT or cell is pd.NA:
+            cleaned_row.append(None)  # 缺失值写为空单元格
+            continue
+        cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F\uD800-\uDFFF\uFFFE\uFFFF]', '', str(cell))
+        if replace_unsupported:
+            cleaned = re.sub(r'[^\x20-\x7E\u00A0-\u024F\u1E00-\u1EFF\u2000-\u206F\u20A0-\u20CF\u2100-\u214F]', '_', cleaned)
+        cleaned_row.append(cleaned.strip())
+    return cleaned_row
+
+def rows_of(df):
+    return [[None if isinstance(cell, float) and np.isnan(cell) else cell for cell in row]
+            for row in dataframe_to_rows(df, index=False, header=True)]
+
+def sample_frame(rows=600):
+    texts = ["Shopee ID", " padded ", "tab\tinside", "ctrl\x01\x7f\x85", "中文商品", "Café €5 ™",
+             "emoji 🎉", "　全角空格　", "", None, "bad\uFFFE\uFFFF xml"]
+    return pd.DataFrame({
+        'offer_name': [texts[i % len(texts)] for i in range(rows)],
+        'clean\x02 header': [f"ID{i}" for i in range(rows)],
+        'sale_amount': np.arange(rows) * 1.25,
+        'conversions': np.arange(rows),
+        'mixed': [[1, "x\x03y", 2.5, None, "商品"][i % 5] for i in range(rows)],
+        'aff_sub1': pd.Categorical([["OPPO", "VIVO ", "中文"][i % 3] for i in range(rows)]),
+        'collide': pd.Categorical([["A", "A "][i % 2] for i in range(rows)]),
+        'datetime': pd.to_datetime(["2025-06-01 10:00:00", None] * (rows // 2)),
+        'flag': [i % 2 == 0 for i in range(rows)],
+    })
+
+def test_sanitize_matches_per_cell_cleaning():
+    """测试两种清理模式下整表清理与逐单元格清理结果一致"""
+    print_step("Excel清理测试", "测试与逐单元格清理结果一致")
+
+    df = sample_frame()
+    original = df.copy()
+    for replace_unsupported in (True, False):
+        expected = [reference_clean_row(row, replace_unsupported) for row in rows_of(df)]
+        assert rows_of(sanitize_dataframe(df, replace_unsupported)) == expected
+    pd.testing.assert_frame_equal(df, original)  # 原DataFrame不变
+
+    total_row = ['TOTAL', 10.5, 3, '', ' x\x01 ', None]
+    assert sanitize_row(total_row, replace_unsupported=False) == reference_clean_row(total_row, False)
+
+    string_frame = df[['offer_name']].astype("str")
+    assert rows_of(sanitize_dataframe(string_frame)) == [reference_clean_row(row) for row in rows_of(string_frame)]
+
+def test_clean_frame_is_returned_unchanged():
+    """测试已经干净的DataFrame不做复制"""
+    print_step("Excel清理测试", "测试干净的DataFrame原样返回")
+
+    df = pd.DataFrame({'offer_name': ["A", "B", None], 'sale_amount': [1.0, 2.0, 3.0]})
+    assert sanitize_dataframe(df) is df
+    assert sanitize_dataframe(pd.DataFrame()).empty
+
+if __name__ == "__main__":
+    test_sanitize_matches_per_cell_cleaning()
+    test_clean_frame_is_returned_unchanged()
+    print_step("测试完成", "Excel字符清理测试全部通过")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Excel输出引擎测试
+测试流式写入的文件与openpyxl逐行写入的单元格值一致（分块、混合类型、缺失值、XML转义），
+按列数字格式、汇总行、条件格式和多个工作表可被openpyxl/pandas正常读取，
+缺失值(pd.NA/NaT)写为空单元格，XML不允许的字符在不替换特殊字符时同样被移除
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.excel_sanitizer import sanitize_dataframe
+from modules.excel_writer import StreamingWorkbook, write_dataframe_workbook, CURRENCY_FORMAT, PERCENT_FORMAT
+from utils.logger import print_step
+
+def sample_frame(rows=250):
+    return pd.DataFrame({
+        'conversion_id': np.arange(rows) + 521748423,
+        'offer_name': [["Shopee ID <CPS>", "A & B", "中文 Offer", " padded ", None][i % 5] for i in range(rows)],
+        'sale_amount': [[12.34, 0.1 + 0.2, np.nan, 29525.69, -1e-05][i % 5] for i in range(rows)],
+        'mixed': [[1, "x\x03y", 2.5, None, True][i % 5] for i in range(rows)],
+        'approved': [i % 2 == 0 for i in range(rows)],
+        'datetime': pd.to_datetime(["2025-06-01 10:00:00"] * rows),
+    })
+
+def sheet_values(path):
+    return {ws.title: [[cell.value for cell in row] for row in ws.iter_rows()] for ws in load_workbook(path).worksheets}
+
+def test_streaming_matches_openpyxl():
+    """测试分块流式写入与openpyxl逐行写入的单元格值一致"""
+    print_step("Excel引擎测试", "测试与openpyxl写入结果一致")
+
+    df = sample_frame()
+    saved = config.EXCEL_WRITE_CHUNK_ROWS
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference = os.path.join(tmp_dir, "reference.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Data & <Report>"
+        for row in dataframe_to_rows(sanitize_dataframe(df), index=False, header=True):
+            ws.append(row)
+        wb.save(reference)
+
+        streamed = os.path.join(tmp_dir, "streamed.xlsx")
+        try:
+            config.EXCEL_WRITE_CHUNK_ROWS = 64  # 多个块
+            write_dataframe_workbook(df, streamed, "Data & <Report>", column_formats={'sale_amount': CURRENCY_FORMAT})
+        finally:
+            config.EXCEL_WRITE_CHUNK_ROWS = saved
+
+        expected = sheet_values(reference)["Data & <Report>"]
+        actual = sheet_values(streamed)["Data & <Report>"]
+        assert len(actual) == len(df) + 1
+        # openpyxl 把NaN写成空值单元格，这里不写该单元格，读取结果同为None
+        assert actual == [[None if value == '' else value for value in row] for row in expected]
+
+        ws = load_workbook(streamed).active
+        assert ws['C2'].number_format == CURRENCY_FORMAT and ws['C1'].number_format == 'General'
+        assert ws['B2'].value == "Shopee ID <CPS>" and ws['D6'].value is True
+        assert pd.read_excel(streamed).shape == df.shape
+
+def test_sheets_rows_and_conditional_format():
+    """测试多个工作表、单独追加的行和条件格式"""
+    print_step("Excel引擎测试", "测试工作表、汇总行和条件格式")
+
+    summary = pd.DataFrame({'Offer Name': ["A", "B"], 'Sale Amount': [100.0, 50.5], 'ByteC ROI': [1.5, -0.25]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "report.xlsx")
+        workbook = StreamingWorkbook()
+        sheet = workbook.add_sheet("2025-06-01", summary.columns, {'Sale Amount': CURRENCY_FORMAT, 'ByteC ROI': PERCENT_FORMAT})
+        sheet.write_dataframe(summary)
+        sheet.append([])
+        sheet.append(['TOTAL', 150.5, 1.25])
+        sheet.add_conditional_format('C2:C3', 'lessThan', '0', fill_color='FFCCCC', font_color='CC0000')
+        workbook.add_sheet("No_Data").append(["Partner", " Message "])
+        assert workbook.sheet_count == 2
+        # 重名的工作表（不区分大小写）依次追加序号，与openpyxl一致
+        assert workbook.add_sheet("no_data").title == "no_data1"
+        assert workbook.add_sheet("No_Data").title == "No_Data2"
+        assert workbook.add_sheet("X" * 31).title == "X" * 31 and workbook.add_sheet("X" * 31).title == "X" * 30 + "1"
+        workbook.save(path)
+
+        wb = load_workbook(path)
+        assert wb.sheetnames == ["2025-06-01", "No_Data", "no_data1", "No_Data2", "X" * 31, "X" * 30 + "1"]
+        ws = wb["2025-06-01"]
+        assert [cell.value for cell in ws[5]] == ['TOTAL', 150.5, 1.25]
+        assert ws['B5'].number_format == CURRENCY_FORMAT and ws['C3'].number_format == PERCENT_FORMAT
+        assert ws.max_row == 5
+        rules = list(ws.conditional_formatting)
+        assert len(rules) == 1 and str(rules[0].sqref) == 'C2:C3'
+        rule = rules[0].rules[0]
+        assert rule.operator == 'lessThan' and rule.formula == ['0'] and rule.dxf.font.color.rgb == 'FFCC0000'
+        assert wb["No_Data"]['B1'].value == " Message "
+        assert not os.path.exists(path + ".tmp")
+
+def test_missing_values_and_xml_invalid_chars():
+    """测试pd.NA/NaT/NaN写为空单元格，不替换特殊字符时U+FFFE/U+FFFF也不会写入工作表"""
+    print_step("Excel引擎测试", "测试缺失值和XML不允许的字符")
+
+    df = pd.DataFrame({
+        'Offer Name': ["A\uFFFEB", "中文\uFFFF", "C"],
+        'Conversions': pd.array([1, None, 3], dtype="Int64"),
+        'Note': pd.array(["x", pd.NA, "z"], dtype=object),
+        'Date': pd.to_datetime(["2025-06-01", None, "2025-06-03"]),
+        'Sale Amount': [1.5, np.nan, np.inf],
+    })
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "report.xlsx")
+        workbook = StreamingWorkbook()
+        sheet = workbook.add_sheet("Data", df.columns, {'Sale Amount': CURRENCY_FORMAT})
+        sheet.write_dataframe(df, replace_unsupported=False)
+        sheet.append(["TOTAL", pd.NA, None, pd.NaT, 1.5])
+        workbook.save(path)
+
+        rows = sheet_values(path)["Data"]
+        assert rows[1] == ["AB", 1, "x", "2025-06-01 00:00:00", 1.5]
+        assert rows[2] == ["中文", None, None, None, None]
+        assert rows[3] == ["C", 3, "z", "2025-06-03 00:00:00", None]
+        assert rows[4] == ["TOTAL", None, None, None, 1.5]
+        assert load_workbook(path)["Data"]['E5'].number_format == CURRENCY_FORMAT
+
+if __name__ == "__main__":
+    test_streaming_matches_openpyxl()
+    test_sheets_rows_and_conditional_format()
+    test_missing_values_and_xml_invalid_chars()
+    print_step("测试完成", "Excel输出引擎测试全部通过")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+可续传获取检查点测试
+测试检查点记录已完成/跳过页面，以及续传时只获取缺失页面并追加到原spool，
+有记录数限制时不续传，分片计划不一致时拒绝续传
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.fetch_checkpoint import FetchCheckpoint, open_checkpointed_spool
+from modules.involve_asia_api import InvolveAsiaAPI
+from modules.page_size_probe import PageSizeTuner
+from utils.logger import print_step
+
+TOTAL_RECORDS = 250
+
+def create_page_result(page):
+    """生成分页API返回结果（共250条，每页100条）"""
+    records = [{'conversion_id': f"c-{i}"} for i in range((page - 1) * 100, min(page * 100, TOTAL_RECORDS))]
+    return {
+        'data': {
+            'page': page,
+            'limit': 100,
+            'count': TOTAL_RECORDS,
+            'nextPage': page + 1 if page < 3 else None,
+            'data': records
+        }
+    }
+
+def create_client(failing_pages, requested_pages):
+    """创建不访问网络的同步客户端：指定页面返回失败"""
+    client = InvolveAsiaAPI(api_secret="secret", api_key="key")
+    client.token = "token"
+    client.request_delay = 0
+    client.resource_monitor.print_resource_status = lambda *args, **kwargs: None
+    client.page_size = PageSizeTuner(client.api_secret, enabled=False)  # 固定每页100条
+
+    def handle_page_request(page, headers, data, api_label="", probe=False):
+        requested_pages.append(page)
+        if page in failing_pages:
+            return None, False
+        return create_page_result(page), True
+
+    client._handle_page_request = handle_page_request
+    return client
+
+def test_resume_fetches_only_missing_pages():
+    """测试第一次有跳过页面，续传时只请求缺失页面"""
+    print_step("检查点测试", "测试续传只获取缺失页面")
+
+    original_temp_dir = config.TEMP_DIR
+    original_checkpoint_dir = config.CHECKPOINT_DIR
+    original_spool_dir = config.SPOOL_DIR
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.TEMP_DIR = tmp_dir
+        config.CHECKPOINT_DIR = os.path.join(tmp_dir, "checkpoints")
+        config.SPOOL_DIR = os.path.join(tmp_dir, "spool")
+        try:
+            requested = []
+            spool, checkpoint = open_checkpointed_spool("TestAPI", "2025-06-01", "2025-06-02")
+            with spool:
+                result = create_client({2}, requested).get_conversions(
+                    "2025-06-01", "2025-06-02", spool=spool, checkpoint=checkpoint)
+            assert requested == [1, 2, 3]
+            assert result['data']['skipped_pages'] == [2]
+            assert len(result['data']['data']) == 150
+            assert checkpoint.missing_pages() == [("2025-06-01", "2025-06-02", 2)]
+
+            # 续传：只请求第2页，追加到原spool
+            requested = []
+            spool, checkpoint = open_checkpointed_spool("TestAPI", "2025-06-01", "2025-06-02", resume=True)
+            assert 'token' not in checkpoint.state  # token不写入检查点
+            with spool:
+                result = create_client(set(), requested).get_conversions(
+                    "2025-06-01", "2025-06-02", spool=spool, checkpoint=checkpoint)
+            assert requested == [2]
+            assert result['data']['spool_path'] == checkpoint.spool_path
+            ids = [record['conversion_id'] for record in result['data']['data']]
+            assert len(ids) == TOTAL_RECORDS and len(set(ids)) == TOTAL_RECORDS
+
+            reloaded = FetchCheckpoint.open("TestAPI", "2025-06-01", "2025-06-02", resume=True)
+            assert reloaded.state['completed'] is True
+            assert reloaded.missing_pages() == []
+
+            # 有记录数限制时不续传，新建spool，避免重复追加已有记录
+            original_limit = config.MAX_RECORDS_LIMIT
+            try:
+                config.MAX_RECORDS_LIMIT = 120
+                spool, checkpoint = open_checkpointed_spool("TestAPI", "2025-06-01", "2025-06-02", resume=True)
+                with spool:
+                    result = create_client(set(), []).get_conversions(
+                        "2025-06-01", "2025-06-02", spool=spool, checkpoint=checkpoint)
+                assert spool.path != reloaded.spool_path
+                assert len(result['data']['data']) == 120
+            finally:
+                config.MAX_RECORDS_LIMIT = original_limit
+        finally:
+            config.TEMP_DIR = original_temp_dir
+            config.CHECKPOINT_DIR = original_checkpoint_dir
+            config.SPOOL_DIR = original_spool_dir
+
+def test_resume_rejects_shard_plan_mismatch():
+    """测试续传时分片计划与检查点不一致（如异步按日分片后用同步模式续传）时拒绝获取，不重复写入spool"""
+    print_step("检查点测试", "测试分片计划不一致时拒绝续传")
+
+    original_temp_dir = config.TEMP_DIR
+    original_checkpoint_dir = config.CHECKPOINT_DIR
+    original_spool_dir = config.SPOOL_DIR
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.TEMP_DIR = tmp_dir
+        config.CHECKPOINT_DIR = os.path.join(tmp_dir, "checkpoints")
+        config.SPOOL_DIR = os.path.join(tmp_dir, "spool")
+        try:
+            day_shards = [("2025-06-01", "2025-06-01"), ("2025-06-02", "2025-06-02")]
+            spool, checkpoint = open_checkpointed_spool("TestAPI", "2025-06-01", "2025-06-02")
+            with spool:
+                spool.append_page([{'conversion_id': "c-0"}])
+                checkpoint.bind(shards=day_shards)
+                checkpoint.set_shard_total("2025-06-01", "2025-06-01", 1, 1)
+                checkpoint.mark_done("2025-06-01", "2025-06-01", 1)
+
+            # 相同分片（顺序不同）可以续传
+            checkpoint.bind(shards=list(reversed(day_shards)))
+            try:
+                checkpoint.bind(shards=[("2025-06-01", "2025-06-02")])
+                assert False, "分片计划不一致时应拒绝"
+            except ValueError as e:
+                assert "不一致" in str(e)
+
+            requested = []
+            spool, checkpoint = open_checkpointed_spool("TestAPI", "2025-06-01", "2025-06-02", resume=True)
+            with spool:
+                result = create_client(set(), requested).get_conversions(
+                    "2025-06-01", "2025-06-02", spool=spool, checkpoint=checkpoint)
+                assert spool.record_count == 1
+            assert result is None
+            assert requested == []
+            assert checkpoint.shard_ranges == day_shards
+        finally:
+            config.TEMP_DIR = original_temp_dir
+            config.CHECKPOINT_DIR = original_checkpoint_dir
+            config.SPOOL_DIR = original_spool_dir
+
+if __name__ == "__main__":
+    test_resume_fetches_only_missing_pages()
+    test_resume_rejects_shard_plan_mismatch()
+    print_step("测试完成", "可续传获取检查点测试全部通过")
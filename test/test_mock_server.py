@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Involve Asia 模拟服务器测试
+测试同步和异步客户端能从本地模拟服务器完整获取合成数据，以及429注入统计
+"""
+
+import sys
+import os
+import asyncio
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.mock_involve_server import MockInvolveAsiaServer
+from modules.fetch_benchmark import percentile
+from modules.token_cache import reset_token_cache
+from modules.involve_asia_api import InvolveAsiaAPI
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from utils.logger import print_step
+
+MOCK_SETTINGS = {'records_per_day': 150, 'latency_ms': 1, 'seed': 7}
+
+def point_config_to(server):
+    """让客户端使用模拟服务器，返回原配置"""
+    saved = {key: getattr(config, key) for key in
+             ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL', 'REQUEST_DELAY', 'RATE_LIMIT_DELAY', 'RESOURCE_MONITOR_ENABLED',
+              'PAGE_SIZE_PROBE_ENABLED', 'TOKEN_CACHE_BACKEND')}
+    config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+    config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+    config.REQUEST_DELAY = 0
+    config.RATE_LIMIT_DELAY = 0
+    config.RESOURCE_MONITOR_ENABLED = False
+    config.PAGE_SIZE_PROBE_ENABLED = False  # 按默认页面大小校验页数
+    config.TOKEN_CACHE_BACKEND = "memory"  # 模拟服务器的token不写入本地缓存文件
+    reset_token_cache()
+    return saved
+
+def restore_config(saved):
+    for key, value in saved.items():
+        setattr(config, key, value)
+    reset_token_cache()
+
+def test_sync_and_async_clients_fetch_all_pages():
+    """测试同步和异步客户端获取相同的完整数据"""
+    print_step("模拟服务器测试", "测试同步和异步客户端完整获取")
+
+    with MockInvolveAsiaServer(settings=MOCK_SETTINGS) as server:
+        saved = point_config_to(server)
+        try:
+            with InvolveAsiaAPI(api_secret="secret", api_key="key") as api:
+                assert api.authenticate()
+                sync_result = api.get_conversions("2025-06-01", "2025-06-03")
+            sync_ids = [record['conversion_id'] for record in sync_result['data']['data']]
+            assert len(sync_ids) == 450 and len(set(sync_ids)) == 450
+            assert server.get_stats()['pages_served'] == 5
+
+            async def fetch():
+                api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+                assert await api.authenticate()
+                return await api.get_conversions_async("2025-06-01", "2025-06-03")
+
+            async_result = asyncio.run(fetch())
+            async_ids = [record['conversion_id'] for record in async_result['data']['data']]
+            assert sorted(async_ids) == sorted(sync_ids)
+        finally:
+            restore_config(saved)
+
+def test_rate_limit_injection_and_stats():
+    """测试429注入会被统计，异步客户端按Retry-After重试后仍获取完整数据"""
+    print_step("模拟服务器测试", "测试429注入和统计")
+
+    settings = {**MOCK_SETTINGS, 'rate_limit_probability': 0.5, 'retry_after': 0}
+    with MockInvolveAsiaServer(settings=settings) as server:
+        saved = point_config_to(server)
+        try:
+            async def fetch():
+                api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+                assert await api.authenticate()
+                return await api.get_conversions_async("2025-06-01", "2025-06-03")
+
+            result = asyncio.run(fetch())
+            stats = server.get_stats()
+            assert len(result['data']['data']) == 450
+            assert stats['conversion_requests'] == stats['pages_served'] + stats['rate_limited']
+            assert stats['rate_limited'] > 0
+        finally:
+            restore_config(saved)
+
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([], 95) == 0.0
+
+if __name__ == "__main__":
+    test_sync_and_async_clients_fetch_all_pages()
+    test_rate_limit_injection_and_stats()
+    print_step("测试完成", "模拟服务器测试全部通过")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+页面处理流水线测试
+测试有序流水线按页码顺序处理乱序完成的页面、处理异常的传播，
+以及异步客户端在获取过程中规范化金额字段并保持页面顺序
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.page_pipeline import PagePipeline, PageNormalizer
+from modules.mock_involve_server import MockInvolveAsiaServer
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from modules.token_cache import reset_token_cache
+from utils.logger import print_step
+
+def test_ordered_pipeline_and_error_propagation():
+    """测试乱序到达的页面按序号处理，处理函数异常在close时抛出"""
+    print_step("流水线测试", "测试有序处理和异常传播")
+
+    processed = []
+
+    async def run_ordered():
+        async with PagePipeline(ordered=True, max_pending=2) as pipeline:
+            async def produce(seq):
+                await asyncio.sleep(0.01 * (5 - seq))  # 后面的页面先完成
+                await pipeline.submit(processed.append, seq, seq=seq)
+            await asyncio.gather(*(produce(seq) for seq in range(5)))
+
+    asyncio.run(run_ordered())
+    assert processed == [0, 1, 2, 3, 4]
+
+    def fail(page):
+        raise ValueError(f"bad page {page}")
+
+    async def run_failing():
+        async with PagePipeline(use_thread=False, max_pending=1) as pipeline:
+            for page in range(5):
+                try:
+                    await pipeline.submit(fail, page)
+                except ValueError:
+                    pass  # 消费者出错后提交立即失败
+
+    try:
+        asyncio.run(run_failing())
+        assert False, "处理函数的异常应该被抛出"
+    except ValueError as e:
+        assert "bad page 0" in str(e)
+
+    records = [{'sale_amount': "1,234.50", 'payout': "bad", 'aff_sub1': "RAMPUP"}]
+    PageNormalizer(partner_field="partner").normalize_page(records)
+    assert records[0] == {'sale_amount': 1234.5, 'payout': "bad", 'aff_sub1': "RAMPUP", 'partner': "RAMPUP"}
+
+def test_async_client_normalizes_pages_in_order():
+    """测试异步客户端的页面在流水线中按页码顺序写入，金额字段已转为数值"""
+    print_step("流水线测试", "测试异步客户端按页码顺序处理页面")
+
+    saved = {key: getattr(config, key) for key in ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL',
+                                                   'REQUEST_DELAY', 'RESOURCE_MONITOR_ENABLED', 'DATE_SHARDING_ENABLED',
+                                                   'PAGE_SIZE_PROBE_ENABLED', 'DEFAULT_PAGE_LIMIT', 'PAGE_SIZE_CACHE_PATH',
+                                                   'TOKEN_CACHE_BACKEND')}
+    with MockInvolveAsiaServer(settings={'records_per_day': 950, 'latency_distribution': 'uniform',
+                                         'latency_ms': 20, 'latency_jitter_ms': 15}) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+        config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+        config.REQUEST_DELAY = 0
+        config.RESOURCE_MONITOR_ENABLED = False
+        config.DATE_SHARDING_ENABLED = False
+        config.PAGE_SIZE_PROBE_ENABLED = False  # 固定页面大小，950条记录分10页，才能检验乱序完成的页面
+        config.DEFAULT_PAGE_LIMIT = 100
+        config.PAGE_SIZE_CACHE_PATH = os.path.join(tmp_dir, "page_size_cache.json")
+        config.TOKEN_CACHE_BACKEND = "memory"  # 模拟服务器的token不写入本地缓存文件
+        reset_token_cache()
+        try:
+            async def fetch():
+                api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+                assert await api.authenticate()
+                return await api.get_conversions_async("2025-06-01", "2025-06-01")
+
+            records = asyncio.run(fetch())['data']['data']
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            reset_token_cache()
+
+    ids = [record['conversion_id'] for record in records]
+    assert server.get_stats()['pages_served'] == 10
+    assert len(ids) == 950 and ids == sorted(ids)
+    assert all(isinstance(record['sale_amount'], float) for record in records)
+
+if __name__ == "__main__":
+    test_ordered_pipeline_and_error_propagation()
+    test_async_client_normalizes_pages_in_order()
+    print_step("测试完成", "页面处理流水线测试全部通过")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+页面大小探测测试
+测试探测候选值逐级减小、缓存复用、超时减半，
+以及同步/异步客户端在API限制limit（拒绝、截断或静默截断）时用更少的请求获取完整数据
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.page_size_probe import PageSizeCache, PageSizeTuner, reset_page_size_cache
+from modules.token_cache import reset_token_cache
+from modules.mock_involve_server import MockInvolveAsiaServer
+from modules.involve_asia_api import InvolveAsiaAPI
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from utils.logger import print_step
+
+def test_probe_cache_and_shrink():
+    """测试被拒绝时减小候选值，确认后写入缓存，新实例复用缓存，超时达到阈值后减半"""
+    print_step("页面大小测试", "测试探测、缓存和超时减半")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = PageSizeCache(path=os.path.join(tmp_dir, "page_size.json"))
+        options = dict(api_url="http://api.test", cache=cache, candidates=[1000, 500, 250],
+                       min_size=100, timeout_threshold=2, enabled=True)
+
+        tuner = PageSizeTuner("secret", **options)
+        assert tuner.probing and tuner.limit == 1000
+        tuner.reject(1000)
+        assert tuner.limit == 500
+        assert tuner.confirm(500, 400) == 400  # API截断时以回显值为准
+        assert not tuner.probing
+
+        reloaded = PageSizeTuner("secret", cache=PageSizeCache(path=cache.path), **{
+            key: value for key, value in options.items() if key != 'cache'})
+        assert not reloaded.probing and reloaded.limit == 400
+        assert PageSizeTuner("other-secret", **options).probing
+
+        reloaded.record_timeout(400)
+        assert reloaded.limit == 400
+        reloaded.record_timeout(400)
+        assert reloaded.limit == 200 and reloaded.get_stats()['shrinks'] == 1
+        assert PageSizeCache(path=cache.path).get(reloaded.key)['page_size'] == 200
+
+        reloaded.record_timeout(200)
+        reloaded.record_timeout(200)
+        assert reloaded.limit == 100  # 不低于下限
+
+        assert PageSizeTuner("secret", enabled=False, cache=cache).limit == config.DEFAULT_PAGE_LIMIT
+
+        # API静默截断（回显请求的limit但只返回100条）：不接受也不缓存，改用更小的候选值
+        tuner = PageSizeTuner("silent-secret", **options)
+        assert tuner.confirm(1000, 1000, rows=100, count=5000) is None
+        assert tuner.probing and tuner.limit == 500 and cache.get(tuner.key) is None
+        assert tuner.confirm(500, None, rows=100, count=5000) is None and tuner.limit == 250
+        assert tuner.confirm(250, 250, rows=100, count=5000) is None and tuner.limit == 100
+        assert tuner.confirm(100, None, rows=100, count=5000) == 100
+        assert cache.get(tuner.key)['page_size'] == 100
+
+        # 总数不足一页时返回的记录数等于总数，页面大小被接受；已缓存的页面大小被截断时重新探测
+        tuner = PageSizeTuner("small-secret", **options)
+        assert tuner.confirm(1000, None, rows=40, count=40) == 1000
+        cached = PageSizeTuner("small-secret", **options)
+        assert not cached.probing and cached.confirm(1000, None, rows=250, count=900) is None
+        assert cached.probing and cached.limit == 500
+
+def test_clients_probe_against_mock_server():
+    """测试异步（分片）和同步客户端探测到API上限后获取全部记录，请求数少于默认页面大小"""
+    print_step("页面大小测试", "测试客户端探测模拟服务器的limit上限")
+
+    keys = ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL', 'REQUEST_DELAY', 'RESOURCE_MONITOR_ENABLED',
+            'DATE_SHARDING_ENABLED', 'PAGE_SIZE_PROBE_ENABLED', 'PAGE_SIZE_CACHE_PATH', 'TOKEN_CACHE_BACKEND')
+    saved = {key: getattr(config, key) for key in keys}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config.REQUEST_DELAY = 0
+        config.RESOURCE_MONITOR_ENABLED = False
+        config.PAGE_SIZE_PROBE_ENABLED = True
+        config.TOKEN_CACHE_BACKEND = "memory"  # 模拟服务器的token不写入本地缓存文件
+        reset_token_cache()
+        try:
+            with MockInvolveAsiaServer(settings={'records_per_day': 1200, 'latency_ms': 5,
+                                                 'max_page_limit': 500, 'page_limit_policy': 'reject'}) as server:
+                config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+                config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+                config.DATE_SHARDING_ENABLED = True
+                config.PAGE_SIZE_CACHE_PATH = os.path.join(tmp_dir, "async.json")
+                reset_page_size_cache()
+
+                async def fetch():
+                    api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+                    assert await api.authenticate()
+                    return await api.get_conversions_async("2025-06-01", "2025-06-03")
+
+                result = asyncio.run(fetch())['data']
+                stats = server.get_stats()
+
+            assert len(result['data']) == 3600 and result['limit'] == 500
+            assert stats['pages_served'] == 9  # 3个分片 × 3页
+            assert stats['conversion_requests'] == 10  # 多出的一次是被拒绝的1000
+
+            with MockInvolveAsiaServer(settings={'records_per_day': 1200, 'latency_ms': 5,
+                                                 'max_page_limit': 250, 'page_limit_policy': 'clamp'}) as server:
+                config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+                config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+                config.PAGE_SIZE_CACHE_PATH = os.path.join(tmp_dir, "sync.json")
+                reset_page_size_cache()
+
+                api = InvolveAsiaAPI(api_secret="secret", api_key="key")
+                assert api.authenticate()
+                result = api.get_conversions("2025-06-01", "2025-06-01")['data']
+                stats = server.get_stats()
+
+            assert len(result['data']) == 1200 and result['limit'] == 250
+            assert stats['conversion_requests'] == 5
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            reset_page_size_cache()
+            reset_token_cache()
+
+def test_clients_detect_silent_truncation():
+    """测试API静默截断页面大小时，异步和同步客户端减小页面大小后获取全部记录"""
+    print_step("页面大小测试", "测试客户端识别静默截断")
+
+    keys = ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL', 'REQUEST_DELAY', 'RESOURCE_MONITOR_ENABLED',
+            'DATE_SHARDING_ENABLED', 'PAGE_SIZE_PROBE_ENABLED', 'PAGE_SIZE_CACHE_PATH', 'TOKEN_CACHE_BACKEND')
+    saved = {key: getattr(config, key) for key in keys}
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            MockInvolveAsiaServer(settings={'records_per_day': 1200, 'latency_ms': 5,
+                                            'max_page_limit': 250, 'page_limit_policy': 'silent'}) as server:
+        config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+        config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+        config.REQUEST_DELAY = 0
+        config.RESOURCE_MONITOR_ENABLED = False
+        config.DATE_SHARDING_ENABLED = True
+        config.PAGE_SIZE_PROBE_ENABLED = True
+        config.TOKEN_CACHE_BACKEND = "memory"
+        reset_token_cache()
+        try:
+            config.PAGE_SIZE_CACHE_PATH = os.path.join(tmp_dir, "async.json")
+            reset_page_size_cache()
+
+            async def fetch():
+                api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+                assert await api.authenticate()
+                return await api.get_conversions_async("2025-06-01", "2025-06-03")
+
+            result = asyncio.run(fetch())['data']
+            ids = [record['conversion_id'] for record in result['data']]
+            assert len(ids) == 3600 and len(set(ids)) == 3600 and result['limit'] == 250
+
+            config.PAGE_SIZE_CACHE_PATH = os.path.join(tmp_dir, "sync.json")
+            reset_page_size_cache()
+            api = InvolveAsiaAPI(api_secret="secret", api_key="key")
+            assert api.authenticate()
+            result = api.get_conversions("2025-06-01", "2025-06-01")['data']
+            ids = [record['conversion_id'] for record in result['data']]
+            assert len(ids) == 1200 and len(set(ids)) == 1200 and result['limit'] == 250
+            assert PageSizeCache(path=config.PAGE_SIZE_CACHE_PATH).get(api.page_size.key)['page_size'] == 250
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            reset_page_size_cache()
+            reset_token_cache()
+
+if __name__ == "__main__":
+    test_probe_cache_and_shrink()
+    test_clients_probe_against_mock_server()
+    test_clients_detect_silent_truncation()
+    print_step("测试完成", "页面大小探测测试全部通过")
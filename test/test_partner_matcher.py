@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Partner匹配器测试
+测试预编译匹配器与逐个Partner检查的结果一致（包括字面值与正则的优先级），
+以及整列向量化匹配、空值处理和映射替换后重新编译
+"""
+
+import sys
+import os
+import re
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.partner_matcher import PartnerMatcher, get_partner_matcher
+from utils.logger import print_step
+
+def reference_match(mapping, source_name):
+    """逐个Partner检查的参考实现"""
+    for partner, partner_config in mapping.items():
+        if source_name in partner_config.get('sources', []):
+            return partner
+        pattern = partner_config.get('pattern', '')
+        if pattern and re.match(pattern, source_name):
+            return partner
+    return source_name
+
+def test_matcher_preserves_partner_priority():
+    """测试匹配结果与参考实现一致"""
+    print_step("Partner匹配测试", "测试优先级与参考实现一致")
+
+    mapping = {
+        "First": {"sources": ["LIT"], "pattern": r"^(AB|CD.*)"},
+        "Second": {"sources": ["ABX", "AB"], "pattern": r"^(AB.*|X\d+)"},  # AB 的字面值晚于 First 的正则
+        "Third": {"sources": ["X1"]},  # X1 的字面值晚于 Second 的正则
+        "Fourth": {"pattern": r"^Z"},
+    }
+    matcher = PartnerMatcher(mapping)
+    sources = ["LIT", "AB", "ABX", "ABC", "CD", "CDE", "X1", "X", "Z9", "zz", "Unknown"]
+    for source in sources:
+        assert matcher.match(source) == reference_match(mapping, source), source
+
+    config_sources = ["RAMPUP", "RPID001", "OPPO", "OPPO_X", "VIVO", "OEM2", "OEM3", "MKK", "MKK2",
+                      "TestPartner", "TestPartner-A", "SomethingElse", "ALL", "rampup", ""]
+    for source in config_sources:
+        assert config.match_source_to_partner(source) == reference_match(config.PARTNER_SOURCES_MAPPING, source)
+
+    # 跳过汇总Partner时未匹配的Source原样返回
+    dashboard = PartnerMatcher(config.PARTNER_SOURCES_MAPPING, skip_partners=("ByteC",), empty_result="Unknown")
+    assert dashboard.match("SomethingElse") == "SomethingElse"
+    assert dashboard.match("") == "Unknown" and dashboard.match(None) == "Unknown"
+
+def test_match_series_and_recompile():
+    """测试整列匹配（含缺失值）与逐个匹配一致，映射对象替换后重新编译"""
+    print_step("Partner匹配测试", "测试整列匹配和重新编译")
+
+    series = pd.Series(["RPID001", None, "OPPO", "MKK", "RPID001", "Other"] * 1000, index=range(10, 6010))
+    matcher = get_partner_matcher()
+    result = matcher.match_series(series)
+    assert list(result.index) == list(series.index)
+    assert pd.isna(result.iloc[1])
+    assert result.dropna().tolist() == [matcher.match(source) for source in series.dropna()]
+    assert result.iloc[0] == "RAMPUP" and result.iloc[5] == "ByteC"
+    assert matcher.cache_info().currsize >= 4
+
+    dashboard = PartnerMatcher(config.PARTNER_SOURCES_MAPPING, skip_partners=("ByteC",), empty_result="Unknown")
+    assert dashboard.match_series(pd.Series(["OEM2", None, "Other"])).tolist() == ["DeepLeaper", "Unknown", "Other"]
+
+    original = config.PARTNER_SOURCES_MAPPING
+    try:
+        config.PARTNER_SOURCES_MAPPING = {"Only": {"sources": [], "pattern": r"^RPID"}}
+        assert config.match_source_to_partner("RPID001") == "Only"
+        assert config.match_source_to_partner("OPPO") == "OPPO"
+    finally:
+        config.PARTNER_SOURCES_MAPPING = original
+    assert config.match_source_to_partner("OPPO") == "DeepLeaper"
+
+if __name__ == "__main__":
+    test_matcher_preserves_partner_priority()
+    test_match_series_and_recompile()
+    print_step("测试完成", "Partner匹配器测试全部通过")
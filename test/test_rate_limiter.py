@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+全局令牌桶限速测试
+测试令牌桶的速率控制和统计、按主机共享的限速器，以及文件锁跨进程共享状态
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.rate_limiter import TokenBucketRateLimiter, get_rate_limiter, reset_rate_limiters, fcntl
+from utils.logger import print_step
+
+def test_token_bucket_paces_sync_and_async_callers():
+    """测试突发令牌用完后按速率放行，并统计被限速次数和等待时间"""
+    print_step("限速测试", "测试令牌桶速率控制")
+
+    limiter = TokenBucketRateLimiter("api.example.com", rate=50, burst=2)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    elapsed = time.monotonic() - started
+    stats = limiter.get_stats()
+    assert stats['requests'] == 4
+    assert stats['throttled'] == 2
+    assert elapsed >= 0.035
+
+    async def acquire_concurrently():
+        waits = await asyncio.gather(*(limiter.acquire_async() for _ in range(5)))
+        return sorted(waits)
+
+    waits = asyncio.run(acquire_concurrently())
+    # 并发调用者按预约顺序依次放行，等待时间逐个递增一个令牌间隔
+    assert all(later - earlier > 0.015 for earlier, later in zip(waits, waits[1:]))
+    assert limiter.get_stats()['requests'] == 9
+
+    unlimited = TokenBucketRateLimiter("api.example.com")
+    assert not unlimited.enabled
+    assert unlimited.acquire() == 0 and unlimited.get_stats()['throttled'] == 0
+
+def test_limiters_shared_by_host_and_across_processes():
+    """测试同一主机的客户端共享限速器，文件锁状态在多个限速器实例间共享"""
+    print_step("限速测试", "测试按主机共享和跨进程共享")
+
+    reset_rate_limiters()
+    original_enabled = config.GLOBAL_RATE_LIMIT_ENABLED
+    config.GLOBAL_RATE_LIMIT_ENABLED = True
+    try:
+        auth = get_rate_limiter("https://api.involve.asia/api/authenticate")
+        conversions = get_rate_limiter("https://api.involve.asia/api/conversions/range")
+        other = get_rate_limiter("http://127.0.0.1:8765/api/conversions/range")
+        assert auth is conversions
+        assert other is not conversions and other.key == "127.0.0.1:8765"
+    finally:
+        config.GLOBAL_RATE_LIMIT_ENABLED = original_enabled
+        reset_rate_limiters()
+
+    if fcntl is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_path = os.path.join(tmp_dir, "rate_limit_api.json")
+        # 两个实例模拟两个进程：第一个用完突发令牌后，第二个也需要等待
+        first = TokenBucketRateLimiter("api", rate=50, burst=2, state_path=state_path)
+        second = TokenBucketRateLimiter("api", rate=50, burst=2, state_path=state_path)
+        first.acquire()
+        first.acquire()
+        assert second.acquire() > 0
+        assert second.get_stats()['throttled'] == 1 and second.get_stats()['cross_process']
+
+if __name__ == "__main__":
+    test_token_bucket_paces_sync_and_async_callers()
+    test_limiters_shared_by_host_and_across_processes()
+    print_step("测试完成", "全局令牌桶限速测试全部通过")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Conversion记录字段投影测试
+测试紧凑记录的映射接口、额外字段、原始JSON保留、序列化/DataFrame兼容性和内存占用
+"""
+
+import sys
+import os
+import json
+import tempfile
+import tracemalloc
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.record_projection import RecordProjector, json_default
+from modules.conversion_spool import ConversionSpool
+from modules.shard_planner import ConversionDeduplicator
+from modules.mock_involve_server import synthetic_conversion
+from utils.logger import print_step
+
+def create_raw_page(start, count=100):
+    """生成带多余字段的一页原始记录"""
+    page = []
+    for index in range(start, start + count):
+        record = synthetic_conversion("2025-06-01", index)
+        record.update({f"unused_field_{k}": f"unused-{index}-{k}" for k in range(10)})
+        page.append(record)
+    return page
+
+def test_compact_record_behaves_like_dict():
+    """测试紧凑记录只保留投影字段，并可像dict一样读写、序列化和构建DataFrame"""
+    print_step("投影测试", "测试紧凑记录的映射接口")
+
+    projector = RecordProjector(fields=["conversion_id", "offer_name", "sale_amount", "aff_sub1", "aff_sub4"],
+                                shared_fields=["offer_name"])
+    raw_page = create_raw_page(0, 3)
+    records = projector.project_page(raw_page)
+    record = records[0]
+
+    assert set(record) == {"conversion_id", "offer_name", "sale_amount", "aff_sub1"}
+    assert record['sale_amount'] == raw_page[0]['sale_amount']
+    assert record.get('aff_sub4') is None and 'payout' not in record
+    assert record.raw is None
+    assert records[0]['offer_name'] is projector.project_page(create_raw_page(6, 1))[0]['offer_name']
+
+    record['api_source'] = "IAByteC"
+    assert record.to_dict()['api_source'] == "IAByteC"
+    assert json.loads(json.dumps(record, default=json_default)) == record.to_dict()
+
+    df = pd.DataFrame(records)
+    assert list(df.columns) == ["conversion_id", "offer_name", "sale_amount", "aff_sub1", "api_source"]
+    assert len(ConversionDeduplicator().filter(records + records)) == 3
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ConversionSpool(path=os.path.join(tmp_dir, "projected.ndjson")) as spool:
+            spool.append_page(records)
+        assert list(spool.reader())[0] == record.to_dict()
+
+    raw_projector = RecordProjector(fields=["conversion_id"], keep_raw=True)
+    assert raw_projector.project_page(raw_page)[0].raw is raw_page[0]
+    assert RecordProjector(enabled=False).project_page(raw_page) is raw_page
+
+def test_projection_reduces_memory():
+    """测试投影后的记录内存显著低于完整dict"""
+    print_step("投影测试", "测试投影后的内存占用")
+
+    payload = json.dumps(create_raw_page(0, 5000))
+
+    tracemalloc.start()
+    full_records = json.loads(payload)
+    full_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del full_records
+
+    projector = RecordProjector(shared_fields=["conversion_status", "offer_name", "currency", "aff_sub1", "aff_sub2"])
+    tracemalloc.start()
+    page = json.loads(payload)
+    projected = projector.project_page(page)
+    del page  # 原始页面在投影后即可释放
+    projected_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(projected) == 5000
+    assert projected_size * 2 < full_size
+
+if __name__ == "__main__":
+    test_compact_record_behaves_like_dict()
+    test_projection_reduces_memory()
+    print_step("测试完成", "记录字段投影测试全部通过")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+报告汇总清单测试
+测试Partner报表和ByteC报表生成时写入汇总清单，邮件从清单得到的统计与读取Excel得到的结果一致，
+以及清单缺失或报表被替换时回退到读取Excel
+"""
+
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.conversion_frame import ConversionFrame
+from modules.data_processor import DataProcessor
+from modules.bytec_report_generator import ByteCReportGenerator
+from modules.email_sender import EmailSender
+from modules.report_manifest import manifest_path, load_manifest, is_report_manifest
+from utils.logger import print_step
+
+def create_test_frame(rows=600):
+    """生成多个Partner、Source和Offer的测试数据"""
+    sources = ["OEM3", "OEM2", "RPID001", "MKK", "A&B <x>", None, "Shopee/Promo", "Shopee_Promo"]  # 后两个清理后工作表重名
+    return pd.DataFrame({
+        'conversion_id': [f"c{i}" for i in range(rows)],
+        'offer_name': [["Shopee TH - CPS", "Lazada MY - CPS", "Zalora - CPS"][i % 3] for i in range(rows)],
+        'sale_amount': [round(1 + (i * 7.31) % 500, 2) for i in range(rows)],
+        'payout': [round((i * 0.37) % 20, 2) for i in range(rows)],
+        'aff_sub1': [sources[i % len(sources)] for i in range(rows)],
+        'api_source': ["LisaidByteC" if i % 3 else "IAByteC" for i in range(rows)],
+    })
+
+def test_partner_manifest_matches_excel():
+    """测试Partner邮件数据从清单读取与从Excel计算一致"""
+    print_step("汇总清单测试", "测试Partner报表清单")
+
+    original_parallel = config.PARALLEL_EXPORT_ENABLED
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            config.PARALLEL_EXPORT_ENABLED = False
+            summary = DataProcessor().process_data(ConversionFrame.build(create_test_frame()), output_dir=tmp_dir,
+                                                   start_date="2025-01-01", end_date="2025-01-07")
+        finally:
+            config.PARALLEL_EXPORT_ENABLED = original_parallel
+
+        sender = EmailSender(global_email_disabled=True)
+        assert len(summary['pub_files']) > 1
+        for file_path in summary['pub_files']:
+            manifest = load_manifest(file_path)
+            assert manifest is not None and manifest['report_type'] == 'partner'
+            partner = manifest['partner']
+            assert manifest['records'] == summary['pub_summary'][partner]['records']
+            assert round(manifest['total_amount'], 2) == round(summary['pub_summary'][partner]['total_amount'], 2)
+            assert sum(offer['conversions'] for offer in manifest['offers']) == manifest['records']
+
+            from_manifest = sender._prepare_partner_email_data(partner, {'file_path': file_path})
+            assert from_manifest['total_amount'] == sender._calculate_sales_amount_from_excel(file_path)
+            assert from_manifest['sources_statistics'] == sender._calculate_sources_statistics_from_excel(file_path)
+
+        assert [name for name in os.listdir(tmp_dir) if is_report_manifest(name)]
+        sheet_names = [sheet['sheet_name'] for file_path in summary['pub_files'] for sheet in load_manifest(file_path)['sheets']]
+        assert 'Shopee_Promo' in sheet_names and 'Shopee_Promo1' in sheet_names
+
+def test_bytec_manifest_matches_excel():
+    """测试ByteC邮件三个维度的数据从清单读取与从Excel计算一致"""
+    print_step("汇总清单测试", "测试ByteC报表清单")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = ByteCReportGenerator()
+        conversions = ConversionFrame.build(create_test_frame())
+        file_path = generator.generate_bytec_report(conversions, "2025-01-01", "2025-01-07", tmp_dir)
+        summary_data = generator._create_offer_summary(generator._prepare_data(conversions))
+
+        manifest = load_manifest(file_path)
+        assert manifest['report_type'] == 'bytec'
+        assert manifest['company']['total_conversion'] == int(summary_data['Conversions'].sum())
+
+        sender = EmailSender(global_email_disabled=True)
+        from_manifest = sender._bytec_data_from_manifest(manifest)
+        from_excel = sender._calculate_bytec_summary_from_excel(file_path)
+        assert from_manifest['partner_source'] == from_excel['partner_source']
+        assert from_manifest['offer'] == from_excel['offer']
+        for key in ('total_conversion', 'total_sales', 'total_earning', 'total_pub_commission'):
+            assert from_manifest['company'][key] == from_excel['company'][key], key
+        assert from_manifest['company']['total_sales'] == f"${summary_data['Sale Amount'].sum():,.2f}"
+
+        email_data = sender._prepare_partner_email_data('ByteC', {'file_path': file_path})
+        assert email_data['sources_statistics'] == [
+            {'source_name': '2025-01-01 to 2025-01-07', 'records': len(summary_data), 'sales_amount': from_manifest['company']['total_sales']}
+        ]
+
+def test_stale_or_missing_manifest():
+    """测试清单缺失、损坏或报表被替换时返回None"""
+    print_step("汇总清单测试", "测试清单回退")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = ByteCReportGenerator()
+        file_path = generator.generate_bytec_report(ConversionFrame.build(create_test_frame(60)),
+                                                    "2025-01-01", "2025-01-01", tmp_dir)
+        assert load_manifest(file_path) is not None
+
+        with open(file_path, 'ab') as f:
+            f.write(b'\0')  # 报表被替换
+        assert load_manifest(file_path) is None
+
+        with open(manifest_path(file_path), 'w', encoding='utf-8') as f:
+            f.write("{")
+        assert load_manifest(file_path) is None
+
+        os.remove(manifest_path(file_path))
+        assert load_manifest(file_path) is None
+        assert load_manifest(None) is None
+
+        original = config.REPORT_MANIFEST_ENABLED
+        try:
+            config.REPORT_MANIFEST_ENABLED = False
+            file_path = generator.generate_bytec_report(ConversionFrame.build(create_test_frame(60)),
+                                                        "2025-01-02", "2025-01-02", tmp_dir)
+            assert not os.path.exists(manifest_path(file_path))
+        finally:
+            config.REPORT_MANIFEST_ENABLED = original
+
+if __name__ == "__main__":
+    test_partner_manifest_matches_excel()
+    test_bytec_manifest_matches_excel()
+    test_stale_or_missing_manifest()
+    print_step("测试完成", "报告汇总清单测试全部通过")
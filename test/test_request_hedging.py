@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+请求对冲测试
+测试p95触发时间、样本不足和预算限制，慢请求被对冲请求截断、失败请求回退到另一请求，
+以及不成功的响应不会胜出、对冲请求占用并发槽位
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.request_hedging import HedgePolicy, run_hedged
+from modules.concurrency_controller import AIMDConcurrencyController
+from utils.logger import print_step
+
+def test_hedge_delay_and_budget():
+    """测试触发时间取p95并受最小值限制，对冲数量不超过预算比例"""
+    print_step("对冲测试", "测试触发时间和预算")
+
+    policy = HedgePolicy(enabled=True, percentile=95, min_samples=20, budget_percent=10, min_delay=0.05)
+    for latency in range(1, 20):
+        policy.record_latency(latency / 100.0)
+    assert policy.hedge_delay() is None  # 样本不足
+
+    policy.record_latency(0.20)
+    assert policy.hedge_delay() == 0.19
+
+    for _ in range(20):
+        policy.count_request()
+    assert policy.try_acquire() and policy.try_acquire()
+    assert not policy.try_acquire()
+    assert policy.get_stats()['hedges_skipped_budget'] == 1
+
+    assert HedgePolicy(enabled=False).hedge_delay() is None
+
+def test_run_hedged_cuts_slow_request():
+    """测试慢主请求被对冲请求截断，主请求失败时返回对冲结果"""
+    print_step("对冲测试", "测试对冲请求先返回")
+
+    policy = HedgePolicy(enabled=True, min_samples=1, budget_percent=100, min_delay=0.05)
+    policy.record_latency(0.01)
+    calls = []
+    cancelled = []
+
+    async def send():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)  # 长尾主请求
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "primary"
+        await asyncio.sleep(0.01)
+        return "hedge"
+
+    tokens = []
+
+    async def before_hedge():
+        tokens.append(True)
+
+    started = time.monotonic()
+    result = asyncio.run(run_hedged(policy, send, before_hedge=before_hedge))
+    assert result == "hedge"
+    assert time.monotonic() - started < 1
+    assert tokens == [True] and cancelled == [True]
+    assert policy.get_stats()['hedges_won'] == 1
+
+    failures = []
+
+    async def failing_primary():
+        failures.append(True)
+        if len(failures) == 1:
+            await asyncio.sleep(0.1)
+            raise ConnectionError("primary failed")
+        await asyncio.sleep(0.2)
+        return "hedge"
+
+    assert asyncio.run(run_hedged(policy, failing_primary)) == "hedge"
+    assert policy.get_stats()['hedges_issued'] == 2
+
+def test_unsuccessful_hedge_does_not_win():
+    """测试先返回的429响应不作为胜出结果，对冲请求在并发槽位内发送"""
+    print_step("对冲测试", "测试不成功的响应和并发槽位")
+
+    policy = HedgePolicy(enabled=True, min_samples=1, budget_percent=100, min_delay=0.05)
+    policy.record_latency(0.01)
+    controller = AIMDConcurrencyController(initial_limit=2, adaptive=False)
+    in_flight = []
+
+    def make_send(primary_status, hedge_status):
+        calls = []
+
+        async def send():
+            calls.append(True)
+            if len(calls) == 1:
+                await asyncio.sleep(0.3)
+                return primary_status
+            in_flight.append(controller.in_flight)
+            await asyncio.sleep(0.01)
+            return hedge_status
+        return send
+
+    def run(send):
+        return asyncio.run(run_hedged(policy, send, is_success=lambda status: status < 400,
+                                      hedge_slot=controller.slot))
+
+    assert run(make_send(200, 429)) == 200  # 对冲请求先返回429，等待主请求
+    assert run(make_send(503, 429)) == 503  # 都不成功时返回主请求的响应
+    assert run(make_send(200, 200)) == 200 and policy.get_stats()['hedges_won'] == 1
+    assert in_flight == [1, 1, 1] and controller.in_flight == 0
+
+if __name__ == "__main__":
+    test_hedge_delay_and_budget()
+    test_run_hedged_cuts_slow_request()
+    test_unsuccessful_hedge_does_not_win()
+    print_step("测试完成", "请求对冲测试全部通过")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+后台资源采样测试
+测试环形缓冲区容量、事件记录、时间序列输出、资源状态打印只读取最新样本，
+以及输出文件统计包含Parquet中间文件、不含报表清单和资源时间序列
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import modules.resource_sampler as resource_sampler
+from modules.resource_sampler import ResourceSampler
+from modules.involve_asia_api import ResourceMonitor
+from utils.logger import print_step
+
+def test_sampler_ring_buffer_and_timeseries_dump():
+    """测试后台线程采样写入有界缓冲区，并输出样本和事件时间序列"""
+    print_step("资源采样测试", "测试环形缓冲区和时间序列输出")
+
+    original_check = resource_sampler.check_connectivity
+    resource_sampler.check_connectivity = lambda *args, **kwargs: True
+    try:
+        sampler = ResourceSampler(interval=0.02, buffer_size=5).start()
+        time.sleep(0.3)
+        sampler.record_event("第3页超时重试1")
+        sampler.stop()
+
+        assert len(sampler.samples) == 5
+        latest = sampler.latest()
+        assert latest['rss_mb'] > 0 and latest['connectivity'] is True
+        assert [sample['timestamp'] for sample in sampler.samples] == sorted(s['timestamp'] for s in sampler.samples)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = sampler.dump(os.path.join(tmp_dir, "resource_timeseries.json"))
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        assert len(payload['samples']) == 5
+        assert payload['events'][0]['label'] == "第3页超时重试1"
+        assert ResourceSampler(interval=1).dump() is None
+
+        # 默认路径写入诊断目录，不进入输出目录
+        original_dir = config.DIAGNOSTICS_DIR
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.DIAGNOSTICS_DIR = os.path.join(tmp_dir, "diagnostics")
+            try:
+                path = sampler.dump()
+            finally:
+                config.DIAGNOSTICS_DIR = original_dir
+            assert os.path.dirname(path) == os.path.join(tmp_dir, "diagnostics")
+            assert os.path.basename(path).startswith(resource_sampler.TIMESERIES_PREFIX)
+            assert not resource_sampler.is_data_output_file(os.path.basename(path))
+    finally:
+        resource_sampler.check_connectivity = original_check
+
+def test_print_resource_status_reads_latest_sample():
+    """测试资源状态打印不在调用路径上执行探测，只读取共享采样器的最新样本"""
+    print_step("资源采样测试", "测试资源状态打印只读取最新样本")
+
+    sampler = ResourceSampler(interval=60)
+    sampler.take_sample = None  # 打印路径不应触发采样
+    sampler.samples.append({'timestamp': time.time(), 'rss_mb': 12.5, 'vms_mb': 50.0, 'memory_percent': 1.0,
+                            'process_cpu': 3.0, 'system_cpu': 10.0, 'cpu_count': 4,
+                            'established_connections': 2, 'total_connections': 3, 'connectivity': None,
+                            'disk_used_gb': 1.0, 'disk_total_gb': 10.0, 'disk_percent': 10.0,
+                            'json_files': 0, 'json_files_mb': 0.0, 'json_files_latest': []})
+
+    original_get = resource_sampler.get_resource_sampler
+    import modules.involve_asia_api as involve_asia_api
+    involve_asia_api.get_resource_sampler = lambda: sampler
+    try:
+        monitor = ResourceMonitor()
+        started = time.monotonic()
+        monitor.print_resource_status("第5页超时重试1")
+        assert time.monotonic() - started < 0.5
+        assert [event['label'] for event in sampler.events] == ["第5页超时重试1"]
+    finally:
+        involve_asia_api.get_resource_sampler = original_get
+
+def test_output_file_stats_include_parquet():
+    """测试JSON/Parquet转换数据文件计入统计，报表清单和资源时间序列不计入"""
+    print_step("资源采样测试", "测试输出文件统计")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("conversions.json", "conversions.parquet", "Partner.xlsx", "Partner.xlsx.summary.json",
+                     "resource_timeseries_20250601_100000.json"):
+            with open(os.path.join(tmp_dir, name), 'wb') as f:
+                f.write(b'x' * 1024)
+
+        info = resource_sampler.json_files_info(tmp_dir)
+        assert info['count'] == 2
+        assert sorted(f['name'] for f in info['latest']) == ["conversions.json", "conversions.parquet"]
+
+        info = ResourceMonitor().get_json_files_info(tmp_dir)
+        assert sorted(f['name'] for f in info['files']) == ["conversions.json", "conversions.parquet"]
+
+if __name__ == "__main__":
+    test_sampler_ring_buffer_and_timeseries_dump()
+    test_print_resource_status_reads_latest_sample()
+    test_output_file_stats_include_parquet()
+    print_step("测试完成", "后台资源采样测试全部通过")
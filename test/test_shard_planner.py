@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+日期分片规划测试
+测试日期范围切分与分片边界去重
+"""
+
+import sys
+import os
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.shard_planner import plan_date_shards, ConversionDeduplicator
+from utils.logger import print_step
+
+def test_plan_date_shards():
+    """测试按天/按N天切分日期范围"""
+    print_step("分片测试", "测试日期范围切分")
+
+    shards = plan_date_shards('2025-06-01', '2025-06-30', shard_days=1, min_days=3)
+    assert len(shards) == 30
+    assert shards[0] == ('2025-06-01', '2025-06-01')
+    assert shards[-1] == ('2025-06-30', '2025-06-30')
+
+    shards = plan_date_shards('2025-06-01', '2025-06-10', shard_days=4, min_days=3)
+    assert shards == [('2025-06-01', '2025-06-04'), ('2025-06-05', '2025-06-08'), ('2025-06-09', '2025-06-10')]
+
+    # 跨月份
+    shards = plan_date_shards('2025-05-30', '2025-06-02', shard_days=2, min_days=3)
+    assert shards == [('2025-05-30', '2025-05-31'), ('2025-06-01', '2025-06-02')]
+
+    # 短范围不分片
+    assert plan_date_shards('2025-06-01', '2025-06-02', shard_days=1, min_days=3) == [('2025-06-01', '2025-06-02')]
+
+def test_deduplicate_shard_edges():
+    """测试按conversion_id去重"""
+    print_step("分片测试", "测试分片边界去重")
+
+    deduplicator = ConversionDeduplicator()
+    first = deduplicator.filter([{'conversion_id': 1}, {'conversion_id': 2}, {'sale_amount': '1.0'}])
+    second = deduplicator.filter([{'conversion_id': 2}, {'conversion_id': 3}, {'sale_amount': '1.0'}])
+
+    assert len(first) == 3
+    assert [record.get('conversion_id') for record in second] == [3, None]
+    assert deduplicator.duplicates == 1
+
+if __name__ == "__main__":
+    test_plan_date_shards()
+    test_deduplicate_shard_edges()
+    print_step("测试完成", "日期分片规划测试全部通过")
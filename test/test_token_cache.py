@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+认证Token缓存测试
+测试过期/刷新窗口、作废时保留其他客户端刷新的token、文件存储跨实例复用，
+以及客户端命中缓存时跳过认证、缓存token失效(401)时只重新认证一次
+"""
+
+import sys
+import os
+import stat
+import time
+import asyncio
+import tempfile
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from modules.token_cache import TokenCache, MemoryTokenStore, FileTokenStore, token_key, reset_token_cache
+from modules.mock_involve_server import MockInvolveAsiaServer
+from modules.involve_asia_api import InvolveAsiaAPI
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from utils.logger import print_step
+
+def test_token_cache_expiry_and_store():
+    """测试缓存命中、刷新窗口内视为过期、按token作废和文件存储"""
+    print_step("Token缓存测试", "测试过期和存储")
+
+    cache = TokenCache(MemoryTokenStore(), enabled=True, ttl_seconds=3600, refresh_margin=300)
+    key = token_key("general", "secret", "https://api.test/api/authenticate")
+    assert "secret" not in key and key != token_key("general", "other", "https://api.test/api/authenticate")
+
+    cache.put(key, "token-1")
+    assert cache.get(key) == "token-1"
+    cache.put(key, "token-short", expires_in=200)  # 有效期短于刷新窗口
+    assert cache.get(key) is None
+
+    cache.put(key, "token-2")
+    cache.invalidate(key, "token-1")  # 已被其他客户端刷新，保留新token
+    assert cache.get(key) == "token-2"
+    cache.invalidate(key, "token-2")
+    assert cache.get(key) is None
+    assert cache.get_stats()['invalidations'] == 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "tokens.json")
+        TokenCache(FileTokenStore(path), enabled=True).put(key, "token-3")
+        assert TokenCache(FileTokenStore(path), enabled=True).get(key) == "token-3"
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+        store = FileTokenStore(path)
+        store.set("expired", {'token': "old", 'expires_at': time.time() - 1})
+        assert store.get("expired") is None and store.get(key)['token'] == "token-3"
+
+    assert TokenCache(MemoryTokenStore(), enabled=False).get(key) is None
+
+def test_clients_reuse_and_refresh_tokens():
+    """测试第二个客户端复用缓存token，缓存token失效时并发页面只触发一次重新认证"""
+    print_step("Token缓存测试", "测试客户端复用和401刷新")
+
+    keys = ('INVOLVE_ASIA_AUTH_URL', 'INVOLVE_ASIA_CONVERSIONS_URL', 'REQUEST_DELAY', 'RESOURCE_MONITOR_ENABLED',
+            'DATE_SHARDING_ENABLED', 'PAGE_SIZE_PROBE_ENABLED', 'TOKEN_CACHE_BACKEND', 'TOKEN_CACHE_PATH')
+    saved = {key: getattr(config, key) for key in keys}
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            MockInvolveAsiaServer(settings={'records_per_day': 500, 'latency_ms': 5, 'token_ttl_seconds': 600}) as server:
+        config.INVOLVE_ASIA_AUTH_URL = f"{server.base_url}/authenticate"
+        config.INVOLVE_ASIA_CONVERSIONS_URL = f"{server.base_url}/conversions/range"
+        config.REQUEST_DELAY = 0
+        config.RESOURCE_MONITOR_ENABLED = False
+        config.DATE_SHARDING_ENABLED = False
+        config.PAGE_SIZE_PROBE_ENABLED = False
+        config.TOKEN_CACHE_BACKEND = "file"
+        config.TOKEN_CACHE_PATH = os.path.join(tmp_dir, "tokens.json")
+        reset_token_cache()
+        try:
+            with InvolveAsiaAPI(api_secret="secret", api_key="key") as api:
+                assert api.authenticate()
+            reset_token_cache()  # 模拟新的一次运行
+            with InvolveAsiaAPI(api_secret="secret", api_key="key") as api:
+                assert api.authenticate()
+                assert len(api.get_conversions("2025-06-01", "2025-06-01")['data']['data']) == 500
+            assert server.get_stats()['auth_requests'] == 1
+
+            # 缓存中的token已被服务器作废
+            api = AsyncInvolveAsiaAPI(api_secret="secret", api_key="key")
+            api.token_cache.put(api.token_key, "revoked-token")
+
+            async def fetch():
+                assert await api.authenticate()
+                assert api.token == "revoked-token"
+                return await api.get_conversions_async("2025-06-01", "2025-06-02")
+
+            records = asyncio.run(fetch())['data']['data']
+            stats = server.get_stats()
+            assert len(records) == 1000
+            assert stats['auth_requests'] == 2
+            assert stats['unauthorized'] >= 1
+            assert api.token_cache.get(api.token_key) == api.token != "revoked-token"
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            reset_token_cache()
+
+if __name__ == "__main__":
+    test_token_cache_expiry_and_store()
+    test_clients_reuse_and_refresh_tokens()
+    print_step("测试完成", "认证Token缓存测试全部通过")